@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+♻️ POOL DE WEBDRIVERS REUTILIZABLES
+Comparte navegadores entre las búsquedas de un ciclo de los scrapers
+continuos: el arranque de Chrome (varios segundos y cientos de MB) se paga
+una vez por slot del pool y no una vez por término de búsqueda.
+
+- Un slot se revisa antes de entregarse (health check) si su última página
+  falló o si estuvo ocioso más de idle_check_s (ej. la pausa entre
+  búsquedas), y se reemplaza si el navegador murió o quedó colgado
+- Un driver se recicla (quit + uno nuevo) al llegar a max_pages páginas,
+  para acotar memoria y estado acumulado de la sesión
+- Uso por página: ``with pool.page() as driver: driver.get(url) ...``; si
+  el bloque lanza una excepción el driver queda bajo sospecha y se revisa
+  antes de volver a usarse
+
+El pool no importa selenium: recibe la función que crea el driver
+(setup_driver_continuo de cada scraper).
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_PAGES = 40
+DEFAULT_IDLE_CHECK_S = 5.0
+
+
+def driver_is_alive(driver: Any) -> bool:
+    """Health check por defecto: el navegador responde a un script trivial"""
+    try:
+        return driver.execute_script("return 1") == 1
+    except Exception:
+        return False
+
+
+def quit_driver(driver: Any) -> None:
+    """driver.quit() sin propagar errores de un navegador ya muerto"""
+    try:
+        driver.quit()
+    except Exception as e:
+        logger.warning(f"⚠️ Error cerrando driver: {e}")
+
+
+class PooledDriver:
+    """Driver del pool con su contador de páginas"""
+
+    __slots__ = ("driver", "pages", "suspect", "released_at")
+
+    def __init__(self, driver: Any):
+        self.driver = driver
+        self.pages = 0
+        self.suspect = False
+        self.released_at = time.monotonic()
+
+
+class DriverPool:
+    """Pool de WebDrivers con health check y reciclaje por páginas"""
+
+    def __init__(self, factory: Callable[[], Any], size: int = 1, max_pages: int = DEFAULT_MAX_PAGES,
+                 health_check: Optional[Callable[[Any], bool]] = driver_is_alive,
+                 idle_check_s: float = DEFAULT_IDLE_CHECK_S, name: str = "chrome"):
+        if size < 1:
+            raise ValueError("size debe ser >= 1")
+        if max_pages < 1:
+            raise ValueError("max_pages debe ser >= 1")
+        self.factory = factory
+        self.size = size
+        self.max_pages = max_pages
+        self.health_check = health_check
+        self.idle_check_s = idle_check_s
+        self.name = name
+        self._idle: List[PooledDriver] = []
+        self._created = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self.stats = {"started": 0, "recycled": 0, "unhealthy": 0, "pages": 0}
+
+    # ========================================================================
+    # 🔄 PRÉSTAMO Y DEVOLUCIÓN
+    # ========================================================================
+
+    def acquire(self, timeout: Optional[float] = None) -> PooledDriver:
+        """Driver sano del pool; crea uno si hay slots libres, si no espera"""
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError(f"Pool '{self.name}' cerrado")
+                if self._idle:
+                    slot = self._idle.pop()
+                    break
+                if self._created < self.size:
+                    self._created += 1
+                    slot = None
+                    break
+                if not self._cond.wait(timeout):
+                    raise TimeoutError(f"Sin drivers libres en pool '{self.name}' tras {timeout}s")
+
+        # Health check y arranque fuera del lock: pueden tardar segundos
+        if slot is not None and not self._healthy(slot):
+            with self._cond:
+                self.stats["unhealthy"] += 1
+            logger.warning(f"🩺 Driver {self.name} no responde tras {slot.pages} páginas, reemplazando")
+            quit_driver(slot.driver)
+            slot = None
+
+        if slot is None:
+            try:
+                slot = PooledDriver(self.factory())
+            except BaseException:
+                with self._cond:
+                    self._created -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self.stats["started"] += 1
+            logger.info(f"🚀 Driver {self.name} iniciado ({self._created}/{self.size} slots)")
+        return slot
+
+    def release(self, slot: PooledDriver, ok: bool = True) -> None:
+        """Devuelve el driver; lo recicla si llegó a max_pages o el pool se cerró"""
+        recycle = False
+        with self._cond:
+            slot.pages += 1
+            self.stats["pages"] += 1
+            slot.suspect = not ok
+            slot.released_at = time.monotonic()
+            if self._closed or slot.pages >= self.max_pages:
+                recycle = True
+                self._created -= 1
+                if not self._closed:
+                    self.stats["recycled"] += 1
+            else:
+                self._idle.append(slot)
+            self._cond.notify()
+        if recycle:
+            if not self._closed:
+                logger.info(f"♻️ Reciclando driver {self.name} tras {slot.pages} páginas")
+            quit_driver(slot.driver)
+
+    @contextmanager
+    def page(self, timeout: Optional[float] = None):
+        """Presta un driver para cargar y procesar una página"""
+        slot = self.acquire(timeout)
+        ok = False
+        try:
+            yield slot.driver
+            ok = True
+        finally:
+            self.release(slot, ok)
+
+    def _healthy(self, slot: PooledDriver) -> bool:
+        if self.health_check is None:
+            return True
+        if not slot.suspect and time.monotonic() - slot.released_at < self.idle_check_s:
+            return True
+        return bool(self.health_check(slot.driver))
+
+    # ========================================================================
+    # 🏁 CIERRE
+    # ========================================================================
+
+    def close(self) -> None:
+        """Cierra los drivers libres; los prestados se cierran al devolverse"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._created -= len(idle)
+            self._cond.notify_all()
+        for slot in idle:
+            quit_driver(slot.driver)
+        logger.info(f"🏁 Pool {self.name} cerrado: {self.stats['started']} drivers iniciados, "
+                    f"{self.stats['pages']} páginas, {self.stats['recycled']} reciclados, "
+                    f"{self.stats['unhealthy']} reemplazados por health check")
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._cond:
+            return dict(self.stats, alive=self._created, idle=len(self._idle))
+
+    def __enter__(self) -> "DriverPool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+⚡ MOTOR DE SCRAPING CONCURRENTE
+Ejecuta K páginas (de una o varias búsquedas) en paralelo por retailer sobre
+un DriverPool de K slots, en vez de recorrer búsquedas y páginas una por una.
+
+- Cortesía por dominio (DomainLimiter): máximo de páginas simultáneas y
+  separación mínima (más jitter) entre cargas al mismo host
+- Espera por página lista (wait_for_products): sondea los productos
+  renderizados y devuelve apenas el conteo se estabiliza tras el scroll,
+  en lugar de los sleeps fijos de 2+1+1+2 s por página
+- Con cut_empty_from, una página vacía de ese número en adelante cancela
+  las páginas siguientes de la búsqueda que aún no empezaron, y descarta
+  las que ya estaban en vuelo (mismo corte que el loop secuencial)
+- Sin limiter explícito se usa uno con DEFAULT_MIN_INTERVAL_S entre cargas
+  al mismo host: nunca K cargas simultáneas sin separación
+
+No importa selenium ni bs4: usa la API mínima del WebDriver (get,
+page_source, find_elements, execute_script) y el parser que entrega cada
+scraper. benchmarks/scrape_bench.py mide el throughput contra un servidor
+HTTP local con páginas guardadas.
+"""
+
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+CSS_SELECTOR = "css selector"  # selenium.webdriver.common.by.By.CSS_SELECTOR
+SCROLL_BOTTOM_JS = "window.scrollTo(0, document.body.scrollHeight);"
+DEFAULT_MIN_INTERVAL_S = 1.0
+
+
+# ============================================================================
+# 🚦 CORTESÍA POR DOMINIO
+# ============================================================================
+
+class _DomainState:
+    __slots__ = ("semaphore", "next_start")
+
+    def __init__(self, max_concurrent: int):
+        self.semaphore = threading.BoundedSemaphore(max_concurrent)
+        self.next_start = 0.0
+
+
+class DomainLimiter:
+    """Máximo de cargas simultáneas y separación mínima entre cargas por host"""
+
+    def __init__(self, max_concurrent: int = 2, min_interval_s: float = DEFAULT_MIN_INTERVAL_S,
+                 jitter_s: float = 0.0):
+        if max_concurrent < 1:
+            raise ValueError("max_concurrent debe ser >= 1")
+        self.max_concurrent = max_concurrent
+        self.min_interval_s = min_interval_s
+        self.jitter_s = jitter_s
+        self._domains: Dict[str, _DomainState] = {}
+        self._lock = threading.Lock()
+
+    def _state(self, domain: str) -> _DomainState:
+        with self._lock:
+            state = self._domains.get(domain)
+            if state is None:
+                state = self._domains[domain] = _DomainState(self.max_concurrent)
+            return state
+
+    def _reserve_start(self, state: _DomainState) -> float:
+        """Reserva el próximo turno del dominio; devuelve cuánto esperar"""
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, state.next_start)
+            gap = self.min_interval_s + (random.uniform(0, self.jitter_s) if self.jitter_s else 0.0)
+            state.next_start = start + gap
+            return start - now
+
+    @contextmanager
+    def slot(self, url: str):
+        """Turno para cargar url respetando los límites de su dominio"""
+        state = self._state(urlsplit(url).netloc)
+        state.semaphore.acquire()
+        try:
+            delay = self._reserve_start(state)
+            if delay > 0:
+                time.sleep(delay)
+            yield
+        finally:
+            state.semaphore.release()
+
+
+# ============================================================================
+# ⏳ ESPERA POR PÁGINA LISTA
+# ============================================================================
+
+def wait_for_products(driver: Any, selector: str, timeout: float = 10.0, poll_s: float = 0.25,
+                      scroll: bool = True) -> int:
+    """
+    Espera a que la página tenga productos renderizados: conteo de selector > 0
+    y sin cambios entre dos sondeos (con scroll al fondo entre ellos para
+    disparar la carga diferida). Devuelve el conteo; 0 si se agota el timeout
+    sin productos (página vacía o bloqueada).
+    """
+    deadline = time.monotonic() + timeout
+    last = -1
+    while True:
+        count = len(driver.find_elements(CSS_SELECTOR, selector))
+        if count and count == last:
+            return count
+        if time.monotonic() >= deadline:
+            return count
+        last = count
+        if scroll and count:
+            driver.execute_script(SCROLL_BOTTOM_JS)
+        time.sleep(poll_s)
+
+
+# ============================================================================
+# ⚡ MOTOR CONCURRENTE
+# ============================================================================
+
+class PageTask:
+    """Una página a scrapear: key agrupa las páginas de una búsqueda"""
+
+    __slots__ = ("key", "page_num", "url", "context")
+
+    def __init__(self, key: str, page_num: int, url: str, context: Optional[Dict[str, Any]] = None):
+        self.key = key
+        self.page_num = page_num
+        self.url = url
+        self.context = context or {}
+
+
+class PageResult:
+    """Resultado de una página: productos parseados o el error"""
+
+    __slots__ = ("task", "products", "rendered", "elapsed_s", "error", "skipped")
+
+    def __init__(self, task: PageTask, products: Optional[List[Dict[str, Any]]] = None, rendered: int = 0,
+                 elapsed_s: float = 0.0, error: Optional[str] = None, skipped: bool = False):
+        self.task = task
+        self.products = products or []
+        self.rendered = rendered
+        self.elapsed_s = elapsed_s
+        self.error = error
+        self.skipped = skipped
+
+
+class ConcurrentScraper:
+    """K páginas en paralelo sobre un DriverPool, con cortesía por dominio"""
+
+    def __init__(self, pool: Any, parse_page: Callable[[str, PageTask], List[Dict[str, Any]]],
+                 product_selector: str, workers: int = 2, limiter: Optional[DomainLimiter] = None,
+                 wait_timeout: float = 10.0, poll_s: float = 0.25, stop_event: Optional[threading.Event] = None,
+                 cut_empty_from: Optional[int] = None):
+        self.pool = pool
+        self.parse_page = parse_page
+        self.product_selector = product_selector
+        self.workers = max(1, workers)
+        self.limiter = limiter or DomainLimiter(max_concurrent=self.workers)
+        self.wait_timeout = wait_timeout
+        self.poll_s = poll_s
+        self.stop_event = stop_event
+        self.cut_empty_from = cut_empty_from
+        self._cut: Dict[str, int] = {}
+        self._cut_lock = threading.Lock()
+
+    def _cut_page(self, key: str) -> Optional[int]:
+        with self._cut_lock:
+            return self._cut.get(key)
+
+    def _mark_empty(self, task: PageTask) -> None:
+        """Página vacía: las siguientes de la misma búsqueda ya no se cargan"""
+        if self.cut_empty_from is None or task.page_num < self.cut_empty_from:
+            return
+        with self._cut_lock:
+            cut = self._cut.get(task.key)
+            if cut is None or task.page_num < cut:
+                self._cut[task.key] = task.page_num
+
+    def fetch(self, task: PageTask) -> PageResult:
+        """Carga, espera y parsea una página"""
+        cut = self._cut_page(task.key)
+        if (self.stop_event is not None and self.stop_event.is_set()) or (cut is not None and task.page_num > cut):
+            return PageResult(task, skipped=True)
+        start = time.monotonic()
+        logger.info(f"📄 {task.key} - Página {task.page_num}: {task.url}")
+        try:
+            with self.limiter.slot(task.url):
+                with self.pool.page() as driver:
+                    driver.get(task.url)
+                    rendered = wait_for_products(driver, self.product_selector, self.wait_timeout, self.poll_s)
+                    html = driver.page_source
+            products = self.parse_page(html, task)
+        except Exception as e:
+            logger.error(f"❌ {task.key} página {task.page_num}: {e}")
+            return PageResult(task, elapsed_s=time.monotonic() - start, error=str(e))
+        if not products:
+            logger.warning(f"⚠️ Sin productos en {task.key} página {task.page_num}")
+            self._mark_empty(task)
+        return PageResult(task, products, rendered, time.monotonic() - start)
+
+    def run(self, tasks: List[PageTask]) -> List[PageResult]:
+        """Resultados en el mismo orden que tasks"""
+        self._cut.clear()
+        if self.workers == 1:
+            return [self.fetch(task) for task in tasks]
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="scrape") as executor:
+            results = list(executor.map(self.fetch, tasks))
+        # Páginas tras el corte que ya estaban en vuelo: el loop secuencial no las habría cargado
+        return [PageResult(r.task, skipped=True)
+                if not r.skipped and r.task.page_num > self._cut.get(r.task.key, r.task.page_num) else r
+                for r in results]
+
+
+def group_products(results: List[PageResult]) -> Dict[str, List[Dict[str, Any]]]:
+    """Productos por búsqueda (key), en orden de página"""
+    grouped: Dict[str, List[Dict[str, Any]]] = {}
+    for res in sorted(results, key=lambda r: r.task.page_num):
+        grouped.setdefault(res.task.key, []).extend(res.products)
+    return grouped
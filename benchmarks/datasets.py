@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 Generador de datasets sintéticos etiquetados
+Produce JSONs con la misma forma que los scrapers de Falabella/Ripley/Paris
+(metadata + products) a partir de un catálogo canónico, con perturbaciones
+de nombre por retailer. Cada listing queda etiquetado con su producto canónico.
+"""
+
+import json
+import os
+import random
+from datetime import datetime
+from typing import Dict, List, Any, Tuple
+
+RETAILERS = {
+    "Falabella": {
+        "base_url": "https://www.falabella.com/falabella-cl/search?Ntt={term}",
+        "scraper": "Falabella Scraper CONTINUO con BÚSQUEDAS 🔄",
+        "link": "https://www.falabella.com/falabella-cl/product/{code}",
+    },
+    "Ripley": {
+        "base_url": "https://simple.ripley.cl/search/{term}",
+        "scraper": "Ripley Proxy Rotation 🔄",
+        "link": "https://simple.ripley.cl/{code}",
+    },
+    "Paris": {
+        "base_url": "https://www.paris.cl/search/?q={term}",
+        "scraper": "París Scraper CONTINUO con BÚSQUEDAS 🔄",
+        "link": "https://www.paris.cl/{code}.html",
+    },
+}
+
+# search_key -> (search_term, category_id)
+SEARCHES = {
+    "smartphone": ("smartphone", "smartphones"),
+    "smartv": ("smart tv", "smart_tv"),
+    "notebook": ("notebook", "notebooks"),
+    "perfume": ("perfume", "perfumes"),
+}
+CATEGORY_BY_SEARCH = {k: v[1] for k, v in SEARCHES.items()}
+
+PHONE_LINES = {
+    "SAMSUNG": ["Galaxy A", "Galaxy S", "Galaxy M"], "APPLE": ["iPhone "],
+    "XIAOMI": ["Redmi Note ", "Redmi ", "Poco X"], "MOTOROLA": ["Moto G", "Moto Edge "],
+    "HONOR": ["Honor X", "Honor Magic "],
+}
+TV_BRANDS = ["SAMSUNG", "LG", "TCL", "HISENSE", "PHILIPS"]
+TV_PANELS = ["4K UHD", "QLED 4K", "OLED 4K", "Full HD", "Mini LED 4K"]
+NOTEBOOK_LINES = {
+    "HP": ["Pavilion ", "Victus ", "EliteBook "], "LENOVO": ["IdeaPad ", "ThinkPad E", "Legion "],
+    "ASUS": ["Vivobook ", "Zenbook ", "ROG Strix G"], "DELL": ["Inspiron ", "Vostro "],
+    "ACER": ["Aspire ", "Nitro "],
+}
+PERFUME_LINES = {
+    "CAROLINA HERRERA": ["212 VIP", "Good Girl", "CH"], "VERSACE": ["Eros", "Dylan Blue", "Bright Crystal"],
+    "CALVIN KLEIN": ["CK One", "Eternity", "Obsession"], "RABANNE": ["1 Million", "Invictus", "Olympea"],
+    "GIVENCHY": ["L'Interdit", "Gentleman", "Irresistible"],
+}
+COLORS = ["Negro", "Blanco", "Azul", "Verde", "Gris", "Plata"]
+SUFFIXES = ["", "", " Liberado", " Nuevo", " Oferta", " Original"]
+
+
+def _canonical(cat: str, rng: random.Random, seq: int) -> Dict[str, Any]:
+    """Producto canónico; `seq` garantiza unicidad del modelo"""
+    if cat == "smartphones":
+        brand = rng.choice(list(PHONE_LINES))
+        cap = rng.choice([64, 128, 256, 512])
+        model = f"{rng.choice(PHONE_LINES[brand])}{seq}"
+        return {"brand": brand, "category": cat, "parts": [model, f"{cap}GB", rng.choice(COLORS)],
+                "price": rng.randrange(99_990, 1_899_990, 1000)}
+    if cat == "smart_tv":
+        brand = rng.choice(TV_BRANDS)
+        size = rng.choice([32, 43, 50, 55, 65, 75, 85])
+        return {"brand": brand, "category": cat,
+                "parts": ["Smart TV", rng.choice(TV_PANELS), f'{size}"', f"{brand[:2]}{seq}"],
+                "price": rng.randrange(149_990, 2_999_990, 1000)}
+    if cat == "notebooks":
+        brand = rng.choice(list(NOTEBOOK_LINES))
+        ram, ssd = rng.choice([8, 16, 32]), rng.choice([256, 512, 1024])
+        storage = "1TB" if ssd == 1024 else f"{ssd}GB"
+        return {"brand": brand, "category": cat,
+                "parts": ["Notebook", f"{rng.choice(NOTEBOOK_LINES[brand])}{seq}",
+                          f'{rng.choice([14, 15.6, 16])}"', f"{ram}GB RAM", f"{storage} SSD"],
+                "price": rng.randrange(299_990, 2_999_990, 1000)}
+    brand = rng.choice(list(PERFUME_LINES))
+    return {"brand": brand, "category": "perfumes",
+            "parts": ["Perfume", f"{rng.choice(PERFUME_LINES[brand])} {seq}",
+                      rng.choice(["EDP", "EDT", "PARFUM"]), f"{rng.choice([30, 50, 80, 100, 200])}ml",
+                      rng.choice(["Mujer", "Hombre", "Unisex"])],
+            "price": rng.randrange(19_990, 249_990, 1000)}
+
+
+def perturb_name(prod: Dict[str, Any], rng: random.Random) -> str:
+    """Variante de título como la publicaría otro retailer"""
+    parts = list(prod["parts"])
+    brand = prod["brand"].title() if rng.random() < 0.5 else prod["brand"]
+    # La marca suele ir después del tipo de producto ("Smart TV LG ...")
+    if parts[0] in ("Smart TV", "Notebook", "Perfume"):
+        parts.insert(1, brand)
+    else:
+        parts.insert(0, brand)
+    if rng.random() < 0.3:
+        parts = [p.replace("GB", " GB").replace("ml", " ml") for p in parts]
+    if prod["category"] == "smartphones" and rng.random() < 0.3:
+        parts.pop()  # sin color
+    name = " ".join(parts) + rng.choice(SUFFIXES)
+    r = rng.random()
+    if r < 0.15:
+        name = name.upper()
+    elif r < 0.25:
+        name = name.lower()
+    return name
+
+
+def _price_fields(retailer: str, price: int, rng: random.Random) -> Dict[str, Any]:
+    card = int(price * rng.uniform(0.85, 1.0)) // 10 * 10
+    fmt = lambda v: "$" + f"{v:,}".replace(",", ".")
+    if retailer == "Ripley":
+        return {"ripley_price_text": fmt(card), "card_price_text": fmt(card),
+                "normal_price_text": fmt(price)}
+    return {"card_price_text": fmt(card), "card_price": card,
+            "normal_price_text": fmt(price), "normal_price": price,
+            "original_price_text": "", "original_price": None}
+
+
+def generate_dataset(n_listings: int, seed: int = 42, presence: float = 0.7
+                     ) -> Tuple[Dict[str, Dict[str, Dict[str, Any]]], Dict[Tuple[str, str], int]]:
+    """
+    Genera ~n_listings productos repartidos entre retailers y búsquedas.
+
+    Returns:
+        (docs, labels): docs[retailer][search_key] = JSON con forma de scraper;
+        labels[(retailer, product_code)] = id canónico
+    """
+    rng = random.Random(seed)
+    n_canonical = max(1, int(n_listings / (len(RETAILERS) * presence)))
+    now = datetime(2026, 1, 1).strftime("%Y-%m-%d %H:%M:%S")
+
+    docs: Dict[str, Dict[str, Dict[str, Any]]] = {r: {} for r in RETAILERS}
+    labels: Dict[Tuple[str, str], int] = {}
+    search_keys = list(SEARCHES)
+
+    for cid in range(n_canonical):
+        key = search_keys[cid % len(search_keys)]
+        term, cat = SEARCHES[key]
+        prod = _canonical(cat, rng, 100 + cid)
+        for retailer, cfg in RETAILERS.items():
+            if rng.random() >= presence:
+                continue
+            doc = docs[retailer].setdefault(key, {
+                "metadata": {
+                    "scraped_at": now, "search_term": term, "search_key": key,
+                    "base_url": cfg["base_url"].format(term=term.replace(" ", "+")),
+                    "scraper": cfg["scraper"], "total_products": 0,
+                },
+                "products": [],
+            })
+            code = f"{retailer[:3].upper()}{cid:07d}"
+            item = {"product_code": code, "name": perturb_name(prod, rng)}
+            if retailer != "Ripley":
+                item["brand"] = prod["brand"]
+            item.update(_price_fields(retailer, prod["price"], rng))
+            item.update({
+                "product_link": cfg["link"].format(code=code),
+                "page_scraped": 1 + len(doc["products"]) // 48,
+                "search_term": term, "scraped_at": now,
+            })
+            doc["products"].append(item)
+            doc["metadata"]["total_products"] += 1
+            labels[(retailer, code)] = cid
+    return docs, labels
+
+
+def write_dataset(out_dir: str, n_listings: int, seed: int = 42) -> Dict[str, Any]:
+    """Escribe un JSON por retailer/búsqueda + labels.json en out_dir"""
+    docs, labels = generate_dataset(n_listings, seed=seed)
+    os.makedirs(out_dir, exist_ok=True)
+    files = []
+    for retailer, by_key in docs.items():
+        for key, doc in by_key.items():
+            path = os.path.join(out_dir, f"{retailer.lower()}_busqueda_{key}.json")
+            with open(path, "w", encoding="utf-8") as fh:
+                json.dump(doc, fh, ensure_ascii=False)
+            files.append(path)
+    with open(os.path.join(out_dir, "labels.json"), "w", encoding="utf-8") as fh:
+        json.dump({f"{r}|{c}": cid for (r, c), cid in labels.items()}, fh)
+    return {"files": files, "listings": len(labels)}
+
+
+def iter_listings(docs: Dict[str, Dict[str, Dict[str, Any]]]):
+    """(retailer, metadata, item) por cada producto generado"""
+    for retailer, by_key in docs.items():
+        for doc in by_key.values():
+            for item in doc["products"]:
+                yield retailer, doc["metadata"], item
+
+
+def parse_size(value: str) -> int:
+    """'1k' -> 1000, '100k' -> 100000, '1m' -> 1000000"""
+    v = value.strip().lower()
+    mult = 1_000_000 if v.endswith("m") else 1000 if v.endswith("k") else 1
+    return int(float(v.rstrip("km")) * mult)
+
+
+def true_pairs(labels: Dict[Tuple[str, str], int]) -> set:
+    """Pares cross-retailer (no ordenados) que comparten producto canónico"""
+    by_cid: Dict[int, List[Tuple[str, str]]] = {}
+    for key, cid in labels.items():
+        by_cid.setdefault(cid, []).append(key)
+    pairs = set()
+    for members in by_cid.values():
+        for i in range(len(members)):
+            for j in range(i + 1, len(members)):
+                if members[i][0] != members[j][0]:
+                    pairs.add(frozenset((members[i], members[j])))
+    return pairs
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+⚡ Benchmark de enrich.extract_attributes (pasada única vs reglas por separado)
+Compara la extracción compilada desde configs/attribute_schema.json contra la
+implementación de referencia (una regex/loop por atributo sobre el nombre
+completo, como estaba antes del esquema) sobre los nombres de
+benchmarks/datasets.py. Verifica que ambas den exactamente lo mismo y reporta
+µs por nombre y speedup por categoría. Sale con código 1 si el speedup total
+queda bajo --min-speedup o si hay diferencias.
+
+Uso:
+    python -m benchmarks.extract_bench --size 20k
+    python -m benchmarks.extract_bench --size 20k --min-speedup 2
+"""
+
+import argparse
+import gc
+import json
+import os
+import re
+import statistics
+import sys
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from benchmarks.datasets import generate_dataset, iter_listings, parse_size, CATEGORY_BY_SEARCH
+from src.enrich import extract_attributes
+
+# ============================================================================
+# 📜 REFERENCIA: reglas por separado (una pasada por atributo)
+# ============================================================================
+
+COLOR_WORDS = ["negro", "black", "blanco", "white", "grafito", "gris", "azul", "icyblue", "lavanda", "morado",
+               "verde", "navy", "plata", "titanio", "rojo", "pink", "gold"]
+RES_WORDS = ["4k", "uhd", "full hd", "fhd", "hd", "8k", "qled", "oled", "mini led", "nanocell", "crystal"]
+
+GB_RX = re.compile(r"(\d+)\s*gb", re.I)
+TB_RX = re.compile(r"(\d+)\s*tb", re.I)
+INCH_RX = re.compile(r'(\d{2,3}(?:\.\d{1,2})?)\s*(?:\"|inch|pulgadas?)', re.I)
+ML_RX = re.compile(r"(\d{1,4})\s*ml", re.I)
+ED_RX = re.compile(r"\b(EDP|EDT|PARFUM)\b", re.I)
+
+
+def reference_extract(name: str, category_id: str) -> Dict[str, Any]:
+    """extract_attributes original: GB/TB/pulgadas/ml/EDP y loops de colores/paneles sobre el nombre completo"""
+    t = name
+    attrs: Dict[str, Any] = {}
+
+    if category_id == "smartphones":
+        cap = GB_RX.search(t) or TB_RX.search(t)
+        if cap:
+            val = cap.group(1)
+            unit = "TB" if "tb" in cap.group(0).lower() else "GB"
+            attrs["capacity"] = f"{val} {unit}"
+        col = [c for c in COLOR_WORDS if c in t.lower()]
+        if col:
+            attrs["color"] = col[0]
+        if "5g" in t.lower():
+            attrs["network"] = "5G"
+        inc = INCH_RX.search(t)
+        if inc:
+            attrs["screen_size_in"] = float(inc.group(1))
+
+    elif category_id == "notebooks":
+        inc = INCH_RX.search(t)
+        if inc:
+            attrs["screen_size_in"] = float(inc.group(1))
+        ram = GB_RX.search(t)
+        if ram:
+            attrs["ram"] = f"{ram.group(1)} GB"
+        caps = (list(GB_RX.finditer(t)) + list(TB_RX.finditer(t)))
+        if len(caps) >= 2:
+            c = caps[1]
+            unit = "TB" if "tb" in c.group(0).lower() else "GB"
+            attrs["storage"] = f"{c.group(1)} {unit}"
+
+    elif category_id == "smart_tv":
+        inc = INCH_RX.search(t)
+        if inc:
+            attrs["screen_size_in"] = float(inc.group(1))
+        res = [r for r in RES_WORDS if r in t.lower()]
+        if res:
+            attrs["panel"] = res[0].upper()
+
+    elif category_id == "perfumes":
+        ml = ML_RX.search(t)
+        if ml:
+            attrs["volume_ml"] = int(ml.group(1))
+        ed = ED_RX.search(t)
+        if ed:
+            attrs["concentration"] = ed.group(1).upper()
+        low = t.lower()
+        if "mujer" in low:
+            attrs["gender"] = "Mujer"
+        elif "hombre" in low:
+            attrs["gender"] = "Hombre"
+        elif "unisex" in low:
+            attrs["gender"] = "Unisex"
+
+    return attrs
+
+
+# ============================================================================
+# ⏱️ MEDICIÓN
+# ============================================================================
+
+def load_names(size: int, seed: int) -> Dict[str, List[str]]:
+    """Nombres generados por categoría (misma forma que los scrapers)"""
+    docs, _ = generate_dataset(size, seed=seed)
+    by_category: Dict[str, List[str]] = {}
+    for _, meta, item in iter_listings(docs):
+        by_category.setdefault(CATEGORY_BY_SEARCH[meta["search_key"]], []).append(item["name"])
+    return by_category
+
+
+def _time(fn: Callable[[str, str], Any], names: List[str], category: str) -> float:
+    t0 = time.perf_counter()
+    for name in names:
+        fn(name, category)
+    return time.perf_counter() - t0
+
+
+def bench_category(category: str, names: List[str], rounds: int) -> Dict[str, Any]:
+    """
+    Alterna referencia y pasada única por ronda (mismo ruido de máquina para ambas)
+    y reporta el mínimo de cada una y la mediana del speedup por ronda.
+    """
+    mismatches = [n for n in names if extract_attributes(n, category) != reference_extract(n, category)]
+    ref_times, new_times, ratios = [], [], []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for i in range(rounds):
+            if i % 2:
+                new = _time(extract_attributes, names, category)
+                ref = _time(reference_extract, names, category)
+            else:
+                ref = _time(reference_extract, names, category)
+                new = _time(extract_attributes, names, category)
+            ref_times.append(ref)
+            new_times.append(new)
+            ratios.append(ref / new)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    n = len(names)
+    return {
+        "category": category,
+        "names": n,
+        "reference_us": round(min(ref_times) / n * 1e6, 3),
+        "single_pass_us": round(min(new_times) / n * 1e6, 3),
+        "speedup": round(statistics.median(ratios), 2),
+        "mismatches": len(mismatches),
+        "mismatch_examples": mismatches[:5],
+    }
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="extract-bench")
+    ap.add_argument("--size", default="20k", help="Listings generados (ej: 5k, 20k, 100k)")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--rounds", type=int, default=15)
+    ap.add_argument("--min-speedup", type=float, default=None,
+                    help="Speedup total mínimo (sale con 1 si no se alcanza)")
+    ap.add_argument("--out", default=None, help="Reporte JSON (opcional)")
+    args = ap.parse_args(argv)
+
+    by_category = load_names(parse_size(args.size), args.seed)
+    results = []
+    for category in sorted(by_category):
+        res = bench_category(category, by_category[category], args.rounds)
+        results.append(res)
+        print(f"[BENCH] {category}: {res['reference_us']} µs -> {res['single_pass_us']} µs por nombre "
+              f"(x{res['speedup']}, {res['mismatches']} diferencias)")
+
+    total_ref = sum(r["reference_us"] * r["names"] for r in results)
+    total_new = sum(r["single_pass_us"] * r["names"] for r in results)
+    report = {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": sys.version.split()[0],
+        "size": args.size,
+        "results": results,
+        "speedup": round(total_ref / total_new, 2) if total_new else None,
+    }
+    print(f"[BENCH] total: x{report['speedup']}")
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    if any(r["mismatches"] for r in results):
+        print("[BENCH] ❌ la pasada única no coincide con la referencia")
+        return 1
+    if args.min_speedup is not None and report["speedup"] < args.min_speedup:
+        print(f"[BENCH] ❌ speedup x{report['speedup']} < x{args.min_speedup}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
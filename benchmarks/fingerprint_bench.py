@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+⚡ Benchmark de fingerprint/product_id (src/fingerprint.py)
+Compara el cálculo original (product_fingerprint con SHA-1 sobre un string
+armado aparte y un segundo SHA-1 para product_id, como en normalize_one)
+contra las versiones v1 (mismos ids) y v2 (BLAKE2b-128, un solo estado de
+hash para ambos ids), por producto y por lote, sobre los productos base de
+benchmarks/datasets.py. Verifica que v1 reproduzca exactamente los ids
+históricos. Sale con código 1 si hay diferencias.
+
+Uso:
+    python -m benchmarks.fingerprint_bench --size 20k
+    python -m benchmarks.fingerprint_bench --size 20k --dup 3 --out out/fingerprint_bench.json
+"""
+
+import argparse
+import gc
+import hashlib
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from benchmarks.datasets import generate_dataset, iter_listings, parse_size, CATEGORY_BY_SEARCH
+from src.enrich import extract_attributes, clean_model
+from src.fingerprint import (FingerprintKey, fingerprint_batch, product_fingerprint,
+                             product_ids_batch)
+
+ID_ATTRS = ("capacity", "volume_ml", "screen_size_in", "panel", "ram", "storage", "color")
+
+# ============================================================================
+# 📜 REFERENCIA: dos strings, dos SHA-1
+# ============================================================================
+
+
+def reference_fingerprint(prod: Dict[str, Any]) -> str:
+    """fingerprint.product_fingerprint original"""
+    base = "|".join([
+        prod.get("brand", ""),
+        prod.get("category", ""),
+        (prod.get("model") or prod.get("name", "")),
+        str(prod.get("attributes", {}).get("capacity", "")),
+        str(prod.get("attributes", {}).get("volume_ml", "")),
+        str(prod.get("attributes", {}).get("screen_size_in", "")),
+    ])
+    return hashlib.sha1(base.encode("utf-8")).hexdigest()
+
+
+def reference_ids(prods: List[Dict[str, Any]], parts: List[List[Any]]) -> List[Tuple[str, str]]:
+    return [(reference_fingerprint(p), hashlib.sha1("|".join(str(x) for x in s).encode("utf-8")).hexdigest())
+            for p, s in zip(prods, parts)]
+
+
+def scalar_ids(version: str) -> Callable[[List[Dict[str, Any]], List[List[Any]]], List[Tuple[str, str]]]:
+    def run(prods, parts):
+        out = []
+        for p, s in zip(prods, parts):
+            key = FingerprintKey(p, version)
+            out.append((key.fingerprint, key.product_id(s)))
+        return out
+    return run
+
+
+# ============================================================================
+# ⏱️ MEDICIÓN
+# ============================================================================
+
+def load_products(size: int, seed: int, dup: int) -> Tuple[List[Dict[str, Any]], List[List[Any]]]:
+    """Productos base (como normalize_one antes del LLM) y partes de product_id por listing"""
+    docs, _ = generate_dataset(size, seed=seed)
+    prods, parts = [], []
+    for retailer, meta, item in iter_listings(docs):
+        category = CATEGORY_BY_SEARCH[meta["search_key"]]
+        name = item["name"]
+        brand = item.get("brand") or "DESCONOCIDA"
+        attrs = extract_attributes(name, category)
+        model = clean_model(name, brand) or name
+        prod = {"brand": brand, "category": category, "model": model, "attributes": attrs}
+        sig = [retailer, brand, model, category] + [f"{k}={attrs[k]}" for k in ID_ATTRS if k in attrs]
+        for _ in range(dup):  # mismo producto en varias búsquedas/páginas del scrape
+            prods.append(prod)
+            parts.append(sig)
+    return prods, parts
+
+
+def bench(label: str, ref: Callable, new: Callable, args: tuple, n: int, rounds: int) -> Dict[str, Any]:
+    """Alterna referencia y nueva versión por ronda; mínimos y mediana del speedup"""
+    ref_times, new_times, ratios = [], [], []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for i in range(rounds):
+            order = (new, ref) if i % 2 else (ref, new)
+            times = {}
+            for fn in order:
+                t0 = time.perf_counter()
+                fn(*args)
+                times[fn] = time.perf_counter() - t0
+            ref_times.append(times[ref])
+            new_times.append(times[new])
+            ratios.append(times[ref] / times[new])
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return {
+        "bench": label,
+        "items": n,
+        "reference_us": round(min(ref_times) / n * 1e6, 3),
+        "new_us": round(min(new_times) / n * 1e6, 3),
+        "speedup": round(statistics.median(ratios), 2),
+    }
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="fingerprint-bench")
+    ap.add_argument("--size", default="20k", help="Listings generados (ej: 5k, 20k, 100k)")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--dup", type=int, default=1, help="Veces que se repite cada listing en el lote")
+    ap.add_argument("--rounds", type=int, default=15)
+    ap.add_argument("--out", default=None, help="Reporte JSON (opcional)")
+    args = ap.parse_args(argv)
+
+    prods, parts = load_products(parse_size(args.size), args.seed, args.dup)
+    n = len(prods)
+    expected = reference_ids(prods, parts)
+    mismatches = sum(got != exp for got, exp in zip(scalar_ids("v1")(prods, parts), expected))
+    mismatches += sum(got != exp for got, exp in zip(product_ids_batch(prods, parts, "v1"), expected))
+    mismatches += sum(got != exp[0] for got, exp in zip(fingerprint_batch(prods, "v1"), expected))
+    mismatches += sum(product_fingerprint(p, "v1") != exp[0] for p, exp in zip(prods, expected))
+
+    ref_fp = lambda ps: [reference_fingerprint(p) for p in ps]
+    results = [
+        bench("fingerprint v1", ref_fp, lambda ps: [product_fingerprint(p, "v1") for p in ps], (prods,), n,
+              args.rounds),
+        bench("fingerprint v2", ref_fp, lambda ps: [product_fingerprint(p, "v2") for p in ps], (prods,), n,
+              args.rounds),
+        bench("fingerprint_batch v2", ref_fp, lambda ps: fingerprint_batch(ps, "v2"), (prods,), n, args.rounds),
+        bench("ids v1", reference_ids, scalar_ids("v1"), (prods, parts), n, args.rounds),
+        bench("ids v2", reference_ids, scalar_ids("v2"), (prods, parts), n, args.rounds),
+        bench("ids_batch v2", reference_ids, lambda ps, ss: product_ids_batch(ps, ss, "v2"), (prods, parts), n,
+              args.rounds),
+    ]
+    for res in results:
+        print(f"[BENCH] {res['bench']}: {res['reference_us']} µs -> {res['new_us']} µs por producto "
+              f"(x{res['speedup']})")
+    print(f"[BENCH] {n} productos, {mismatches} diferencias v1 vs ids históricos")
+
+    report = {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": sys.version.split()[0],
+        "size": args.size,
+        "dup": args.dup,
+        "products": n,
+        "results": results,
+        "mismatches": mismatches,
+    }
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    if mismatches:
+        print("[BENCH] ❌ v1 no reproduce los ids históricos")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+📏 Benchmark de matching inter-retail (calidad + throughput)
+Ejecuta cada matcher sobre datasets sintéticos etiquetados (ver benchmarks/datasets.py)
+y reporta precision/recall/F1, pares evaluados, tiempo, memoria pico y pares/s en JSON.
+Cada matcher corre --warmup rondas descartadas y --rounds rondas medidas; tiempo
+y memoria son la mediana. Compara contra un baseline guardado y sale con código 1
+si hay regresión.
+
+Uso:
+    python -m benchmarks.match_bench --sizes 1k,10k,100k
+    python -m benchmarks.match_bench --sizes 1k --update-baseline
+"""
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from typing import Dict, List, Any, Callable, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from benchmarks.datasets import (
+    generate_dataset, iter_listings, true_pairs, parse_size, CATEGORY_BY_SEARCH
+)
+from src.enrich import guess_brand, extract_attributes, clean_model
+from src.fingerprint import product_fingerprint
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines", "match_baseline.json")
+
+
+def to_rows(docs) -> List[Dict[str, Any]]:
+    """Normalización mínima (sin BD/LLM) de los JSON generados a filas de matching"""
+    rows = []
+    for retailer, meta, item in iter_listings(docs):
+        name = item["name"]
+        category = CATEGORY_BY_SEARCH[meta["search_key"]]
+        brand = item.get("brand") or guess_brand(name) or "DESCONOCIDA"
+        row = {
+            "product_id": f"{retailer}|{item['product_code']}",
+            "retailer": retailer,
+            "name": name,
+            "brand": brand,
+            "model": clean_model(name, brand),
+            "category": category,
+            "attributes": extract_attributes(name, category),
+            "source": {"retailer": retailer},
+        }
+        row["fingerprint"] = product_fingerprint(row)
+        rows.append(row)
+    return rows
+
+
+def _key(product_id: str) -> Tuple[str, str]:
+    retailer, code = product_id.split("|", 1)
+    return retailer, code
+
+
+def run_do_match(rows):
+    from src.match import do_match
+    stats: Dict[str, Any] = {}
+    pairs = do_match(rows, stats=stats)
+    pred = {frozenset((_key(p["left"]["product_id"]), _key(p["right"]["product_id"]))) for p in pairs}
+    return pred, stats["comparisons"]
+
+
+def run_find_matches(rows):
+    from src.retail_normalizer.match import find_matches, blocking_key
+    pairs = find_matches(rows)
+    pred = {frozenset((_key(p["a_id"]), _key(p["b_id"]))) for p in pairs}
+    # find_matches compara todos los pares cross-retailer de cada bucket
+    buckets = defaultdict(lambda: defaultdict(int))
+    for r in rows:
+        buckets[blocking_key(r)][r["source"]["retailer"]] += 1
+    evaluated = 0
+    for counts in buckets.values():
+        total = sum(counts.values())
+        evaluated += (total * total - sum(n * n for n in counts.values())) // 2
+    return pred, evaluated
+
+
+MATCHERS: Dict[str, Callable] = {
+    "src.match.do_match": run_do_match,
+    "retail_normalizer.match.find_matches": run_find_matches,
+}
+
+
+def evaluate(pred: set, truth: set) -> Dict[str, float]:
+    tp = len(pred & truth)
+    precision = tp / len(pred) if pred else 0.0
+    recall = tp / len(truth) if truth else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {"tp": tp, "predicted": len(pred), "precision": round(precision, 4),
+            "recall": round(recall, 4), "f1": round(f1, 4)}
+
+
+def _rss_mb() -> float:
+    """Pico de RSS del proceso (ru_maxrss está en KB en Linux, bytes en macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1e6 if sys.platform == "darwin" else 1e3)
+
+
+def _measure(fn: Callable, rows, use_tracemalloc: bool):
+    if use_tracemalloc:
+        tracemalloc.start()
+    else:
+        rss0 = _rss_mb()
+    t0 = time.perf_counter()
+    pred, evaluated = fn(rows)
+    wall = time.perf_counter() - t0
+    if use_tracemalloc:
+        peak_mb = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+    else:
+        peak_mb = _rss_mb() - rss0
+    return pred, evaluated, wall, peak_mb
+
+
+def _child(fn, rows, conn):
+    try:
+        conn.send(("ok", _measure(fn, rows, use_tracemalloc=False)))
+    except ImportError as e:
+        conn.send(("skipped", f"ImportError: {e}"))
+    except Exception as e:
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+    finally:
+        conn.close()
+
+
+def _run_once(fn: Callable, rows) -> Tuple[str, Any]:
+    """
+    Una medición aislada en un proceso hijo (fork) para medir tiempo y pico de RSS
+    sin el overhead de tracemalloc; sin fork (Windows) usa tracemalloc en el mismo proceso.
+    """
+    if resource is not None and "fork" in mp.get_all_start_methods():
+        ctx = mp.get_context("fork")
+        parent_conn, child_conn = ctx.Pipe(duplex=False)
+        proc = ctx.Process(target=_child, args=(fn, rows, child_conn))
+        proc.start()
+        child_conn.close()
+        try:
+            status, payload = parent_conn.recv()
+        except EOFError:  # El hijo murió sin responder (p.ej. OOM killer)
+            proc.join()
+            return "error", f"proceso hijo terminó sin resultado (exitcode {proc.exitcode})"
+        proc.join()
+        return status, payload
+    try:
+        return "ok", _measure(fn, rows, use_tracemalloc=True)
+    except ImportError as e:
+        return "skipped", f"ImportError: {e}"
+
+
+def bench_one(name: str, fn: Callable, rows, truth, rounds: int = 3, warmup: int = 1) -> Dict[str, Any]:
+    """
+    warmup rondas descartadas + rounds medidas, cada una en su hijo; tiempo y pico
+    de memoria son la mediana (pares y calidad son deterministas)
+    """
+    walls, peaks = [], []
+    for i in range(warmup + rounds):
+        status, payload = _run_once(fn, rows)
+        if status != "ok":
+            return {"matcher": name, "skipped" if status == "skipped" else "error": payload}
+        if i >= warmup:
+            pred, evaluated, wall, peak_mb = payload
+            walls.append(wall)
+            peaks.append(peak_mb)
+    wall, peak_mb = statistics.median(walls), statistics.median(peaks)
+    res = {"matcher": name, "pairs_evaluated": evaluated, "wall_s": round(wall, 3),
+           "peak_mb": round(max(peak_mb, 0.0), 2),
+           "pairs_per_s": round(evaluated / wall, 1) if wall > 0 else None,
+           "rounds": rounds}
+    res.update(evaluate(pred, truth))
+    return res
+
+
+def compare_baseline(results: List[Dict[str, Any]], baseline: Dict[str, Any],
+                     f1_tol: float, max_slowdown: float) -> List[str]:
+    base = {(r["matcher"], r["size"]): r for r in baseline.get("results", []) if "f1" in r}
+    regressions = []
+    for r in results:
+        b = base.get((r["matcher"], r["size"]))
+        if not b or "f1" not in r:
+            continue
+        if r["f1"] < b["f1"] - f1_tol:
+            regressions.append(f"{r['matcher']}@{r['size']}: F1 {b['f1']} -> {r['f1']}")
+        if b.get("pairs_per_s") and r["pairs_per_s"] is not None \
+                and r["pairs_per_s"] < b["pairs_per_s"] * (1 - max_slowdown):
+            regressions.append(f"{r['matcher']}@{r['size']}: pares/s {b['pairs_per_s']} -> {r['pairs_per_s']}")
+    return regressions
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="match-bench")
+    ap.add_argument("--sizes", default="1k,10k,100k", help="Tamaños (listings), ej: 1k,10k,100k")
+    ap.add_argument("--matchers", default=",".join(MATCHERS))
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--out", default="reports/bench_match.json")
+    ap.add_argument("--baseline", default=BASELINE_PATH)
+    ap.add_argument("--update-baseline", action="store_true")
+    ap.add_argument("--f1-tol", type=float, default=0.01, help="Caída máxima de F1 tolerada")
+    ap.add_argument("--max-slowdown", type=float, default=0.25, help="Caída máxima de pares/s (fracción)")
+    ap.add_argument("--rounds", type=int, default=3, help="Rondas medidas por matcher (se compara la mediana)")
+    ap.add_argument("--warmup", type=int, default=1, help="Rondas de calentamiento descartadas por matcher")
+    args = ap.parse_args(argv)
+    if args.rounds < 1 or args.warmup < 0:
+        ap.error("--rounds debe ser >= 1 y --warmup >= 0")
+
+    results = []
+    for size in [parse_size(s) for s in args.sizes.split(",")]:
+        docs, labels = generate_dataset(size, seed=args.seed)
+        rows = to_rows(docs)
+        truth = true_pairs(labels)
+        for name in args.matchers.split(","):
+            res = bench_one(name, MATCHERS[name], rows, truth, args.rounds, args.warmup)
+            res.update({"size": size, "listings": len(rows), "true_pairs": len(truth)})
+            results.append(res)
+            print(f"[BENCH] {name} @ {size}: " + (res.get("skipped") or res.get("error") or
+                  f"F1={res['f1']} P={res['precision']} R={res['recall']} "
+                  f"{res['pairs_evaluated']} pares en {res['wall_s']}s ({res['pairs_per_s']} pares/s, "
+                  f"pico {res['peak_mb']} MB)"))
+
+    report = {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "seed": args.seed,
+        "results": results,
+    }
+
+    regressions = []
+    if os.path.exists(args.baseline) and not args.update_baseline:
+        with open(args.baseline, "r", encoding="utf-8") as fh:
+            regressions = compare_baseline(results, json.load(fh), args.f1_tol, args.max_slowdown)
+    report["regressions"] = regressions
+
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, ensure_ascii=False, indent=2)
+    print(f"[OK] Reporte -> {args.out}")
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, ensure_ascii=False, indent=2)
+        print(f"[OK] Baseline actualizado -> {args.baseline}")
+
+    errors = [f"{r['matcher']} @ {r['size']}: {r['error']}" for r in results if "error" in r]
+    for r in regressions:
+        print(f"[REGRESION] {r}")
+    for e in errors:
+        print(f"[ERROR] {e}")
+    return 1 if regressions or errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,609 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🏁 Benchmark end-to-end del pipeline (ingest → normalize → match → persist)
+Genera JSON sintéticos con la forma de los scrapers de Falabella/Ripley/Paris
+(benchmarks/datasets.py), los corre por el pipeline con el LLM simulado y la BD
+reemplazada por SQLite (o un Postgres local con --persist postgres) y reporta
+por etapa: throughput, percentiles de latencia por ítem/lote y pico de RSS.
+normalize corre el código de producción (integrated_base/product_id_parts) y
+su desglose (categorize, pick_price, brand, ...) sale de los stage timers.
+Cada tamaño corre --warmup rondas descartadas y --rounds rondas medidas; se
+reporta y compara la mediana por etapa contra un baseline guardado (sale con
+código 1 si hay regresión). El p95 solo se compara con suficientes muestras.
+
+Uso:
+    python -m benchmarks.pipeline_bench --sizes 1k,10k
+    python -m benchmarks.pipeline_bench --sizes 100k,1m --llm-latency-ms 5
+    python -m benchmarks.pipeline_bench --sizes 1k --update-baseline
+"""
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from typing import Dict, List, Any, Callable, Iterable, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from benchmarks.datasets import write_dataset, parse_size
+import src.categorize as categorize_module
+from src.ingest import load_items
+from src.fingerprint import FingerprintKey
+from src.normalize_integrated import integrated_base, product_id_parts
+from src.stage_profiler import get_profiler, stage
+from src.gpt5.monitoring.metrics_collector import LatencyHistogram
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines", "pipeline_baseline.json")
+TAXONOMY_PATH = os.path.join(os.path.dirname(__file__), "..", "configs", "taxonomy_v1.json")
+
+STAGES = ("ingest", "normalize", "match", "persist")
+PERSIST_BATCH = 1000
+MIN_P95_SAMPLES = 50  # con menos muestras el p95 es casi el máximo: ruido puro
+
+
+# ============================================================================
+# 🤖 LLM SIMULADO + 🗄️ BD DE PRUEBA
+# ============================================================================
+
+class MockLLM:
+    """extract_with_llm determinista con latencia configurable (sin red ni costo)"""
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency_s = latency_ms / 1000
+        self.calls = 0
+
+    def __call__(self, name: str, category: str) -> Dict[str, Any]:
+        self.calls += 1
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        words = name.split()
+        return {
+            "brand": words[0].upper() if words else "DESCONOCIDA",
+            "model": " ".join(words[1:4]),
+            "normalized_name": " ".join(w.capitalize() for w in words),
+            "refined_attributes": {"category_hint": category},
+            "confidence": 0.9,
+        }
+
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ai_metadata_cache (
+    fingerprint TEXT PRIMARY KEY,
+    metadata TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS productos_maestros (
+    fingerprint TEXT PRIMARY KEY,
+    product_id TEXT NOT NULL,
+    name TEXT, brand TEXT, model TEXT, category TEXT,
+    attributes TEXT, ai_enhanced INTEGER, ai_confidence REAL
+);
+CREATE TABLE IF NOT EXISTS precios_actuales (
+    fingerprint TEXT NOT NULL,
+    retailer TEXT NOT NULL,
+    precio_actual INTEGER, precio_original INTEGER, url TEXT,
+    PRIMARY KEY (fingerprint, retailer)
+);
+CREATE TABLE IF NOT EXISTS matches (
+    left_id TEXT, right_id TEXT, similarity REAL
+);
+CREATE TABLE IF NOT EXISTS attributes_schema (
+    category_id TEXT NOT NULL,
+    attribute_name TEXT NOT NULL,
+    attribute_type TEXT, required INTEGER, default_value TEXT, display_order INTEGER
+);
+CREATE TABLE IF NOT EXISTS brands (
+    brand_canonical TEXT PRIMARY KEY,
+    aliases TEXT
+);
+"""
+
+ATTRIBUTES_SCHEMA_SQL = ("SELECT attribute_name, attribute_type, required, default_value FROM attributes_schema "
+                         "WHERE category_id = {ph} ORDER BY display_order, attribute_name")
+
+
+class SQLiteStore:
+    """Stand-in de PostgreSQL: cache IA + upserts de productos/precios en SQLite"""
+
+    placeholder = "?"
+
+    def __init__(self, path: str):
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SQLITE_SCHEMA)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+
+    def get_ai_cache(self, fingerprint: str) -> Optional[Dict[str, Any]]:
+        row = self.conn.execute("SELECT metadata FROM ai_metadata_cache WHERE fingerprint = ?",
+                                (fingerprint,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_ai_cache(self, fingerprint: str, data: Dict[str, Any]) -> None:
+        self.conn.execute("INSERT OR REPLACE INTO ai_metadata_cache VALUES (?, ?)",
+                          (fingerprint, json.dumps(data, ensure_ascii=False)))
+
+    def fetchall(self, sql: str, params: tuple = ()) -> List[tuple]:
+        return self.conn.execute(sql, params).fetchall()
+
+    def get_attributes_schema(self, category_id: str) -> List[Dict[str, Any]]:
+        """Reemplazo de categorize.get_category_attributes_schema contra este store"""
+        rows = self.fetchall(ATTRIBUTES_SCHEMA_SQL.format(ph=self.placeholder), (category_id,))
+        return [{"name": r[0], "type": r[1], "required": r[2], "default": r[3]} for r in rows]
+
+    def get_brand_aliases(self) -> Dict[str, List[str]]:
+        return {brand: json.loads(aliases or "[]")
+                for brand, aliases in self.fetchall("SELECT brand_canonical, aliases FROM brands")}
+
+    def executemany(self, sql: str, rows: List[tuple]) -> None:
+        self.conn.executemany(sql, rows)
+
+    def commit(self) -> None:
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+class PostgresStore(SQLiteStore):
+    """Mismo contrato sobre un Postgres local, en tablas temporales de la sesión"""
+
+    placeholder = "%s"
+
+    def __init__(self, dsn: str):
+        import psycopg2
+        from psycopg2 import extras
+        self._extras = extras
+        self.conn = psycopg2.connect(dsn)
+        with self.conn.cursor() as cur:
+            for stmt in filter(str.strip, SQLITE_SCHEMA.split(";")):
+                cur.execute(stmt.replace("CREATE TABLE IF NOT EXISTS", "CREATE TEMP TABLE"))
+        self.conn.commit()
+
+    def get_ai_cache(self, fingerprint: str) -> Optional[Dict[str, Any]]:
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT metadata FROM ai_metadata_cache WHERE fingerprint = %s", (fingerprint,))
+            row = cur.fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_ai_cache(self, fingerprint: str, data: Dict[str, Any]) -> None:
+        with self.conn.cursor() as cur:
+            cur.execute("INSERT INTO ai_metadata_cache VALUES (%s, %s) ON CONFLICT (fingerprint) "
+                        "DO UPDATE SET metadata = EXCLUDED.metadata",
+                        (fingerprint, json.dumps(data, ensure_ascii=False)))
+
+    def fetchall(self, sql: str, params: tuple = ()) -> List[tuple]:
+        with self.conn.cursor() as cur:
+            cur.execute(sql, params)
+            return cur.fetchall()
+
+    def executemany(self, sql: str, rows: List[tuple]) -> None:
+        # VALUES (?, ...) → un INSERT multi-fila con execute_values
+        head, tail = sql.split(" VALUES ", 1)
+        tail = tail[tail.index(")") + 1:]
+        with self.conn.cursor() as cur:
+            self._extras.execute_values(cur, f"{head} VALUES %s{tail}", rows, page_size=len(rows))
+
+
+def open_store(kind: str, workdir: str, dsn: Optional[str]):
+    if kind == "postgres":
+        return PostgresStore(dsn or os.getenv("BENCH_PG_DSN", "dbname=postgres"))
+    return SQLiteStore(os.path.join(workdir, "bench.sqlite"))
+
+
+# ============================================================================
+# ⚙️ ETAPAS
+# ============================================================================
+
+def _load_taxonomy() -> Dict[str, Any]:
+    """Taxonomía del JSON versionado (sin intentar la BD como load_taxonomy)"""
+    with open(TAXONOMY_PATH, "r", encoding="utf-8") as fh:
+        taxonomy = json.load(fh)
+    taxonomy["source"] = "json_fallback"
+    return taxonomy
+
+
+def normalize_record(rec: Dict[str, Any], store, llm: MockLLM, taxonomy: Dict[str, Any],
+                     brand_aliases: Dict[str, List[str]]) -> Dict[str, Any]:
+    """
+    normalize_one_integrated sobre el código de producción (integrated_base +
+    product_id_parts) con cache IA en `store` y LLM simulado; la escritura en
+    BD queda para la etapa persist
+    """
+    raw, retailer = rec["item"], rec["retailer"]
+    base = integrated_base(raw, rec["metadata"], taxonomy, brand_aliases)
+    name, category_id, attrs = base["name"], base["category_id"], base["attributes"]
+    with stage("fingerprint"):
+        fp_key = FingerprintKey(base["base_product"])
+        fingerprint = fp_key.fingerprint
+
+    with stage("ai_cache_lookup"):
+        ai_data = store.get_ai_cache(fingerprint)
+    if ai_data is None:
+        with stage("llm_extract"):
+            ai_data = llm(name, category_id)
+        with stage("ai_cache_store"):
+            store.set_ai_cache(fingerprint, ai_data)
+    final_attrs = dict(attrs)
+    final_attrs.update({k: v for k, v in (ai_data.get("refined_attributes") or {}).items() if v not in (None, "")})
+
+    # El matcher usa la marca heurística (como el pipeline sin enriquecimiento)
+    return {
+        "product_id": fp_key.product_id(product_id_parts(base, retailer, ai_data)),
+        "fingerprint": fingerprint,
+        "retailer": retailer,
+        "name": name,
+        "normalized_name": ai_data.get("normalized_name", name),
+        "brand": base["brand"],
+        "model": base["model"],
+        "category": category_id,
+        "price_current": base["price_current"],
+        "price_original": base["price_original"],
+        "url": raw.get("product_link") or raw.get("url"),
+        "attributes": final_attrs,
+        "ai_enhanced": True,
+        "ai_confidence": ai_data.get("confidence", 0.0),
+        "source": {"retailer": retailer},
+    }
+
+
+def persist_rows(store, rows: List[Dict[str, Any]], pairs: List[Dict[str, Any]], hist: LatencyHistogram) -> int:
+    """Upsert de productos y precios + matches, en lotes de PERSIST_BATCH filas"""
+    ph = store.placeholder
+    product_sql = (f"INSERT INTO productos_maestros VALUES ({', '.join([ph] * 9)}) "
+                   "ON CONFLICT (fingerprint) DO UPDATE SET product_id = EXCLUDED.product_id, "
+                   "name = EXCLUDED.name, attributes = EXCLUDED.attributes")
+    price_sql = (f"INSERT INTO precios_actuales VALUES ({', '.join([ph] * 5)}) "
+                 "ON CONFLICT (fingerprint, retailer) DO UPDATE SET precio_actual = EXCLUDED.precio_actual, "
+                 "precio_original = EXCLUDED.precio_original")
+    match_sql = f"INSERT INTO matches VALUES ({ph}, {ph}, {ph})"
+    written = 0
+    for i in range(0, len(rows), PERSIST_BATCH):
+        t0 = time.perf_counter()
+        chunk = rows[i:i + PERSIST_BATCH]
+        # Un fingerprint por lote (ON CONFLICT no admite dos veces la misma clave en un INSERT)
+        products = {r["fingerprint"]: (r["fingerprint"], r["product_id"], r["normalized_name"], r["brand"],
+                                       r["model"], r["category"], json.dumps(r["attributes"], ensure_ascii=False),
+                                       int(r["ai_enhanced"]), r["ai_confidence"]) for r in chunk}
+        prices = {(r["fingerprint"], r["retailer"]): (r["fingerprint"], r["retailer"], r["price_current"],
+                                                      r["price_original"], r["url"]) for r in chunk}
+        store.executemany(product_sql, list(products.values()))
+        store.executemany(price_sql, list(prices.values()))
+        store.commit()
+        hist.record((time.perf_counter() - t0) * 1e6)
+        written += len(chunk)
+    if pairs:
+        store.executemany(match_sql, [(p["left"]["product_id"], p["right"]["product_id"], p["similarity"])
+                                      for p in pairs])
+        store.commit()
+    return written
+
+
+# ============================================================================
+# 📏 MEDICIÓN
+# ============================================================================
+
+def _rss_mb() -> Optional[float]:
+    """Pico de RSS del proceso (ru_maxrss está en KB en Linux, bytes en macOS)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1e6 if sys.platform == "darwin" else 1e3)
+
+
+class StageTimer:
+    """Tiempo total, latencias por unidad (µs) y RSS al cierre de una etapa"""
+
+    def __init__(self, name: str, unit: str):
+        self.name = name
+        self.unit = unit
+        self.hist = LatencyHistogram(max_value=3_600_000_000)
+        self.items = 0
+        self.wall = 0.0
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.wall = time.perf_counter() - self.t0
+        self.rss = _rss_mb()
+        return False
+
+    def timed(self, fn: Callable, items: Iterable):
+        """Aplicar fn a cada ítem midiendo la latencia individual"""
+        out = []
+        record, clock = self.hist.record, time.perf_counter
+        for item in items:
+            t0 = clock()
+            out.append(fn(item))
+            record((clock() - t0) * 1e6)
+        self.items += len(out)
+        return out
+
+    def result(self) -> Dict[str, Any]:
+        p = self.hist.percentiles((50, 95, 99))
+        res = {"stage": self.name, "items": self.items, "wall_s": round(self.wall, 4),
+               "items_per_s": round(self.items / self.wall, 1) if self.wall > 0 else None,
+               "peak_rss_mb": round(self.rss, 1) if self.rss is not None else None}
+        if self.hist.count:
+            res.update({"latency_unit": self.unit, "samples": self.hist.count,
+                        "p50_ms": round(p[50] / 1000, 4), "p95_ms": round(p[95] / 1000, 4),
+                        "p99_ms": round(p[99] / 1000, 4)})
+        return res
+
+
+def run_pipeline(data_dir: str, workdir: str, persist: str, dsn: Optional[str],
+                 llm_latency_ms: float) -> Dict[str, Any]:
+    """Pipeline completo en el proceso actual; retorna métricas por etapa"""
+    from src.match import do_match
+
+    taxonomy = _load_taxonomy()
+    store = open_store(persist, workdir, dsn)
+    llm = MockLLM(llm_latency_ms)
+    timers = {}
+
+    with StageTimer("ingest", "file") as t:
+        records, current, t_file = [], None, time.perf_counter()
+        for rec in load_items(data_dir):
+            if rec["source_path"] != current:
+                if current is not None:
+                    t.hist.record((time.perf_counter() - t_file) * 1e6)
+                current, t_file = rec["source_path"], time.perf_counter()
+            records.append(rec)
+        if current is not None:
+            t.hist.record((time.perf_counter() - t_file) * 1e6)
+        t.items = len(records)
+    timers["ingest"] = t
+
+    # Esquemas de atributos y aliases de marca desde el store (no la BD de producción)
+    brand_aliases = store.get_brand_aliases()
+    schema_lookup = categorize_module.get_category_attributes_schema
+    categorize_module.get_category_attributes_schema = store.get_attributes_schema
+    profiler = get_profiler()
+    profiler.reset()
+    profiler.enable()
+    try:
+        with StageTimer("normalize", "item") as t:
+            rows = t.timed(lambda rec: normalize_record(rec, store, llm, taxonomy, brand_aliases), records)
+            store.commit()
+    finally:
+        categorize_module.get_category_attributes_schema = schema_lookup
+        profiler.disable()
+    timers["normalize"] = t
+    normalize_stages = profiler.stage_summary()
+
+    with StageTimer("match", "run") as t:
+        stats: Dict[str, Any] = {}
+        pairs = do_match(rows, stats=stats)
+        t.items = len(rows)
+    timers["match"] = t
+
+    with StageTimer("persist", f"batch{PERSIST_BATCH}") as t:
+        t.items = persist_rows(store, rows, pairs, t.hist)
+    timers["persist"] = t
+    store.close()
+
+    total_wall = sum(tm.wall for tm in timers.values())
+    return {
+        "stages": [timers[s].result() for s in STAGES],
+        "listings": len(records),
+        "total_wall_s": round(total_wall, 3),
+        "end_to_end_items_per_s": round(len(records) / total_wall, 1) if total_wall > 0 else None,
+        "llm_calls": llm.calls,
+        "matches": len(pairs),
+        "match_comparisons": stats.get("comparisons"),
+        "normalize_stages": normalize_stages,
+        "peak_rss_mb": _rss_mb(),
+    }
+
+
+def _child(fn, args, conn):
+    try:
+        conn.send(("ok", fn(*args)))
+    except ImportError as e:
+        conn.send(("skipped", f"ImportError: {e}"))
+    except Exception as e:
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+    finally:
+        conn.close()
+
+
+def run_isolated(fn: Callable, *args) -> Dict[str, Any]:
+    """
+    Ejecutar fn en un proceso hijo (fork) para que el pico de RSS sea solo el suyo;
+    sin fork (Windows) corre en el mismo proceso.
+    """
+    if resource is not None and "fork" in mp.get_all_start_methods():
+        ctx = mp.get_context("fork")
+        parent_conn, child_conn = ctx.Pipe(duplex=False)
+        proc = ctx.Process(target=_child, args=(fn, args, child_conn))
+        proc.start()
+        child_conn.close()
+        try:
+            status, payload = parent_conn.recv()
+        except EOFError:  # El hijo murió sin responder (p.ej. OOM killer)
+            proc.join()
+            return {"error": f"proceso hijo terminó sin resultado (exitcode {proc.exitcode})"}
+        proc.join()
+    else:
+        try:
+            status, payload = "ok", fn(*args)
+        except ImportError as e:
+            status, payload = "skipped", f"ImportError: {e}"
+    if status != "ok":
+        return {"skipped" if status == "skipped" else "error": payload}
+    return payload
+
+
+def median_result(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Mediana por etapa (y totales) de varias rondas del mismo tamaño"""
+    def med(values):
+        values = [v for v in values if v is not None]
+        return round(statistics.median(values), 4) if values else None
+
+    res = dict(runs[-1])
+    for key in ("total_wall_s", "end_to_end_items_per_s", "peak_rss_mb"):
+        res[key] = med(r.get(key) for r in runs)
+    stages = []
+    for i, stage_res in enumerate(runs[-1]["stages"]):
+        merged = dict(stage_res)
+        for key, value in stage_res.items():
+            if isinstance(value, float):
+                merged[key] = med(r["stages"][i].get(key) for r in runs)
+        stages.append(merged)
+    res["stages"] = stages
+    res["rounds"] = len(runs)
+    return res
+
+
+def run_rounds(rounds: int, warmup: int, data_dir: str, run_dir: str, *args) -> Dict[str, Any]:
+    """
+    warmup rondas descartadas + rounds medidas; cada una en su hijo y con BD
+    nueva (sin cache IA de la ronda anterior). Mediana de las medidas.
+    """
+    runs = []
+    for i in range(warmup + rounds):
+        round_dir = os.path.join(run_dir, f"round_{i}")
+        os.makedirs(round_dir, exist_ok=True)
+        res = run_isolated(run_pipeline, data_dir, round_dir, *args)
+        if "stages" not in res:
+            return res
+        if i >= warmup:
+            runs.append(res)
+    return median_result(runs)
+
+
+# ============================================================================
+# 📊 BASELINE
+# ============================================================================
+
+def compare_baseline(results: List[Dict[str, Any]], baseline: Dict[str, Any],
+                     max_slowdown: float, max_rss_growth: float,
+                     min_p95_samples: int = MIN_P95_SAMPLES) -> List[str]:
+    """Regresiones por (tamaño, etapa): throughput, p95 (con muestras suficientes) y pico de RSS"""
+    base = {(r["size"], s["stage"]): s for r in baseline.get("results", []) for s in r.get("stages", [])}
+    regressions = []
+    for r in results:
+        for s in r.get("stages", []):
+            b = base.get((r["size"], s["stage"]))
+            if not b:
+                continue
+            tag = f"{s['stage']}@{r['size']}"
+            if b.get("items_per_s") and s.get("items_per_s") is not None \
+                    and s["items_per_s"] < b["items_per_s"] * (1 - max_slowdown):
+                regressions.append(f"{tag}: ítems/s {b['items_per_s']} -> {s['items_per_s']}")
+            if b.get("p95_ms") and s.get("p95_ms") is not None \
+                    and min(s.get("samples", 0), b.get("samples", 0)) >= min_p95_samples \
+                    and s["p95_ms"] > b["p95_ms"] * (1 + max_slowdown):
+                regressions.append(f"{tag}: p95 {b['p95_ms']}ms -> {s['p95_ms']}ms")
+            if b.get("peak_rss_mb") and s.get("peak_rss_mb") is not None \
+                    and s["peak_rss_mb"] > b["peak_rss_mb"] * (1 + max_rss_growth):
+                regressions.append(f"{tag}: RSS {b['peak_rss_mb']}MB -> {s['peak_rss_mb']}MB")
+    return regressions
+
+
+def _print_result(res: Dict[str, Any]) -> None:
+    if "stages" not in res:
+        print(f"[BENCH] pipeline @ {res['size']}: {res.get('skipped') or res.get('error')}")
+        return
+    print(f"[BENCH] pipeline @ {res['size']}: {res['listings']} listings, {res['total_wall_s']}s "
+          f"(mediana de {res.get('rounds', 1)} rondas) "
+          f"({res['end_to_end_items_per_s']} ítems/s), {res['llm_calls']} llamadas LLM, {res['matches']} matches")
+    for s in res["stages"]:
+        lat = f" p50={s['p50_ms']}ms p95={s['p95_ms']}ms p99={s['p99_ms']}ms /{s['latency_unit']}" \
+            if "p50_ms" in s else ""
+        print(f"    {s['stage']:<11}{s['wall_s']:>9.3f}s {s['items_per_s']:>12} ítems/s"
+              f"  RSS {s['peak_rss_mb']}MB{lat}")
+    for name, sub in (res.get("normalize_stages") or {}).items():
+        print(f"      normalize/{name:<20}{sub['total_ms']:>10.1f}ms  p95={sub['p95_ms']}ms")
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="pipeline-bench")
+    ap.add_argument("--sizes", default="1k,10k", help="Tamaños (listings), ej: 1k,10k,100k,1m")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--persist", choices=["sqlite", "postgres"], default="sqlite")
+    ap.add_argument("--dsn", default=None, help="DSN del Postgres local (default $BENCH_PG_DSN)")
+    ap.add_argument("--llm-latency-ms", dest="llm_latency_ms", type=float, default=0.0,
+                    help="Latencia simulada por llamada al LLM")
+    ap.add_argument("--workdir", default=None, help="Directorio para datasets/BD (default: temporal)")
+    ap.add_argument("--out", default="reports/bench_pipeline.json")
+    ap.add_argument("--baseline", default=BASELINE_PATH)
+    ap.add_argument("--update-baseline", action="store_true")
+    ap.add_argument("--max-slowdown", type=float, default=0.25,
+                    help="Caída máxima de ítems/s (y subida de p95) tolerada, fracción")
+    ap.add_argument("--max-rss-growth", type=float, default=0.25, help="Crecimiento máximo del pico de RSS")
+    ap.add_argument("--rounds", type=int, default=3, help="Rondas medidas por tamaño (se compara la mediana)")
+    ap.add_argument("--warmup", type=int, default=1, help="Rondas de calentamiento descartadas por tamaño")
+    ap.add_argument("--min-p95-samples", dest="min_p95_samples", type=int, default=MIN_P95_SAMPLES,
+                    help="Muestras mínimas para comparar el p95 de una etapa")
+    args = ap.parse_args(argv)
+    if args.rounds < 1 or args.warmup < 0:
+        ap.error("--rounds debe ser >= 1 y --warmup >= 0")
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="pipeline_bench_", dir=args.workdir) as tmp:
+        for size in [parse_size(s) for s in args.sizes.split(",")]:
+            data_dir = os.path.join(tmp, f"data_{size}")
+            run_dir = os.path.join(tmp, f"run_{size}")
+            os.makedirs(run_dir, exist_ok=True)
+            # Generar en otro hijo: el proceso del pipeline no hereda la memoria del generador
+            gen = run_isolated(write_dataset, data_dir, size, args.seed)
+            if not gen.get("listings"):
+                print(f"[ERROR] No se pudo generar el dataset de {size} listings: "
+                      f"{gen.get('error') or gen.get('skipped') or 'dataset vacío'}")
+                return 2
+            res = run_rounds(args.rounds, args.warmup, data_dir, run_dir, args.persist, args.dsn,
+                             args.llm_latency_ms)
+            res.update({"size": size})
+            results.append(res)
+            _print_result(res)
+
+    report = {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "seed": args.seed,
+        "persist": args.persist,
+        "llm_latency_ms": args.llm_latency_ms,
+        "rounds": args.rounds,
+        "warmup": args.warmup,
+        "results": results,
+    }
+
+    regressions = []
+    if os.path.exists(args.baseline) and not args.update_baseline:
+        with open(args.baseline, "r", encoding="utf-8") as fh:
+            regressions = compare_baseline(results, json.load(fh), args.max_slowdown, args.max_rss_growth,
+                                           args.min_p95_samples)
+    report["regressions"] = regressions
+
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, ensure_ascii=False, indent=2)
+    print(f"[OK] Reporte -> {args.out}")
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, ensure_ascii=False, indent=2)
+        print(f"[OK] Baseline actualizado -> {args.baseline}")
+
+    errors = [f"pipeline @ {r['size']}: {r['error']}" for r in results if "error" in r]
+    for r in regressions:
+        print(f"[REGRESION] {r}")
+    for e in errors:
+        print(f"[ERROR] {e}")
+    return 1 if regressions or errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
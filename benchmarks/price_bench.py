@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+⚡ Benchmark de precios (utils.parse_price / pick_price memoizados)
+Compara contra la implementación de referencia (regex + dos replace por texto,
+y normalize_one evaluando pick_price dos veces más el barrido de llaves
+*price*) sobre un scrape real: un JSON de scraper o un directorio con varios
+(mismo formato que lee src/ingest.py). Sin --input genera un dataset con la
+forma de los scrapers. Verifica que ambos den exactamente lo mismo y reporta
+µs por producto y speedup. Sale con código 1 si hay diferencias o si el
+speedup queda bajo --min-speedup.
+
+Uso:
+    python -m benchmarks.price_bench --input resultados/falabella_busqueda_celulares.json
+    python -m benchmarks.price_bench --size 20k --min-speedup 2
+"""
+
+import argparse
+import gc
+import json
+import os
+import re
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from benchmarks.datasets import write_dataset, parse_size
+from src.ingest import load_items
+from src.utils import parse_price, parse_prices, pick_price
+import src.utils as price_utils
+
+# ============================================================================
+# 📜 REFERENCIA: sin memo, pick_price dos veces por producto
+# ============================================================================
+
+_CLP_RX = re.compile(r"[^\d,\.]")
+PRICE_KEYS_PREF = [("card_price", "card_price_text"), ("normal_price", "normal_price_text"),
+                   ("ripley_price", "ripley_price_text")]
+
+
+def reference_parse_price(value) -> Optional[int]:
+    """utils.parse_price original"""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        price = int(round(float(value)))
+    elif isinstance(value, str):
+        s = value.strip()
+        if not s:
+            return None
+        s = _CLP_RX.sub("", s)
+        if not s:
+            return None
+        s = s.replace(".", "").replace(",", "")
+        try:
+            price = int(s)
+        except Exception:
+            return None
+    else:
+        return None
+    if price < 1 or price > 100_000_000:
+        return None
+    return price
+
+
+def reference_pick_price(item: Dict[str, Any]) -> Tuple[Optional[int], Optional[int]]:
+    current = None
+    for numk, textk in PRICE_KEYS_PREF:
+        if numk in item:
+            current = reference_parse_price(item.get(numk))
+        if current is None and textk in item:
+            current = reference_parse_price(item.get(textk))
+        if current is not None:
+            break
+    original = None
+    for k in ("original_price", "original_price_text", "normal_price", "normal_price_text"):
+        val = reference_parse_price(item.get(k))
+        if val:
+            original = val
+            break
+    return current, original
+
+
+def reference_prices(raw: Dict[str, Any]) -> Tuple[Optional[int], Optional[int]]:
+    """Precios como los calculaba normalize_one antes (dos pick_price + barrido)"""
+    price_curr, price_orig = reference_pick_price(raw)
+    if price_curr is None:
+        for k, v in raw.items():
+            if "price" in k and isinstance(v, str):
+                p = reference_parse_price(v)
+                if p:
+                    price_curr = p
+                    break
+    price_curr, price_orig = reference_pick_price(raw)
+    if price_curr is None and price_orig:
+        price_curr = price_orig
+    return price_curr, price_orig
+
+
+def memo_prices(raw: Dict[str, Any]) -> Tuple[Optional[int], Optional[int]]:
+    """Precios como los calcula normalize_one ahora (una evaluación)"""
+    price_curr, price_orig = pick_price(raw)
+    if price_curr is None and price_orig:
+        price_curr = price_orig
+    return price_curr, price_orig
+
+
+# ============================================================================
+# ⏱️ MEDICIÓN
+# ============================================================================
+
+def load_products(paths: List[str]) -> List[Dict[str, Any]]:
+    """Productos crudos de uno o más JSON de scraper (archivo o directorio)"""
+    products: List[Dict[str, Any]] = []
+    for path in paths:
+        if os.path.isdir(path):
+            products.extend(rec["item"] for rec in load_items(path))
+            continue
+        with open(path, "r", encoding="utf-8") as fh:
+            data = json.load(fh)
+        products.extend(data.get("products", []) if isinstance(data, dict) else data)
+    return products
+
+
+def _time(fn: Callable[[Any], Any], arg: Any) -> float:
+    price_utils._PRICE_MEMO.clear()  # cada ronda parte en frío: la memo se gana dentro del scrape
+    t0 = time.perf_counter()
+    fn(arg)
+    return time.perf_counter() - t0
+
+
+def bench(label: str, ref: Callable[[Any], Any], new: Callable[[Any], Any], arg: Any, n: int,
+          rounds: int) -> Dict[str, Any]:
+    """Alterna referencia y memo por ronda y reporta mínimos y mediana del speedup"""
+    ref_times, new_times, ratios = [], [], []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for i in range(rounds):
+            if i % 2:
+                t_new, t_ref = _time(new, arg), _time(ref, arg)
+            else:
+                t_ref, t_new = _time(ref, arg), _time(new, arg)
+            ref_times.append(t_ref)
+            new_times.append(t_new)
+            ratios.append(t_ref / t_new)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return {
+        "bench": label,
+        "items": n,
+        "reference_us": round(min(ref_times) / n * 1e6, 3),
+        "memo_us": round(min(new_times) / n * 1e6, 3),
+        "speedup": round(statistics.median(ratios), 2),
+    }
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="price-bench")
+    ap.add_argument("--input", nargs="*", default=None,
+                    help="JSON(s) de scraper o directorios (por defecto: dataset generado)")
+    ap.add_argument("--size", default="20k", help="Listings generados si no hay --input")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--rounds", type=int, default=15)
+    ap.add_argument("--min-speedup", type=float, default=None,
+                    help="Speedup mínimo por producto (sale con 1 si no se alcanza)")
+    ap.add_argument("--out", default=None, help="Reporte JSON (opcional)")
+    args = ap.parse_args(argv)
+
+    if args.input:
+        products, source = load_products(args.input), args.input
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            write_dataset(tmp, parse_size(args.size), seed=args.seed)
+            products, source = load_products([tmp]), f"generated:{args.size}"
+    if not products:
+        print("[BENCH] ❌ sin productos en el input")
+        return 1
+
+    texts = [v for p in products for k, v in p.items() if "price" in k]
+    mismatches = [p for p in products if memo_prices(p) != reference_prices(p)]
+    mismatches += [v for v in texts if parse_price(v) != reference_parse_price(v)]
+    if parse_prices(texts) != [reference_parse_price(v) for v in texts]:
+        mismatches.append("parse_prices")
+
+    results = [
+        bench("normalize_one", lambda ps: [reference_prices(p) for p in ps],
+              lambda ps: [memo_prices(p) for p in ps], products, len(products), args.rounds),
+        bench("parse_prices", lambda vs: [reference_parse_price(v) for v in vs], parse_prices,
+              texts, len(texts), args.rounds),
+    ]
+    for res in results:
+        print(f"[BENCH] {res['bench']}: {res['reference_us']} µs -> {res['memo_us']} µs por item "
+              f"(x{res['speedup']}, {res['items']} items)")
+    distinct = len(set(v for v in texts if isinstance(v, str)))
+    report = {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": sys.version.split()[0],
+        "source": source,
+        "products": len(products),
+        "price_fields": len(texts),
+        "distinct_texts": distinct,
+        "results": results,
+        "mismatches": len(mismatches),
+        "speedup": results[0]["speedup"],
+    }
+    print(f"[BENCH] {len(texts)} campos de precio, {distinct} textos distintos, "
+          f"{len(mismatches)} diferencias")
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    if mismatches:
+        print("[BENCH] ❌ los precios memoizados no coinciden con la referencia")
+        return 1
+    if args.min_speedup is not None and report["speedup"] < args.min_speedup:
+        print(f"[BENCH] ❌ speedup x{report['speedup']} < x{args.min_speedup}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
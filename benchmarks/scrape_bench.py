@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+⚡ Benchmark del motor de scraping concurrente (Scrappers/scrape_engine.py)
+Levanta un servidor HTTP local que sirve páginas de búsqueda con la forma de
+Falabella (productos de benchmarks/datasets.py, 48 por página) y la página
+guardada scrapers_busqueda/ripley_debug_pagina2.html (bloqueo Cloudflare, sin
+productos). Un driver de fixture carga las páginas por HTTP y simula el
+render del lado del cliente: los productos aparecen en page_source recién
+--render-ms después de get().
+
+Compara el loop secuencial original (sleeps fijos de 2+1+1+2+0.5 s por
+página, escalados con --sleep-scale) contra ConcurrentScraper con 1 y con
+--workers drivers, esperando productos renderizados. Verifica que todos
+extraigan los mismos productos y que la página bloqueada termine en el
+timeout sin productos. Sale con código 1 si hay diferencias.
+
+Uso:
+    python -m benchmarks.scrape_bench
+    python -m benchmarks.scrape_bench --workers 4 --render-ms 300 --out out/scrape_bench.json
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Tuple
+from urllib.parse import parse_qs, quote_plus, urlsplit
+
+from benchmarks.datasets import generate_dataset, parse_size
+from Scrappers.driver_pool import DriverPool
+from Scrappers.scrape_engine import ConcurrentScraper, DomainLimiter, PageTask
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RIPLEY_BLOCKED_HTML = os.path.join(ROOT, "scrapers_busqueda", "ripley_debug_pagina2.html")
+PRODUCT_SELECTOR = 'a[data-pod="catalyst-pod"]'
+PRODUCTS_START = "<!--productos-->"
+PRODUCTS_END = "<!--/productos-->"
+_CODE_RX = re.compile(r'href="/falabella-cl/product/(\w+)/')
+_ATTR_SELECTOR_RX = re.compile(r'^(\w*)\[([\w-]+)="([^"]*)"\]$')
+
+# ============================================================================
+# 🌐 SERVIDOR DE FIXTURES
+# ============================================================================
+
+
+def render_search_page(term: str, page: int, products: List[Dict[str, Any]]) -> str:
+    pods = "".join(
+        f'<a data-pod="catalyst-pod" href="/falabella-cl/product/{p["product_code"]}/x">'
+        f'<b class="pod-title">{p.get("brand", "")}</b><b class="pod-subTitle">{p["name"]}</b>'
+        f'<div class="prices"><span>{p.get("normal_price_text", "")}</span></div></a>'
+        for p in products
+    )
+    return (f"<html><head><title>{term} - página {page}</title></head><body><div id=\"testId-searchResults\">"
+            f"{PRODUCTS_START}{pods}{PRODUCTS_END}</div></body></html>")
+
+
+def build_fixture_pages(size: int, seed: int) -> Dict[Tuple[str, int], str]:
+    """Páginas de búsqueda (term, page) -> HTML, desde los productos Falabella del dataset"""
+    docs, _ = generate_dataset(size, seed=seed)
+    pages: Dict[Tuple[str, int], str] = {}
+    for doc in docs["Falabella"].values():
+        term = doc["metadata"]["search_term"]
+        by_page: Dict[int, List[Dict[str, Any]]] = {}
+        for item in doc["products"]:
+            by_page.setdefault(item["page_scraped"], []).append(item)
+        for page, items in by_page.items():
+            pages[(term, page)] = render_search_page(term, page, items)
+    return pages
+
+
+class FixtureServer:
+    """ThreadingHTTPServer local con latencia de red fija por request"""
+
+    def __init__(self, pages: Dict[Tuple[str, int], str], latency_s: float):
+        with open(RIPLEY_BLOCKED_HTML, "rb") as f:
+            blocked = f.read()
+        encoded = {key: html.encode("utf-8") for key, html in pages.items()}
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests += 1
+                time.sleep(latency_s)
+                parts = urlsplit(self.path)
+                if parts.path == "/ripley/pagina2":
+                    body = blocked
+                else:
+                    qs = parse_qs(parts.query)
+                    body = encoded.get((qs.get("Ntt", [""])[0], int(qs.get("page", ["1"])[0])))
+                if body is None:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self) -> "FixtureServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+# ============================================================================
+# 🤖 DRIVER DE FIXTURE
+# ============================================================================
+
+class FixtureDriver:
+    """
+    API mínima de WebDriver sobre HTTP: los productos del HTML aparecen en
+    page_source render_s después de get(), como en un sitio que renderiza en
+    el cliente. find_elements entiende selectores ``tag[attr="valor"]``.
+    """
+
+    def __init__(self, render_s: float):
+        self.render_s = render_s
+        self._html = ""
+        self._loaded_at = 0.0
+
+    def get(self, url: str) -> None:
+        with urllib.request.urlopen(url, timeout=30) as resp:
+            self._html = resp.read().decode("utf-8", "replace")
+        self._loaded_at = time.monotonic()
+
+    @property
+    def page_source(self) -> str:
+        html = self._html
+        if time.monotonic() - self._loaded_at < self.render_s and PRODUCTS_START in html:
+            head, _, rest = html.partition(PRODUCTS_START)
+            return head + rest.partition(PRODUCTS_END)[2]
+        return html
+
+    def find_elements(self, by: str, selector: str) -> List[None]:
+        html = self.page_source
+        count = 0
+        for sel in selector.split(","):
+            m = _ATTR_SELECTOR_RX.match(sel.strip())
+            if m:
+                tag, attr, value = m.groups()
+                pattern = "<" + (tag or r"\w+") + r"\b[^>]*\b" + attr + '="' + re.escape(value) + '"'
+                count += len(re.findall(pattern, html))
+        return [None] * count
+
+    def execute_script(self, script: str, *args) -> Any:
+        return 1 if script.strip() == "return 1" else None
+
+    def quit(self) -> None:
+        self._html = ""
+
+
+# ============================================================================
+# ⏱️ MEDICIÓN
+# ============================================================================
+
+def parse_codes(html: str, task: PageTask) -> List[Dict[str, Any]]:
+    return [{"product_code": code, "page_scraped": task.page_num} for code in _CODE_RX.findall(html)]
+
+
+def run_sequential(tasks: List[PageTask], render_s: float, scale: float) -> List[List[Dict[str, Any]]]:
+    """Loop original: un driver, sleeps fijos de 2+1+1+2 s y 0.5 s entre páginas"""
+    driver = FixtureDriver(render_s)
+    out = []
+    for task in tasks:
+        driver.get(task.url)
+        for pause in (2, 1, 1, 2):
+            time.sleep(pause * scale)
+            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+        out.append(parse_codes(driver.page_source, task))
+        time.sleep(0.5 * scale)
+    driver.quit()
+    return out
+
+
+def run_engine(tasks: List[PageTask], render_s: float, scale: float, workers: int,
+               interval_s: float) -> Tuple[List[List[Dict[str, Any]]], Dict[str, int]]:
+    pool = DriverPool(lambda: FixtureDriver(render_s), size=workers, name="fixture")
+    limiter = DomainLimiter(max_concurrent=workers, min_interval_s=interval_s)
+    engine = ConcurrentScraper(pool, parse_codes, PRODUCT_SELECTOR, workers=workers, limiter=limiter,
+                               wait_timeout=10 * scale, poll_s=0.25 * scale)
+    try:
+        results = engine.run(tasks)
+    finally:
+        pool.close()
+    return [r.products for r in results], pool.get_stats()
+
+
+def timed(label: str, fn: Callable, pages: int, rounds: int) -> Tuple[Dict[str, Any], Any]:
+    best, out = None, None
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        out = fn()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    products = sum(len(p) for p in (out[0] if isinstance(out, tuple) else out))
+    return {"bench": label, "pages": pages, "seconds": round(best, 3), "pages_per_s": round(pages / best, 2),
+            "products_per_s": round(products / best, 1)}, out
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="scrape-bench")
+    ap.add_argument("--size", default="2k", help="Listings generados (ej: 1k, 2k, 5k)")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--pages", type=int, default=5, help="Páginas por búsqueda")
+    ap.add_argument("--workers", type=int, default=3)
+    ap.add_argument("--latency-ms", type=float, default=50.0, help="Latencia del servidor por request")
+    ap.add_argument("--render-ms", type=float, default=150.0, help="Tiempo hasta que los productos se renderizan")
+    ap.add_argument("--sleep-scale", type=float, default=0.1, help="Escala de los sleeps fijos y timeouts")
+    ap.add_argument("--interval-ms", type=float, default=0.0, help="Separación mínima entre cargas por dominio")
+    ap.add_argument("--rounds", type=int, default=1)
+    ap.add_argument("--out", default=None, help="Reporte JSON (opcional)")
+    args = ap.parse_args(argv)
+
+    fixture_pages = build_fixture_pages(parse_size(args.size), args.seed)
+    render_s, scale, interval_s = args.render_ms / 1000, args.sleep_scale, args.interval_ms / 1000
+
+    with FixtureServer(fixture_pages, args.latency_ms / 1000) as server:
+        terms = sorted({term for term, _ in fixture_pages})
+        tasks = [PageTask(term, page, f"{server.base_url}/falabella-cl/search?Ntt={quote_plus(term)}&page={page}")
+                 for term in terms for page in range(1, args.pages + 1) if (term, page) in fixture_pages]
+        n = len(tasks)
+
+        ref, expected = timed("secuencial (sleeps fijos)", lambda: run_sequential(tasks, render_s, scale), n,
+                              args.rounds)
+        one, (got_one, _) = timed("motor x1", lambda: run_engine(tasks, render_s, scale, 1, interval_s), n,
+                                  args.rounds)
+        many, (got_many, stats) = timed(f"motor x{args.workers}",
+                                        lambda: run_engine(tasks, render_s, scale, args.workers, interval_s), n,
+                                        args.rounds)
+        mismatches = sum(a != b for a, b in zip(expected, got_one)) + sum(a != b for a, b in zip(expected, got_many))
+
+        blocked_task = PageTask("ripley", 2, f"{server.base_url}/ripley/pagina2")
+        t0 = time.perf_counter()
+        blocked, _ = run_engine([blocked_task], render_s, scale, 1, interval_s)
+        blocked_s = time.perf_counter() - t0
+        requests = server.requests
+
+    results = [ref, one, many]
+    for res in results:
+        speedup = round(ref["seconds"] / res["seconds"], 2)
+        res["speedup"] = speedup
+        print(f"[BENCH] {res['bench']}: {res['pages']} páginas en {res['seconds']} s -> "
+              f"{res['pages_per_s']} páginas/s, {res['products_per_s']} productos/s (x{speedup})")
+    print(f"[BENCH] pool x{args.workers}: {stats['started']} drivers, {stats['pages']} páginas")
+    print(f"[BENCH] página bloqueada (ripley_debug_pagina2.html): {len(blocked[0])} productos, "
+          f"{blocked_s:.2f} s (timeout {10 * scale:.2f} s)")
+    print(f"[BENCH] {sum(len(p) for p in expected)} productos, {mismatches} páginas con diferencias, "
+          f"{requests} requests al servidor")
+
+    report = {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": sys.version.split()[0],
+        "size": args.size,
+        "workers": args.workers,
+        "latency_ms": args.latency_ms,
+        "render_ms": args.render_ms,
+        "sleep_scale": scale,
+        "results": results,
+        "blocked_page_products": len(blocked[0]),
+        "blocked_page_s": round(blocked_s, 3),
+        "mismatches": mismatches,
+    }
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    if mismatches or blocked[0]:
+        print("[BENCH] ❌ El motor no extrae lo mismo que el loop secuencial")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
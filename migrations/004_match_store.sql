@@ -0,0 +1,63 @@
+-- 🔗 MIGRACIÓN: Match Store inter-retail
+-- Fecha: 2026-10-19
+-- Descripción: Persistencia de clusters de matching para comparación de precios
+--              sin recalcular matches.jsonl ni hacer joins ad-hoc
+-- ============================================================================
+
+-- Verificar que estamos en la BD correcta
+\c postgres;
+
+-- ============================================================================
+-- 1️⃣ TABLA: match_clusters
+-- Un registro por grupo de productos equivalentes entre retailers
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS match_clusters (
+    cluster_id VARCHAR(64) PRIMARY KEY,
+    category VARCHAR(100),
+    brand VARCHAR(100),
+    member_count INTEGER NOT NULL DEFAULT 0,
+    retailer_count INTEGER NOT NULL DEFAULT 0,
+    avg_similarity NUMERIC(5,4),
+    match_version VARCHAR(20) DEFAULT 'v1.0',
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_match_clusters_category_brand ON match_clusters(category, brand);
+
+COMMENT ON TABLE match_clusters IS 'Clusters de productos equivalentes entre retailers (salida del matcher)';
+
+-- ============================================================================
+-- 2️⃣ TABLA: match_cluster_members
+-- Oferta de cada retailer dentro de un cluster (precio incluido para lectura directa)
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS match_cluster_members (
+    id BIGSERIAL PRIMARY KEY,
+    cluster_id VARCHAR(64) NOT NULL REFERENCES match_clusters(cluster_id) ON DELETE CASCADE,
+    fingerprint VARCHAR(64) NOT NULL,
+    retailer VARCHAR(100) NOT NULL,
+    product_id VARCHAR(100),
+    name VARCHAR(500),
+    price_current INTEGER,
+    price_original INTEGER,
+    currency VARCHAR(3) DEFAULT 'CLP',
+    url VARCHAR(1000),
+    similarity NUMERIC(5,4),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT uk_match_member UNIQUE (fingerprint, retailer)
+);
+
+-- Lookup principal: fingerprint -> cluster -> todas las ofertas
+CREATE INDEX IF NOT EXISTS idx_match_members_fingerprint ON match_cluster_members(fingerprint);
+CREATE INDEX IF NOT EXISTS idx_match_members_cluster ON match_cluster_members(cluster_id);
+CREATE INDEX IF NOT EXISTS idx_match_members_retailer ON match_cluster_members(retailer);
+
+COMMENT ON TABLE match_cluster_members IS 'Ofertas por retailer de cada cluster; indexado por fingerprint y retailer';
+
+DROP TRIGGER IF EXISTS update_match_clusters_updated_at ON match_clusters;
+CREATE TRIGGER update_match_clusters_updated_at
+    BEFORE UPDATE ON match_clusters
+    FOR EACH ROW
+    EXECUTE FUNCTION update_updated_at_column();
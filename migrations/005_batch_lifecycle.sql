@@ -0,0 +1,68 @@
+-- ============================================================================
+-- 🔄 MIGRACIÓN: Ciclo de vida de Batch API (daemon reanudable)
+-- Fecha: 2026-10-19
+-- Descripción: Máquina de estados persistida en gpt5_batch_jobs + items por
+--              producto para reanudar tras un crash sin perder ni duplicar
+-- ============================================================================
+
+-- Verificar que estamos en la BD correcta
+\c postgres;
+
+-- ============================================================================
+-- 1️⃣ gpt5_batch_jobs: etapa del lifecycle, ids remotos y lease del worker
+-- `status` se mantiene como estado grueso; `stage` es la máquina de estados
+-- del daemon (NULL = job creado por el flujo síncrono, el daemon lo ignora)
+-- ============================================================================
+
+ALTER TABLE gpt5_batch_jobs
+    ADD COLUMN IF NOT EXISTS stage VARCHAR(20),
+    ADD COLUMN IF NOT EXISTS packed BOOLEAN DEFAULT FALSE,
+    ADD COLUMN IF NOT EXISTS openai_file_id VARCHAR(100),
+    ADD COLUMN IF NOT EXISTS openai_batch_id VARCHAR(100),
+    ADD COLUMN IF NOT EXISTS output_file_id VARCHAR(100),
+    ADD COLUMN IF NOT EXISTS poll_attempts INTEGER DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS next_poll_at TIMESTAMP,
+    ADD COLUMN IF NOT EXISTS locked_by VARCHAR(100),
+    ADD COLUMN IF NOT EXISTS locked_until TIMESTAMP,
+    ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+
+ALTER TABLE gpt5_batch_jobs DROP CONSTRAINT IF EXISTS valid_stage;
+ALTER TABLE gpt5_batch_jobs ADD CONSTRAINT valid_stage CHECK (
+    stage IS NULL OR stage IN ('created', 'uploaded', 'submitted', 'downloaded', 'ingested', 'failed')
+);
+
+-- Jobs vivos que el daemon debe reclamar (por vencimiento de poll)
+CREATE INDEX IF NOT EXISTS idx_batch_jobs_due
+    ON gpt5_batch_jobs(next_poll_at)
+    WHERE stage IS NOT NULL AND stage NOT IN ('ingested', 'failed');
+
+-- ============================================================================
+-- 2️⃣ gpt5_batch_items: un registro por producto enviado en un job
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS gpt5_batch_items (
+    batch_id VARCHAR(100) NOT NULL REFERENCES gpt5_batch_jobs(batch_id) ON DELETE CASCADE,
+    fingerprint VARCHAR(64) NOT NULL,
+    custom_id VARCHAR(150) NOT NULL,
+    item_index INTEGER NOT NULL DEFAULT 0,
+    product_data JSONB NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (batch_id, fingerprint),
+    CONSTRAINT valid_item_status CHECK (status IN ('pending', 'done', 'failed', 'requeued'))
+);
+
+-- Un fingerprint solo puede estar pendiente en un job a la vez (sin doble proceso)
+CREATE UNIQUE INDEX IF NOT EXISTS uq_batch_items_pending_fingerprint
+    ON gpt5_batch_items(fingerprint)
+    WHERE status = 'pending';
+
+CREATE INDEX IF NOT EXISTS idx_batch_items_custom_id ON gpt5_batch_items(batch_id, custom_id);
+
+COMMENT ON TABLE gpt5_batch_items IS 'Productos por batch job; permite reanudar y reencolar sin pérdidas';
+
+DROP TRIGGER IF EXISTS update_gpt5_batch_jobs_updated_at ON gpt5_batch_jobs;
+CREATE TRIGGER update_gpt5_batch_jobs_updated_at
+    BEFORE UPDATE ON gpt5_batch_jobs
+    FOR EACH ROW
+    EXECUTE FUNCTION update_updated_at_column();
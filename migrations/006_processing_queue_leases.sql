@@ -0,0 +1,66 @@
+-- ============================================================================
+-- 🚦 MIGRACIÓN: Cola de procesamiento con prioridad, leases y visibilidad
+-- Fecha: 2026-10-19
+-- Descripción: Columnas de lease/visibilidad para consumir processing_queue con
+--              FOR UPDATE SKIP LOCKED desde varios workers, ordenado por
+--              prioridad y antigüedad
+-- ============================================================================
+
+-- Verificar que estamos en la BD correcta
+\c postgres;
+
+-- ============================================================================
+-- 1️⃣ Columnas nuevas
+-- locked_by/locked_until: lease del worker que procesa el item
+-- visible_at: el item no se reclama antes (reintentos con backoff)
+-- ============================================================================
+
+ALTER TABLE processing_queue
+    ADD COLUMN IF NOT EXISTS custom_id VARCHAR(150),
+    ADD COLUMN IF NOT EXISTS locked_by VARCHAR(100),
+    ADD COLUMN IF NOT EXISTS locked_until TIMESTAMP,
+    ADD COLUMN IF NOT EXISTS visible_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    ADD COLUMN IF NOT EXISTS last_error TEXT,
+    ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+
+UPDATE processing_queue SET visible_at = created_at WHERE visible_at IS NULL;
+
+-- ============================================================================
+-- 2️⃣ Un solo item vivo por fingerprint (re-encolar sube la prioridad)
+-- Duplicados vivos previos: se conserva el más reciente
+-- ============================================================================
+
+DELETE FROM processing_queue q
+USING processing_queue newer
+WHERE q.fingerprint = newer.fingerprint
+  AND q.status IN ('pending', 'processing')
+  AND newer.status IN ('pending', 'processing')
+  AND q.id < newer.id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_queue_live_fingerprint
+    ON processing_queue(fingerprint)
+    WHERE status IN ('pending', 'processing');
+
+-- ============================================================================
+-- 3️⃣ Índices de consumo
+-- ============================================================================
+
+-- Claim: pendientes por prioridad y antigüedad
+DROP INDEX IF EXISTS idx_queue_status_priority;
+CREATE INDEX IF NOT EXISTS idx_queue_claim
+    ON processing_queue(priority DESC, created_at)
+    WHERE status = 'pending';
+
+-- Leases vencidos a recuperar
+CREATE INDEX IF NOT EXISTS idx_queue_leases
+    ON processing_queue(locked_until)
+    WHERE status = 'processing';
+
+DROP TRIGGER IF EXISTS update_processing_queue_updated_at ON processing_queue;
+CREATE TRIGGER update_processing_queue_updated_at
+    BEFORE UPDATE ON processing_queue
+    FOR EACH ROW
+    EXECUTE FUNCTION update_updated_at_column();
+
+COMMENT ON COLUMN processing_queue.visible_at IS 'No reclamable antes de este instante (backoff de reintentos)';
+COMMENT ON COLUMN processing_queue.locked_until IS 'Vencimiento del lease; luego otro worker puede reclamar el item';
@@ -0,0 +1,108 @@
+-- ============================================================================
+-- 🔑 MIGRACIÓN: Fingerprints v2 (BLAKE2b-128) con mapeo desde SHA-1 (v1)
+-- Fecha: 2026-10-19
+-- Descripción: Tabla de mapeo v1 -> v2 (fingerprint y product_id) para que
+--              los ids SHA-1 ya guardados sigan resolviendo mientras se migra,
+--              y función que reescribe fingerprint y product_id en las tablas
+--
+-- Procedimiento (ver docs/Pipeline.md, "Fingerprints v2"):
+--   1. python -m src.cli fingerprint-map --input <scrapes> --out out
+--      genera out/fingerprint_migration.csv (old_fingerprint, new_fingerprint,
+--      old_product_id, new_product_id) por el mismo camino que llena
+--      productos_maestros (normalize_integrated: categorize_enhanced + aliases)
+--   2. \copy fingerprint_migration(old_fingerprint, new_fingerprint, old_product_id, new_product_id)
+--          FROM 'out/fingerprint_migration.csv' WITH (FORMAT csv, HEADER true)
+--   3. SELECT * FROM apply_fingerprint_migration();
+--   4. Correr el pipeline con FINGERPRINT_VERSION=v2
+-- Los ids v2 llevan prefijo 'v2:' (35 caracteres, caben en VARCHAR(64)).
+-- ============================================================================
+
+-- Verificar que estamos en la BD correcta
+\c postgres;
+
+-- ============================================================================
+-- 1️⃣ TABLA: fingerprint_migration
+-- Un registro por product_id v1 (listing) con su fingerprint y product_id v2;
+-- varios listings del mismo producto base comparten fingerprint
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS fingerprint_migration (
+    old_product_id VARCHAR(100) PRIMARY KEY,
+    new_product_id VARCHAR(100) NOT NULL UNIQUE,
+    old_fingerprint VARCHAR(64) NOT NULL,
+    new_fingerprint VARCHAR(64) NOT NULL,
+    fingerprint_version VARCHAR(10) NOT NULL DEFAULT 'v2',
+    applied_at TIMESTAMP WITH TIME ZONE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_fingerprint_migration_old_fp ON fingerprint_migration(old_fingerprint);
+
+COMMENT ON TABLE fingerprint_migration IS 'Mapeo de fingerprint/product_id SHA-1 (v1) a BLAKE2b-128 (v2); los ids v1 resuelven vía esta tabla';
+
+-- ============================================================================
+-- 2️⃣ FUNCIÓN: resolve_fingerprint
+-- Id vigente para un fingerprint guardado (v1 mapeado -> v2, resto sin cambio)
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION resolve_fingerprint(p_fingerprint VARCHAR)
+RETURNS VARCHAR AS $$
+    SELECT COALESCE(
+        (SELECT new_fingerprint FROM fingerprint_migration WHERE old_fingerprint = p_fingerprint LIMIT 1),
+        p_fingerprint
+    );
+$$ LANGUAGE sql STABLE;
+
+-- ============================================================================
+-- 3️⃣ FUNCIÓN: apply_fingerprint_migration
+-- Reescribe las llaves v1 -> v2: fingerprint en las tablas indexadas por
+-- fingerprint y product_id en las que lo guardan (productos_maestros, precios,
+-- match store). Idempotente: solo toca filas con ids v1 mapeados.
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION apply_fingerprint_migration()
+RETURNS TABLE(table_name TEXT, column_name TEXT, rows_updated BIGINT) AS $$
+DECLARE
+    t TEXT;
+    n BIGINT;
+BEGIN
+    FOREACH t IN ARRAY ARRAY[
+        'productos_maestros', 'precios_actuales', 'precios_historicos', 'ai_metadata_cache',
+        'product_complexity_cache', 'semantic_cache', 'match_cluster_members', 'price_alerts'
+    ] LOOP
+        IF to_regclass(t) IS NULL THEN
+            CONTINUE;
+        END IF;
+        EXECUTE format(
+            'UPDATE %I x SET fingerprint = m.new_fingerprint
+               FROM (SELECT DISTINCT old_fingerprint, new_fingerprint FROM fingerprint_migration) m
+              WHERE x.fingerprint = m.old_fingerprint', t);
+        GET DIAGNOSTICS n = ROW_COUNT;
+        table_name := t;
+        column_name := 'fingerprint';
+        rows_updated := n;
+        RETURN NEXT;
+    END LOOP;
+
+    FOREACH t IN ARRAY ARRAY[
+        'productos_maestros', 'precios_actuales', 'precios_historicos', 'match_cluster_members'
+    ] LOOP
+        IF to_regclass(t) IS NULL THEN
+            CONTINUE;
+        END IF;
+        EXECUTE format(
+            'UPDATE %I x SET product_id = m.new_product_id
+               FROM fingerprint_migration m
+              WHERE x.product_id = m.old_product_id', t);
+        GET DIAGNOSTICS n = ROW_COUNT;
+        table_name := t;
+        column_name := 'product_id';
+        rows_updated := n;
+        RETURN NEXT;
+    END LOOP;
+
+    UPDATE fingerprint_migration SET applied_at = CURRENT_TIMESTAMP WHERE applied_at IS NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION apply_fingerprint_migration() IS 'Reescribe fingerprint y product_id v1 -> v2 según fingerprint_migration (una transacción)';
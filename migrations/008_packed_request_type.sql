@@ -0,0 +1,15 @@
+-- ============================================================================
+-- 📦 MIGRACIÓN: request_type 'packed' en processing_metrics
+-- Fecha: 2026-10-19
+-- Descripción: Los prompts empaquetados (K productos por chat completion)
+--              registran sus métricas como 'packed' para no mezclarse con
+--              'single'/'retry' en costos ni en el ajuste de umbrales del router
+-- ============================================================================
+
+-- Verificar que estamos en la BD correcta
+\c postgres;
+
+ALTER TABLE processing_metrics DROP CONSTRAINT IF EXISTS valid_request_type;
+ALTER TABLE processing_metrics
+    ADD CONSTRAINT valid_request_type
+    CHECK (request_type IN ('single', 'batch', 'fallback', 'retry', 'packed'));
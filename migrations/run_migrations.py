@@ -320,6 +320,65 @@ class MigrationRunner:
                     results['columns_added'] = len(columns_added)
                     logger.info(f"  ✓ {len(columns_added)} columnas agregadas a ai_metadata_cache")
                 
+                elif '004' in migration_name:
+                    # Verificar tablas del match store
+                    for table in ('match_clusters', 'match_cluster_members'):
+                        cursor.execute("""
+                            SELECT COUNT(*) FROM information_schema.tables 
+                            WHERE table_schema = 'public' AND table_name = %s
+                        """, (table,))
+                        if cursor.fetchone()[0] > 0:
+                            results['tables_created'] += 1
+                            logger.info(f"  ✓ Tabla {table} creada")
+                        else:
+                            results['issues'].append(f"Tabla {table} no encontrada")
+                
+                elif '005' in migration_name:
+                    # Verificar tabla de items y columnas del lifecycle
+                    cursor.execute("""
+                        SELECT COUNT(*) FROM information_schema.tables 
+                        WHERE table_schema = 'public' AND table_name = 'gpt5_batch_items'
+                    """)
+                    if cursor.fetchone()[0] > 0:
+                        results['tables_created'] += 1
+                        logger.info("  ✓ Tabla gpt5_batch_items creada")
+                    else:
+                        results['issues'].append("Tabla gpt5_batch_items no encontrada")
+                    
+                    cursor.execute("""
+                        SELECT column_name FROM information_schema.columns
+                        WHERE table_name = 'gpt5_batch_jobs'
+                        AND column_name IN ('stage', 'openai_batch_id', 'next_poll_at', 'locked_until')
+                    """)
+                    columns_added = cursor.fetchall()
+                    results['columns_added'] = len(columns_added)
+                    if len(columns_added) < 4:
+                        results['issues'].append("Columnas de lifecycle incompletas en gpt5_batch_jobs")
+                
+                elif '006' in migration_name:
+                    # Verificar columnas de lease/visibilidad de la cola
+                    cursor.execute("""
+                        SELECT column_name FROM information_schema.columns
+                        WHERE table_name = 'processing_queue'
+                        AND column_name IN ('locked_by', 'locked_until', 'visible_at', 'updated_at')
+                    """)
+                    columns_added = cursor.fetchall()
+                    results['columns_added'] = len(columns_added)
+                    if len(columns_added) < 4:
+                        results['issues'].append("Columnas de lease incompletas en processing_queue")
+                
+                elif '007' in migration_name:
+                    # Verificar tabla de mapeo de fingerprints
+                    cursor.execute("""
+                        SELECT COUNT(*) FROM information_schema.tables 
+                        WHERE table_schema = 'public' AND table_name = 'fingerprint_migration'
+                    """)
+                    if cursor.fetchone()[0] > 0:
+                        results['tables_created'] += 1
+                        logger.info("  ✓ Tabla fingerprint_migration creada")
+                    else:
+                        results['issues'].append("Tabla fingerprint_migration no encontrada")
+                
                 # Verificar índices
                 cursor.execute("""
                     SELECT COUNT(*) FROM pg_indexes 
@@ -364,7 +423,12 @@ class MigrationRunner:
             # Lista de migraciones en orden
             migrations = [
                 '001_gpt5_initial_schema.sql',
-                '002_update_existing_tables.sql'
+                '002_update_existing_tables.sql',
+                '004_match_store.sql',
+                '005_batch_lifecycle.sql',
+                '006_processing_queue_leases.sql',
+                '007_fingerprint_v2.sql',
+                '008_packed_request_type.sql'
             ]
             
             success_count = 0
@@ -23,6 +23,10 @@ from bs4 import BeautifulSoup
 import logging
 import os
 from threading import Event
+# Módulos compartidos con Scrappers/ (driver_pool, scrape_engine): una sola copia, allá
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Scrappers'))
+from driver_pool import DriverPool
+from scrape_engine import ConcurrentScraper, DomainLimiter, PageTask, group_products
 
 # Configurar encoding para Windows
 sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
@@ -60,6 +64,17 @@ BUSQUEDAS_CONTINUAS = {
     }
 }
 
+# === POOL DE DRIVERS Y CONCURRENCIA ===
+# Un Chrome compartido por todas las búsquedas del ciclo, reciclado cada N páginas
+MAX_PAGINAS_POR_DRIVER = 40
+PAGINAS_POR_BUSQUEDA = 20
+MAX_WORKERS = 2  # páginas en paralelo (= slots de Chrome del pool)
+CORTE_PAGINA_VACIA = 6  # desde esta página, una vacía corta el resto de la búsqueda
+# Cortesía con simple.ripley.cl: máx. páginas simultáneas y separación entre cargas
+LIMITER = DomainLimiter(max_concurrent=MAX_WORKERS, min_interval_s=1.0, jitter_s=1.0)
+# Productos renderizados: la página está lista cuando su conteo se estabiliza
+PRODUCT_SELECTOR = 'div[data-cy*="product"], div.catalog-product-item, a[href*="/p/"]'
+
 # Configuración de proxy (ESPECIAL RIPLEY)
 PROXY_HOST = "cl.decodo.com"
 PROXY_PORT = "30000"
@@ -461,113 +476,97 @@ def extract_products_continuo(soup, page_num, search_term):
     logging.info(f"✅ Búsqueda '{search_term}' P{page_num}: {len(products)} productos extraídos")
     return products
 
-def scrape_busqueda_continuo(search_key, search_info, ciclo_num):
-    """Scraping de una búsqueda Ripley en modo continuo"""
+def build_search_url(term, page_num):
+    """URL de búsqueda Ripley para una página"""
+    if page_num == 1:
+        url = f"https://simple.ripley.cl/tecno/celulares?source=search&term={term}&s=mdco&type=catalog"
+    else:
+        url = f"https://simple.ripley.cl/tecno/celulares?source=search&term={term}&page={page_num}&s=mdco&type=catalog"
+    return url
+
+def parse_page_continuo(html_content, task):
+    """Parseo de una página ya renderizada (corre en el worker que la cargó)"""
+    search_info = task.context['search_info']
+    soup = BeautifulSoup(html_content, 'lxml')
+    page_products = extract_products_continuo(soup, task.page_num, search_info['term'])
+    
+    # Agregar metadata
+    for product in page_products:
+        product['search_key'] = task.key
+        product['search_name'] = search_info['name']
+        product['ciclo_number'] = task.context['ciclo_num']
+    return page_products
+
+def guardar_busqueda_continuo(search_key, search_info, ciclo_num, all_products):
+    """Guarda los productos de una búsqueda del ciclo en JSON"""
+    if all_products:
+        current_datetime = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        filename = os.path.join(output_log_dir, f"busqueda_{search_key}_ciclo{ciclo_num:03d}_{current_datetime}.json")
+
+        json_data = {
+            "metadata": {
+                "scraped_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "search_term": search_info['term'],
+                "search_name": search_info['name'],
+                "search_key": search_key,
+                "base_url": f"https://simple.ripley.cl/tecno/celulares?source=search&term={search_info['term']}",
+                "total_products": len(all_products),
+                "pages_scraped": len(set(p['page_scraped'] for p in all_products)),
+                "ciclo_number": ciclo_num,
+                "scraper": "Ripley Scraper CONTINUO con BÚSQUEDAS 🔄"
+            },
+            "products": all_products
+        }
+
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump(json_data, f, indent=2, ensure_ascii=False)
+
+        logging.info(f"💾 CICLO {ciclo_num} - {search_info['name']}: {len(all_products)} productos → {filename}")
+
+def scrape_busquedas_concurrente(busquedas, ciclo_num, pool, workers=MAX_WORKERS):
+    """
+    Scraping concurrente Ripley: las páginas de todas las búsquedas dadas
+    ((search_key, search_info), ciclo_num consecutivo por búsqueda) se reparten
+    entre `workers` drivers del pool, con cortesía por dominio y espera por
+    productos renderizados. Devuelve {search_key: productos extraídos}
+    """
+    tasks = []
+    for offset, (search_key, search_info) in enumerate(busquedas):
+        context = {'search_info': search_info, 'ciclo_num': ciclo_num + offset}
+        for page_num in range(1, PAGINAS_POR_BUSQUEDA + 1):
+            tasks.append(PageTask(search_key, page_num, build_search_url(search_info['term'], page_num), context))
+    
+    engine = ConcurrentScraper(pool, parse_page_continuo, PRODUCT_SELECTOR, workers=workers, limiter=LIMITER,
+                               stop_event=stop_event, cut_empty_from=CORTE_PAGINA_VACIA)
+    start_time = time.time()
+    results = engine.run(tasks)
+    loaded = sum(1 for r in results if not r.skipped and not r.error)
+    logging.info(f"⚡ {loaded}/{len(tasks)} páginas en {time.time() - start_time:.2f}s ({workers} en paralelo)")
+    
+    grouped = group_products(results)
+    totales = {}
+    for offset, (search_key, search_info) in enumerate(busquedas):
+        all_products = grouped.get(search_key, [])
+        guardar_busqueda_continuo(search_key, search_info, ciclo_num + offset, all_products)
+        totales[search_key] = len(all_products)
+    return totales
+
+def scrape_busqueda_continuo(search_key, search_info, ciclo_num, pool=None):
+    """Scraping de una búsqueda Ripley en modo continuo: sus páginas en paralelo sobre el pool del ciclo si se entrega"""
     logging.info(f"🔄 CICLO {ciclo_num} - Iniciando búsqueda: {search_info['name']}")
     
-    driver = None
-    all_products = []
+    own_pool = pool is None
+    if own_pool:
+        pool = DriverPool(setup_driver_continuo, size=MAX_WORKERS, max_pages=MAX_PAGINAS_POR_DRIVER, name="ripley")
     
     try:
-        driver = setup_driver_continuo()
-        
-        # Scrapear 20 páginas
-        for page_num in range(1, 21):  # 20 páginas fijas
-            if stop_event.is_set():
-                logging.info("🛑 Deteniendo por señal de parada")
-                break
-            
-            # Construir URL de búsqueda Ripley
-            if page_num == 1:
-                url = f"https://simple.ripley.cl/tecno/celulares?source=search&term={search_info['term']}&s=mdco&type=catalog"
-            else:
-                url = f"https://simple.ripley.cl/tecno/celulares?source=search&term={search_info['term']}&page={page_num}&s=mdco&type=catalog"
-            
-            logging.info(f"📄 {search_info['name']} - Página {page_num}/20")
-            logging.info(f"🔗 URL: {url}")
-            
-            try:
-                driver.get(url)
-                
-                # Esperar carga con timeout específico Ripley
-                try:
-                    WebDriverWait(driver, 10).until(
-                        EC.presence_of_element_located((By.CSS_SELECTOR, 'div[data-cy*="product"], div.catalog-product-item, a[href*="/p/"]'))
-                    )
-                except TimeoutException:
-                    logging.warning(f"⚠️ Timeout esperando productos en página {page_num}")
-                
-                time.sleep(2)
-                
-                # Scroll progresivo ESPECIAL RIPLEY
-                driver.execute_script("window.scrollTo(0, document.body.scrollHeight/4);")
-                time.sleep(0.5)
-                driver.execute_script("window.scrollTo(0, document.body.scrollHeight/2);")
-                time.sleep(0.5)
-                driver.execute_script("window.scrollTo(0, document.body.scrollHeight*3/4);")
-                time.sleep(0.5)
-                driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                time.sleep(1)
-                
-                # Procesar
-                html_content = driver.page_source
-                soup = BeautifulSoup(html_content, 'lxml')
-                
-                page_products = extract_products_continuo(soup, page_num, search_info['term'])
-                
-                # Agregar metadata
-                for product in page_products:
-                    product['search_key'] = search_key
-                    product['search_name'] = search_info['name']
-                    product['ciclo_number'] = ciclo_num
-                
-                all_products.extend(page_products)
-                
-                if not page_products:
-                    logging.warning(f"⚠️ Sin productos en página {page_num}")
-                    if page_num > 5:
-                        break
-                
-                # Pausa corta entre páginas
-                time.sleep(random.uniform(0.5, 1.5))
-                
-            except Exception as e:
-                logging.error(f"❌ Error página {page_num}: {e}")
-                continue
-        
-        # Guardar resultados del ciclo
-        if all_products:
-            current_datetime = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-            filename = os.path.join(output_log_dir, f"busqueda_{search_key}_ciclo{ciclo_num:03d}_{current_datetime}.json")
-            
-            json_data = {
-                "metadata": {
-                    "scraped_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                    "search_term": search_info['term'],
-                    "search_name": search_info['name'],
-                    "search_key": search_key,
-                    "base_url": f"https://simple.ripley.cl/tecno/celulares?source=search&term={search_info['term']}",
-                    "total_products": len(all_products),
-                    "pages_scraped": len(set(p['page_scraped'] for p in all_products)),
-                    "ciclo_number": ciclo_num,
-                    "scraper": "Ripley Scraper CONTINUO con BÚSQUEDAS 🔄"
-                },
-                "products": all_products
-            }
-            
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(json_data, f, indent=2, ensure_ascii=False)
-            
-            logging.info(f"💾 CICLO {ciclo_num} - {search_info['name']}: {len(all_products)} productos → {filename}")
-            
-        return len(all_products)
-        
+        return scrape_busquedas_concurrente([(search_key, search_info)], ciclo_num, pool)[search_key]
     except Exception as e:
         logging.error(f"💥 Error crítico ciclo {ciclo_num}: {e}")
         return 0
     finally:
-        if driver:
-            driver.quit()
+        if own_pool:
+            pool.close()
 
 def ejecutar_scraping_continuo():
     """Ejecutor principal del scraping continuo Ripley con búsquedas"""
@@ -578,12 +577,15 @@ def ejecutar_scraping_continuo():
     logging.info("⏱️ Intervalo: SIN ESPERA entre búsquedas")
     logging.info("📄 Páginas por ejecución: 20")
     logging.info("🔄 Modo: Rotación continua entre búsquedas")
+    logging.info(f"⚡ Concurrencia: {MAX_WORKERS} páginas en paralelo, espera por productos renderizados")
     logging.info("🔐 Proxy y anti-detección: ACTIVADO")
     logging.info("="*70)
     
     ciclo_num = 1
     busqueda_keys = list(BUSQUEDAS_CONTINUAS.keys())
     busqueda_index = 0
+    # Pool compartido por las búsquedas del ciclo: Chrome arranca una vez por slot, no por búsqueda
+    pool = DriverPool(setup_driver_continuo, size=MAX_WORKERS, max_pages=MAX_PAGINAS_POR_DRIVER, name="ripley")
     
     try:
         while not stop_event.is_set():
@@ -594,7 +596,7 @@ def ejecutar_scraping_continuo():
             start_time = time.time()
             
             # Ejecutar scraping de la búsqueda
-            productos_extraidos = scrape_busqueda_continuo(search_key, search_info, ciclo_num)
+            productos_extraidos = scrape_busqueda_continuo(search_key, search_info, ciclo_num, pool)
             
             execution_time = time.time() - start_time
             
@@ -606,6 +608,11 @@ def ejecutar_scraping_continuo():
             busqueda_index = (busqueda_index + 1) % len(busqueda_keys)
             ciclo_num += 1
             
+            # Vuelta completa a las búsquedas: nuevo pool para la siguiente rotación
+            if busqueda_index == 0:
+                pool.close()
+                pool = DriverPool(setup_driver_continuo, size=MAX_WORKERS, max_pages=MAX_PAGINAS_POR_DRIVER, name="ripley")
+            
             # SIN ESPERA - Continuar inmediatamente con la siguiente búsqueda
             logging.info(f"➡️ Continuando inmediatamente con próxima búsqueda...")
             logging.info(f"🔄 Próxima búsqueda: {BUSQUEDAS_CONTINUAS[busqueda_keys[busqueda_index]]['name']} ('{BUSQUEDAS_CONTINUAS[busqueda_keys[busqueda_index]]['term']}')")
@@ -623,6 +630,7 @@ def ejecutar_scraping_continuo():
         logging.error(f"💥 Error crítico en bucle principal: {e}")
         stop_event.set()
     finally:
+        pool.close()
         logging.info("🏁 SCRAPING CONTINUO DETENIDO")
         logging.info(f"📊 Total ciclos ejecutados: {ciclo_num - 1}")
         logging.info(f"⏰ Finalización: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
@@ -0,0 +1,472 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧩 Esquema declarativo de atributos por categoría
+
+Una sola fuente (configs/attribute_schema.json) para la extracción de
+enrich.extract_attributes, las reglas de StrictValidator y la tabla
+attributes_schema. El JSON se compila una vez por proceso: regex
+precompiladas, conjuntos de enums y un plan de extracción por categoría que
+recorre el nombre en una sola pasada por palabras. Agregar una categoría o un
+atributo es editar el JSON.
+
+Atributo:
+    {"name": "capacity", "type": "string", "required": true, "description": "...",
+     "extract": {...}, "validate": {...}}
+
+extract (el resultado se guarda en "output" si viene, si no en "name"):
+    {"size": ["GB", "TB"], "nth": 0}       -> "256 GB" (n-ésima medida, unidades en orden)
+    {"measure": ["ml"], "digits": [1, 4],
+     "decimals": 0, "cast": "int"}         -> 100 (primer número+unidad del texto)
+    {"keywords": [...], "upper": true}     -> primera de la lista contenida en el nombre
+    {"keywords": {"mujer": "Mujer"}}       -> valor de la primera contenida
+    {"words": ["EDP", "EDT"]}              -> primera palabra completa (\\b) del texto
+    {"regex": "...", "cast": "float"}      -> grupo 1 como float/int/upper (fuera de la pasada única)
+
+validate:
+    {"pattern": "...", "upper": true}
+    {"range": [lo, hi], "cast": "int", "allow_empty": true}
+    {"enum": [...]}
+"""
+
+import json
+import logging
+import os
+import re
+from operator import itemgetter
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "configs", "attribute_schema.json")
+
+# Tipo del esquema -> attribute_type de la tabla attributes_schema
+_DB_TYPES = {"float": "number", "integer": "number", "boolean": "boolean"}
+
+_CASTS = {"float": float, "int": int}
+
+
+class SchemaError(ValueError):
+    """Esquema de atributos mal formado (se detecta al compilar)"""
+
+
+# ============================================================================
+# 🧪 REGLAS DE VALIDACIÓN (escalares y por columna)
+# ============================================================================
+
+class PatternRule:
+    """re.match sobre str(x) (opcionalmente en mayúsculas)"""
+
+    __slots__ = ("regex", "upper")
+
+    def __init__(self, pattern: str, upper: bool = False):
+        self.regex = re.compile(pattern)
+        self.upper = upper
+
+    def __call__(self, x) -> bool:
+        text = str(x)
+        return bool(self.regex.match(text.upper() if self.upper else text))
+
+    def check_many(self, values: Sequence[Any]) -> List[Tuple[Optional[bool], Optional[str]]]:
+        match = self.regex.match
+        if self.upper:
+            return [(match(str(v).upper()) is not None, None) for v in values]
+        return [(match(str(v)) is not None, None) for v in values]
+
+
+class RangeRule:
+    """lo <= cast(x) <= hi; con allow_empty los valores vacíos pasan"""
+
+    __slots__ = ("lo", "hi", "cast", "allow_empty")
+
+    def __init__(self, lo: float, hi: float, cast=float, allow_empty: bool = False):
+        self.lo = lo
+        self.hi = hi
+        self.cast = cast
+        self.allow_empty = allow_empty
+
+    def __call__(self, x) -> bool:
+        if self.allow_empty and not x:
+            return True
+        return self.lo <= self.cast(x) <= self.hi
+
+    def check_many(self, values: Sequence[Any]) -> List[Tuple[Optional[bool], Optional[str]]]:
+        """Conversión por valor (mismos errores que el escalar) y rango vectorizado con NumPy"""
+        out: List[Tuple[Optional[bool], Optional[str]]] = [(True, None)] * len(values)
+        nums, pos = [], []
+        for i, v in enumerate(values):
+            if self.allow_empty and not v:
+                continue
+            try:
+                nums.append(self.cast(v))
+                pos.append(i)
+            except Exception as e:
+                out[i] = (None, str(e))
+        if nums:
+            try:
+                arr = np.asarray(nums, dtype=np.float64)
+                in_range = ((arr >= self.lo) & (arr <= self.hi)).tolist()
+            except (OverflowError, TypeError, ValueError):  # p.ej. enteros enormes
+                in_range = [self.lo <= n <= self.hi for n in nums]
+            for i, ok in zip(pos, in_range):
+                out[i] = (ok, None)
+        return out
+
+
+class EnumRule:
+    """x in valores permitidos"""
+
+    __slots__ = ("values", "_set")
+
+    def __init__(self, *values):
+        self.values = values
+        self._set = frozenset(values)
+
+    def __call__(self, x) -> bool:
+        return x in self.values
+
+    def check_many(self, values: Sequence[Any]) -> List[Tuple[Optional[bool], Optional[str]]]:
+        allowed = self._set
+        return [(v in allowed, None) for v in values]
+
+
+def compile_rule(spec: Dict[str, Any]) -> Callable[[Any], bool]:
+    """Regla de validación desde su spec declarativa"""
+    if "pattern" in spec:
+        return PatternRule(spec["pattern"], upper=spec.get("upper", False))
+    if "range" in spec:
+        lo, hi = spec["range"]
+        return RangeRule(lo, hi, cast=_CASTS[spec.get("cast", "float")], allow_empty=spec.get("allow_empty", False))
+    if "enum" in spec:
+        return EnumRule(*spec["enum"])
+    raise SchemaError(f"Regla de validación desconocida: {spec}")
+
+
+# ============================================================================
+# 🔎 EXTRACCIÓN EN UNA PASADA (tokens por palabra)
+# ============================================================================
+#
+# El nombre se pasa a minúsculas una vez y se parte en palabras (str.split, en C).
+# Cada palabra distinta se analiza una sola vez por categoría y queda memoizada
+# como eventos (slot, rango, valor): medidas ("128gb", '15.6"', "100ml"),
+# keywords contenidas y palabras exactas (EDP). Por nombre sólo se recorren las
+# palabras y se combinan sus eventos, con el mismo resultado que buscar cada
+# regla por separado sobre el texto completo:
+#   - una keyword sin espacios está en el texto sii está dentro de alguna palabra
+#   - "\s*" entre número y unidad = la palabra anterior termina en número ("128 GB")
+#   - \b en los bordes de una palabra coincide con el borde real (espacio)
+# Rango None = gana la primera aparición; entero = gana el menor (prioridad de
+# la keyword, GB antes que TB).
+
+_TAIL_RX = re.compile(r"[\d.]*\Z")
+_PREV = object()                    # evento: el número está al final de la palabra anterior
+_MISSING = object()
+_MEMO_LIMIT = 50_000                # palabras distintas memoizadas por categoría
+_first = itemgetter(0)
+
+
+def _number_parser(pattern: str, convert: Callable[[str], Any]) -> Callable[[str], Any]:
+    """Sufijo más largo de la corrida [\\d.] que calza con `pattern` (= inicio más a la izquierda)"""
+    search = re.compile(rf"(?:{pattern})\Z").search
+
+    def parse(run: str):
+        m = search(run)
+        if m is None:
+            return None
+        try:
+            return convert(m.group())
+        except ValueError:
+            return None
+    return parse
+
+
+def _regex_extractor(pattern: str, cast: Optional[str] = None) -> Callable[[str], Any]:
+    """Regla libre sobre el texto completo (queda fuera de la pasada única)"""
+    search = re.compile(pattern, re.I).search
+    if cast is not None and cast != "upper" and cast not in _CASTS:
+        raise SchemaError(f"cast desconocido: {cast}")
+    convert = _CASTS.get(cast)
+
+    def extract(text: str):
+        m = search(text)
+        if m is None:
+            return None
+        if convert is not None:
+            try:
+                return convert(m.group(1))
+            except ValueError:
+                return None
+        return m.group(1).upper() if cast == "upper" else m.group(1)
+    return extract
+
+
+class CompiledCategory:
+    """Plan compilado de una categoría: tokens de extracción + reglas de validación"""
+
+    def __init__(self, category: str, attributes: List[Dict[str, Any]]):
+        self.category = category
+        self.attributes = attributes
+        self.required = [a["name"] for a in attributes if a.get("required")]
+        self.optional = [a["name"] for a in attributes if not a.get("required")]
+        self.types = {a["name"]: a["type"] for a in attributes if a.get("type")}
+        self.validators = {a["name"]: compile_rule(a["validate"]) for a in attributes if a.get("validate")}
+
+        # slot = posición del extractor; define el orden de las claves del resultado
+        self._outputs: List[Tuple[int, str]] = []
+        self._measures: List[Tuple[int, Optional[int], str]] = []
+        self._parsers: Dict[Tuple[int, Optional[int]], Callable[[str], Any]] = {}
+        self._keywords: List[Tuple[int, List[Tuple[Optional[int], str, Any]]]] = []
+        self._phrases: List[Tuple[int, int, str, Any]] = []     # keywords con espacios: `in` sobre el nombre
+        self._words: List[Tuple[int, Any, Any, Dict[str, Any]]] = []
+        self._regexes: List[Tuple[int, Callable[[str], Any]]] = []
+        self._nth: Dict[int, int] = {}
+        for attr in attributes:
+            spec = attr.get("extract")
+            if spec:
+                slot = len(self._outputs)
+                self._outputs.append((slot, spec.get("output", attr["name"])))
+                self._compile_extractor(slot, spec)
+
+        # Prefiltro de keywords para palabras nuevas (una regex en vez de un find por keyword)
+        literals = [keyword for _, pairs in self._keywords for _, keyword, _ in pairs]
+        self._keyword_rx = re.compile("|".join(map(re.escape, literals))) if literals else None
+
+        self._memo: Dict[str, Tuple] = {}                            # palabra -> eventos
+        self._tails: Dict[str, str] = {}                             # palabra -> corrida [\d.] final
+        self._runs: Dict[Tuple[str, int, Optional[int]], Any] = {}   # (corrida, slot, rango) -> valor
+
+    def _compile_extractor(self, slot: int, spec: Dict[str, Any]) -> None:
+        if "size" in spec:
+            # "256 GB": unidades en orden de preferencia (todas las GB antes que las TB)
+            units = spec["size"]
+            if spec.get("nth", 0):
+                self._nth[slot] = spec["nth"]
+            for rank, unit in enumerate(units):
+                rank = rank if len(units) > 1 or slot in self._nth else None
+                self._measures.append((slot, rank, unit.lower()))
+                self._parsers[(slot, rank)] = _number_parser(r"\d+", f"{{}} {unit}".format)
+        elif "measure" in spec:
+            # número con dígitos/decimales acotados + cualquiera de las unidades (gana el primero del texto)
+            lo, hi = spec.get("digits", [1, None])
+            number = rf"\d{{{lo},{'' if hi is None else hi}}}"
+            if spec.get("decimals"):
+                number += rf"(?:\.\d{{1,{spec['decimals']}}})?"
+            convert = _CASTS.get(spec.get("cast", "float"))
+            if convert is None:
+                raise SchemaError(f"cast desconocido: {spec.get('cast')}")
+            self._measures.extend((slot, None, unit.lower()) for unit in spec["measure"])
+            self._parsers[(slot, None)] = _number_parser(number, convert)
+        elif "keywords" in spec:
+            keywords = spec["keywords"]
+            if isinstance(keywords, dict):
+                pairs = [(k.lower(), v) for k, v in keywords.items()]
+            else:
+                upper = spec.get("upper", False)
+                pairs = [(k.lower(), k.upper() if upper else k) for k in keywords]
+            single = []
+            for rank, (keyword, value) in enumerate(pairs):
+                if any(c.isspace() for c in keyword):
+                    self._phrases.append((slot, rank, keyword, value))
+                else:
+                    single.append((rank if len(pairs) > 1 else None, keyword, value))
+            self._keywords.append((slot, single))
+        elif "words" in spec:
+            words = spec["words"]
+            values = {k.lower(): v for k, v in (words.items() if isinstance(words, dict) else zip(words, words))}
+            if any(c.isspace() for word in values for c in word):
+                raise SchemaError(f"words no admite espacios (usar regex): {spec}")
+            pattern = r"\b(?:%s)\b" % "|".join(map(re.escape, values))
+            self._words.append((slot, re.compile(pattern), re.compile(pattern, re.I), values))
+        elif "regex" in spec:
+            self._regexes.append((slot, _regex_extractor(spec["regex"], spec.get("cast"))))
+        else:
+            raise SchemaError(f"Extractor desconocido: {spec}")
+
+    def _analyze(self, word: str) -> Tuple:
+        """Eventos (slot, rango, valor) de una palabra en orden de aparición (memoizados)"""
+        found = []
+        for slot, rank, unit in self._measures:
+            i = word.find(unit)
+            while i != -1:
+                if i == 0:
+                    found.append((0, slot, rank, _PREV))
+                else:
+                    run = _TAIL_RX.search(word, 0, i).group()
+                    value = self._parsers[(slot, rank)](run) if run else None
+                    if value is not None:
+                        found.append((i, slot, rank, value))
+                i = word.find(unit, i + len(unit))
+        if self._keyword_rx is not None and self._keyword_rx.search(word):
+            for slot, pairs in self._keywords:
+                for rank, keyword, value in pairs:
+                    i = word.find(keyword)
+                    if i != -1:
+                        found.append((i, slot, rank, value))
+                        break
+        for slot, rx, _, values in self._words:
+            m = rx.search(word)
+            if m:
+                found.append((m.start(), slot, None, values[m.group()]))
+        found.sort(key=_first)
+        events = tuple(f[1:] for f in found)
+
+        if len(self._memo) >= _MEMO_LIMIT:
+            self._memo.clear()
+            self._tails.clear()
+            self._runs.clear()
+        self._memo[word] = events
+        if self._measures:
+            run = _TAIL_RX.search(word).group()
+            if run:
+                self._tails[word] = run
+        return events
+
+    def _tail_value(self, word: Optional[str], slot: int, rank: Optional[int]):
+        """Valor del número con que termina `word` para la medida (slot, rango)"""
+        run = self._tails.get(word)
+        if run is None:
+            return None
+        key = (run, slot, rank)
+        value = self._runs.get(key, _MISSING)
+        if value is _MISSING:
+            value = self._runs[key] = self._parsers[(slot, rank)](run)
+        return value
+
+    def extract(self, name: str) -> Dict[str, Any]:
+        """Atributos del nombre de producto, en el orden del esquema (una pasada por las palabras)"""
+        attrs: Dict[str, Any] = {}
+        if not self._outputs:
+            return attrs
+        low = name.lower()
+        memo = self._memo
+        nth = self._nth
+        best: Dict[int, Any] = {}
+        ranks: Dict[int, int] = {}
+        ranked: Dict[int, List[Tuple[int, Any]]] = {}
+        prev = None
+
+        for word in low.split():
+            events = memo.get(word)
+            if events is None:
+                events = self._analyze(word)
+            elif not events:
+                prev = word
+                continue
+            for slot, rank, value in events:
+                if value is _PREV:
+                    value = self._tail_value(prev, slot, rank)
+                    if value is None:
+                        continue
+                if rank is None:
+                    if slot not in best:
+                        best[slot] = value
+                elif slot in nth:
+                    ranked.setdefault(slot, []).append((rank, value))
+                elif slot not in ranks or rank < ranks[slot]:
+                    ranks[slot] = rank
+                    best[slot] = value
+            prev = word
+
+        if self._phrases:
+            for slot, rank, phrase, value in self._phrases:
+                if phrase in low and (slot not in ranks or rank < ranks[slot]):
+                    ranks[slot] = rank
+                    best[slot] = value
+        if self._words and len(low) != len(name):
+            # "İ".lower() agrega un carácter que no es \w: los bordes \b se evalúan sobre el original
+            for slot, _, rx, values in self._words:
+                m = rx.search(name)
+                best.pop(slot, None)
+                if m:
+                    best[slot] = values.get(m.group().lower(), m.group())
+        if self._regexes:
+            for slot, extract in self._regexes:
+                value = extract(name)
+                if value is not None:
+                    best[slot] = value
+        if ranked:
+            for slot, hits in ranked.items():
+                if len(hits) > nth[slot]:
+                    hits.sort(key=_first)
+                    best[slot] = hits[nth[slot]][1]
+
+        for slot, key in self._outputs:
+            if slot in best:
+                attrs[key] = best[slot]
+        return attrs
+
+    def validator_schema(self) -> Dict[str, Any]:
+        """Forma que usa StrictValidator: required / optional / types / validators"""
+        return {
+            "required": list(self.required),
+            "optional": list(self.optional),
+            "types": dict(self.types),
+            "validators": dict(self.validators),
+        }
+
+
+class AttributeSchema:
+    """Esquema completo compilado (categorías + esquema por defecto)"""
+
+    def __init__(self, spec: Dict[str, Any]):
+        try:
+            self.version = spec.get("version", "1.0")
+            self.default = CompiledCategory("default", spec.get("default", {}).get("attributes", []))
+            self.categories = {
+                category: CompiledCategory(category, body.get("attributes", []))
+                for category, body in spec.get("categories", {}).items()
+            }
+        except SchemaError:
+            raise
+        except (KeyError, TypeError, ValueError, re.error) as e:
+            raise SchemaError(f"Esquema de atributos inválido: {e}") from e
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_SCHEMA_PATH) -> "AttributeSchema":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def category(self, category: str) -> CompiledCategory:
+        return self.categories.get(category, self.default)
+
+    def extract(self, name: str, category: str) -> Dict[str, Any]:
+        plan = self.categories.get(category)
+        return plan.extract(name) if plan is not None else {}
+
+    def validator_schemas(self) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Any]]:
+        """(esquemas por categoría, esquema por defecto) para StrictValidator"""
+        return ({category: plan.validator_schema() for category, plan in self.categories.items()},
+                self.default.validator_schema())
+
+    def db_rows(self) -> List[Tuple[str, str, str, bool, str, int, str]]:
+        """Filas para attributes_schema: (categoría, atributo, tipo, requerido, descripción, orden, reglas JSON)"""
+        rows = []
+        for category, plan in self.categories.items():
+            for order, attr in enumerate(plan.attributes):
+                attr_type = attr.get("type", "string")
+                rows.append((
+                    category, attr["name"], _DB_TYPES.get(attr_type, "string"), bool(attr.get("required")),
+                    attr.get("description", ""), order, json.dumps(attr.get("validate", {}), ensure_ascii=False)
+                ))
+        return rows
+
+
+_schemas: Dict[str, AttributeSchema] = {}
+_default: Optional[AttributeSchema] = None
+
+
+def get_attribute_schema(path: Optional[str] = None) -> AttributeSchema:
+    """Esquema compilado (uno por ruta y proceso)"""
+    global _default
+    if path is None:
+        if _default is None:
+            _default = get_attribute_schema(DEFAULT_SCHEMA_PATH)
+        return _default
+    path = os.path.abspath(path)
+    schema = _schemas.get(path)
+    if schema is None:
+        schema = _schemas[path] = AttributeSchema.load(path)
+        logger.debug(f"Esquema de atributos compilado: {path} ({len(schema.categories)} categorías)")
+    return schema
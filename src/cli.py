@@ -1,32 +1,46 @@
 from __future__ import annotations
-import argparse, json, os, time
+import argparse, csv, json, os, time
 from typing import Dict, Any, List
 from .ingest import load_items
 from .categorize import load_taxonomy, categorize
 from .normalize import normalize_one
+from .fingerprint import migration_rows
 from .persistence import write_jsonl
 from .cache import JsonCache
 from .metrics import Metrics
 from .match import load_normalized, do_match
+from .telemetry import serve_from_env
+from .stage_profiler import add_profile_arguments, enable_from_args, write_profile, get_profiler, stage
 
 def cmd_normalize(args):
     metrics = Metrics()
+    profiling = enable_from_args(args)
+    profiler = get_profiler()
     taxonomy = load_taxonomy(args.taxonomy)
     cache = JsonCache(args.cache, ttl_days=args.ttl_days) if args.cache else None
 
     out_rows = []
+    metrics.start("normalize")
     for rec in load_items(args.input):
         raw = rec["item"]
         meta = rec["metadata"]
         retailer = rec["retailer"]
         name = raw.get("name") or raw.get("title") or ""
-        cat_id, conf, sugg = categorize(name, meta, taxonomy)
-        row = normalize_one(raw, meta, retailer, cat_id)
+        with profiler.sample():
+            with stage("categorize"):
+                cat_id, conf, sugg = categorize(name, meta, taxonomy)
+            with stage("normalize_one"):
+                row = normalize_one(raw, meta, retailer, cat_id)
         out_rows.append(row)
         metrics.inc("normalized")
+    metrics.end("normalize", inc=len(out_rows))
 
+    metrics.start("write")
     n = write_jsonl(out_rows, os.path.join(args.out, "normalized_products.jsonl"))
+    metrics.end("write", inc=n)
     metrics.dump(args.out)
+    if profiling:
+        write_profile(args.out)
     print(f"[OK] Normalized {n} items -> {os.path.join(args.out,'normalized_products.jsonl')}")
 
 def cmd_profile(args):
@@ -40,10 +54,45 @@ def cmd_profile(args):
 
 def cmd_match(args):
     rows = load_normalized(args.normalized)
-    pairs = do_match(rows, threshold=args.sim, max_cands=args.max_cands)
+    stats: Dict[str, Any] = {}
+    pairs = do_match(rows, threshold=args.sim, max_cands=args.max_cands, window=args.window, stats=stats)
     outp = os.path.join(args.out, "matches.jsonl")
     write_jsonl(pairs, outp)
+    with open(os.path.join(args.out, "match_blocking.json"), "w", encoding="utf-8") as fh:
+        json.dump(stats, fh, ensure_ascii=False, indent=2)
     print(f"[OK] Matches: {len(pairs)} -> {outp}")
+    print(f"[OK] Comparaciones: {stats['comparisons']} (baseline {stats['baseline_comparisons']}, "
+          f"reducción {stats['reduction_x']}x)")
+    if args.persist:
+        from .match_store import get_match_store
+        res = get_match_store().upsert_matches(pairs)
+        print(f"[OK] Match store: {res['clusters']} clusters, {res['members']} ofertas")
+
+def cmd_fingerprint_map(args):
+    # mapeo v1 -> v2 (fingerprint y product_id) por el mismo camino que llena productos_maestros:
+    # normalize_integrated (categorize_enhanced + aliases de marca), sin IA ni escritura en BD
+    from .categorize import get_brand_aliases
+    from .fingerprint import FingerprintKey
+    from .normalize_integrated import integrated_base, product_id_parts
+    taxonomy = load_taxonomy(args.taxonomy)
+    brand_aliases = get_brand_aliases()
+    ai_cache = JsonCache(args.ai_cache, ttl_days=0) if args.ai_cache else None
+    bases, id_parts = [], []
+    for rec in load_items(args.input):
+        base = integrated_base(rec["item"], rec["metadata"], taxonomy, brand_aliases)
+        # marca/modelo refinados por IA se leen del cache (llave = fingerprint v1)
+        ai_data = ai_cache.get(FingerprintKey(base["base_product"], "v1").fingerprint) if ai_cache else None
+        bases.append(base["base_product"])
+        id_parts.append(product_id_parts(base, rec["retailer"], ai_data))
+    rows = migration_rows(bases, id_parts)
+    os.makedirs(args.out, exist_ok=True)
+    outp = os.path.join(args.out, "fingerprint_migration.csv")
+    with open(outp, "w", encoding="utf-8", newline="") as fh:
+        writer = csv.DictWriter(fh, fieldnames=["old_fingerprint", "new_fingerprint",
+                                                "old_product_id", "new_product_id"])
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"[OK] Mapeo fingerprint v1 -> v2: {len(rows)} ids ({len(bases)} productos) -> {outp}")
 
 def main():
     ap = argparse.ArgumentParser(prog="retail-normalizer")
@@ -55,6 +104,7 @@ def main():
     ap_norm.add_argument("--taxonomy", default="configs/taxonomy_v1.json")
     ap_norm.add_argument("--cache", default="out/cache.json")
     ap_norm.add_argument("--ttl-days", dest="ttl_days", type=int, default=7)
+    add_profile_arguments(ap_norm)
     ap_norm.set_defaults(func=cmd_normalize)
 
     ap_prof = sub.add_parser("profile", help="Perfil de campos crudos")
@@ -67,9 +117,20 @@ def main():
     ap_match.add_argument("--out", required=True)
     ap_match.add_argument("--sim", type=float, default=0.86)
     ap_match.add_argument("--max-cands", type=int, default=50)
+    ap_match.add_argument("--window", type=int, default=5, help="Ventana sorted-neighbourhood")
+    ap_match.add_argument("--persist", action="store_true", help="Guardar clusters en el match store (BD)")
     ap_match.set_defaults(func=cmd_match)
 
+    ap_fmap = sub.add_parser("fingerprint-map", help="Mapeo de fingerprints v1 (SHA-1) a v2")
+    ap_fmap.add_argument("--input", required=True, help="Directorio con .json crudos")
+    ap_fmap.add_argument("--out", required=True, help="Directorio de salida")
+    ap_fmap.add_argument("--taxonomy", default="configs/taxonomy_v1.json")
+    ap_fmap.add_argument("--ai-cache", dest="ai_cache", default=None,
+                         help="Cache IA en archivo (out/ai_metadata_cache.json) para marca/modelo refinados")
+    ap_fmap.set_defaults(func=cmd_fingerprint_map)
+
     args = ap.parse_args()
+    serve_from_env()
     args.func(args)
 
 if __name__ == "__main__":
@@ -19,6 +19,7 @@ try:
     from .metrics import Metrics
     from .match import load_normalized, do_match
     from .db_persistence import get_persistence_instance
+    from .stage_profiler import add_profile_arguments, enable_from_args, write_profile
 except ImportError:
     from ingest import load_items
     from categorize_db import load_taxonomy
@@ -27,6 +28,7 @@ except ImportError:
     from metrics import Metrics
     from match import load_normalized, do_match
     from db_persistence import get_persistence_instance
+    from stage_profiler import add_profile_arguments, enable_from_args, write_profile
 
 def cmd_normalize_integrated(args):
     """Normalización integrada con BD completa"""
@@ -37,17 +39,22 @@ def cmd_normalize_integrated(args):
     print(f"Base de datos: ACTIVA")
     
     metrics = Metrics()
+    profiling = enable_from_args(args)
     start_time = time.time()
     
     # Cargar taxonomía (automáticamente desde BD)
+    metrics.start("taxonomy")
     taxonomy = load_taxonomy(args.taxonomy)
+    metrics.end("taxonomy")
     print(f"Taxonomía cargada desde: {taxonomy.get('source', 'unknown')}")
     
     # Cargar items crudos
+    metrics.start("load")
     items = []
     for rec in load_items(args.input):
         items.append(rec)
         metrics.inc("loaded")
+    metrics.end("load", inc=len(items))
     
     print(f"Productos cargados: {len(items)}")
     
@@ -57,11 +64,17 @@ def cmd_normalize_integrated(args):
     
     # Normalizar en lote usando BD
     print(f"\\nIniciando normalizacion con BD...")
+    metrics.start("normalize")
     out_rows = normalize_batch_integrated(items)
+    metrics.end("normalize", inc=len(out_rows))
     
     # Guardar JSONL para compatibilidad
+    metrics.start("write")
     n = write_jsonl(out_rows, os.path.join(args.out, "normalized_products.jsonl"))
+    metrics.end("write", inc=n)
     metrics.dump(args.out)
+    if profiling:
+        write_profile(args.out)
     
     # Estadísticas de BD
     try:
@@ -200,6 +213,7 @@ def main():
     ap_norm.add_argument("--input", required=True, help="Directorio con .json crudos")
     ap_norm.add_argument("--out", required=True, help="Directorio de salida")
     ap_norm.add_argument("--taxonomy", default="../configs/taxonomy_v1.json")
+    add_profile_arguments(ap_norm)
     ap_norm.set_defaults(func=cmd_normalize_integrated)
 
     # Comando estadísticas BD
@@ -216,6 +230,7 @@ def main():
     ap_match.add_argument("--out", required=True)
     ap_match.add_argument("--sim", type=float, default=0.86)
     ap_match.add_argument("--max-cands", type=int, default=50)
+    ap_match.add_argument("--window", type=int, default=5, help="Ventana sorted-neighbourhood")
     ap_match.set_defaults(func=cmd_match_original)
 
     args = ap.parse_args()
@@ -227,10 +242,12 @@ def cmd_match_original(args):
     from persistence import write_jsonl
     
     rows = load_normalized(args.normalized)
-    pairs = do_match(rows, threshold=args.sim, max_cands=args.max_cands)
+    stats = {}
+    pairs = do_match(rows, threshold=args.sim, max_cands=args.max_cands, window=args.window, stats=stats)
     outp = os.path.join(args.out, "matches.jsonl")
     write_jsonl(pairs, outp)
     print(f"[OK] Matches: {len(pairs)} -> {outp}")
+    print(f"[OK] Comparaciones: {stats['comparisons']} (baseline {stats['baseline_comparisons']})")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
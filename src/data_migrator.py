@@ -2,13 +2,14 @@
 # -*- coding: utf-8 -*-
 """
 🔄 Migrador de Datos Maestros
-Migra taxonomy_v1.json y brand_aliases.json a la base de datos PostgreSQL
+Migra taxonomy_v1.json, brand_aliases.json y attribute_schema.json a la base de datos PostgreSQL
 """
 
 import json
 import sys
 import os
 from simple_db_connector import SimplePostgreSQLConnector
+from attribute_schema import AttributeSchema, get_attribute_schema
 
 def migrate_taxonomy_to_db(connector: SimplePostgreSQLConnector, taxonomy_file: str):
     """Migrar taxonomy_v1.json a tabla categories"""
@@ -95,63 +96,32 @@ def migrate_brands_to_db(connector: SimplePostgreSQLConnector, brands_file: str)
     print(f"OK: {migrated} marcas migradas a la base de datos")
     return migrated
 
-def create_attribute_schemas(connector: SimplePostgreSQLConnector):
-    """Crear esquemas de atributos predefinidos por categoría"""
+def create_attribute_schemas(connector: SimplePostgreSQLConnector, schema_file: str = None):
+    """Crear esquemas de atributos por categoría desde configs/attribute_schema.json"""
     
     print(">> Creando esquemas de atributos por categoría...")
     
-    # Definir esquemas de atributos por categoría
-    schemas = {
-        "smartphones": [
-            ("capacity", "string", False, "capacity en GB o TB"),
-            ("color", "string", False, "color del dispositivo"),
-            ("network", "string", False, "5G, 4G, etc"),
-            ("screen_size", "number", False, "tamaño pantalla en pulgadas"),
-            ("ram", "string", False, "memoria RAM"),
-            ("storage", "string", False, "almacenamiento interno")
-        ],
-        "perfumes": [
-            ("volume_ml", "number", True, "volumen en mililitros"),
-            ("concentration", "string", False, "EDP, EDT, PARFUM"),
-            ("gender", "string", False, "Mujer, Hombre, Unisex"),
-            ("capacity", "string", False, "capacidad formateada con unidad")
-        ],
-        "notebooks": [
-            ("screen_size", "number", False, "tamaño pantalla en pulgadas"),
-            ("ram", "string", False, "memoria RAM"),
-            ("storage", "string", False, "almacenamiento SSD/HDD"),
-            ("processor", "string", False, "procesador")
-        ],
-        "smart_tv": [
-            ("screen_size", "number", True, "tamaño pantalla en pulgadas"),
-            ("resolution", "string", False, "4K, UHD, FHD"),
-            ("panel", "string", False, "OLED, QLED, LED"),
-            ("smart_features", "boolean", False, "funciones inteligentes")
-        ],
-        "printers": [
-            ("print_type", "string", False, "inkjet, laser, multifuncional"),
-            ("color_support", "boolean", False, "soporte para color"),
-            ("wireless", "boolean", False, "conectividad inalámbrica")
-        ]
-    }
+    # Mismo esquema que usan enrich.extract_attributes y StrictValidator
+    schema = AttributeSchema.load(schema_file) if schema_file else get_attribute_schema()
     
     created = 0
     
     with connector.get_connection() as conn:
         with conn.cursor() as cursor:
-            for category_id, attributes in schemas.items():
-                for attr_name, attr_type, required, description in attributes:
-                    cursor.execute("""
-                        INSERT INTO attributes_schema (
-                            category_id, attribute_name, attribute_type, 
-                            required, default_value, display_order
-                        ) VALUES (%s, %s, %s, %s, %s, %s)
-                        ON CONFLICT (category_id, attribute_name) DO UPDATE SET
-                            attribute_type = EXCLUDED.attribute_type,
-                            required = EXCLUDED.required
-                    """, (category_id, attr_name, attr_type, required, description, created % 10))
-                    
-                    created += 1
+            for category_id, attr_name, attr_type, required, description, order, rules in schema.db_rows():
+                cursor.execute("""
+                    INSERT INTO attributes_schema (
+                        category_id, attribute_name, attribute_type, 
+                        required, default_value, validation_rules, display_order
+                    ) VALUES (%s, %s, %s, %s, %s, %s, %s)
+                    ON CONFLICT (category_id, attribute_name) DO UPDATE SET
+                        attribute_type = EXCLUDED.attribute_type,
+                        required = EXCLUDED.required,
+                        validation_rules = EXCLUDED.validation_rules,
+                        display_order = EXCLUDED.display_order
+                """, (category_id, attr_name, attr_type, required, description, rules, order))
+                
+                created += 1
             
             conn.commit()
     
@@ -216,7 +186,8 @@ def main():
         migrate_brands_to_db(connector, brands_file)
         
         # Crear esquemas de atributos
-        create_attribute_schemas(connector)
+        schema_file = os.path.join(os.path.dirname(os.path.dirname(__file__)), "configs", "attribute_schema.json")
+        create_attribute_schemas(connector, schema_file)
         
         # Verificar migración
         verify_migration(connector)
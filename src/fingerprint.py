@@ -1,14 +1,195 @@
+"""
+🔑 Fingerprint y product_id desde un único buffer canónico
+==========================================================
+El buffer canónico de un producto es
+``brand|category|model|capacity|volume_ml|screen_size_in`` en UTF-8 (los
+mismos campos de siempre). De él salen:
+
+- ``fingerprint``: clave inter-retail (cache IA, productos_maestros, match store)
+- ``product_id``: el fingerprint más las partes propias del listing que
+  aporta cada normalizador (retailer, marca/modelo enriquecidos, precio...)
+
+Versiones de ids (FINGERPRINT_VERSION, por defecto ``v1``):
+
+- ``v1``: SHA-1 en hex (40 caracteres), los ids históricos. fingerprint y
+  product_id se hashean por separado, exactamente como antes.
+- ``v2``: BLAKE2b de 128 bits con prefijo ``v2:`` (35 caracteres). product_id
+  continúa el estado de hash del fingerprint, así el buffer canónico se
+  recorre una sola vez para ambos ids.
+
+``id_version()`` distingue ambas versiones, así un id v1 guardado sigue
+resolviendo mientras se migra. ``migration_rows()`` entrega el mapeo
+fingerprint y product_id v1 -> v2 (ver migrations/007_fingerprint_v2.sql).
+"""
 from __future__ import annotations
 import hashlib
-from typing import Dict, Any
-
-def product_fingerprint(prod: Dict[str, Any]) -> str:
-    base = "|".join([
-        prod.get("brand",""),
-        prod.get("category",""),
-        (prod.get("model") or prod.get("name","")),
-        str(prod.get("attributes",{}).get("capacity","")),
-        str(prod.get("attributes",{}).get("volume_ml","")),
-        str(prod.get("attributes",{}).get("screen_size_in","")),
+import os
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+FINGERPRINT_VERSIONS = ("v1", "v2")
+V2_PREFIX = "v2:"
+V2_DIGEST_SIZE = 16
+_ID_SEP = b"\x1e"  # separa el buffer canónico de las partes del product_id (v2)
+
+_sha1 = hashlib.sha1
+_blake2b = hashlib.blake2b
+_default_version: Optional[str] = None
+
+
+def default_version() -> str:
+    """Versión configurada (FINGERPRINT_VERSION), leída una vez por proceso"""
+    global _default_version
+    if _default_version is None:
+        _default_version = _check_version(os.getenv("FINGERPRINT_VERSION", "v1").strip().lower())
+    return _default_version
+
+
+def set_default_version(version: Optional[str]) -> None:
+    """Fija la versión por defecto (None vuelve a leer FINGERPRINT_VERSION)"""
+    global _default_version
+    _default_version = None if version is None else _check_version(version)
+
+
+def _check_version(version: str) -> str:
+    if version not in FINGERPRINT_VERSIONS:
+        raise ValueError(f"FINGERPRINT_VERSION desconocida: {version!r} (válidas: {', '.join(FINGERPRINT_VERSIONS)})")
+    return version
+
+
+def id_version(identifier: str) -> str:
+    """Versión de un fingerprint/product_id ya emitido"""
+    return "v2" if identifier.startswith(V2_PREFIX) else "v1"
+
+
+# ============================================================================
+# 🧱 BUFFER CANÓNICO
+# ============================================================================
+
+def canonical_text(prod: Dict[str, Any]) -> str:
+    attrs = prod.get("attributes", {})
+    return "|".join([
+        prod.get("brand", ""),
+        prod.get("category", ""),
+        (prod.get("model") or prod.get("name", "")),
+        str(attrs.get("capacity", "")),
+        str(attrs.get("volume_ml", "")),
+        str(attrs.get("screen_size_in", "")),
     ])
-    return hashlib.sha1(base.encode("utf-8")).hexdigest()
+
+
+# ============================================================================
+# 🔑 IDS
+# ============================================================================
+
+def _resolve(version: Optional[str]) -> str:
+    if version is None:
+        return _default_version or default_version()
+    return _check_version(version)
+
+
+def _hexdigest(buf, version: str) -> str:
+    if version == "v1":
+        return _sha1(buf).hexdigest()
+    return V2_PREFIX + _blake2b(buf, digest_size=V2_DIGEST_SIZE).hexdigest()
+
+
+class FingerprintKey:
+    """
+    Fingerprint ya calculado de un producto, listo para derivar su product_id
+    cuando se conozcan las partes del listing (los normalizadores hashean el
+    fingerprint antes del LLM y el product_id después). En v2 el product_id
+    continúa el estado de hash del buffer canónico en vez de rehashearlo.
+    """
+
+    __slots__ = ("version", "fingerprint", "_state")
+
+    def __init__(self, prod: Dict[str, Any], version: Optional[str] = None):
+        self.version = _resolve(version)
+        buf = canonical_text(prod).encode("utf-8")
+        if self.version == "v1":
+            self._state = None
+            self.fingerprint = _sha1(buf).hexdigest()
+        else:
+            self._state = _blake2b(buf, digest_size=V2_DIGEST_SIZE)
+            self.fingerprint = V2_PREFIX + self._state.hexdigest()
+
+    def product_id(self, id_parts: Iterable[Any]) -> str:
+        text = "|".join(map(str, id_parts))
+        if self._state is None:
+            return _sha1(text.encode("utf-8")).hexdigest()
+        h = self._state.copy()
+        h.update(_ID_SEP + text.encode("utf-8"))
+        return V2_PREFIX + h.hexdigest()
+
+
+def product_fingerprint(prod: Dict[str, Any], version: Optional[str] = None) -> str:
+    return _hexdigest(canonical_text(prod).encode("utf-8"), _resolve(version))
+
+
+def product_ids(prod: Dict[str, Any], id_parts: Iterable[Any], version: Optional[str] = None) -> Tuple[str, str]:
+    """(fingerprint, product_id) del producto con las partes de listing dadas"""
+    key = FingerprintKey(prod, version)
+    return key.fingerprint, key.product_id(id_parts)
+
+
+def hash_id(id_parts: Iterable[Any], version: Optional[str] = None) -> str:
+    """Id derivado solo de partes sueltas (ej. retailer + fingerprint)"""
+    return _hexdigest("|".join(map(str, id_parts)).encode("utf-8"), _resolve(version))
+
+
+# ============================================================================
+# 📦 LOTES
+# ============================================================================
+
+def fingerprint_batch(prods: Iterable[Dict[str, Any]], version: Optional[str] = None) -> List[str]:
+    """
+    product_fingerprint por lote (misma salida, un id por producto). Un producto
+    base repetido en el lote (varias búsquedas/páginas del scrape) se hashea una vez.
+    """
+    version = _resolve(version)
+    seen: Dict[str, str] = {}
+    get = seen.get
+    out: List[str] = []
+    append = out.append
+    for prod in prods:
+        text = canonical_text(prod)
+        fp = get(text)
+        if fp is None:
+            fp = seen[text] = _hexdigest(text.encode("utf-8"), version)
+        append(fp)
+    return out
+
+
+def product_ids_batch(prods: Sequence[Dict[str, Any]], id_parts: Sequence[Iterable[Any]],
+                      version: Optional[str] = None) -> List[Tuple[str, str]]:
+    """product_ids por lote: id_parts[i] son las partes de listing de prods[i]"""
+    if len(prods) != len(id_parts):
+        raise ValueError("prods e id_parts deben tener el mismo largo")
+    version = _resolve(version)
+    return [(key.fingerprint, key.product_id(parts))
+            for key, parts in zip((FingerprintKey(p, version) for p in prods), id_parts)]
+
+
+# ============================================================================
+# 🔁 MIGRACIÓN v1 -> v2
+# ============================================================================
+
+def migration_rows(prods: Sequence[Dict[str, Any]],
+                   id_parts: Optional[Sequence[Iterable[Any]]] = None) -> List[Dict[str, str]]:
+    """
+    Mapeo de ids SHA-1 (v1) a v2 sobre los mismos productos base. Con
+    id_parts agrega product_id v1/v2; una fila por id v1 distinto.
+    """
+    rows: List[Dict[str, str]] = []
+    seen = set()
+    for i, prod in enumerate(prods):
+        old, new = FingerprintKey(prod, "v1"), FingerprintKey(prod, "v2")
+        row = {"old_fingerprint": old.fingerprint, "new_fingerprint": new.fingerprint}
+        if id_parts is not None:
+            parts = list(id_parts[i])
+            row.update(old_product_id=old.product_id(parts), new_product_id=new.product_id(parts))
+        dedup_key = row.get("old_product_id", old.fingerprint)
+        if dedup_key not in seen:
+            seen.add(dedup_key)
+            rows.append(row)
+    return rows
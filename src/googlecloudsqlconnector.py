@@ -348,16 +348,43 @@ class CloudSQLConnector:
     def get_price_comparison(self, fingerprints: Optional[List[str]] = None) -> List[Dict]:
         """
         Obtener comparación de precios entre retailers
-        Optimizado para consultas frecuentes
+        Servida desde el match store (match_clusters / match_cluster_members)
+        """
+        base = """
+            SELECT m.fingerprint,
+                   c.cluster_id,
+                   MIN(o.name) AS name,
+                   c.brand,
+                   c.category,
+                   json_agg(
+                       json_build_object(
+                           'retailer', o.retailer,
+                           'product_id', o.product_id,
+                           'fingerprint', o.fingerprint,
+                           'precio_actual', o.price_current,
+                           'precio_original', o.price_original,
+                           'url', o.url
+                       )
+                       ORDER BY o.price_current ASC NULLS LAST, o.retailer
+                   ) AS ofertas,
+                   MIN(o.price_current) AS precio_minimo,
+                   MAX(COALESCE(o.price_original, o.price_current)) AS precio_maximo
+            FROM match_cluster_members m
+            JOIN match_clusters c ON c.cluster_id = m.cluster_id
+            JOIN match_cluster_members o ON o.cluster_id = m.cluster_id
         """
         if fingerprints:
-            query = """
-                SELECT * FROM mv_comparacion_precios
-                WHERE fingerprint = ANY(:fingerprints)
+            query = base + """
+                WHERE m.fingerprint = ANY(:fingerprints)
+                GROUP BY m.fingerprint, c.cluster_id, c.brand, c.category
             """
             params = {'fingerprints': fingerprints}
         else:
-            query = "SELECT * FROM mv_comparacion_precios LIMIT 100"
+            query = base + """
+                WHERE c.retailer_count > 1
+                GROUP BY m.fingerprint, c.cluster_id, c.brand, c.category
+                LIMIT 100
+            """
             params = {}
         
         return self.execute_query(query, params)
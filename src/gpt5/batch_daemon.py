@@ -0,0 +1,617 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🔄 Daemon del ciclo de vida de Batch API
+Máquina de estados persistida en gpt5_batch_jobs (+ gpt5_batch_items) que sube,
+envía, hace polling con backoff, descarga e ingiere resultados en los caches.
+Reanudable tras un crash: cada transición se persiste antes del siguiente paso,
+los jobs se reclaman con lease (FOR UPDATE SKIP LOCKED) y la ingesta es idempotente.
+
+    created ─upload─▶ uploaded ─submit─▶ submitted ─poll…─▶ downloaded ─ingest─▶ ingested
+       ▲                                     │
+       └──────────── retry (remoto falló) ───┴──▶ failed
+
+Uso:
+    python -m gpt5.batch_daemon            # loop continuo
+    python -m gpt5.batch_daemon --once     # un tick (cron)
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import socket
+import uuid
+from datetime import datetime
+from enum import Enum
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from psycopg2 import extras
+
+try:
+    from .batch_processor_db import BatchProcessorDB, _fingerprint
+except ImportError:
+    from gpt5.batch_processor_db import BatchProcessorDB, _fingerprint
+
+logger = logging.getLogger(__name__)
+
+
+class BatchStage(Enum):
+    """Etapas del lifecycle (columna gpt5_batch_jobs.stage)"""
+    CREATED = "created"        # Items registrados, falta archivo/upload
+    UPLOADED = "uploaded"      # Archivo subido (openai_file_id)
+    SUBMITTED = "submitted"    # Batch remoto creado (openai_batch_id), en polling
+    DOWNLOADED = "downloaded"  # Resultados descargados, falta ingesta
+    INGESTED = "ingested"      # Resultados en caches, items cerrados
+    FAILED = "failed"          # Sin reintentos restantes
+
+
+TERMINAL_STAGES = (BatchStage.INGESTED.value, BatchStage.FAILED.value)
+REMOTE_FAILED = ("failed", "expired", "cancelled")
+
+# Columnas que advance() puede escribir
+_JOB_COLUMNS = (
+    "status", "file_path", "openai_file_id", "openai_batch_id", "output_file_id",
+    "output_file_path", "poll_attempts", "retry_count", "error_message",
+)
+
+
+class LeaseLost(Exception):
+    """Otro worker reclamó el job (lease vencido); abortar sin escribir"""
+
+
+# ============================================================================
+# 💾 PERSISTENCIA
+# ============================================================================
+
+class BatchJobStore:
+    """Estado del daemon en PostgreSQL (gpt5_batch_jobs + gpt5_batch_items)"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def create_job(self, batch_id: str, model: str, products: List[Dict],
+                   packed: bool = False, retry_count: int = 0) -> int:
+        """
+        Registrar job + items en una transacción
+
+        Fingerprints ya pendientes en otro job se omiten (índice único parcial),
+        así un producto nunca queda en vuelo dos veces.
+
+        Returns:
+            Items registrados (0 = no se creó el job)
+        """
+        with self.db.get_connection() as conn:
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute("""
+                        INSERT INTO gpt5_batch_jobs
+                        (batch_id, model, status, stage, packed, total_products,
+                         retry_count, next_poll_at)
+                        VALUES (%s, %s, 'pending', %s, %s, %s, %s, CURRENT_TIMESTAMP)
+                    """, (batch_id, model, BatchStage.CREATED.value, packed, len(products), retry_count))
+                    inserted = extras.execute_values(cursor, """
+                        INSERT INTO gpt5_batch_items (batch_id, fingerprint, custom_id, product_data)
+                        VALUES %s
+                        ON CONFLICT DO NOTHING
+                        RETURNING fingerprint
+                    """, [
+                        (batch_id, _fingerprint(p), '', json.dumps(p, default=str))
+                        for p in products
+                    ], fetch=True)
+                    if not inserted:
+                        conn.rollback()
+                        return 0
+                    cursor.execute(
+                        "UPDATE gpt5_batch_jobs SET total_products = %s WHERE batch_id = %s",
+                        (len(inserted), batch_id)
+                    )
+                conn.commit()
+                return len(inserted)
+            except Exception:
+                conn.rollback()
+                raise
+
+    def claim_due(self, worker_id: str, limit: int, lease_seconds: int) -> List[Dict]:
+        """Reclamar jobs vivos con poll vencido y sin lease activo"""
+        with self.db.get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    UPDATE gpt5_batch_jobs
+                    SET locked_by = %s,
+                        locked_until = CURRENT_TIMESTAMP + make_interval(secs => %s)
+                    WHERE batch_id IN (
+                        SELECT batch_id FROM gpt5_batch_jobs
+                        WHERE stage IS NOT NULL
+                          AND stage NOT IN %s
+                          AND COALESCE(next_poll_at, CURRENT_TIMESTAMP) <= CURRENT_TIMESTAMP
+                          AND (locked_until IS NULL OR locked_until < CURRENT_TIMESTAMP)
+                        ORDER BY next_poll_at NULLS FIRST, created_at
+                        LIMIT %s
+                        FOR UPDATE SKIP LOCKED
+                    )
+                    RETURNING *
+                """, (worker_id, lease_seconds, TERMINAL_STAGES, limit))
+                jobs = cursor.fetchall()
+            conn.commit()
+        return [dict(j) for j in jobs]
+
+    def advance(self, batch_id: str, worker_id: str, stage: BatchStage, **fields) -> None:
+        """Persistir transición (solo si el worker mantiene el lease)"""
+        sets = ["stage = %s"]
+        params: List[Any] = [stage.value]
+        for col, val in fields.items():
+            if col not in _JOB_COLUMNS:
+                raise ValueError(f"Columna no permitida: {col}")
+            sets.append(f"{col} = %s")
+            params.append(val)
+        if stage == BatchStage.SUBMITTED:
+            sets.append("started_at = COALESCE(started_at, CURRENT_TIMESTAMP)")
+        if stage.value in TERMINAL_STAGES:
+            sets.append("completed_at = CURRENT_TIMESTAMP")
+        params += [batch_id, worker_id]
+        self._update_owned(f"""
+            UPDATE gpt5_batch_jobs SET {', '.join(sets)}
+            WHERE batch_id = %s AND locked_by = %s
+        """, params)
+
+    def schedule_poll(self, batch_id: str, worker_id: str, delay_seconds: float,
+                      poll_attempts: int, error: str = None) -> None:
+        """Próximo poll en delay_seconds y liberar el lease"""
+        self._update_owned("""
+            UPDATE gpt5_batch_jobs
+            SET next_poll_at = CURRENT_TIMESTAMP + make_interval(secs => %s),
+                poll_attempts = %s,
+                error_message = COALESCE(%s, error_message),
+                locked_by = NULL,
+                locked_until = NULL
+            WHERE batch_id = %s AND locked_by = %s
+        """, (delay_seconds, poll_attempts, error, batch_id, worker_id))
+
+    def pending_items(self, batch_id: str) -> List[Dict]:
+        with self.db.get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT fingerprint, custom_id, item_index, product_data
+                    FROM gpt5_batch_items
+                    WHERE batch_id = %s AND status = 'pending'
+                    ORDER BY fingerprint
+                """, (batch_id,))
+                return [dict(r) for r in cursor.fetchall()]
+
+    def set_custom_ids(self, batch_id: str, item_map: Dict[str, List[str]]) -> None:
+        """Guardar custom_id / posición en el pack de cada item (tras generar el archivo)"""
+        rows = [
+            (batch_id, fp, custom_id, idx)
+            for custom_id, fps in item_map.items()
+            for idx, fp in enumerate(fps)
+        ]
+        with self.db.get_connection() as conn:
+            with conn.cursor() as cursor:
+                extras.execute_values(cursor, """
+                    UPDATE gpt5_batch_items AS i
+                    SET custom_id = v.custom_id, item_index = v.item_index,
+                        updated_at = CURRENT_TIMESTAMP
+                    FROM (VALUES %s) AS v(batch_id, fingerprint, custom_id, item_index)
+                    WHERE i.batch_id = v.batch_id AND i.fingerprint = v.fingerprint
+                """, rows)
+            conn.commit()
+
+    def item_map(self, batch_id: str) -> Dict[str, List[str]]:
+        """custom_id -> fingerprints (en orden de posición) de los items pendientes"""
+        item_map: Dict[str, List[str]] = {}
+        for item in sorted(self.pending_items(batch_id), key=lambda r: (r["custom_id"], r["item_index"])):
+            item_map.setdefault(item["custom_id"], []).append(item["fingerprint"])
+        return item_map
+
+    def finish_job(self, batch_id: str, worker_id: str, done: List[str],
+                   requeue_batch_id: Optional[str] = None) -> Dict[str, int]:
+        """
+        Cerrar job en una transacción: items con resultado -> done; el resto se
+        reencola en un job nuevo (si requeue_batch_id) o queda failed.
+        """
+        with self.db.get_connection() as conn:
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute("""
+                        SELECT model, packed, retry_count FROM gpt5_batch_jobs
+                        WHERE batch_id = %s AND locked_by = %s FOR UPDATE
+                    """, (batch_id, worker_id))
+                    job = cursor.fetchone()
+                    if not job:
+                        raise LeaseLost(batch_id)
+
+                    cursor.execute("""
+                        UPDATE gpt5_batch_items SET status = 'done', updated_at = CURRENT_TIMESTAMP
+                        WHERE batch_id = %s AND status = 'pending' AND fingerprint = ANY(%s)
+                    """, (batch_id, list(done)))
+                    cursor.execute("""
+                        SELECT COUNT(*) AS n FROM gpt5_batch_items
+                        WHERE batch_id = %s AND status = 'done'
+                    """, (batch_id,))
+                    n_done = cursor.fetchone()["n"]
+
+                    leftover_status = 'requeued' if requeue_batch_id else 'failed'
+                    cursor.execute("""
+                        UPDATE gpt5_batch_items SET status = %s, updated_at = CURRENT_TIMESTAMP
+                        WHERE batch_id = %s AND status = 'pending'
+                        RETURNING product_data
+                    """, (leftover_status, batch_id))
+                    leftovers = [r["product_data"] for r in cursor.fetchall()]
+
+                    if leftovers and requeue_batch_id:
+                        cursor.execute("""
+                            INSERT INTO gpt5_batch_jobs
+                            (batch_id, model, status, stage, packed, total_products,
+                             retry_count, next_poll_at)
+                            VALUES (%s, %s, 'pending', %s, %s, %s, %s, CURRENT_TIMESTAMP)
+                        """, (requeue_batch_id, job["model"], BatchStage.CREATED.value,
+                              job["packed"], len(leftovers), job["retry_count"] + 1))
+                        extras.execute_values(cursor, """
+                            INSERT INTO gpt5_batch_items (batch_id, fingerprint, custom_id, product_data)
+                            VALUES %s ON CONFLICT DO NOTHING
+                        """, [
+                            (requeue_batch_id, _fingerprint(p), '', json.dumps(p, default=str))
+                            for p in leftovers
+                        ])
+
+                    cursor.execute("""
+                        UPDATE gpt5_batch_jobs
+                        SET stage = %s, status = 'completed', completed_at = CURRENT_TIMESTAMP,
+                            processed_products = %s, successful_products = %s, failed_products = %s,
+                            locked_by = NULL, locked_until = NULL
+                        WHERE batch_id = %s
+                    """, (BatchStage.INGESTED.value, n_done + len(leftovers), n_done,
+                          len(leftovers), batch_id))
+                conn.commit()
+                return {"done": n_done, "leftover": len(leftovers)}
+            except Exception:
+                conn.rollback()
+                raise
+
+    def fail_job(self, batch_id: str, worker_id: str, error: str) -> None:
+        """Marcar job e items pendientes como fallidos (sin reintentos restantes)"""
+        with self.db.get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    UPDATE gpt5_batch_jobs
+                    SET stage = %s, status = 'failed', error_message = %s,
+                        completed_at = CURRENT_TIMESTAMP, locked_by = NULL, locked_until = NULL
+                    WHERE batch_id = %s AND locked_by = %s
+                """, (BatchStage.FAILED.value, error, batch_id, worker_id))
+                if cursor.rowcount == 0:
+                    conn.rollback()
+                    raise LeaseLost(batch_id)
+                cursor.execute("""
+                    UPDATE gpt5_batch_items SET status = 'failed', updated_at = CURRENT_TIMESTAMP
+                    WHERE batch_id = %s AND status = 'pending'
+                """, (batch_id,))
+            conn.commit()
+
+    def _update_owned(self, query: str, params) -> None:
+        with self.db.get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(query, params)
+                if cursor.rowcount == 0:
+                    conn.rollback()
+                    raise LeaseLost(params[-2])
+            conn.commit()
+
+
+# ============================================================================
+# 🔄 DAEMON
+# ============================================================================
+
+def new_batch_id() -> str:
+    return f"batch_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+
+
+class BatchLifecycleDaemon:
+    """Driver concurrente de la máquina de estados de batches"""
+
+    def __init__(self, processor: BatchProcessorDB, store: BatchJobStore,
+                 worker_id: str = None,
+                 max_concurrent: int = 10,
+                 poll_interval: float = 30,
+                 max_poll_interval: float = 600,
+                 lease_seconds: int = 300,
+                 idle_sleep: float = 5,
+                 on_results: Optional[Callable[[str, List[Dict]], Optional[Awaitable]]] = None):
+        """
+        Args:
+            processor: Cliente HTTP de Batch API + parser de resultados
+            store: Persistencia del estado (BatchJobStore)
+            worker_id: Identificador del worker para leases
+            max_concurrent: Jobs avanzados en paralelo por tick
+            poll_interval: Espera base entre polls de un job en curso
+            max_poll_interval: Tope del backoff exponencial
+            lease_seconds: Duración del lease; al vencer otro worker retoma el job
+            idle_sleep: Espera entre ticks sin trabajo
+            on_results: Callback (batch_id, resultados) al ingerir cada job (ej: cache L1)
+        """
+        self.processor = processor
+        self.store = store
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.max_concurrent = max_concurrent
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.lease_seconds = lease_seconds
+        self.idle_sleep = idle_sleep
+        self.on_results = on_results
+
+        self.stats = {
+            'ticks': 0,
+            'jobs_submitted': 0,
+            'jobs_ingested': 0,
+            'jobs_failed': 0,
+            'items_done': 0,
+            'items_requeued': 0,
+            'polls': 0,
+            'errors': 0
+        }
+
+    # ------------------------------------------------------------------ API
+
+    def submit(self, products: List[Dict], model: str, packed: bool = False) -> Optional[str]:
+        """Registrar productos como job nuevo (el daemon lo sube en el próximo tick)"""
+        keyed = [p for p in products if _fingerprint(p)]
+        if len(keyed) < len(products):
+            logger.warning(f"⚠️ {len(products) - len(keyed)} productos sin fingerprint omitidos")
+        batch_id = new_batch_id()
+        n = self.store.create_job(batch_id, model, keyed, packed=packed) if keyed else 0
+        if not n:
+            logger.info("📭 Todos los productos ya están en vuelo en otro job")
+            return None
+        self.stats['jobs_submitted'] += 1
+        logger.info(f"📝 Job {batch_id} registrado ({n}/{len(products)} productos, {model})")
+        return batch_id
+
+    async def run_once(self) -> int:
+        """Un tick: reclamar jobs vencidos y avanzarlos concurrentemente"""
+        self.stats['ticks'] += 1
+        jobs = self.store.claim_due(self.worker_id, self.max_concurrent, self.lease_seconds)
+        if jobs:
+            await asyncio.gather(*(self._drive(job) for job in jobs))
+        return len(jobs)
+
+    async def run_forever(self, stop: Optional[asyncio.Event] = None):
+        """Loop hasta que `stop` se active; cancelar deja los leases vencer y otro worker retoma"""
+        stop = stop or asyncio.Event()
+        logger.info(f"🔄 Batch daemon {self.worker_id} iniciado")
+        while not stop.is_set():
+            claimed = await self.run_once()
+            if not claimed:
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=self.idle_sleep)
+                except asyncio.TimeoutError:
+                    pass
+        logger.info(f"🛑 Batch daemon detenido: {self.stats}")
+
+    # -------------------------------------------------------------- estados
+
+    async def _drive(self, job: Dict):
+        """Avanzar un job por todas las etapas que no requieren esperar"""
+        batch_id = job['batch_id']
+        try:
+            while job and job['stage'] not in TERMINAL_STAGES:
+                step = {
+                    BatchStage.CREATED.value: self._upload,
+                    BatchStage.UPLOADED.value: self._submit_remote,
+                    BatchStage.SUBMITTED.value: self._poll,
+                    BatchStage.DOWNLOADED.value: self._ingest,
+                }[job['stage']]
+                job = await step(job)
+        except LeaseLost:
+            logger.warning(f"⚠️ Lease perdido para {batch_id}, otro worker lo retoma")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.stats['errors'] += 1
+            attempts = (job or {}).get('poll_attempts', 0) + 1
+            logger.error(f"❌ Job {batch_id} en {job.get('stage') if job else '?'}: {e}")
+            try:
+                self.store.schedule_poll(batch_id, self.worker_id, self._backoff(attempts),
+                                         attempts, error=str(e)[:500])
+            except LeaseLost:
+                pass
+
+    async def _upload(self, job: Dict) -> Dict:
+        """created -> uploaded: (re)generar archivo desde los items pendientes y subirlo"""
+        batch_id = job['batch_id']
+        items = self.store.pending_items(batch_id)
+        if not items:
+            self.store.finish_job(batch_id, self.worker_id, done=[])
+            return None
+        products = [
+            i['product_data'] if isinstance(i['product_data'], dict) else json.loads(i['product_data'])
+            for i in items
+        ]
+        file_path, _ = await self.processor.create_batch_file(
+            products, job['model'], "", batch_id=batch_id, packed=bool(job.get('packed'))
+        )
+        _, item_map = self.processor.load_item_map(batch_id)
+        self.store.set_custom_ids(batch_id, item_map)
+
+        file_id = await self.processor.upload_batch_file(file_path)
+        self.store.advance(batch_id, self.worker_id, BatchStage.UPLOADED,
+                           file_path=file_path, openai_file_id=file_id)
+        return {**job, 'stage': BatchStage.UPLOADED.value, 'file_path': file_path,
+                'openai_file_id': file_id}
+
+    async def _submit_remote(self, job: Dict) -> Dict:
+        """uploaded -> submitted; si un crash ocurrió tras crear el batch remoto, lo adopta"""
+        batch_id = job['batch_id']
+        remote_id = await self._find_remote_batch(batch_id)
+        if remote_id:
+            logger.info(f"♻️ Batch remoto existente adoptado para {batch_id}: {remote_id}")
+        else:
+            remote_id = await self.processor.create_batch_job(job['openai_file_id'], batch_id)
+        self.store.advance(batch_id, self.worker_id, BatchStage.SUBMITTED,
+                           status='processing', openai_batch_id=remote_id, poll_attempts=0)
+        self.store.schedule_poll(batch_id, self.worker_id, self.poll_interval, 0)
+        return None
+
+    async def _poll(self, job: Dict) -> Optional[Dict]:
+        """submitted -> downloaded | retry | failed; en curso reprograma con backoff"""
+        batch_id = job['batch_id']
+        self.stats['polls'] += 1
+        remote = await self.processor.check_batch_status(job['openai_batch_id'])
+        status = remote.get('status')
+
+        if status == 'completed':
+            output_file_id = remote.get('output_file_id')
+            if not output_file_id:
+                # Todas las requests fallaron: OpenAI solo entrega error_file_id
+                await self._close_all_failed(job, remote)
+                return None
+            path = await self.processor.download_results(output_file_id, batch_id)
+            self.store.advance(batch_id, self.worker_id, BatchStage.DOWNLOADED,
+                               output_file_id=output_file_id, output_file_path=path)
+            return {**job, 'stage': BatchStage.DOWNLOADED.value,
+                    'output_file_id': output_file_id, 'output_file_path': path}
+
+        if status in REMOTE_FAILED:
+            error = f"Batch remoto {status}: {remote.get('errors')}"
+            if job.get('retry_count', 0) < job.get('max_retries', 3):
+                logger.warning(f"🔁 {batch_id}: {error}; reintentando ({job.get('retry_count', 0) + 1})")
+                self.store.advance(batch_id, self.worker_id, BatchStage.CREATED,
+                                   retry_count=job.get('retry_count', 0) + 1, error_message=error,
+                                   openai_file_id=None, openai_batch_id=None, poll_attempts=0)
+                return {**job, 'stage': BatchStage.CREATED.value,
+                        'retry_count': job.get('retry_count', 0) + 1}
+            self.store.fail_job(batch_id, self.worker_id, error)
+            self.stats['jobs_failed'] += 1
+            return None
+
+        attempts = job.get('poll_attempts', 0) + 1
+        self.store.schedule_poll(batch_id, self.worker_id, self._backoff(attempts), attempts)
+        return None
+
+    async def _ingest(self, job: Dict) -> None:
+        """downloaded -> ingested: resultados a caches; faltantes se reencolan (o fallan)"""
+        batch_id = job['batch_id']
+        path = job.get('output_file_path')
+        if not path or not os.path.exists(path):
+            path = await self.processor.download_results(job['output_file_id'], batch_id)
+
+        # El sidecar se reconstruye desde la BD (fuente de verdad) por si se perdió
+        self.processor._write_item_map(batch_id, self.store.item_map(batch_id), bool(job.get('packed')))
+        # Reanuda desde el checkpoint de la ingesta si un crash la interrumpió
+        report = await asyncio.to_thread(self.processor.ingest_batch_results, path, batch_id)
+
+        if self.on_results:
+            maybe = self.on_results(batch_id, report.results)
+            if asyncio.iscoroutine(maybe):
+                await maybe
+
+        requeue_id = new_batch_id() if job.get('retry_count', 0) < job.get('max_retries', 3) else None
+        summary = self.store.finish_job(batch_id, self.worker_id, done=sorted(report.done),
+                                        requeue_batch_id=requeue_id)
+        self.stats['jobs_ingested'] += 1
+        self.stats['items_done'] += summary['done']
+        if requeue_id and summary['leftover']:
+            self.stats['items_requeued'] += summary['leftover']
+        logger.info(f"📥 {batch_id} ingerido: {summary['done']} ok, {summary['leftover']} "
+                    f"{'reencolados' if requeue_id else 'fallidos'}")
+        return None
+
+    async def _close_all_failed(self, job: Dict, remote: Dict) -> None:
+        """Batch completado sin output_file_id: items se reencolan (o fallan) y el job se cierra"""
+        batch_id = job['batch_id']
+        error_file_id = remote.get('error_file_id')
+        n_errors, first_error = 0, None
+        if error_file_id:
+            path = await self.processor.download_results(error_file_id, batch_id, kind="errors")
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    n_errors += 1
+                    if first_error is None:
+                        try:
+                            first_error = json.loads(line).get('response', {}).get('body', {}).get('error')
+                        except (ValueError, AttributeError):
+                            first_error = line.strip()[:200]
+
+        requeue_id = new_batch_id() if job.get('retry_count', 0) < job.get('max_retries', 3) else None
+        summary = self.store.finish_job(batch_id, self.worker_id, done=[], requeue_batch_id=requeue_id)
+        if requeue_id and summary['leftover']:
+            self.stats['items_requeued'] += summary['leftover']
+        else:
+            self.stats['jobs_failed'] += 1
+        logger.warning(f"⚠️ {batch_id} completado sin resultados ({n_errors} requests con error: "
+                       f"{first_error}); {summary['leftover']} items "
+                       f"{'reencolados' if requeue_id else 'fallidos'}")
+
+    # ------------------------------------------------------------- helpers
+
+    async def _find_remote_batch(self, batch_id: str) -> Optional[str]:
+        """Buscar batch remoto creado con metadata.batch_id (submit idempotente)"""
+        import aiohttp
+        async with aiohttp.ClientSession() as session:
+            async with session.get(
+                f"{self.processor.base_url}/batches",
+                headers=self.processor.headers,
+                params={"limit": 100}
+            ) as response:
+                if response.status != 200:
+                    return None
+                data = await response.json()
+        for remote in data.get('data', []):
+            if (remote.get('metadata') or {}).get('batch_id') == batch_id \
+                    and remote.get('status') not in REMOTE_FAILED:
+                return remote['id']
+        return None
+
+    def _backoff(self, attempts: int) -> float:
+        """Backoff exponencial con jitter, acotado a max_poll_interval"""
+        base = min(self.poll_interval * (2 ** max(attempts - 1, 0)), self.max_poll_interval)
+        return base * random.uniform(0.8, 1.2)
+
+
+# ============================================================================
+# 🎯 MAIN
+# ============================================================================
+
+async def _main(args) -> int:
+    try:
+        from normalize_gpt5 import get_gpt5_connector, get_l1_cache
+    except ImportError:
+        from ..normalize_gpt5 import get_gpt5_connector, get_l1_cache
+
+    db = get_gpt5_connector()
+    daemon = BatchLifecycleDaemon(
+        processor=BatchProcessorDB(api_key=os.getenv("OPENAI_API_KEY", ""), db_connector=db,
+                                   l1_cache=get_l1_cache()),
+        store=BatchJobStore(db),
+        max_concurrent=args.max_concurrent,
+        poll_interval=args.poll_interval
+    )
+    try:
+        if args.once:
+            await daemon.run_once()
+        else:
+            await daemon.run_forever()
+    finally:
+        db.close()
+    return 0
+
+
+def main(argv=None) -> int:
+    import argparse
+    ap = argparse.ArgumentParser(prog="batch-daemon")
+    ap.add_argument("--once", action="store_true", help="Ejecutar un solo tick")
+    ap.add_argument("--max-concurrent", type=int, default=10)
+    ap.add_argument("--poll-interval", type=float, default=30)
+    args = ap.parse_args(argv)
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    try:
+        return asyncio.run(_main(args))
+    except KeyboardInterrupt:
+        return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
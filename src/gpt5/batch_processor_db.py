@@ -20,15 +20,43 @@ from enum import Enum
 import sys
 sys.path.append(str(Path(__file__).parent.parent))
 from gpt5_db_connector import GPT5DatabaseConnector, BatchStatus, ModelType
+from gpt5.prompts import get_prompt_manager
+from gpt5.prompt_optimizer import PromptOptimizer, PACKED_MAX_COMPLETION_TOKENS
+from gpt5.prompt_templates import ChatRequestTemplate, CompiledTemplate
+from gpt5.router import GPT5Router
+from gpt5.result_ingester import BatchResultIngester, IngestReport, DEFAULT_CHUNK_SIZE
 
 logger = logging.getLogger(__name__)
 
+def _fingerprint(product: Dict) -> str:
+    return product.get('fingerprint') or product.get('_fingerprint', '')
+
+BATCH_SYSTEM_PROMPT = "Eres un experto en normalización de productos retail chilenos. Responde SOLO en formato JSON válido."
+
+# Prompts de usuario por modelo, compilados una vez (ver _prompt_template)
+_PROMPT_DEFAULTS = {"name": "", "category": "", "price": 0, "retailer": ""}
+_MINI_BATCH_PROMPT = CompiledTemplate("N:{name:.100}|C:{category}|P:{price}", defaults=_PROMPT_DEFAULTS)
+_MINI_PROMPT = CompiledTemplate("Normaliza: {name:.150} [{category}]", defaults=_PROMPT_DEFAULTS)
+_GPT5_PROMPT = CompiledTemplate("""Producto: {name}
+Categoría: {category}
+Precio: ${price:,} CLP
+Retailer: {retailer}
+
+Extrae: marca, modelo, atributos clave""", defaults=_PROMPT_DEFAULTS)
+
 class BatchProcessorDB:
     """Procesador batch con integración a BD"""
     
-    def __init__(self, api_key: str, db_connector: GPT5DatabaseConnector):
+    def __init__(self, api_key: str, db_connector: GPT5DatabaseConnector,
+                 l1_cache=None, ingest_workers: int = None,
+                 ingest_chunk_size: int = DEFAULT_CHUNK_SIZE):
         self.api_key = api_key
         self.db = db_connector
+        
+        # Ingesta de resultados (bulk + checkpoint); L1 opcional
+        self.l1_cache = l1_cache
+        self.ingest_workers = ingest_workers
+        self.ingest_chunk_size = ingest_chunk_size
         self.base_url = "https://api.openai.com/v1"
         self.batch_dir = Path("out/batches")
         self.batch_dir.mkdir(parents=True, exist_ok=True)
@@ -38,10 +66,14 @@ class BatchProcessorDB:
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
+        
+        # Prompts empaquetados (K productos por request)
+        self.prompt_manager = get_prompt_manager()
+        self.optimizer = PromptOptimizer()
     
     async def create_batch_file(self, products: List[Dict[str, Any]], 
                               model: str, prompt_template: str,
-                              batch_id: str = None) -> Tuple[str, str]:
+                              batch_id: str = None, packed: bool = False) -> Tuple[str, str]:
         """Crear archivo JSONL para batch processing"""
         
         if not batch_id:
@@ -49,66 +81,166 @@ class BatchProcessorDB:
         
         file_path = self.batch_dir / f"{batch_id}.jsonl"
         
-        # Crear requests JSONL
+        if packed:
+            return self._create_packed_batch_file(products, model, batch_id, file_path)
+        
+        # Crear requests JSONL: partes fijas del request serializadas una vez
+        request_template = ChatRequestTemplate(model, BATCH_SYSTEM_PROMPT, self._get_max_tokens(model))
+        item_map = {}
         with open(file_path, 'w', encoding='utf-8') as f:
             for idx, product in enumerate(products):
                 # Crear custom_id único
-                custom_id = f"{batch_id}_{idx}_{product.get('fingerprint', '')[:8]}"
-                
-                # Formatear prompt según modelo
-                prompt = self._format_prompt(product, model, prompt_template)
+                fingerprint = _fingerprint(product)
+                custom_id = f"{batch_id}_{idx}_{fingerprint[:8]}"
+                item_map[custom_id] = [fingerprint]
                 
-                # Estructura de request para Batch API
+                # Formatear prompt según modelo (compilado: solo se escapan los campos)
+                compiled = self._prompt_template(product, model, prompt_template)
+                if compiled is not None:
+                    line = request_template.render_product_line(custom_id, compiled, product)
+                else:
+                    line = request_template.render_line(custom_id, self._format_prompt(product, model, prompt_template))
+                f.write(line + '\n')
+        
+        self._write_item_map(batch_id, item_map, packed=False)
+        logger.info(f"✅ Archivo batch creado: {file_path} ({len(products)} productos)")
+        return str(file_path), batch_id
+    
+    def _packed_request(self, products: List[Dict], model: str) -> Dict[str, Any]:
+        """Body de chat completion con K productos y salida indexada"""
+        return {
+            "model": model,
+            "messages": [
+                {"role": "system", "content": self.prompt_manager.get_packed_system_prompt(model)},
+                {"role": "user", "content": self.prompt_manager.get_packed_prompt(products)}
+            ],
+            "temperature": 0.1,
+            "max_completion_tokens": self._get_packed_max_tokens(model),
+            "response_format": {"type": "json_object"}
+        }
+    
+    def _create_packed_batch_file(self, products: List[Dict], model: str,
+                                  batch_id: str, file_path: Path) -> Tuple[str, str]:
+        """JSONL con una línea por pack + mapa custom_id -> fingerprints para el fan-out"""
+        packs = self.optimizer.pack_products(products, model, self._get_packed_max_tokens(model))
+        item_map = {}
+        
+        with open(file_path, 'w', encoding='utf-8') as f:
+            for n, idxs in enumerate(packs):
+                custom_id = f"{batch_id}_p{n}"
+                item_map[custom_id] = [_fingerprint(products[i]) for i in idxs]
                 request = {
                     "custom_id": custom_id,
                     "method": "POST",
                     "url": "/v1/chat/completions",
-                    "body": {
-                        "model": model,
-                        "messages": [
-                            {
-                                "role": "system",
-                                "content": "Eres un experto en normalización de productos retail chilenos. Responde SOLO en formato JSON válido."
-                            },
-                            {
-                                "role": "user",
-                                "content": prompt
-                            }
-                        ],
-                        "temperature": 0.1,
-                        "max_completion_tokens": self._get_max_tokens(model),
-                        "response_format": {"type": "json_object"}
-                    }
+                    "body": self._packed_request([products[i] for i in idxs], model)
                 }
-                
                 f.write(json.dumps(request, ensure_ascii=False) + '\n')
         
-        logger.info(f"✅ Archivo batch creado: {file_path} ({len(products)} productos)")
+        self._write_item_map(batch_id, item_map, packed=True)
+        
+        logger.info(
+            f"✅ Archivo batch empaquetado: {file_path} "
+            f"({len(products)} productos en {len(packs)} requests)"
+        )
         return str(file_path), batch_id
     
+    def _item_map_path(self, batch_id: str) -> Path:
+        return self.batch_dir / f"{batch_id}_items.json"
+    
+    def _write_item_map(self, batch_id: str, item_map: Dict[str, List[str]], packed: bool):
+        """Sidecar custom_id -> fingerprints completos (fan-out y reanudación)"""
+        with open(self._item_map_path(batch_id), 'w', encoding='utf-8') as f:
+            json.dump({"packed": packed, "items": item_map}, f)
+    
+    def load_item_map(self, batch_id: str) -> Tuple[bool, Dict[str, List[str]]]:
+        """(packed, custom_id -> fingerprints) del batch; vacío si no hay sidecar"""
+        path = self._item_map_path(batch_id)
+        if not path.exists():
+            return False, {}
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return data.get("packed", False), data.get("items", {})
+    
+    def _get_packed_max_tokens(self, model: str) -> int:
+        """max_completion_tokens de un request empaquetado (límite completo del modelo)"""
+        config = self.db.get_model_config(model)
+        if config and config.get('max_completion_tokens'):
+            return int(config['max_completion_tokens'])
+        return PACKED_MAX_COMPLETION_TOKENS.get(model, 4000)
+    
+    async def complete_packed(self, products: List[Dict], model: str,
+                              max_rounds: int = 2) -> List[Dict]:
+        """
+        Normalizar productos vía chat completions empaquetadas (síncrono, sin Batch API)
+        
+        Solo los items faltantes o inválidos de cada respuesta se reintentan,
+        re-empaquetados, hasta max_rounds veces.
+        """
+        results = []
+        pending = list(products)
+        
+        async with aiohttp.ClientSession() as session:
+            for round_ in range(max_rounds + 1):
+                if not pending:
+                    break
+                retry = []
+                for idxs in self.optimizer.pack_products(pending, model, self._get_packed_max_tokens(model)):
+                    pack = [pending[i] for i in idxs]
+                    try:
+                        async with session.post(
+                            f"{self.base_url}/chat/completions",
+                            headers=self.headers,
+                            json=self._packed_request(pack, model)
+                        ) as response:
+                            body = await response.json()
+                        content = body['choices'][0]['message']['content']
+                    except Exception as e:
+                        logger.warning(f"⚠️ Pack de {len(pack)} falló ({e}), reintentando items")
+                        retry.extend(pack)
+                        continue
+                    
+                    parsed, missing = self.prompt_manager.parse_packed_response(content, len(pack))
+                    for i, normalized in parsed.items():
+                        results.append({
+                            'fingerprint': _fingerprint(pack[i]),
+                            'normalized': normalized,
+                            'tokens': body.get('usage', {})
+                        })
+                    retry.extend(pack[i] for i in missing)
+                
+                if retry:
+                    logger.info(f"🔁 Ronda {round_ + 1}: {len(retry)} items a reintentar")
+                pending = retry
+        
+        if pending:
+            logger.warning(f"⚠️ {len(pending)} productos sin respuesta válida tras {max_rounds} reintentos")
+        return results
+    
     def _format_prompt(self, product: Dict, model: str, template: str) -> str:
         """Formatear prompt según modelo y estilo"""
+        compiled = self._prompt_template(product, model, template)
+        if compiled is not None:
+            return compiled.render(product)
+        
+        # Fallback detallado para GPT-4o
+        return template.format(**product) if "{" in template else template
+    
+    def _prompt_template(self, product: Dict, model: str, template: str) -> Optional[CompiledTemplate]:
+        """Plantilla compilada según modelo y estilo (None: template libre del caller)"""
         
         # Estilos optimizados por modelo
         if "gpt-5-mini" in model:
             # Ultra-compacto para GPT-5-mini
             if "_batch_mode" in product or "BATCH" in template:
-                return f"N:{product.get('name', '')[:100]}|C:{product.get('category', '')}|P:{product.get('price', 0)}"
-            else:
-                return f"Normaliza: {product.get('name', '')[:150]} [{product.get('category', '')}]"
+                return _MINI_BATCH_PROMPT
+            return _MINI_PROMPT
         
-        elif "gpt-5" in model and "gpt-5-mini" not in model:
+        if "gpt-5" in model:
             # Estándar para GPT-5
-            return f"""Producto: {product.get('name', '')}
-Categoría: {product.get('category', '')}
-Precio: ${product.get('price', 0):,} CLP
-Retailer: {product.get('retailer', '')}
-
-Extrae: marca, modelo, atributos clave"""
+            return _GPT5_PROMPT
         
-        else:
-            # Fallback detallado para GPT-4o
-            return template.format(**product) if "{" in template else template
+        return None
     
     def _get_max_tokens(self, model: str) -> int:
         """Obtener max_completion_tokens según modelo"""
@@ -191,8 +323,8 @@ Extrae: marca, modelo, atributos clave"""
             ) as response:
                 return await response.json()
     
-    async def download_results(self, output_file_id: str, batch_id: str) -> str:
-        """Descargar resultados del batch"""
+    async def download_results(self, output_file_id: str, batch_id: str, kind: str = "results") -> str:
+        """Descargar resultados del batch (kind="errors" para el error_file_id)"""
         async with aiohttp.ClientSession() as session:
             async with session.get(
                 f"{self.base_url}/files/{output_file_id}/content",
@@ -201,7 +333,7 @@ Extrae: marca, modelo, atributos clave"""
                 content = await response.text()
                 
                 # Guardar resultados
-                output_path = self.batch_dir / f"{batch_id}_results.jsonl"
+                output_path = self.batch_dir / f"{batch_id}_{kind}.jsonl"
                 with open(output_path, 'w', encoding='utf-8') as f:
                     f.write(content)
                 
@@ -209,100 +341,65 @@ Extrae: marca, modelo, atributos clave"""
                 return str(output_path)
     
     async def process_batch_results(self, results_path: str, batch_id: str) -> List[Dict]:
-        """Procesar resultados del batch y actualizar BD"""
-        processed_results = []
-        successful = 0
-        failed = 0
-        total_tokens_input = 0
-        total_tokens_output = 0
-        total_cost = 0.0
-        
-        with open(results_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                result = json.loads(line)
-                custom_id = result.get('custom_id', '')
-                
-                if result.get('response', {}).get('status_code') == 200:
-                    # Éxito
-                    response_body = result['response']['body']
-                    choices = response_body.get('choices', [])
-                    
-                    if choices:
-                        content = choices[0]['message']['content']
-                        try:
-                            normalized_data = json.loads(content)
-                            
-                            # Extraer fingerprint del custom_id
-                            parts = custom_id.split('_')
-                            fingerprint = parts[-1] if len(parts) > 2 else None
-                            
-                            if fingerprint:
-                                # Guardar en cache IA
-                                cache = GPT5AICache(self.db)
-                                cache.set(
-                                    fingerprint=fingerprint,
-                                    metadata=normalized_data,
-                                    model_used=response_body.get('model'),
-                                    tokens_used=response_body.get('usage', {}).get('total_tokens'),
-                                    batch_id=batch_id
-                                )
-                            
-                            processed_results.append({
-                                'custom_id': custom_id,
-                                'fingerprint': fingerprint,
-                                'normalized': normalized_data,
-                                'tokens': response_body.get('usage', {})
-                            })
-                            
-                            successful += 1
-                            
-                            # Acumular tokens y costos
-                            usage = response_body.get('usage', {})
-                            total_tokens_input += usage.get('prompt_tokens', 0)
-                            total_tokens_output += usage.get('completion_tokens', 0)
-                            
-                        except json.JSONDecodeError:
-                            logger.error(f"Error parseando JSON para {custom_id}")
-                            failed += 1
-                else:
-                    # Error
-                    logger.error(f"Error en {custom_id}: {result.get('error')}")
-                    failed += 1
+        """Procesar resultados del batch y actualizar BD (sin bloquear el event loop)"""
+        report = await asyncio.to_thread(self.ingest_batch_results, results_path, batch_id)
+        return report.results
+    
+    def ingest_batch_results(self, results_path: str, batch_id: str) -> IngestReport:
+        """Ingesta streaming + upsert masivo en caches; reanuda desde el checkpoint si existe"""
+        ingester = BatchResultIngester(
+            GPT5AICache(self.db),
+            l1_cache=self.l1_cache,
+            chunk_size=self.ingest_chunk_size,
+            workers=self.ingest_workers
+        )
+        # custom_id -> fingerprints (packs: K por línea)
+        packed, item_map = self.load_item_map(batch_id)
+        report = ingester.ingest(results_path, batch_id, item_map, packed)
         
         # Calcular costo total con descuento batch
+        total_cost = 0.0
         model_config = self.db.get_model_config(batch_id.split('_')[0] if '_' in batch_id else 'gpt-5-mini')
         if model_config:
-            cost_input = (total_tokens_input / 1000) * model_config['cost_per_1k_input']
-            cost_output = (total_tokens_output / 1000) * model_config['cost_per_1k_output']
+            cost_input = (report.tokens_input / 1000) * model_config['cost_per_1k_input']
+            cost_output = (report.tokens_output / 1000) * model_config['cost_per_1k_output']
             total_cost = (cost_input + cost_output) * model_config['batch_discount']
         
         # Actualizar batch en BD
         self.db.update_batch_status(
             batch_id,
-            BatchStatus.COMPLETED if failed == 0 else BatchStatus.COMPLETED,
-            processed=successful + failed,
+            BatchStatus.COMPLETED,
+            processed=report.successful + report.failed,
             metadata={
-                'successful': successful,
-                'failed': failed,
-                'total_tokens_input': total_tokens_input,
-                'total_tokens_output': total_tokens_output,
+                'successful': report.successful,
+                'failed': report.failed,
+                'low_quality': report.low_quality,
+                'total_tokens_input': report.tokens_input,
+                'total_tokens_output': report.tokens_output,
                 'actual_cost': total_cost
             }
         )
         
         logger.info(f"""
         ✅ Batch {batch_id} procesado:
-        - Exitosos: {successful}
-        - Fallidos: {failed}
-        - Tokens: {total_tokens_input} input, {total_tokens_output} output
+        - Exitosos: {report.successful} ({report.low_quality} bajo umbral de calidad)
+        - Fallidos: {report.failed}
+        - Tokens: {report.tokens_input} input, {report.tokens_output} output
         - Costo: ${total_cost:.4f} (con 50% descuento)
+        - Ingesta: {report.lines} líneas en {report.elapsed:.2f}s
         """)
         
-        return processed_results
+        return report
     
     async def process_products_batch(self, products: List[Dict], model: str,
-                                    prompt_template: str = "Normalize: {name}") -> List[Dict]:
-        """Pipeline completo de batch processing"""
+                                    prompt_template: str = "Normalize: {name}",
+                                    packed: bool = False) -> List[Dict]:
+        """
+        Pipeline completo de batch processing
+        
+        Con packed=True cada línea del batch lleva K productos; los items que
+        vuelven faltantes o inválidos se reintentan vía complete_packed.
+        """
         
         # 1. Registrar batch en BD
         batch_id = self.db.create_batch_job(
@@ -313,7 +410,8 @@ Extrae: marca, modelo, atributos clave"""
         
         try:
             # 2. Crear archivo JSONL
-            file_path, _ = await self.create_batch_file(products, model, prompt_template, batch_id)
+            file_path, _ = await self.create_batch_file(products, model, prompt_template, batch_id,
+                                                        packed=packed)
             
             # 3. Subir archivo a OpenAI
             file_id = await self.upload_batch_file(file_path)
@@ -334,7 +432,15 @@ Extrae: marca, modelo, atributos clave"""
                     results_path = await self.download_results(output_file_id, batch_id)
                     
                     # 7. Procesar resultados
-                    return await self.process_batch_results(results_path, batch_id)
+                    results = await self.process_batch_results(results_path, batch_id)
+                    
+                    # 8. Reintentar solo los items afectados de packs parciales/malformados
+                    if packed:
+                        done = {r['fingerprint'] for r in results}
+                        missing = [p for p in products if _fingerprint(p) not in done]
+                        if missing:
+                            results.extend(await self.complete_packed(missing, model))
+                    return results
                 
                 elif status['status'] == 'failed':
                     error_msg = status.get('errors', {}).get('data', [{}])[0].get('message', 'Unknown error')
@@ -372,18 +478,16 @@ class BatchOrchestrator:
     def __init__(self, api_key: str, db_connector: GPT5DatabaseConnector):
         self.processor = BatchProcessorDB(api_key, db_connector)
         self.db = db_connector
+        self.router = GPT5Router(db_connector)
     
-    async def process_pending_batches(self):
-        """Procesar todos los batches pendientes"""
-        pending = self.db.get_pending_batches(limit=5)
+    async def process_pending_batches(self) -> int:
+        """Avanzar los batches pendientes un tick (productos persistidos en gpt5_batch_items)"""
+        from gpt5.batch_daemon import BatchLifecycleDaemon, BatchJobStore
         
-        for batch in pending:
-            batch_id = batch['batch_id']
-            logger.info(f"📋 Procesando batch pendiente: {batch_id}")
-            
-            # TODO: Recuperar productos del batch y procesarlos
-            # Este método necesitaría acceso a los productos originales
-            # guardados en algún lugar (archivo o BD)
+        daemon = BatchLifecycleDaemon(self.processor, BatchJobStore(self.db))
+        claimed = await daemon.run_once()
+        logger.info(f"📋 Batches avanzados: {claimed} ({daemon.stats})")
+        return claimed
     
     def create_optimized_batches(self, products: List[Dict], 
                                 max_batch_size: int = 50000) -> List[Dict]:
@@ -396,19 +500,17 @@ class BatchOrchestrator:
             ModelType.GPT4O_MINI.value: []
         }
         
+        # Respetar '_routing' si ya fueron ruteados; el resto en una sola pasada
+        pending = [p for p in products if not p.get('_routing')]
+        routed = self.router.route_many(pending, save=True) if pending else []
+        for product, (model, complexity, reason) in zip(pending, routed):
+            product['_routing'] = {
+                'model': model,
+                'complexity': complexity,
+                'reason': reason
+            }
         for product in products:
-            # Calcular complejidad y obtener modelo
-            fingerprint = product.get('fingerprint', '')
-            complexity = self.db.get_complexity_analysis(fingerprint)
-            
-            if complexity:
-                model = complexity['model_assigned']
-            else:
-                # Calcular complejidad si no existe
-                # (simplificado aquí, debería usar ComplexityAnalyzer)
-                model = ModelType.GPT5_MINI.value
-            
-            batches_by_model[model].append(product)
+            batches_by_model[product['_routing']['model']].append(product)
         
         # Dividir en sub-batches por tamaño
         final_batches = []
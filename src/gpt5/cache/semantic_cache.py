@@ -17,10 +17,26 @@ import logging
 import os
 from pathlib import Path
 
+try:
+    from ...telemetry import get_registry
+except ImportError:
+    from telemetry import get_registry
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+def _semantic_cache_metrics(cache: "SemanticCache"):
+    """Stats del cache semántico para /metrics (se leen al exponer)"""
+    stats = cache.stats
+    return [
+        ("cache_requests", "counter", "Consultas a cache por tier y resultado",
+         [({"tier": "semantic", "result": "hit"}, stats['hits']),
+          ({"tier": "semantic", "result": "semantic_hit"}, stats['semantic_hits']),
+          ({"tier": "semantic", "result": "miss"}, stats['misses'])]),
+    ]
+
+
 @dataclass 
 class CachedItem:
     """Item cacheado con embedding"""
@@ -49,6 +65,7 @@ class SemanticCache:
             'semantic_hits': 0,
             'total_queries': 0
         }
+        get_registry().register_collector(_semantic_cache_metrics, owner=self)
         
         # Configurar backend
         if backend == "postgresql":
@@ -9,12 +9,28 @@ import json
 import redis
 import hashlib
 import logging
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
 from datetime import timedelta
 import pickle
 
+try:
+    from ..telemetry import get_registry
+except ImportError:
+    from telemetry import get_registry
+
 logger = logging.getLogger(__name__)
 
+def _l1_metrics(cache: "L1RedisCache"):
+    """Stats del cache L1 para /metrics (se leen al exponer)"""
+    stats = cache.stats
+    return [
+        ("cache_requests", "counter", "Consultas a cache por tier y resultado",
+         [({"tier": "l1", "result": "hit"}, stats['hits']),
+          ({"tier": "l1", "result": "miss"}, stats['misses'])]),
+        ("cache_sets", "counter", "Escrituras a cache por tier", [({"tier": "l1"}, stats['sets'])]),
+        ("cache_errors", "counter", "Errores de cache por tier", [({"tier": "l1"}, stats['errors'])]),
+    ]
+
 class L1RedisCache:
     """Cache L1 con Redis para hits <200ms"""
     
@@ -90,6 +106,7 @@ class L1RedisCache:
             'sets': 0,
             'errors': 0
         }
+        get_registry().register_collector(_l1_metrics, owner=self)
     
     def _get_key(self, fingerprint: str) -> str:
         """Generar clave con namespace y versión"""
@@ -192,6 +209,40 @@ class L1RedisCache:
             self.stats['errors'] += 1
             return False
     
+    def set_many(self, entries: List[Tuple[str, Dict[str, Any], Optional[str]]]) -> int:
+        """
+        Guardar varios resultados en un solo round-trip (pipeline Redis)
+        
+        Args:
+            entries: Tuplas (fingerprint, data, category)
+        
+        Returns:
+            Cantidad guardada
+        """
+        if self.use_mock:
+            return sum(1 for fp, data, category in entries if self.set(fp, data, category))
+        
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for fingerprint, data, category in entries:
+                key = self._get_key(fingerprint)
+                ttl = self._get_ttl(category)
+                pipe.setex(key, ttl, pickle.dumps(data))
+                pipe.hset(f"{key}:meta", mapping={
+                    "category": category or "unknown",
+                    "hits": 0,
+                    "ttl_original": ttl
+                })
+                pipe.expire(f"{key}:meta", ttl)
+            pipe.execute()
+            self.stats['sets'] += len(entries)
+            logger.debug(f"💾 L1 Cache SET bulk: {len(entries)} claves")
+            return len(entries)
+        except Exception as e:
+            logger.error(f"Error setting L1 cache (bulk): {e}")
+            self.stats['errors'] += 1
+            return 0
+    
     def delete(self, fingerprint: str) -> bool:
         """Eliminar del cache"""
         key = self._get_key(fingerprint)
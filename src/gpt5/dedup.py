@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧬 Coalescing de requests LLM
+Colapsa productos con el mismo fingerprint o título normalizado en un único
+request antes de llamar al modelo y reparte el resultado a todos los originales
+"""
+
+import re
+import logging
+import unicodedata
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Tokens de marketing que no cambian el producto físico. "nuevo"/"nueva" y
+# "original" no van: distinguen productos reales (nuevo vs reacondicionado,
+# original vs alternativo/compatible) y agruparlos mezclaría resultados
+TITLE_NOISE = {
+    "oferta", "liberado", "liberada",
+    "envio", "gratis", "despacho", "sale", "promo",
+}
+TOKENS_PER_REQUEST = 250  # Mismo estimado que batch_processor_db
+
+_UNIT_RE = re.compile(r"(\d+(?:[.,]\d+)?)\s+(gb|tb|mb|ml|l|kg|g|cm|mm|w|hz|mah|pulgadas|\")\b")
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9\"]+")
+
+
+def normalize_title(title: str) -> str:
+    """Título canónico para dedup: sin tildes, mayúsculas, puntuación ni ruido de marketing"""
+    t = unicodedata.normalize("NFKD", title or "")
+    t = "".join(c for c in t if not unicodedata.combining(c)).lower()
+    t = _UNIT_RE.sub(r"\1\2", t)
+    t = _NON_ALNUM_RE.sub(" ", t)
+    return " ".join(tok for tok in t.split() if tok not in TITLE_NOISE)
+
+
+def _fingerprint_of(product: Dict[str, Any]) -> Optional[str]:
+    return product.get("_fingerprint") or product.get("fingerprint")
+
+
+@dataclass
+class DedupPlan:
+    """Resultado del coalescing: representantes únicos + grupos de originales"""
+    unique: List[Dict[str, Any]]
+    groups: List[List[int]]            # groups[k] = índices originales del representante k
+    total: int
+    tokens_per_request: int = TOKENS_PER_REQUEST
+    by_reason: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def calls_saved(self) -> int:
+        return self.total - len(self.unique)
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.calls_saved * self.tokens_per_request
+
+    def members(self, k: int) -> List[int]:
+        return self.groups[k]
+
+    def fan_out(self, results: List[Any]) -> List[Any]:
+        """Expandir resultados por representante a la lista original (mismo orden de entrada)"""
+        out: List[Any] = [None] * self.total
+        for k, idxs in enumerate(self.groups):
+            res = results[k] if k < len(results) else None
+            for n, i in enumerate(idxs):
+                # Copia por miembro para que mutar un resultado no afecte a sus duplicados
+                out[i] = dict(res) if n and isinstance(res, dict) else res
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "input": self.total,
+            "unique": len(self.unique),
+            "calls_saved": self.calls_saved,
+            "tokens_saved": self.tokens_saved,
+            "dedup_rate": round(self.calls_saved / self.total, 4) if self.total else 0.0,
+            "by_reason": dict(self.by_reason),
+        }
+
+
+def coalesce(products: List[Dict[str, Any]],
+             fingerprint_fn: Optional[Callable[[Dict[str, Any]], Optional[str]]] = None,
+             use_titles: bool = True,
+             tokens_per_request: int = TOKENS_PER_REQUEST) -> DedupPlan:
+    """
+    Agrupar productos duplicados (union-find por fingerprint y por título normalizado)
+
+    Args:
+        products: Productos a enviar al LLM
+        fingerprint_fn: Cómo obtener el fingerprint (default: _fingerprint / fingerprint)
+        use_titles: Colapsar también títulos normalizados idénticos dentro de la categoría
+        tokens_per_request: Tokens estimados por request para reportar ahorro
+
+    Returns:
+        DedupPlan con un representante (el primero en orden de entrada) por grupo
+    """
+    fingerprint_fn = fingerprint_fn or _fingerprint_of
+    parent = list(range(len(products)))
+    reasons = {"fingerprint": 0, "title": 0}
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(i: int, j: int, reason: str):
+        ri, rj = find(i), find(j)
+        if ri != rj:
+            # El representante es siempre el índice menor
+            parent[max(ri, rj)] = min(ri, rj)
+            reasons[reason] += 1
+
+    seen_fp: Dict[str, int] = {}
+    seen_title: Dict[tuple, int] = {}
+    for i, p in enumerate(products):
+        fp = fingerprint_fn(p)
+        if fp:
+            if fp in seen_fp:
+                union(seen_fp[fp], i, "fingerprint")
+            else:
+                seen_fp[fp] = i
+        if use_titles:
+            title = normalize_title(p.get("name") or p.get("title") or "")
+            if title:
+                key = (p.get("category", ""), title)
+                if key in seen_title:
+                    union(seen_title[key], i, "title")
+                else:
+                    seen_title[key] = i
+
+    slot: Dict[int, int] = {}
+    unique: List[Dict[str, Any]] = []
+    groups: List[List[int]] = []
+    for i in range(len(products)):
+        root = find(i)
+        if root not in slot:
+            slot[root] = len(unique)
+            unique.append(products[root])
+            groups.append([])
+        groups[slot[root]].append(i)
+
+    plan = DedupPlan(unique=unique, groups=groups, total=len(products),
+                     tokens_per_request=tokens_per_request, by_reason=reasons)
+    if plan.calls_saved:
+        logger.info(
+            f"🧬 Dedup: {plan.total} → {len(unique)} requests "
+            f"({plan.calls_saved} llamadas y ~{plan.tokens_saved} tokens ahorrados)"
+        )
+    return plan
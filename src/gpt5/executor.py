@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+⚙️ Ejecutor concurrente con paralelismo acotado por modelo
+Cola de trabajo asyncio que respeta el RateLimiter, preserva el orden de salida
+y cancela limpiamente a sus workers al cerrar
+"""
+
+import asyncio
+import contextvars
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+try:
+    from .throttling import RateLimiter, DEFAULT_CONCURRENT_LIMIT
+except ImportError:
+    from gpt5.throttling import RateLimiter, DEFAULT_CONCURRENT_LIMIT
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+# Pacing del executor en curso (lo fija cada worker; None fuera de un map)
+_pacer: contextvars.ContextVar[Optional[Callable[[str], Awaitable[None]]]] = \
+    contextvars.ContextVar('gpt5_executor_pacer', default=None)
+
+
+async def pace_llm_call(model: str) -> None:
+    """
+    Esperar capacidad en el RateLimiter del executor que corre este item
+
+    Para fns que solo a veces llaman al LLM (p.ej. con cache delante): se llama
+    justo antes del request y los cache hits no esperan al bucket de RPM.
+    No-op fuera de ConcurrentExecutor.map o sin rate limiter.
+    """
+    pacer = _pacer.get()
+    if pacer is not None:
+        await pacer(model)
+
+
+class ConcurrentExecutor:
+    """
+    Ejecuta `fn(item)` sobre una lista con N workers y un límite de requests
+    en vuelo por modelo (semáforo por modelo).
+
+    Antes de despachar cada item espera capacidad en el RateLimiter del modelo,
+    de modo que el throughput sube hasta el cap de RPM configurado en lugar de
+    1 latencia de request por producto. Con `pace_items=False` el pacing queda
+    en manos de la fn, que llama a `pace_llm_call` solo cuando va al LLM.
+    """
+
+    def __init__(self,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 max_workers: int = 32,
+                 max_in_flight: Optional[Dict[str, int]] = None,
+                 estimated_tokens: int = 250,
+                 max_wait: float = 60):
+        """
+        Args:
+            rate_limiter: Limiter a respetar (None = sin pacing, solo semáforos)
+            max_workers: Workers totales de la cola
+            max_in_flight: Override de requests en vuelo por modelo
+                           (default: RateLimitConfig.concurrent_limit)
+            estimated_tokens: Tokens estimados por request para el bucket de tokens
+            max_wait: Segundos máximos esperando capacidad antes de despachar igual
+        """
+        self.rate_limiter = rate_limiter
+        self.max_workers = max(1, max_workers)
+        self.max_in_flight = dict(max_in_flight or {})
+        self.estimated_tokens = estimated_tokens
+        self.max_wait = max_wait
+
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._workers: Set[asyncio.Task] = set()  # De todos los map en curso (para shutdown)
+        self._stopping = False
+
+        self.stats = {
+            'submitted': 0,
+            'completed': 0,
+            'failed': 0,
+            'cancelled': 0,
+            'peak_in_flight': 0
+        }
+        self._in_flight = 0
+
+    def _limit_for(self, model: str) -> int:
+        if model in self.max_in_flight:
+            return max(1, int(self.max_in_flight[model]))
+        if self.rate_limiter and model in self.rate_limiter.configs:
+            return self.rate_limiter.configs[model].concurrent_limit
+        return self.max_in_flight.get('default', DEFAULT_CONCURRENT_LIMIT)
+
+    def _semaphore(self, model: str) -> asyncio.Semaphore:
+        sem = self._semaphores.get(model)
+        if sem is None:
+            sem = self._semaphores[model] = asyncio.Semaphore(self._limit_for(model))
+        return sem
+
+    async def _wait_for_capacity(self, model: str) -> None:
+        ready = await self.rate_limiter.wait_for_capacity(
+            model, self.estimated_tokens, max_wait=self.max_wait
+        )
+        if not ready:
+            logger.warning(f"⏳ Sin capacidad para {model} tras {self.max_wait}s, despachando igual")
+
+    async def _run_item(self, fn: Callable[[Any], Awaitable[Any]], item: Any, model: str,
+                        pace_item: bool) -> Any:
+        async with self._semaphore(model):
+            if pace_item and self.rate_limiter is not None:
+                await self._wait_for_capacity(model)
+            self._in_flight += 1
+            self.stats['peak_in_flight'] = max(self.stats['peak_in_flight'], self._in_flight)
+            try:
+                return await fn(item)
+            finally:
+                self._in_flight -= 1
+
+    async def _worker(self, queue: asyncio.Queue, fn, model_of, results: List[Any],
+                      progress: Optional[Callable[[int, int], None]], done: List[int], pace_items: bool):
+        total = len(results)
+        if self.rate_limiter is not None and not pace_items:
+            _pacer.set(self._wait_for_capacity)
+        while True:
+            job = await queue.get()
+            try:
+                if job is _STOP:
+                    return
+                idx, item = job
+                try:
+                    results[idx] = await self._run_item(fn, item, model_of(item), pace_items)
+                    self.stats['completed'] += 1
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    results[idx] = e
+                    self.stats['failed'] += 1
+                done[0] += 1
+                if progress:
+                    progress(done[0], total)
+            finally:
+                queue.task_done()
+
+    async def map(self, fn: Callable[[Any], Awaitable[Any]], items: List[Any],
+                  model_of: Callable[[Any], str] = lambda _: 'default',
+                  progress: Optional[Callable[[int, int], None]] = None,
+                  pace_items: bool = True) -> List[Any]:
+        """
+        Procesar items concurrentemente (varios map pueden correr a la vez)
+
+        Args:
+            pace_items: Esperar capacidad de RPM antes de cada item; False si la fn
+                        llama a pace_llm_call antes de ir al LLM
+
+        Returns:
+            Lista alineada con `items`: resultado o la excepción levantada por ese item
+        """
+        if self._stopping:
+            raise RuntimeError("Executor detenido")
+
+        results: List[Any] = [None] * len(items)
+        if not items:
+            return results
+
+        queue: asyncio.Queue = asyncio.Queue()
+        for idx, item in enumerate(items):
+            queue.put_nowait((idx, item))
+        n_workers = min(self.max_workers, len(items))
+        for _ in range(n_workers):
+            queue.put_nowait(_STOP)
+        self.stats['submitted'] += len(items)
+        done = [0]
+
+        workers = [
+            asyncio.create_task(self._worker(queue, fn, model_of, results, progress, done, pace_items))
+            for _ in range(n_workers)
+        ]
+        self._workers.update(workers)
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            await self._cancel_workers(workers)
+            self.stats['cancelled'] += len(items) - done[0]
+        return results
+
+    async def _cancel_workers(self, workers) -> None:
+        workers = list(workers)
+        pending = [w for w in workers if not w.done()]
+        for w in pending:
+            w.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+        self._workers.difference_update(workers)
+
+    async def shutdown(self):
+        """Cancelar workers en curso y rechazar nuevos trabajos"""
+        self._stopping = True
+        await self._cancel_workers(self._workers)
+        logger.info(f"🛑 Executor detenido: {self.stats}")
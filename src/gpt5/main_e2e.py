@@ -21,15 +21,18 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 from normalize_gpt5 import (
     normalize_with_gpt5, 
     process_batch_gpt5,
+    process_packed_gpt5,
     ProcessingMode,
     get_gpt5_connector,
     get_router,
     get_prompt_manager,
     get_validator,
     get_l1_cache,
-    get_rate_limiter
+    get_rate_limiter,
+    get_dedup_stats
 )
 from gpt5.batch_processor_db import BatchOrchestrator
+from gpt5.executor import ConcurrentExecutor
 from gpt5_db_connector import GPT5DatabaseConnector
 from ingest import ingest_from_dir
 from persistence import persist_jsonl
@@ -65,6 +68,7 @@ class GPT5Pipeline:
         self.validator = get_validator()
         self.l1_cache = get_l1_cache()
         self.rate_limiter = get_rate_limiter()
+        self.executor: Optional[ConcurrentExecutor] = None
         
         # Estadísticas
         self.stats = {
@@ -90,6 +94,10 @@ class GPT5Pipeline:
             'enable_quality_gate': True,
             'min_quality_score': 0.7,
             'enable_throttling': True,
+            'max_workers': 32,
+            'max_in_flight': {},  # override por modelo, ej: {'gpt-5': 4}
+            'packed_prompts': False,  # K productos por request (salida indexada)
+            'router_fit_days': 30,  # Ajustar umbrales de routing con métricas (0 = fijos)
             'save_to_db': True,
             'save_to_jsonl': True
         }
@@ -127,8 +135,11 @@ class GPT5Pipeline:
             # 2️⃣ PRE-PROCESS: Análisis de complejidad y routing
             logger.info("🎯 Analizando complejidad y routing...")
             
-            for product in raw_products:
-                model, complexity, reason = self.router.route_single_extended(product)
+            if self.config.get('router_fit_days'):
+                self.router.fit_thresholds(days=self.config['router_fit_days'])
+            
+            routed = self.router.route_many(raw_products)
+            for product, (model, complexity, reason) in zip(raw_products, routed):
                 product['_routing'] = {
                     'model': model,
                     'complexity': complexity,
@@ -203,6 +214,11 @@ class GPT5Pipeline:
             rl_stats = self.rate_limiter.get_status()
             self.stats['requests_throttled'] = rl_stats['stats'].get('requests_throttled', 0)
             
+            # Dedup stats (llamadas/tokens ahorrados antes del LLM)
+            dedup = get_dedup_stats()
+            self.stats['dedup_calls_saved'] = dedup['calls_saved']
+            self.stats['dedup_tokens_saved'] = dedup['tokens_saved']
+            
             # Imprimir resumen
             self._print_summary()
             
@@ -214,23 +230,47 @@ class GPT5Pipeline:
             raise
         finally:
             # Limpiar recursos
+            if self.executor is not None:
+                await self.executor.shutdown()
             if hasattr(self, 'db'):
                 self.db.close()
     
+    def _make_executor(self) -> ConcurrentExecutor:
+        """Ejecutor concurrente acotado por modelo según config"""
+        return ConcurrentExecutor(
+            rate_limiter=self.rate_limiter if self.config.get('enable_throttling', True) else None,
+            max_workers=self.config.get('max_workers', 32),
+            max_in_flight=self.config.get('max_in_flight')
+        )
+    
+    @staticmethod
+    def _routed_model(product: Dict) -> str:
+        return (product.get('_routing') or {}).get('model', 'default')
+    
+    def _log_progress(self, done: int, total: int):
+        if done % 10 == 0 or done == total:
+            logger.info(f"Progreso: {done}/{total}")
+    
     async def _process_hybrid(self, products: List[Dict]) -> List[Dict]:
         """Procesamiento híbrido: cache + batch"""
         normalized = []
         to_batch = []
         
-        for product in products:
-            # Intentar normalizar con cache
-            result = await normalize_with_gpt5(
-                product, 
-                mode=ProcessingMode.SINGLE,
-                force_model=None
-            )
-            
-            if result.get('pending_batch'):
+        # Intentar normalizar con cache (concurrente, orden preservado)
+        self.executor = self._make_executor()
+        results = await self.executor.map(
+            lambda p: normalize_with_gpt5(p, mode=ProcessingMode.SINGLE, force_model=None),
+            products,
+            model_of=self._routed_model,
+            progress=self._log_progress,
+            pace_items=False  # Solo esperan RPM los que van al LLM (pace_llm_call)
+        )
+        
+        for i, (product, result) in enumerate(zip(products, results), 1):
+            if isinstance(result, Exception):
+                logger.error(f"Error procesando producto {i}: {result}")
+                self.stats['errors'] += 1
+            elif result.get('pending_batch'):
                 to_batch.append(product)
             else:
                 normalized.append(result)
@@ -240,7 +280,9 @@ class GPT5Pipeline:
         # Procesar pendientes en batch
         if to_batch:
             logger.info(f"📦 Procesando {len(to_batch)} productos en batch...")
-            batch_results = await process_batch_gpt5(to_batch)
+            batch_results = await process_batch_gpt5(
+                to_batch, packed=self.config.get('packed_prompts', False)
+            )
             normalized.extend(batch_results)
         
         return normalized
@@ -249,27 +291,33 @@ class GPT5Pipeline:
         """Procesamiento batch puro"""
         return await process_batch_gpt5(
             products, 
-            max_batch_size=self.config['max_batch_size']
+            max_batch_size=self.config['max_batch_size'],
+            packed=self.config.get('packed_prompts', False)
         )
     
     async def _process_single(self, products: List[Dict]) -> List[Dict]:
-        """Procesamiento individual"""
+        """Procesamiento individual (concurrente, orden preservado)"""
         normalized = []
         
-        for i, product in enumerate(products, 1):
-            try:
-                result = await normalize_with_gpt5(
-                    product,
-                    mode=ProcessingMode.SINGLE
-                )
-                normalized.append(result)
-                
-                if i % 10 == 0:
-                    logger.info(f"Progreso: {i}/{len(products)}")
-                    
-            except Exception as e:
-                logger.error(f"Error procesando producto {i}: {e}")
+        self.executor = self._make_executor()
+        if self.config.get('packed_prompts', False):
+            # K productos por request; los packs corren en paralelo en el executor
+            return await process_packed_gpt5(products, executor=self.executor)
+        
+        results = await self.executor.map(
+            lambda p: normalize_with_gpt5(p, mode=ProcessingMode.SINGLE),
+            products,
+            model_of=self._routed_model,
+            progress=self._log_progress,
+            pace_items=False  # Solo esperan RPM los que van al LLM (pace_llm_call)
+        )
+        
+        for i, result in enumerate(results, 1):
+            if isinstance(result, Exception):
+                logger.error(f"Error procesando producto {i}: {result}")
                 self.stats['errors'] += 1
+            else:
+                normalized.append(result)
         
         return normalized
     
@@ -406,6 +454,7 @@ class GPT5Pipeline:
   • Duración: {duration:.1f} segundos
   • Velocidad: {self.stats['processed']/max(duration, 1):.1f} productos/segundo
   • Requests throttled: {self.stats.get('requests_throttled', 0)}
+  • Dedup: {self.stats.get('dedup_calls_saved', 0)} llamadas / ~{self.stats.get('dedup_tokens_saved', 0)} tokens ahorrados
         """)
 
 
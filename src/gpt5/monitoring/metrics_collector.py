@@ -3,18 +3,30 @@
 """
 📊 GPT-5 Metrics Collector
 Sistema de monitoreo y métricas para tracking de costos, performance y calidad
+
+Memoria constante en procesos de larga vida: los requests recientes viven en
+ring buffers, las latencias en histogramas log-lineales (percentiles sin
+guardar muestras) y costos/errores en contadores por hora y día con
+retención fija.
 """
 
 from __future__ import annotations
+import math
 import time
 import json
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Iterable, Tuple
 from dataclasses import dataclass, asdict
 from datetime import datetime, timedelta
-from collections import defaultdict
+from collections import defaultdict, deque, OrderedDict
+from itertools import islice
 import logging
 from pathlib import Path
 
+try:
+    from ...telemetry import get_registry
+except ImportError:
+    from telemetry import get_registry
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -47,21 +59,179 @@ class BatchMetric:
     success_rate: float
 
 
+class LatencyHistogram:
+    """
+    Histograma log-lineal (estilo HDR) para percentiles con memoria acotada
+    
+    Cada bucket cubre [base^(i-1), base^i) con base = 1 + 2·precision, así el
+    valor representativo tiene error relativo ≤ precision. Los conteos son
+    dispersos: entre 1ms y 1h hay a lo sumo ~800 buckets, sin importar
+    cuántos requests se registren.
+    """
+    
+    def __init__(self, precision: float = 0.01, max_value: float = 3_600_000):
+        self.precision = precision
+        self.max_value = max_value
+        self._log_base = math.log(1 + 2 * precision)
+        self._max_index = self._index(max_value)
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+        self._cache: Dict[float, float] = {}
+    
+    def _index(self, value: float) -> int:
+        if value <= 1:
+            return 0
+        return int(math.log(value) / self._log_base) + 1
+    
+    def record(self, value: float, n: int = 1):
+        """Registrar un valor (ms) n veces"""
+        idx = min(self._index(value), self._max_index)
+        self.counts[idx] = self.counts.get(idx, 0) + n
+        self.count += n
+        self.total += value * n
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        self._cache.clear()
+    
+    def percentiles(self, qs: Iterable[float] = (50, 95, 99)) -> Dict[float, float]:
+        """Percentiles en una pasada sobre los buckets (cacheados hasta el próximo record)"""
+        qs = tuple(qs)
+        missing = [q for q in qs if q not in self._cache]
+        if missing and self.count:
+            targets = sorted((max(1, math.ceil(q / 100 * self.count)), q) for q in missing)
+            seen, t = 0, 0
+            for idx in sorted(self.counts):
+                seen += self.counts[idx]
+                while t < len(targets) and seen >= targets[t][0]:
+                    # Punto medio geométrico del bucket, acotado al rango observado
+                    value = math.exp((idx - 0.5) * self._log_base) if idx else 1.0
+                    self._cache[targets[t][1]] = min(max(value, self.min), self.max)
+                    t += 1
+        return {q: self._cache.get(q, 0.0) for q in qs}
+    
+    def percentile(self, q: float) -> float:
+        return self.percentiles((q,))[q]
+    
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+    
+    def summary(self) -> Dict[str, float]:
+        """p50/p95/p99 + media, redondeados para reportes"""
+        p = self.percentiles((50, 95, 99))
+        return {'p50': round(p[50], 2), 'p95': round(p[95], 2), 'p99': round(p[99], 2),
+                'mean': round(self.mean, 2), 'count': self.count}
+    
+    def merge(self, other: 'LatencyHistogram'):
+        """Sumar otro histograma con la misma precisión"""
+        for idx, n in other.counts.items():
+            self.counts[idx] = self.counts.get(idx, 0) + n
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._cache.clear()
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Forma compacta para persistir (solo buckets con conteo)"""
+        return {'precision': self.precision, 'count': self.count, 'total': self.total,
+                'min': self.min if self.count else None, 'max': self.max,
+                'counts': {str(k): v for k, v in sorted(self.counts.items())}}
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'LatencyHistogram':
+        hist = cls(precision=data.get('precision', 0.01))
+        hist.counts = {int(k): v for k, v in data.get('counts', {}).items()}
+        hist.count = data.get('count', sum(hist.counts.values()))
+        hist.total = data.get('total', 0.0)
+        hist.min = data['min'] if data.get('min') is not None else math.inf
+        hist.max = data.get('max', 0.0)
+        return hist
+
+
+class TimeBuckets:
+    """
+    Contadores por hora o día (hora local) con retención fija
+    
+    Las claves tienen el formato histórico ("%Y-%m-%d_%H" / "%Y-%m-%d"); al
+    abrir un bucket nuevo se descartan los más antiguos que `retention`.
+    """
+    
+    FORMATS = {'hour': "%Y-%m-%d_%H", 'day': "%Y-%m-%d"}
+    
+    def __init__(self, unit: str = 'hour', retention: int = 168):
+        self.unit = unit
+        self.fmt = self.FORMATS[unit]
+        self.retention = retention
+        self.buckets: 'OrderedDict[str, Dict[str, float]]' = OrderedDict()
+        self._current: Optional[Dict[str, float]] = None
+        self._until = 0.0
+    
+    def _open(self, ts: float) -> Dict[str, float]:
+        start = datetime.fromtimestamp(ts).replace(minute=0, second=0, microsecond=0)
+        if self.unit == 'day':
+            start = start.replace(hour=0)
+        self._until = (start + (timedelta(days=1) if self.unit == 'day' else timedelta(hours=1))).timestamp()
+        key = start.strftime(self.fmt)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = defaultdict(float)
+            while len(self.buckets) > self.retention:
+                self.buckets.popitem(last=False)
+        self._current = bucket
+        return bucket
+    
+    def add(self, ts: float, **values: float):
+        """Sumar valores al bucket de `ts` (la clave solo se recalcula al cambiar de bucket)"""
+        bucket = self._current if self._current is not None and ts < self._until else self._open(ts)
+        for name, value in values.items():
+            bucket[name] += value
+    
+    def get(self, key: str, field: str, default: float = 0.0) -> float:
+        bucket = self.buckets.get(key)
+        return bucket.get(field, default) if bucket else default
+    
+    def series(self, field: str) -> Dict[str, float]:
+        return {key: bucket.get(field, 0.0) for key, bucket in self.buckets.items()}
+    
+    def last(self, n: int) -> List[Tuple[str, Dict[str, float]]]:
+        """Los n buckets más recientes, del más antiguo al más nuevo"""
+        return list(self.buckets.items())[-n:]
+    
+    def load(self, field: str, values: Dict[str, float]):
+        """Restaurar una serie persistida (orden cronológico por clave)"""
+        for key in sorted(values):
+            self.buckets.setdefault(key, defaultdict(float))[field] = values[key]
+        while len(self.buckets) > self.retention:
+            self.buckets.popitem(last=False)
+        self._current = None
+
+
 class MetricsCollector:
     """
     Colector centralizado de métricas para GPT-5
+    
+    Memoria constante: ring buffers para requests/batches recientes,
+    histogramas de latencia por modelo y contadores horarios/diarios.
     """
     
-    def __init__(self, persist_path: str = "out/metrics"):
+    def __init__(self, persist_path: str = "out/metrics", ring_size: int = 1000,
+                 batch_ring_size: int = 100, hourly_retention: int = 168,
+                 daily_retention: int = 400, latency_precision: float = 0.01):
+        self.latency_precision = latency_precision
         self.metrics = {
-            'requests': [],
-            'batches': [],
+            'requests': deque(maxlen=ring_size),
+            'batches': deque(maxlen=batch_ring_size),
             'models': defaultdict(lambda: {
                 'total_requests': 0,
                 'total_tokens': 0,
                 'total_cost': 0.0,
                 'avg_latency': 0.0,
-                'success_rate': 0.0
+                'success_rate': 0.0,
+                'success_count': 0
             }),
             'cache': {
                 'hits': 0,
@@ -69,12 +239,29 @@ class MetricsCollector:
                 'semantic_hits': 0
             },
             'costs': {
-                'hourly': defaultdict(float),
-                'daily': defaultdict(float),
+                'hourly': TimeBuckets('hour', hourly_retention),
+                'daily': TimeBuckets('day', daily_retention),
                 'total': 0.0
-            }
+            },
+            'latency': LatencyHistogram(latency_precision),
+            'model_latency': defaultdict(lambda: LatencyHistogram(latency_precision)),
+            'total_requests': 0,
+            'total_batches': 0
         }
         
+        # Exposición Prometheus (registro del proceso, compartido entre colectores)
+        registry = get_registry()
+        self._prom_requests = registry.counter(
+            "llm_requests", "Requests LLM por modelo y estado", ("model", "status"))
+        self._prom_latency = registry.histogram(
+            "llm_request_duration_seconds", "Latencia de requests LLM", ("model",))
+        self._prom_tokens = registry.counter(
+            "llm_request_tokens", "Tokens consumidos por modelo", ("model",))
+        self._prom_cost = registry.counter(
+            "llm_cost_usd", "Costo acumulado en USD por modelo", ("model",))
+        self._prom_cache = registry.counter(
+            "cache_requests", "Consultas a cache por tier y resultado", ("tier", "result"))
+        
         self.persist_path = Path(persist_path)
         self.persist_path.mkdir(parents=True, exist_ok=True)
         
@@ -85,10 +272,10 @@ class MetricsCollector:
                      cost: float, cache_hit: bool = False, batch: bool = False,
                      complexity: float = 0.5, success: bool = True, 
                      error: str = None):
-        """Registra métrica de request individual"""
-        
+        """Registra métrica de request individual (O(1), memoria acotada)"""
+        now = time.time()
         metric = RequestMetric(
-            timestamp=time.time(),
+            timestamp=now,
             model=model,
             latency_ms=latency_ms,
             tokens_used=tokens,
@@ -101,24 +288,22 @@ class MetricsCollector:
         )
         
         self.metrics['requests'].append(metric)
+        self.metrics['total_requests'] += 1
         
         # Actualizar agregados por modelo
         model_stats = self.metrics['models'][model]
         model_stats['total_requests'] += 1
         model_stats['total_tokens'] += tokens
         model_stats['total_cost'] += cost
-        
-        # Actualizar latencia promedio
         n = model_stats['total_requests']
-        model_stats['avg_latency'] = (
-            (model_stats['avg_latency'] * (n - 1) + latency_ms) / n
-        )
-        
-        # Actualizar success rate
+        model_stats['avg_latency'] += (latency_ms - model_stats['avg_latency']) / n
         if success:
-            success_count = model_stats.get('success_count', 0) + 1
-            model_stats['success_count'] = success_count
-            model_stats['success_rate'] = success_count / n
+            model_stats['success_count'] += 1
+        model_stats['success_rate'] = model_stats['success_count'] / n
+        
+        # Percentiles de latencia (global y por modelo)
+        self.metrics['latency'].record(latency_ms)
+        self.metrics['model_latency'][model].record(latency_ms)
         
         # Actualizar cache stats
         if cache_hit:
@@ -126,8 +311,19 @@ class MetricsCollector:
         else:
             self.metrics['cache']['misses'] += 1
         
-        # Actualizar costos
-        self._update_costs(cost)
+        self._prom_requests.labels(model, "success" if success else "error").inc()
+        self._prom_latency.labels(model).observe(latency_ms / 1000)
+        self._prom_tokens.labels(model).inc(tokens)
+        self._prom_cost.labels(model).inc(cost)
+        self._prom_cache.labels("llm_response", "hit" if cache_hit else "miss").inc()
+        
+        # Contadores horarios (tendencias) y costos
+        self.metrics['costs']['hourly'].add(
+            now, cost=cost, requests=1, tokens=tokens, latency_sum=latency_ms,
+            cache_hits=int(cache_hit), errors=int(not success)
+        )
+        self.metrics['costs']['daily'].add(now, cost=cost)
+        self.metrics['costs']['total'] += cost
         
         # Log si es significativo
         if cost > 0.1:  # Más de 10 centavos
@@ -150,34 +346,31 @@ class MetricsCollector:
         )
         
         self.metrics['batches'].append(metric)
+        self.metrics['total_batches'] += 1
         
         # Log batch completion
         logger.info(f"📦 Batch completed: {product_count} products, ${cost:.2f}, {success_rate:.1%} success")
     
-    def _update_costs(self, cost: float):
-        """Actualiza tracking de costos"""
-        now = datetime.now()
-        
-        # Costo por hora
-        hour_key = now.strftime("%Y-%m-%d_%H")
-        self.metrics['costs']['hourly'][hour_key] += cost
-        
-        # Costo por día
-        day_key = now.strftime("%Y-%m-%d")
-        self.metrics['costs']['daily'][day_key] += cost
-        
-        # Costo total
-        self.metrics['costs']['total'] += cost
+    def _recent(self, n: int) -> List[RequestMetric]:
+        """Últimos n requests del ring buffer (sin copiar el buffer completo)"""
+        return list(islice(reversed(self.metrics['requests']), n))
+    
+    def get_latency_percentiles(self, model: str = None) -> Dict[str, float]:
+        """p50/p95/p99 de latencia (ms), global o por modelo"""
+        if model is None:
+            return self.metrics['latency'].summary()
+        hist = self.metrics['model_latency'].get(model)
+        return hist.summary() if hist else LatencyHistogram(self.latency_precision).summary()
     
     def get_current_stats(self) -> Dict[str, Any]:
         """Obtiene estadísticas actuales"""
         
-        total_requests = len(self.metrics['requests'])
+        total_requests = self.metrics['total_requests']
         if total_requests == 0:
             return {'message': 'No metrics collected yet'}
         
         # Calcular estadísticas agregadas
-        recent_requests = [r for r in self.metrics['requests'][-100:]]  # Últimas 100
+        recent_requests = self._recent(100)  # Últimas 100
         
         avg_latency = sum(r.latency_ms for r in recent_requests) / len(recent_requests)
         cache_hit_rate = self.metrics['cache']['hits'] / max(
@@ -192,19 +385,21 @@ class MetricsCollector:
                     'requests': stats['total_requests'],
                     'percentage': stats['total_requests'] / total_requests * 100,
                     'avg_latency_ms': stats['avg_latency'],
+                    'latency_ms': self.get_latency_percentiles(model),
                     'total_cost': stats['total_cost'],
                     'success_rate': stats['success_rate']
                 }
         
         # Costos
         now = datetime.now()
-        today_cost = self.metrics['costs']['daily'].get(now.strftime("%Y-%m-%d"), 0.0)
-        hour_cost = self.metrics['costs']['hourly'].get(now.strftime("%Y-%m-%d_%H"), 0.0)
+        today_cost = self.metrics['costs']['daily'].get(now.strftime("%Y-%m-%d"), 'cost')
+        hour_cost = self.metrics['costs']['hourly'].get(now.strftime("%Y-%m-%d_%H"), 'cost')
         
         return {
             'total_requests': total_requests,
-            'total_batches': len(self.metrics['batches']),
+            'total_batches': self.metrics['total_batches'],
             'avg_latency_ms': round(avg_latency, 2),
+            'latency_ms': self.get_latency_percentiles(),
             'cache_hit_rate': round(cache_hit_rate, 3),
             'model_distribution': model_distribution,
             'costs': {
@@ -221,44 +416,31 @@ class MetricsCollector:
         period: 'hourly', 'daily'
         """
         if period == "hourly":
-            costs = dict(self.metrics['costs']['hourly'])
+            costs = self.metrics['costs']['hourly'].series('cost')
         else:
-            costs = dict(self.metrics['costs']['daily'])
+            costs = self.metrics['costs']['daily'].series('cost')
         
         # Ordenar por fecha
         return dict(sorted(costs.items()))
     
     def get_performance_trends(self, hours: int = 24) -> Dict[str, Any]:
-        """Obtiene tendencias de performance"""
-        
-        cutoff = time.time() - (hours * 3600)
-        recent = [r for r in self.metrics['requests'] if r.timestamp > cutoff]
+        """Obtiene tendencias de performance (desde los contadores horarios)"""
+        
+        cutoff = (datetime.now() - timedelta(hours=hours)).strftime("%Y-%m-%d_%H")
+        hourly_stats = {}
+        for hour, bucket in self.metrics['costs']['hourly'].last(hours + 1):
+            if hour < cutoff or not bucket.get('requests'):
+                continue
+            hourly_stats[hour] = {
+                'requests': int(bucket['requests']),
+                'avg_latency': bucket['latency_sum'] / bucket['requests'],
+                'cache_hits': int(bucket['cache_hits']),
+                'errors': int(bucket['errors'])
+            }
         
-        if not recent:
+        if not hourly_stats:
             return {'message': f'No data in last {hours} hours'}
-        
-        # Agrupar por hora
-        hourly_stats = defaultdict(lambda: {
-            'requests': 0,
-            'avg_latency': 0.0,
-            'cache_hits': 0,
-            'errors': 0
-        })
-        
-        for req in recent:
-            hour = datetime.fromtimestamp(req.timestamp).strftime("%Y-%m-%d_%H")
-            stats = hourly_stats[hour]
-            stats['requests'] += 1
-            stats['avg_latency'] = (
-                (stats['avg_latency'] * (stats['requests'] - 1) + req.latency_ms) 
-                / stats['requests']
-            )
-            if req.cache_hit:
-                stats['cache_hits'] += 1
-            if not req.success:
-                stats['errors'] += 1
-        
-        return dict(hourly_stats)
+        return hourly_stats
     
     def check_alerts(self) -> List[Dict[str, Any]]:
         """Verifica condiciones de alerta"""
@@ -267,7 +449,7 @@ class MetricsCollector:
         
         # Alerta de costo alto
         hour_cost = self.metrics['costs']['hourly'].get(
-            datetime.now().strftime("%Y-%m-%d_%H"), 0.0
+            datetime.now().strftime("%Y-%m-%d_%H"), 'cost'
         )
         if hour_cost > 10.0:  # Más de $10 USD/hora
             alerts.append({
@@ -278,7 +460,7 @@ class MetricsCollector:
             })
         
         # Alerta de latencia alta
-        recent = [r for r in self.metrics['requests'][-20:]]
+        recent = self._recent(20)
         if recent:
             avg_latency = sum(r.latency_ms for r in recent) / len(recent)
             if avg_latency > 5000:  # Más de 5 segundos
@@ -302,26 +484,30 @@ class MetricsCollector:
         return alerts
     
     def save_metrics(self):
-        """Persiste métricas a disco"""
+        """Persiste métricas a disco (ring buffers + agregados compactos)"""
         
         # Convertir dataclasses a dict para serialización
         data = {
-            'requests': [asdict(r) for r in self.metrics['requests'][-1000:]],  # Últimas 1000
-            'batches': [asdict(b) for b in self.metrics['batches'][-100:]],  # Últimos 100
+            'requests': [asdict(r) for r in self.metrics['requests']],
+            'batches': [asdict(b) for b in self.metrics['batches']],
             'models': dict(self.metrics['models']),
             'cache': self.metrics['cache'],
             'costs': {
-                'hourly': dict(self.metrics['costs']['hourly']),
-                'daily': dict(self.metrics['costs']['daily']),
+                'hourly': self.metrics['costs']['hourly'].series('cost'),
+                'daily': self.metrics['costs']['daily'].series('cost'),
                 'total': self.metrics['costs']['total']
             },
+            'latency': self.metrics['latency'].to_dict(),
+            'model_latency': {m: h.to_dict() for m, h in self.metrics['model_latency'].items()},
+            'totals': {'requests': self.metrics['total_requests'],
+                       'batches': self.metrics['total_batches']},
             'saved_at': datetime.now().isoformat()
         }
         
         file_path = self.persist_path / f"metrics_{datetime.now().strftime('%Y%m%d')}.json"
         
         with open(file_path, 'w') as f:
-            json.dump(data, f, indent=2, default=str)
+            json.dump(data, f, default=str)
         
         logger.info(f"💾 Metrics saved to {file_path}")
     
@@ -336,8 +522,16 @@ class MetricsCollector:
                     data = json.load(f)
                 
                 # Restaurar costos históricos
-                self.metrics['costs']['daily'] = defaultdict(float, data.get('costs', {}).get('daily', {}))
-                self.metrics['costs']['total'] = data.get('costs', {}).get('total', 0.0)
+                costs = data.get('costs', {})
+                self.metrics['costs']['daily'].load('cost', costs.get('daily', {}))
+                self.metrics['costs']['hourly'].load('cost', costs.get('hourly', {}))
+                self.metrics['costs']['total'] = costs.get('total', 0.0)
+                
+                # Restaurar histogramas de latencia
+                if data.get('latency'):
+                    self.metrics['latency'] = LatencyHistogram.from_dict(data['latency'])
+                for model, hist in data.get('model_latency', {}).items():
+                    self.metrics['model_latency'][model] = LatencyHistogram.from_dict(hist)
                 
                 logger.info(f"📈 Loaded historical metrics from {today_file}")
                 
@@ -348,6 +542,7 @@ class MetricsCollector:
         """Genera reporte formateado de métricas"""
         
         stats = self.get_current_stats()
+        latency = stats.get('latency_ms', {})
         
         report = f"""
 📊 GPT-5 METRICS REPORT
@@ -357,6 +552,7 @@ class MetricsCollector:
 - Total Requests: {stats.get('total_requests', 0):,}
 - Total Batches: {stats.get('total_batches', 0):,}
 - Avg Latency: {stats.get('avg_latency_ms', 0):.2f}ms
+- Latency p50/p95/p99: {latency.get('p50', 0):.0f}/{latency.get('p95', 0):.0f}/{latency.get('p99', 0):.0f}ms
 - Cache Hit Rate: {stats.get('cache_hit_rate', 0):.1%}
 
 💰 COSTS
@@ -12,10 +12,30 @@ from enum import Enum
 import json
 import logging
 
+try:
+    from .prompt_templates import CompiledTemplate
+except ImportError:
+    from gpt5.prompt_templates import CompiledTemplate
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+# max_completion_tokens por request empaquetado (si la BD no trae config del modelo)
+PACKED_MAX_COMPLETION_TOKENS = {
+    "gpt-5-mini": 4000,
+    "gpt-5": 8000,
+    "gpt-4o-mini": 4000,
+    "gpt-4o": 4000,
+}
+PACKED_ITEM_OUTPUT_OVERHEAD = 45  # llaves JSON + attributes + confidence por item
+PACKED_MAX_ITEMS = 25
+PACKED_OUTPUT_SAFETY = 0.8        # margen para no truncar la respuesta
+
+# Valor de cada campo cuando el producto no lo trae
+TEMPLATE_DEFAULTS = {"name": "", "category": "general", "price": 0, "retailer": "", "sku": ""}
+
+
 class PromptStyle(Enum):
     """Estilos de prompt según complejidad"""
     MINIMAL = "minimal"  # Ultra-compacto para GPT-5-mini
@@ -39,23 +59,28 @@ class PromptOptimizer:
             PromptStyle.BATCH: 40  # Ultra-optimizado para batch
         }
     
-    def _load_templates(self) -> Dict[str, Dict[str, str]]:
-        """Carga templates optimizados por modelo y estilo"""
+    def _load_templates(self) -> Dict[str, Dict[PromptStyle, CompiledTemplate]]:
+        """Carga y compila (una vez) los templates por modelo y estilo"""
+        standard = self._compile(self._get_standard_template())
         return {
             "gpt-5-mini": {
-                PromptStyle.MINIMAL: self._get_minimal_template(),
-                PromptStyle.STANDARD: self._get_standard_template(),
-                PromptStyle.BATCH: self._get_batch_template()
+                PromptStyle.MINIMAL: self._compile(self._get_minimal_template()),
+                PromptStyle.STANDARD: standard,
+                PromptStyle.BATCH: self._compile(self._get_batch_template())
             },
             "gpt-5": {
-                PromptStyle.STANDARD: self._get_standard_template(),
-                PromptStyle.DETAILED: self._get_detailed_template()
+                PromptStyle.STANDARD: standard,
+                PromptStyle.DETAILED: self._compile(self._get_detailed_template())
             },
             "gpt-4o-mini": {
-                PromptStyle.STANDARD: self._get_legacy_template()
+                PromptStyle.STANDARD: self._compile(self._get_legacy_template())
             }
         }
     
+    def _compile(self, source: str) -> CompiledTemplate:
+        """Template compilado con limpieza de valores para reducir tokens"""
+        return CompiledTemplate(source, defaults=TEMPLATE_DEFAULTS, cleaner=self._clean_value)
+    
     def _get_minimal_template(self) -> str:
         """
         Template ultra-minimalista para GPT-5-mini
@@ -146,18 +171,27 @@ JSON: {{brand, model, attributes: {{capacity, color}}, confidence}}"""
         """
         Genera prompt optimizado según modelo y complejidad
         """
+        template = self.get_template(product, model, style)
+        if template is None:
+            return ""
+        
+        # Formatear con datos del producto
+        return template.render(product)
+    
+    def get_template(self, product: Dict[str, Any], model: str,
+                     style: Optional[PromptStyle] = None) -> Optional[CompiledTemplate]:
+        """Template compilado para el producto (None si el modelo no tiene templates)"""
         # Determinar estilo si no se especifica
         if style is None:
             style = self._determine_style(product, model)
         
         # Obtener template
-        template = self.templates.get(model, {}).get(style)
-        if not template:
+        model_templates = self.templates.get(model, {})
+        template = model_templates.get(style)
+        if template is None:
             # Fallback a standard
-            template = self.templates.get(model, {}).get(PromptStyle.STANDARD, "")
-        
-        # Formatear con datos del producto
-        return self._format_template(template, product)
+            template = model_templates.get(PromptStyle.STANDARD)
+        return template
     
     def _determine_style(self, product: Dict[str, Any], model: str) -> PromptStyle:
         """
@@ -186,29 +220,6 @@ JSON: {{brand, model, attributes: {{capacity, color}}, confidence}}"""
         # Default
         return PromptStyle.STANDARD
     
-    def _format_template(self, template: str, product: Dict[str, Any]) -> str:
-        """
-        Formatea template con datos del producto
-        Maneja valores faltantes elegantemente
-        """
-        # Preparar datos con defaults
-        data = {
-            'name': product.get('name', ''),
-            'category': product.get('category', 'general'),
-            'price': product.get('price', 0),
-            'retailer': product.get('retailer', ''),
-            'sku': product.get('sku', ''),
-        }
-        
-        # Limpiar datos para reducir tokens
-        data = {k: self._clean_value(v) for k, v in data.items()}
-        
-        try:
-            return template.format(**data)
-        except KeyError as e:
-            logger.warning(f"Missing key in template: {e}")
-            return template.format_map(DefaultDict(data))
-    
     def _clean_value(self, value: Any) -> str:
         """
         Limpia valores para minimizar tokens
@@ -262,6 +273,48 @@ JSON: {{brand, model, attributes: {{capacity, color}}, confidence}}"""
         
         return int(base_estimate * style_multiplier.get(style, 1.0))
     
+    def estimate_prompt_tokens(self, product: Dict[str, Any], model: str,
+                               style: Optional[PromptStyle] = None) -> int:
+        """
+        Tokens del prompt sin construirlo: parte estática cacheada en el
+        template compilado + solo los campos del producto
+        """
+        template = self.get_template(product, model, style)
+        return template.estimate_tokens(product) if template is not None else 0
+    
+    def estimate_packed_item_tokens(self, product: Dict[str, Any]) -> int:
+        """Tokens de salida estimados para un item empaquetado (nombre normalizado + campos)"""
+        name = self._clean_value(product.get('name', ''))
+        return PACKED_ITEM_OUTPUT_OVERHEAD + 2 * self.estimate_tokens(name, PromptStyle.STANDARD)
+    
+    def pack_products(self, products: List[Dict[str, Any]], model: str,
+                      max_completion_tokens: Optional[int] = None,
+                      max_items: int = PACKED_MAX_ITEMS) -> List[List[int]]:
+        """
+        Agrupa productos en packs de K adaptativo para un solo request
+        
+        K crece mientras la salida estimada (estimate_tokens por item) quepa en
+        max_completion_tokens con margen de seguridad.
+        
+        Returns:
+            Lista de packs, cada uno con los índices de `products`
+        """
+        budget = int((max_completion_tokens or PACKED_MAX_COMPLETION_TOKENS.get(model, 4000))
+                     * PACKED_OUTPUT_SAFETY)
+        packs: List[List[int]] = []
+        current: List[int] = []
+        used = 0
+        for i, product in enumerate(products):
+            cost = self.estimate_packed_item_tokens(product)
+            if current and (used + cost > budget or len(current) >= max_items):
+                packs.append(current)
+                current, used = [], 0
+            current.append(i)
+            used += cost
+        if current:
+            packs.append(current)
+        return packs
+    
     def get_system_prompt(self, model: str, context: str = "retail_cl") -> str:
         """
         Obtiene system prompt optimizado por modelo
@@ -315,15 +368,6 @@ JSON: {{brand, model, attributes: {{capacity, color}}, confidence}}"""
         return examples.get(category, [])
 
 
-class DefaultDict(dict):
-    """Helper para template formatting con defaults"""
-    def __init__(self, data):
-        super().__init__(data)
-    
-    def __missing__(self, key):
-        return ""
-
-
 if __name__ == "__main__":
     # Test del optimizador
     optimizer = PromptOptimizer()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧩 Plantillas de prompt compiladas
+Cada plantilla str.format se analiza una sola vez: campos, defaults y prefijo
+estático quedan resueltos, y los tokens de las partes estáticas se cuentan una
+vez. El prefijo (todo lo anterior al primer campo) y el system prompt son
+byte-idénticos entre productos, lo que habilita el prompt caching del proveedor.
+"""
+
+import json
+from json.encoder import encode_basestring
+from string import Formatter
+from typing import Any, Callable, Dict, Optional, Tuple
+
+try:
+    import tiktoken
+except ImportError:  # Opcional: sin tiktoken se usa la heurística de caracteres
+    tiktoken = None
+
+CHARS_PER_TOKEN = 4.0
+
+_encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """Tokens de un texto (tiktoken o_200k si está instalado; si no ~4 caracteres/token)"""
+    global _encoding
+    if not text:
+        return 0
+    if tiktoken is not None:
+        if _encoding is None:
+            _encoding = tiktoken.get_encoding("o200k_base")
+        return len(_encoding.encode(text))
+    return max(1, round(len(text) / CHARS_PER_TOKEN))
+
+
+class CompiledTemplate:
+    """
+    Plantilla str.format resuelta una vez, con render rápido y tokens estáticos cacheados
+
+    Al compilar se genera una función con un f-string equivalente a la plantilla
+    (un dict.get por campo), así el render por producto no vuelve a parsear la
+    plantilla ni arma diccionarios intermedios.
+    """
+
+    __slots__ = ("source", "defaults", "options", "cleaner", "fields", "prefix",
+                 "static_text", "static_tokens", "_specs", "_literals", "_render", "_render_json")
+
+    def __init__(self, source: str, defaults: Optional[Dict[str, Any]] = None,
+                 options: Optional[Dict[str, Any]] = None,
+                 cleaner: Optional[Callable[[Any], str]] = None):
+        """
+        Args:
+            source: Plantilla str.format ({{ }} para llaves literales)
+            defaults: Valor por campo cuando el producto no lo trae
+            options: Campos que vienen de los kwargs del render (no del producto), con su default
+            cleaner: Normalización opcional aplicada a cada valor antes de formatear
+        """
+        self.source = source
+        self.defaults = dict(defaults or {})
+        self.options = dict(options or {})
+        self.cleaner = cleaner
+
+        literals, specs = [], []
+        prefix = None
+        for literal, field, spec, conversion in Formatter().parse(source):
+            literals.append(literal)
+            if field is None:
+                continue
+            if not field.isidentifier() or conversion or "{" in (spec or ""):
+                raise ValueError(f"Campo no soportado en plantilla compilada: {field!r}")
+            if prefix is None:
+                prefix = "".join(literals)
+            specs.append((field, spec or ""))
+        self.fields: Tuple[str, ...] = tuple(dict.fromkeys(f for f, _ in specs))
+        self._specs = tuple(specs)
+        # Texto estático: lo que format() produce sin campos ({{ → {)
+        self.static_text = "".join(literals)
+        self.prefix = self.static_text if prefix is None else prefix
+        self.static_tokens = count_tokens(self.static_text)
+        self._literals = tuple(literals)
+        self._render = self._build_render()
+        self._render_json = None
+
+    def _build_render(self, escape: bool = False) -> Callable[[Dict[str, Any], Dict[str, Any]], str]:
+        """
+        Función render(product, extra) con un f-string equivalente a la plantilla
+
+        Con escape=True el resultado es el contenido de un string JSON: los
+        literales se escapan al compilar y solo se escapan los valores.
+        """
+        namespace: Dict[str, Any] = {"_clean": self.cleaner, "_esc": encode_basestring}
+        parts = []
+        for i, literal in enumerate(self._literals):
+            if escape:
+                literal = encode_basestring(literal)[1:-1]
+            parts.append(literal.replace("{", "{{").replace("}", "}}"))
+            if i >= len(self._specs):
+                continue
+            field, spec = self._specs[i]
+            namespace[f"_k{i}"] = field
+            if field in self.options:
+                namespace[f"_d{i}"] = self.options[field]
+                expr = f"extra_get(_k{i}, _d{i})"
+            else:
+                namespace[f"_d{i}"] = self.defaults.get(field, "")
+                expr = f"get(_k{i}, _d{i})"
+            if self.cleaner is not None:
+                expr = f"_clean({expr})"
+            if escape:
+                namespace[f"_s{i}"] = spec
+                parts.append("{_esc(format(" + expr + f", _s{i}))[1:-1]}}")
+            else:
+                parts.append("{" + expr + (":" + spec if spec else "") + "}")
+        code = (
+            "def render(product, extra):\n"
+            "    get = product.get\n"
+            "    extra_get = extra.get\n"
+            f"    return f{''.join(parts)!r}\n"
+        )
+        exec(code, namespace)
+        return namespace["render"]
+
+    def _value(self, field: str, product: Dict[str, Any], extra: Dict[str, Any]) -> Any:
+        if field in self.options:
+            value = extra.get(field, self.options[field])
+        else:
+            value = product.get(field, self.defaults.get(field, ""))
+        return self.cleaner(value) if self.cleaner is not None else value
+
+    def render(self, product: Dict[str, Any], **extra) -> str:
+        """Prompt del producto (`extra` solo alimenta los campos de `options`)"""
+        return self._render(product, extra)
+
+    def render_json(self, product: Dict[str, Any], **extra) -> str:
+        """render() ya escapado como contenido de string JSON (sin comillas)"""
+        if self._render_json is None:
+            self._render_json = self._build_render(escape=True)
+        return self._render_json(product, extra)
+
+    def estimate_tokens(self, product: Dict[str, Any], **extra) -> int:
+        """Tokens del prompt: estáticos cacheados + solo los campos dinámicos"""
+        return self.static_tokens + sum(
+            count_tokens(format(self._value(field, product, extra), spec)) for field, spec in self._specs)
+
+    def __repr__(self) -> str:
+        return f"CompiledTemplate(fields={self.fields}, static_tokens={self.static_tokens})"
+
+
+class ChatRequestTemplate:
+    """
+    Línea JSONL de Batch API con las partes fijas serializadas una sola vez
+
+    Produce exactamente json.dumps(request, ensure_ascii=False) pero por
+    producto solo serializa custom_id y el prompt de usuario.
+    """
+
+    def __init__(self, model: str, system_prompt: str, max_completion_tokens: int,
+                 temperature: float = 0.1, response_format: Optional[Dict[str, Any]] = None):
+        self.model = model
+        self.system_prompt = system_prompt
+        self.system_tokens = count_tokens(system_prompt)
+        body_tail = {
+            "temperature": temperature,
+            "max_completion_tokens": max_completion_tokens,
+            "response_format": response_format or {"type": "json_object"},
+        }
+        self._head = '{"custom_id": '
+        self._mid = (
+            ', "method": "POST", "url": "/v1/chat/completions", "body": {"model": '
+            + json.dumps(model, ensure_ascii=False)
+            + ', "messages": [{"role": "system", "content": '
+            + json.dumps(system_prompt, ensure_ascii=False)
+            + '}, {"role": "user", "content": '
+        )
+        self._tail = "}], " + json.dumps(body_tail, ensure_ascii=False)[1:] + "}"
+
+    def render_line(self, custom_id: str, prompt: str) -> str:
+        """Request serializado (sin salto de línea)"""
+        return (self._head + encode_basestring(custom_id) + self._mid
+                + encode_basestring(prompt) + self._tail)
+
+    def render_product_line(self, custom_id: str, template: CompiledTemplate,
+                            product: Dict[str, Any], **extra) -> str:
+        """Como render_line, escapando solo los campos del producto (estáticos ya escapados)"""
+        return (self._head + encode_basestring(custom_id) + self._mid
+                + '"' + template.render_json(product, **extra) + '"' + self._tail)
@@ -5,8 +5,14 @@
 Prompts por modelo, categoría y modo de procesamiento
 """
 
+import json
 from enum import Enum
-from typing import Dict, Any
+from typing import Dict, Any, List, Tuple
+
+try:
+    from .prompt_templates import CompiledTemplate
+except ImportError:
+    from gpt5.prompt_templates import CompiledTemplate
 
 class PromptMode(Enum):
     """Modos de prompt según contexto"""
@@ -15,6 +21,13 @@ class PromptMode(Enum):
     STANDARD = "standard"    # 100 tokens - Balance calidad/costo
     DETAILED = "detailed"    # 200 tokens - Máxima precisión
     FALLBACK = "fallback"    # Variable - Corrección con contexto
+    PACKED = "packed"        # ~20 tokens/producto - K productos por request
+
+# Campos que debe traer cada item de una respuesta empaquetada
+PACKED_FIELDS = ("brand", "model", "normalized_name", "attributes", "confidence", "category_suggestion")
+
+# Valor de cada campo cuando el producto no lo trae
+PRODUCT_DEFAULTS = {"name": "", "category": "", "price": 0, "retailer": "", "sku": "N/A"}
 
 class PromptManager:
     """Gestor de prompts optimizados por modelo y categoría"""
@@ -34,8 +47,8 @@ class PromptManager:
         }
     
     def _init_prompts(self):
-        """Definir todos los prompts específicos"""
-        self.prompts = {
+        """Definir y compilar todos los prompts específicos (una sola vez)"""
+        sources = {
             "gpt-5-mini": {
                 "smartphones": {
                     PromptMode.MINIMAL: self._minimal_smartphone,
@@ -77,49 +90,70 @@ class PromptManager:
                 "all": {PromptMode.FALLBACK: self._fallback_detailed}
             }
         }
+        self.prompts = {
+            model: {
+                category: {mode: self._compile(source) for mode, source in modes.items()}
+                for category, modes in categories.items()
+            }
+            for model, categories in sources.items()
+        }
+        self._default_template = self._compile(self._standard_default)
+        self._resolved: Dict[Tuple[str, str, PromptMode], CompiledTemplate] = {}
+    
+    def _compile(self, source) -> CompiledTemplate:
+        """Compilar la plantilla de un método (defaults de producto + opciones de kwargs)"""
+        return CompiledTemplate(source(), defaults=PRODUCT_DEFAULTS,
+                                options=getattr(source, "options", None))
+    
+    def get_template(self, model: str, category: str, mode: PromptMode) -> CompiledTemplate:
+        """Plantilla compilada para (modelo, categoría, modo), resuelta una vez"""
+        key = (model, category, mode)
+        template = self._resolved.get(key)
+        if template is None:
+            # Buscar prompt específico
+            model_prompts = self.prompts.get(model, {})
+            
+            # Intentar categoría específica
+            category_prompts = model_prompts.get(category, {})
+            if not category_prompts:
+                # Fallback a default o all
+                category_prompts = model_prompts.get("default", model_prompts.get("all", {}))
+            
+            # Fallback a standard
+            template = category_prompts.get(mode, self._default_template)
+            self._resolved[key] = template
+        return template
     
     def get_prompt(self, model: str, category: str, mode: PromptMode, 
                    product: Dict[str, Any], **kwargs) -> str:
         """Obtener prompt apropiado"""
-        
-        # Buscar prompt específico
-        model_prompts = self.prompts.get(model, {})
-        
-        # Intentar categoría específica
-        category_prompts = model_prompts.get(category, {})
-        if not category_prompts:
-            # Fallback a default o all
-            category_prompts = model_prompts.get("default", model_prompts.get("all", {}))
-        
-        # Obtener función de prompt
-        prompt_func = category_prompts.get(mode)
-        
-        if prompt_func:
-            return prompt_func(product, **kwargs)
-        
-        # Fallback a standard
-        return self._standard_default(product)
+        return self.get_template(model, category, mode).render(product, **kwargs)
+    
+    # ============================================================================
+    # Plantillas str.format: {{ }} son llaves literales, {name:.80} trunca a 80
+    # caracteres. Defaults de producto en PRODUCT_DEFAULTS.
+    # ============================================================================
     
     # ============================================================================
     # SMARTPHONES - Prompts
     # ============================================================================
     
-    def _minimal_smartphone(self, product: Dict, **kwargs) -> str:
+    def _minimal_smartphone(self) -> str:
         """Ultra compacto para batch masivo"""
-        return f"N:{product.get('name', '')[:80]}|C:smartphones|$:{product.get('price', 0)}"
+        return "N:{name:.80}|C:smartphones|$:{price}"
     
-    def _batch_smartphone(self, product: Dict, **kwargs) -> str:
+    def _batch_smartphone(self) -> str:
         """Optimizado para batch"""
-        return f"""Smartphone:{product.get('name', '')[:100]}[${product.get('price', 0)}]
+        return """Smartphone:{name:.100}[${price}]
 JSON:brand,model,capacity,color,screen_size,network"""
     
-    def _standard_smartphone(self, product: Dict, **kwargs) -> str:
+    def _standard_smartphone(self) -> str:
         """Balance calidad/costo"""
-        return f"""Normaliza el siguiente smartphone:
+        return """Normaliza el siguiente smartphone:
 
-PRODUCTO: "{product.get('name', '')}"
-PRECIO: ${product.get('price', 0):,} CLP
-RETAILER: "{product.get('retailer', '')}"
+PRODUCTO: "{name}"
+PRECIO: ${price:,} CLP
+RETAILER: "{retailer}"
 
 Extrae y estructura en JSON:
 {{
@@ -136,15 +170,15 @@ Extrae y estructura en JSON:
   "category_suggestion": "smartphones"
 }}"""
     
-    def _detailed_smartphone(self, product: Dict, **kwargs) -> str:
+    def _detailed_smartphone(self) -> str:
         """Análisis exhaustivo con GPT-5"""
-        return f"""Analiza exhaustivamente este smartphone del mercado chileno:
+        return """Analiza exhaustivamente este smartphone del mercado chileno:
 
 DATOS DE ENTRADA:
-- Nombre completo: "{product.get('name', '')}"
-- Precio CLP: ${product.get('price', 0):,}
-- Retailer: {product.get('retailer', '')}
-- SKU/ID: {product.get('sku', 'N/A')}
+- Nombre completo: "{name}"
+- Precio CLP: ${price:,}
+- Retailer: {retailer}
+- SKU/ID: {sku}
 
 INSTRUCCIONES DE EXTRACCIÓN:
 1. Identificar marca exacta (verificar aliases y variaciones)
@@ -176,18 +210,18 @@ ESTRUCTURA JSON REQUERIDA:
     # NOTEBOOKS - Prompts
     # ============================================================================
     
-    def _minimal_notebook(self, product: Dict, **kwargs) -> str:
-        return f"N:{product.get('name', '')[:80]}|C:notebooks|$:{product.get('price', 0)}"
+    def _minimal_notebook(self) -> str:
+        return "N:{name:.80}|C:notebooks|$:{price}"
     
-    def _batch_notebook(self, product: Dict, **kwargs) -> str:
-        return f"""Notebook:{product.get('name', '')[:100]}[${product.get('price', 0)}]
+    def _batch_notebook(self) -> str:
+        return """Notebook:{name:.100}[${price}]
 JSON:brand,model,screen_size,ram,storage,processor"""
     
-    def _standard_notebook(self, product: Dict, **kwargs) -> str:
-        return f"""Normaliza el siguiente notebook:
+    def _standard_notebook(self) -> str:
+        return """Normaliza el siguiente notebook:
 
-PRODUCTO: "{product.get('name', '')}"
-PRECIO: ${product.get('price', 0):,} CLP
+PRODUCTO: "{name}"
+PRECIO: ${price:,} CLP
 
 Estructura JSON:
 {{
@@ -204,11 +238,11 @@ Estructura JSON:
   "category_suggestion": "notebooks"
 }}"""
     
-    def _detailed_notebook(self, product: Dict, **kwargs) -> str:
-        return f"""Análisis detallado de notebook:
+    def _detailed_notebook(self) -> str:
+        return """Análisis detallado de notebook:
 
-ENTRADA: "{product.get('name', '')}"
-PRECIO: ${product.get('price', 0):,} CLP
+ENTRADA: "{name}"
+PRECIO: ${price:,} CLP
 
 Extraer TODO incluyendo:
 - Marca y línea de producto
@@ -225,18 +259,18 @@ JSON con todos los atributos detectados."""
     # SMART TV - Prompts
     # ============================================================================
     
-    def _minimal_tv(self, product: Dict, **kwargs) -> str:
-        return f"N:{product.get('name', '')[:80]}|C:smart_tv|$:{product.get('price', 0)}"
+    def _minimal_tv(self) -> str:
+        return "N:{name:.80}|C:smart_tv|$:{price}"
     
-    def _batch_tv(self, product: Dict, **kwargs) -> str:
-        return f"""TV:{product.get('name', '')[:100]}[${product.get('price', 0)}]
+    def _batch_tv(self) -> str:
+        return """TV:{name:.100}[${price}]
 JSON:brand,model,screen_size,panel,resolution"""
     
-    def _standard_tv(self, product: Dict, **kwargs) -> str:
-        return f"""Normaliza Smart TV:
+    def _standard_tv(self) -> str:
+        return """Normaliza Smart TV:
 
-"{product.get('name', '')}"
-${product.get('price', 0):,} CLP
+"{name}"
+${price:,} CLP
 
 JSON:
 {{
@@ -252,9 +286,9 @@ JSON:
   "category_suggestion": "smart_tv"
 }}"""
     
-    def _detailed_tv(self, product: Dict, **kwargs) -> str:
-        return f"""Smart TV análisis completo:
-{product.get('name', '')}
+    def _detailed_tv(self) -> str:
+        return """Smart TV análisis completo:
+{name}
 
 Extraer marca, línea, tecnología de panel, resolución, 
 smart features, HDR, audio, año si existe."""
@@ -263,18 +297,18 @@ smart features, HDR, audio, año si existe."""
     # PERFUMES - Prompts
     # ============================================================================
     
-    def _minimal_perfume(self, product: Dict, **kwargs) -> str:
-        return f"N:{product.get('name', '')[:80]}|C:perfumes|$:{product.get('price', 0)}"
+    def _minimal_perfume(self) -> str:
+        return "N:{name:.80}|C:perfumes|$:{price}"
     
-    def _batch_perfume(self, product: Dict, **kwargs) -> str:
-        return f"""Perfume:{product.get('name', '')[:100]}[${product.get('price', 0)}]
+    def _batch_perfume(self) -> str:
+        return """Perfume:{name:.100}[${price}]
 JSON:brand,model,volume_ml,concentration,gender"""
     
-    def _standard_perfume(self, product: Dict, **kwargs) -> str:
-        return f"""Normaliza perfume:
+    def _standard_perfume(self) -> str:
+        return """Normaliza perfume:
 
-"{product.get('name', '')}"
-${product.get('price', 0):,} CLP
+"{name}"
+${price:,} CLP
 
 JSON:
 {{
@@ -290,9 +324,9 @@ JSON:
   "category_suggestion": "perfumes"
 }}"""
     
-    def _detailed_perfume(self, product: Dict, **kwargs) -> str:
-        return f"""Perfume análisis:
-{product.get('name', '')}
+    def _detailed_perfume(self) -> str:
+        return """Perfume análisis:
+{name}
 
 Identificar marca exacta, línea de fragancia, 
 volumen en ml, concentración (EDP/EDT/Parfum),
@@ -302,20 +336,20 @@ género target, notas si se mencionan."""
     # DEFAULT - Prompts genéricos
     # ============================================================================
     
-    def _minimal_default(self, product: Dict, **kwargs) -> str:
-        return f"N:{product.get('name', '')[:100]}|C:{product.get('category', '')}|$:{product.get('price', 0)}"
+    def _minimal_default(self) -> str:
+        return "N:{name:.100}|C:{category}|$:{price}"
     
-    def _batch_default(self, product: Dict, **kwargs) -> str:
-        return f"""Producto:{product.get('name', '')[:120]}[{product.get('category', '')}]
-Precio:${product.get('price', 0)}
+    def _batch_default(self) -> str:
+        return """Producto:{name:.120}[{category}]
+Precio:${price}
 JSON:brand,model,normalized_name,attributes,confidence"""
     
-    def _standard_default(self, product: Dict, **kwargs) -> str:
-        return f"""Normaliza producto:
+    def _standard_default(self) -> str:
+        return """Normaliza producto:
 
-NOMBRE: "{product.get('name', '')}"
-CATEGORÍA: "{product.get('category', '')}"
-PRECIO: ${product.get('price', 0):,} CLP
+NOMBRE: "{name}"
+CATEGORÍA: "{category}"
+PRECIO: ${price:,} CLP
 
 Estructura JSON con:
 - brand (marca en mayúsculas)
@@ -325,13 +359,13 @@ Estructura JSON con:
 - confidence (0.0 a 1.0)
 - category_suggestion (si difiere)"""
     
-    def _detailed_default(self, product: Dict, **kwargs) -> str:
-        return f"""Análisis exhaustivo:
+    def _detailed_default(self) -> str:
+        return """Análisis exhaustivo:
 
-PRODUCTO COMPLETO: {product.get('name', '')}
-CATEGORÍA BASE: {product.get('category', '')}
-PRECIO: ${product.get('price', 0):,} CLP
-RETAILER: {product.get('retailer', '')}
+PRODUCTO COMPLETO: {name}
+CATEGORÍA BASE: {category}
+PRECIO: ${price:,} CLP
+RETAILER: {retailer}
 
 Extraer TODOS los atributos detectables.
 Normalizar para comparación inter-retail.
@@ -339,44 +373,40 @@ Evaluar confianza de extracción."""
     
     # ============================================================================
     # FALLBACK - Prompts de corrección
+    # previous_attempt/error llegan como kwargs de get_prompt (no del producto)
     # ============================================================================
     
-    def _fallback_prompt(self, product: Dict, **kwargs) -> str:
+    def _fallback_prompt(self) -> str:
         """Fallback básico para corrección"""
-        previous = kwargs.get('previous_attempt', {})
-        error = kwargs.get('error', 'JSON inválido o incompleto')
-        
-        return f"""Corrige el siguiente resultado:
+        return """Corrige el siguiente resultado:
 
-PRODUCTO ORIGINAL: "{product.get('name', '')}"
-CATEGORÍA: "{product.get('category', '')}"
+PRODUCTO ORIGINAL: "{name}"
+CATEGORÍA: "{category}"
 
 INTENTO ANTERIOR:
-{previous}
+{previous_attempt}
 
 ERROR: {error}
 
 Genera JSON válido corregido con todos los campos requeridos:
 brand, model, normalized_name, attributes, confidence, category_suggestion"""
+    _fallback_prompt.options = {"previous_attempt": {}, "error": "JSON inválido o incompleto"}
     
-    def _fallback_detailed(self, product: Dict, **kwargs) -> str:
+    def _fallback_detailed(self) -> str:
         """Fallback detallado con GPT-4o"""
-        previous = kwargs.get('previous_attempt', {})
-        error = kwargs.get('error', '')
-        
-        return f"""Análisis y corrección experta:
+        return """Análisis y corrección experta:
 
 CONTEXTO:
-- Producto: "{product.get('name', '')}"
-- Categoría: "{product.get('category', '')}"
-- Precio: ${product.get('price', 0):,} CLP
-- Retailer: {product.get('retailer', '')}
+- Producto: "{name}"
+- Categoría: "{category}"
+- Precio: ${price:,} CLP
+- Retailer: {retailer}
 
 PROBLEMA DETECTADO:
 {error}
 
 INTENTO PREVIO:
-{previous}
+{previous_attempt}
 
 INSTRUCCIONES:
 1. Identificar qué faltó o falló en el intento anterior
@@ -393,6 +423,48 @@ ESTRUCTURA REQUERIDA:
   "confidence": 0.0,
   "category_suggestion": "opcional"
 }}"""
+    _fallback_detailed.options = {"previous_attempt": {}, "error": ""}
+    
+    # ============================================================================
+    # PACKED - K productos por request con salida JSON indexada
+    # ============================================================================
+    
+    def get_packed_system_prompt(self, model: str) -> str:
+        """System prompt del modelo + contrato de salida indexada (una sola vez por request)"""
+        base = self.system_prompts.get(model, self.system_prompts["gpt-5-mini"])
+        return (
+            f"{base} Recibirás productos numerados 'i|nombre|categoría|precio'. "
+            'Responde {"items":[{"i":<i>,...}]} con exactamente un objeto por producto, mismo i.'
+        )
+    
+    def get_packed_prompt(self, products: List[Dict[str, Any]]) -> str:
+        """Prompt empaquetado: cabecera común + una línea compacta por producto"""
+        lines = [
+            f"{i}|{' '.join(str(p.get('name', '')).split())[:150]}|{p.get('category', '')}|{p.get('price', 0)}"
+            for i, p in enumerate(products)
+        ]
+        return f"Normaliza cada producto. Campos por item: i,{','.join(PACKED_FIELDS)}\n" + "\n".join(lines)
+    
+    def parse_packed_response(self, content: str, n_items: int) -> Tuple[Dict[int, Dict[str, Any]], List[int]]:
+        """
+        Parsear respuesta empaquetada tolerando truncamiento
+        
+        Returns:
+            (resultados por índice, índices faltantes/inválidos a reintentar)
+        """
+        items = _decode_packed_items(content or "")
+        results: Dict[int, Dict[str, Any]] = {}
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            try:
+                idx = int(item.pop("i"))
+            except (KeyError, TypeError, ValueError):
+                continue
+            if 0 <= idx < n_items and idx not in results and item.get("brand") and item.get("model"):
+                results[idx] = item
+        missing = [i for i in range(n_items) if i not in results]
+        return results, missing
     
     def get_tokens_estimate(self, mode: PromptMode) -> int:
         """Estimar tokens por modo"""
@@ -401,10 +473,37 @@ ESTRUCTURA REQUERIDA:
             PromptMode.BATCH: 40,
             PromptMode.STANDARD: 100,
             PromptMode.DETAILED: 200,
-            PromptMode.FALLBACK: 150
+            PromptMode.FALLBACK: 150,
+            PromptMode.PACKED: 20
         }
         return estimates.get(mode, 100)
 
+def _decode_packed_items(content: str) -> List[Any]:
+    """Items de {"items":[...]} o [...]; si el JSON viene truncado rescata los objetos completos"""
+    try:
+        data = json.loads(content)
+        if isinstance(data, dict):
+            data = data.get("items", [])
+        return data if isinstance(data, list) else []
+    except json.JSONDecodeError:
+        pass
+    
+    start = content.find("[")
+    if start < 0:
+        return []
+    decoder = json.JSONDecoder()
+    items, pos = [], start + 1
+    while True:
+        pos = content.find("{", pos)
+        if pos < 0:
+            break
+        try:
+            obj, pos = decoder.raw_decode(content, pos)
+        except json.JSONDecodeError:
+            break
+        items.append(obj)
+    return items
+
 # ============================================================================
 # Singleton para uso global
 # ============================================================================
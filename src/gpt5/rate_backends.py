@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🌐 Backends compartidos para el rate limiter
+Token buckets con estado fuera del proceso para que varios workers repartan un
+mismo presupuesto RPM/TPM del proveedor:
+- RedisBucketBackend: script Lua (atómico, reloj del servidor), multi-host
+- SQLiteBucketBackend: archivo local con BEGIN IMMEDIATE, un solo host
+
+Ambos adquieren varios buckets (requests + tokens) de forma atómica: o se
+descuentan todos o ninguno, y si no alcanza devuelven cuánto esperar. `adjust`
+liquida diferencias sin chequear (uso real vs estimado, pausas por retry-after);
+el nivel puede quedar negativo y esa deuda la pagan todos los procesos.
+"""
+
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class BucketSpec:
+    """Bucket a adquirir: clave compartida, capacidad, recarga (por segundo) y cantidad"""
+    key: str
+    capacity: float
+    refill_rate: float
+    amount: float
+
+
+def _wait_for(tokens: float, spec: BucketSpec) -> float:
+    amount = min(spec.amount, spec.capacity)  # Un request mayor que el bucket nunca cabría
+    return 0.0 if tokens >= amount else (amount - tokens) / spec.refill_rate
+
+
+# ============================================================================
+# 🔴 REDIS
+# ============================================================================
+
+_ACQUIRE_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local consume = ARGV[1] == '1'
+local levels = {}
+local wait = 0
+for i = 1, #KEYS do
+    local cap = tonumber(ARGV[i * 3 - 1])
+    local rate = tonumber(ARGV[i * 3])
+    local amount = math.min(tonumber(ARGV[i * 3 + 1]), cap)
+    local state = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or cap
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(cap, tokens + math.max(0, now - ts) * rate)
+    levels[i] = tokens
+    if tokens < amount then
+        wait = math.max(wait, (amount - tokens) / rate)
+    end
+end
+if wait > 0 then
+    return {0, tostring(wait)}
+end
+if consume then
+    for i = 1, #KEYS do
+        local cap = tonumber(ARGV[i * 3 - 1])
+        local rate = tonumber(ARGV[i * 3])
+        local amount = math.min(tonumber(ARGV[i * 3 + 1]), cap)
+        redis.call('HSET', KEYS[i], 'tokens', tostring(levels[i] - amount), 'ts', tostring(now))
+        redis.call('PEXPIRE', KEYS[i], math.ceil(cap / rate * 2000))
+    end
+end
+return {1, '0'}
+"""
+
+_ADJUST_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local cap = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or cap
+local ts = tonumber(state[2]) or now
+tokens = math.min(cap, tokens + math.max(0, now - ts) * rate) - tonumber(ARGV[3])
+if ARGV[4] ~= '' then
+    tokens = math.min(tokens, tonumber(ARGV[4]))
+end
+tokens = math.min(cap, tokens)
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((cap - math.min(tokens, 0)) / rate * 2000))
+return tostring(tokens)
+"""
+
+
+class RedisBucketBackend:
+    """Buckets en Redis; el script Lua hace check + descuento de todos los buckets atómicamente"""
+
+    def __init__(self, url: str = "redis://localhost:6379/0", namespace: str = "ratelimit:v1"):
+        import redis.asyncio as redis_async
+        self.client = redis_async.Redis.from_url(url)
+        self.namespace = namespace
+        self._script = self.client.register_script(_ACQUIRE_LUA)
+        self._adjust_script = self.client.register_script(_ADJUST_LUA)
+
+    async def acquire(self, specs: List[BucketSpec], consume: bool = True) -> Tuple[bool, float]:
+        """
+        Returns:
+            (concedido, segundos a esperar si no)
+        """
+        args = ['1' if consume else '0']
+        for s in specs:
+            args += [s.capacity, s.refill_rate, s.amount]
+        ok, wait = await self._script(keys=[f"{self.namespace}:{s.key}" for s in specs], args=args)
+        return bool(int(ok)), float(wait)
+
+    async def adjust(self, spec: BucketSpec, ceiling: Optional[float] = None) -> float:
+        """
+        Descontar spec.amount (negativo = devolver) sin chequear; `ceiling` acota el nivel
+
+        Returns:
+            Nivel resultante del bucket
+        """
+        level = await self._adjust_script(
+            keys=[f"{self.namespace}:{spec.key}"],
+            args=[spec.capacity, spec.refill_rate, spec.amount, '' if ceiling is None else ceiling]
+        )
+        return float(level)
+
+    async def close(self):
+        await self.client.aclose()
+
+
+# ============================================================================
+# 🗄️ SQLITE (un host)
+# ============================================================================
+
+class SQLiteBucketBackend:
+    """Buckets en un archivo SQLite compartido por los procesos del host"""
+
+    def __init__(self, path: str = "out/ratelimit.sqlite", busy_timeout: float = 5.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid = None
+        self._lock = threading.Lock()  # La conexión se usa desde hilos de asyncio.to_thread
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def _connection(self) -> sqlite3.Connection:
+        # Una conexión por proceso (no se comparte a través de fork)
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS buckets (
+                    key TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    ts REAL NOT NULL
+                )
+            """)
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def acquire_sync(self, specs: List[BucketSpec], consume: bool = True) -> Tuple[bool, float]:
+        with self._lock:
+            return self._acquire_locked(specs, consume)
+
+    def _acquire_locked(self, specs: List[BucketSpec], consume: bool) -> Tuple[bool, float]:
+        conn = self._connection()
+        # BEGIN IMMEDIATE toma el lock de escritura: leer-calcular-escribir es atómico entre procesos
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            placeholders = ",".join("?" * len(specs))
+            state = {
+                key: (tokens, ts) for key, tokens, ts in conn.execute(
+                    f"SELECT key, tokens, ts FROM buckets WHERE key IN ({placeholders})",
+                    [s.key for s in specs]
+                )
+            }
+            levels = []
+            wait = 0.0
+            for s in specs:
+                tokens, ts = state.get(s.key, (s.capacity, now))
+                tokens = min(s.capacity, tokens + max(0.0, now - ts) * s.refill_rate)
+                levels.append(tokens)
+                wait = max(wait, _wait_for(tokens, s))
+
+            if wait == 0 and consume:
+                conn.executemany(
+                    "INSERT INTO buckets (key, tokens, ts) VALUES (?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, ts = excluded.ts",
+                    [(s.key, level - min(s.amount, s.capacity), now) for s, level in zip(specs, levels)]
+                )
+            conn.execute("COMMIT")
+            return wait == 0, wait
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def adjust_sync(self, spec: BucketSpec, ceiling: Optional[float] = None) -> float:
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = conn.execute("SELECT tokens, ts FROM buckets WHERE key = ?", (spec.key,)).fetchone()
+                tokens, ts = row or (spec.capacity, now)
+                tokens = min(spec.capacity, tokens + max(0.0, now - ts) * spec.refill_rate) - spec.amount
+                if ceiling is not None:
+                    tokens = min(tokens, ceiling)
+                tokens = min(spec.capacity, tokens)
+                conn.execute(
+                    "INSERT INTO buckets (key, tokens, ts) VALUES (?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, ts = excluded.ts",
+                    (spec.key, tokens, now)
+                )
+                conn.execute("COMMIT")
+                return tokens
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    async def acquire(self, specs: List[BucketSpec], consume: bool = True) -> Tuple[bool, float]:
+        """
+        Returns:
+            (concedido, segundos a esperar si no)
+        """
+        # Transacción de microsegundos; el lock de otro proceso se espera fuera del loop
+        return await asyncio.to_thread(self.acquire_sync, specs, consume)
+
+    async def adjust(self, spec: BucketSpec, ceiling: Optional[float] = None) -> float:
+        """
+        Descontar spec.amount (negativo = devolver) sin chequear; `ceiling` acota el nivel
+
+        Returns:
+            Nivel resultante del bucket
+        """
+        return await asyncio.to_thread(self.adjust_sync, spec, ceiling)
+
+    async def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+def backend_from_url(url: Optional[str]):
+    """
+    Backend desde URL: redis://host:port/db | sqlite:///ruta/archivo | vacío = en proceso
+    """
+    if not url:
+        return None
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBucketBackend(url)
+    if url.startswith("sqlite:///"):
+        return SQLiteBucketBackend(url[len("sqlite:///"):])
+    raise ValueError(f"Backend de rate limit no soportado: {url}")
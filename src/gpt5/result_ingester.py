@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+📥 Ingesta streaming de resultados de Batch API
+Lee el JSONL de resultados por chunks, parsea y valida en un pool de procesos,
+hace upsert masivo en ai_metadata_cache (+ L1) por chunk y guarda un checkpoint
+de offset tras cada chunk para reanudar tras un fallo sin repetir trabajo.
+"""
+
+import json
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+try:
+    from .validator import get_validator
+    from .prompts import get_prompt_manager
+except ImportError:
+    from gpt5.validator import get_validator
+    from gpt5.prompts import get_prompt_manager
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 1000
+PARALLEL_MIN_BYTES = 4 * 1024 * 1024  # Bajo esto el pool cuesta más de lo que ahorra
+
+_COUNTERS = ("lines", "successful", "failed", "low_quality", "tokens_input", "tokens_output")
+
+
+# ============================================================================
+# 🧩 PARSEO (se ejecuta en workers)
+# ============================================================================
+
+class _ChunkParser:
+    """Parsea + valida líneas de resultados; sin I/O para poder correr en otro proceso"""
+
+    def __init__(self, item_map: Dict[str, List[str]], packed: bool):
+        self.item_map = item_map
+        self.packed = packed
+        self.validator = get_validator()
+        self.prompt_manager = get_prompt_manager()
+
+    def parse(self, lines: List[bytes]) -> Dict[str, Any]:
+        out = {"records": [], **{k: 0 for k in _COUNTERS}}
+        for raw in lines:
+            if not raw.strip():
+                continue
+            out["lines"] += 1
+            try:
+                result = json.loads(raw)
+            except json.JSONDecodeError:
+                logger.error("Línea de resultados ilegible")
+                out["failed"] += 1
+                continue
+
+            custom_id = result.get('custom_id', '')
+            fingerprints = self.item_map.get(custom_id)
+            response = result.get('response') or {}
+            if response.get('status_code') != 200:
+                logger.error(f"Error en {custom_id}: {result.get('error')}")
+                out["failed"] += len(fingerprints or [None])
+                continue
+
+            body = response.get('body') or {}
+            choices = body.get('choices', [])
+            usage = body.get('usage', {})
+            if not choices:
+                out["failed"] += len(fingerprints or [None])
+                continue
+            out["tokens_input"] += usage.get('prompt_tokens', 0)
+            out["tokens_output"] += usage.get('completion_tokens', 0)
+            content = choices[0]['message']['content']
+
+            if self.packed and fingerprints:
+                # Pack: fan-out por índice; los faltantes quedan para reintento
+                parsed, missing = self.prompt_manager.parse_packed_response(content, len(fingerprints))
+                per_item = usage.get('total_tokens', 0) // len(fingerprints)
+                for i, data in parsed.items():
+                    self._add(out, custom_id, fingerprints[i], data, body.get('model'), per_item, usage)
+                out["failed"] += len(missing)
+                continue
+
+            try:
+                data = json.loads(content)
+            except json.JSONDecodeError:
+                logger.error(f"Error parseando JSON para {custom_id}")
+                out["failed"] += 1
+                continue
+            if fingerprints:
+                fingerprint = fingerprints[0]
+            else:
+                # Fingerprint completo del sidecar (o prefijo del custom_id)
+                parts = custom_id.split('_')
+                fingerprint = parts[-1] if len(parts) > 2 else None
+            self._add(out, custom_id, fingerprint, data, body.get('model'),
+                      usage.get('total_tokens'), usage)
+        self._validate(out)
+        return out
+
+    def _add(self, out: Dict, custom_id: str, fingerprint: Optional[str], data: Dict,
+             model: str, tokens: int, usage: Dict):
+        out["successful"] += 1
+        out["records"].append({
+            'custom_id': custom_id,
+            'fingerprint': fingerprint,
+            'normalized': data,
+            'tokens': usage,
+            'model_used': model,
+            'tokens_used': tokens,
+            'quality_score': None
+        })
+
+    def _validate(self, out: Dict):
+        """Validar cada registro del chunk (limpia `normalized` in-place)"""
+        for record in out["records"]:
+            data = record['normalized']
+            try:
+                passes, quality_score, _ = self.validator.validate_normalized(
+                    data, data.get('category_suggestion', 'general'))
+            except Exception as e:
+                logger.warning(f"⚠️ {record['custom_id']} no validó: {e}")
+                passes, quality_score = False, 0.0
+            if not passes:
+                out["low_quality"] += 1
+            record['quality_score'] = quality_score
+
+
+_worker_parser: Optional[_ChunkParser] = None
+
+
+def _init_worker(item_map: Dict[str, List[str]], packed: bool):
+    global _worker_parser
+    _worker_parser = _ChunkParser(item_map, packed)
+
+
+def _parse_in_worker(lines: List[bytes]) -> Dict[str, Any]:
+    return _worker_parser.parse(lines)
+
+
+# ============================================================================
+# 📥 INGESTER
+# ============================================================================
+
+@dataclass
+class IngestReport:
+    """Resumen de una ingesta (contadores acumulados incluyendo lo ya checkpointeado)"""
+    results: List[Dict] = field(default_factory=list)   # Ingeridos en esta corrida
+    done: Set[str] = field(default_factory=set)         # Todos los fingerprints con resultado
+    lines: int = 0
+    successful: int = 0
+    failed: int = 0
+    low_quality: int = 0
+    tokens_input: int = 0
+    tokens_output: int = 0
+    chunks: int = 0
+    resumed_from: int = 0
+    elapsed: float = 0.0
+
+
+class BatchResultIngester:
+    """Ingesta por chunks con pool de parseo, escritura masiva y checkpoint"""
+
+    def __init__(self, ai_cache, l1_cache=None,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 workers: int = None,
+                 parallel_min_bytes: int = PARALLEL_MIN_BYTES):
+        """
+        Args:
+            ai_cache: GPT5AICache (usa set_many)
+            l1_cache: L1RedisCache opcional (usa set_many)
+            chunk_size: Líneas por chunk (= filas por upsert y granularidad del checkpoint)
+            workers: Procesos de parseo (default: CPUs; 1 = en el mismo proceso)
+            parallel_min_bytes: Tamaño de archivo desde el cual se usa el pool
+        """
+        self.ai_cache = ai_cache
+        self.l1_cache = l1_cache
+        self.chunk_size = max(1, chunk_size)
+        self.workers = workers or os.cpu_count() or 1
+        self.parallel_min_bytes = parallel_min_bytes
+
+    @staticmethod
+    def checkpoint_path(results_path: str) -> str:
+        return f"{results_path}.ckpt"
+
+    def ingest(self, results_path: str, batch_id: str,
+               item_map: Dict[str, List[str]], packed: bool = False) -> IngestReport:
+        """
+        Ingerir (o reanudar) un archivo de resultados
+
+        Returns:
+            IngestReport; `done` incluye los fingerprints de chunks de corridas previas
+        """
+        t0 = time.perf_counter()
+        report = self._load_checkpoint(results_path)
+        size = os.path.getsize(results_path)
+        if report.resumed_from > size:
+            logger.warning(f"⚠️ Checkpoint inválido para {results_path}, reingiriendo desde 0")
+            os.remove(self.checkpoint_path(results_path))
+            report = IngestReport()
+        if report.resumed_from:
+            logger.info(f"♻️ Reanudando {batch_id} desde byte {report.resumed_from} "
+                        f"({len(report.done)} ya ingeridos)")
+
+        chunks = self._read_chunks(results_path, report.resumed_from)
+        if self.workers > 1 and size - report.resumed_from >= self.parallel_min_bytes:
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                     initargs=(item_map, packed)) as pool:
+                # Ventana acotada: parsea adelantado mientras se escribe el chunk actual
+                window: deque = deque()
+                for offset, lines in chunks:
+                    window.append((offset, pool.submit(_parse_in_worker, lines)))
+                    if len(window) >= self.workers * 2:
+                        offset, fut = window.popleft()
+                        self._commit(fut.result(), offset, batch_id, results_path, report)
+                while window:
+                    offset, fut = window.popleft()
+                    self._commit(fut.result(), offset, batch_id, results_path, report)
+        else:
+            parser = _ChunkParser(item_map, packed)
+            for offset, lines in chunks:
+                self._commit(parser.parse(lines), offset, batch_id, results_path, report)
+
+        report.elapsed = time.perf_counter() - t0
+        logger.info(
+            f"📥 {batch_id}: {report.successful} ok / {report.failed} fallidos en "
+            f"{report.chunks} chunks ({report.elapsed:.2f}s)"
+        )
+        return report
+
+    def _read_chunks(self, path: str, start: int) -> Iterator[Tuple[int, List[bytes]]]:
+        """(offset al final del chunk, líneas) desde `start`"""
+        with open(path, 'rb') as f:
+            f.seek(start)
+            lines: List[bytes] = []
+            for line in iter(f.readline, b''):
+                lines.append(line)
+                if len(lines) >= self.chunk_size:
+                    yield f.tell(), lines
+                    lines = []
+            if lines:
+                yield f.tell(), lines
+
+    def _commit(self, parsed: Dict[str, Any], offset: int, batch_id: str,
+                results_path: str, report: IngestReport):
+        """Escritura masiva del chunk y luego checkpoint (reaplicar un chunk es idempotente)"""
+        records = [r for r in parsed["records"] if r['fingerprint']]
+        if records:
+            self.ai_cache.set_many([
+                {'fingerprint': r['fingerprint'], 'metadata': r['normalized'],
+                 'model_used': r['model_used'], 'tokens_used': r['tokens_used'],
+                 'quality_score': r['quality_score'], 'batch_id': batch_id}
+                for r in records
+            ])
+            if self.l1_cache is not None:
+                self.l1_cache.set_many([
+                    (r['fingerprint'], r['normalized'], r['normalized'].get('category_suggestion'))
+                    for r in records
+                ])
+
+        for k in _COUNTERS:
+            setattr(report, k, getattr(report, k) + parsed[k])
+        report.chunks += 1
+        report.results.extend(parsed["records"])
+        chunk_done = [r['fingerprint'] for r in records]
+        report.done.update(chunk_done)
+
+        entry = {"offset": offset, "done": chunk_done, **{k: getattr(report, k) for k in _COUNTERS}}
+        with open(self.checkpoint_path(results_path), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _load_checkpoint(self, results_path: str) -> IngestReport:
+        report = IngestReport()
+        path = self.checkpoint_path(results_path)
+        if not os.path.exists(path):
+            return report
+        valid: List[str] = []
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                valid.append(line)
+                report.done.update(entry["done"])
+                report.resumed_from = entry["offset"]
+                for k in _COUNTERS:
+                    setattr(report, k, entry[k])
+            truncated = f.read() or None
+        if truncated is not None or (valid and not valid[-1].endswith("\n")):
+            # Cola truncada por un crash: se descarta y ese chunk se reaplica
+            with open(path, 'w', encoding='utf-8') as f:
+                f.writelines(l if l.endswith("\n") else l + "\n" for l in valid)
+        return report
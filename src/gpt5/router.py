@@ -12,11 +12,17 @@ import re
 from typing import Dict, Any, List, Tuple, Optional
 from enum import Enum
 from dataclasses import dataclass
+from collections import defaultdict
 import logging
 
+import numpy as np
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Bins de complejidad para aprender umbrales (width_bucket(score, 0, 1, N) en SQL)
+COMPLEXITY_BINS = 20
+
 
 class ModelType(Enum):
     """Modelos disponibles con sus caracterÃ­sticas"""
@@ -65,6 +71,43 @@ class ComplexityAnalyzer:
             'beverages': 0.1,
             'accessories': 0.3
         }
+        
+        # Un solo regex (lookahead = coincidencias solapadas) equivale al loop de substrings
+        self._technical_re = re.compile(
+            "(?=(" + "|".join(re.escape(t) for t in sorted(self.technical_terms)) + "))"
+        )
+        self._variants_re = re.compile(r'\d+GB|\d+TB|/|\||,\s*\d+')
+    
+    def calculate_complexity_batch(self, products: List[Dict[str, Any]]) -> np.ndarray:
+        """
+        Complejidad de todo un lote en una pasada vectorizada
+        Mismos factores y pesos que calculate_complexity (resultado idéntico)
+        """
+        n = len(products)
+        names = [str(p.get('name') or '').lower() for p in products]
+        categories = [str(p.get('category') or '').lower() for p in products]
+        
+        lengths = np.fromiter((len(name) for name in names), dtype=float, count=n)
+        technical = np.fromiter(
+            (len(set(self._technical_re.findall(name))) for name in names), dtype=float, count=n
+        )
+        category_w = np.fromiter(
+            (self.complex_categories.get(c, self.simple_categories.get(c, 0.4)) for c in categories),
+            dtype=float, count=n
+        )
+        prices = np.fromiter((float(p.get('price') or 0) for p in products), dtype=float, count=n)
+        price_w = np.select([prices > 1000000, prices > 500000, prices > 100000], [0.8, 0.6, 0.4], 0.2)
+        variants = np.fromiter(
+            (self._variants_re.search(name) is not None for name in names), dtype=bool, count=n
+        )
+        
+        return (
+            np.minimum(lengths / 300, 1.0) * 0.15
+            + np.minimum(technical / 5, 1.0) * 0.25
+            + category_w * 0.3
+            + price_w * 0.15
+            + np.where(variants, 0.7 * 0.15, 0.2 * 0.15)
+        )
     
     def calculate_complexity(self, product: Dict[str, Any]) -> float:
         """
@@ -73,50 +116,73 @@ class ComplexityAnalyzer:
         0.3-0.7: Medio (GPT-5-mini con validaciÃ³n)
         0.7-1.0: Complejo (GPT-5 full)
         """
-        name = product.get('name', '').lower()
-        category = product.get('category', '').lower()
-        price = product.get('price', 0)
-        
-        complexity_factors = []
-        
-        # Factor 1: Longitud del nombre (productos con descripciones largas)
-        name_length_score = min(len(name) / 300, 1.0)
-        complexity_factors.append(name_length_score * 0.15)
-        
-        # Factor 2: TÃ©rminos tÃ©cnicos
-        technical_count = sum(1 for term in self.technical_terms if term in name)
-        technical_score = min(technical_count / 5, 1.0)
-        complexity_factors.append(technical_score * 0.25)
-        
-        # Factor 3: CategorÃ­a
-        if category in self.complex_categories:
-            complexity_factors.append(self.complex_categories[category] * 0.3)
-        elif category in self.simple_categories:
-            complexity_factors.append(self.simple_categories[category] * 0.3)
-        else:
-            complexity_factors.append(0.4 * 0.3)  # CategorÃ­a desconocida = medio
-        
-        # Factor 4: Precio (productos caros suelen ser mÃ¡s complejos)
-        if price > 1000000:  # > 1M CLP
-            complexity_factors.append(0.8 * 0.15)
-        elif price > 500000:  # > 500K CLP
-            complexity_factors.append(0.6 * 0.15)
-        elif price > 100000:  # > 100K CLP
-            complexity_factors.append(0.4 * 0.15)
-        else:
-            complexity_factors.append(0.2 * 0.15)
-        
-        # Factor 5: Multi-variante (productos con mÃºltiples opciones)
-        has_variants = bool(re.search(r'\d+GB|\d+TB|/|\||,\s*\d+', name))
-        complexity_factors.append(0.7 * 0.15 if has_variants else 0.2 * 0.15)
-        
-        return sum(complexity_factors)
+        return float(self.calculate_complexity_batch([product])[0])
+
+
+def fit_complexity_threshold(rows: List[Dict[str, Any]], current: float,
+                             min_quality: float = 0.85, min_samples: int = 50,
+                             bins: int = COMPLEXITY_BINS) -> Optional[float]:
+    """
+    Umbral 'complex' aprendido de métricas agregadas por bin
+    
+    rows: {bin, model, request_type, success, n, cost_usd} (ver get_routing_stats).
+    Un fallo de calidad de mini no deja fila propia: se ve como fila 'fallback'
+    del modelo superior; un error de mini deja fila fallida y también fallback.
+    
+    Returns:
+        Nuevo umbral, o None si no hay bins con muestras suficientes
+    """
+    mini, big = ModelType.GPT5_MINI.value, ModelType.GPT5.value
+    acc = defaultdict(lambda: {'ok': 0, 'fail': 0, 'fallback': 0,
+                               'mini_cost': [0.0, 0], 'big_cost': [0.0, 0]})
+    for r in rows:
+        b = acc[int(r['bin'])]
+        n = int(r['n'])
+        if r['model'] == mini and r['request_type'] == 'single':
+            b['ok' if r['success'] else 'fail'] += n
+            if r['success']:
+                b['mini_cost'][0] += float(r.get('cost_usd') or 0) * n
+                b['mini_cost'][1] += n
+        elif r['request_type'] == 'fallback':
+            b['fallback'] += n
+        if r['model'] == big and r['success']:
+            b['big_cost'][0] += float(r.get('cost_usd') or 0) * n
+            b['big_cost'][1] += n
+    
+    verdicts = []
+    for bin_idx in sorted(acc):
+        b = acc[bin_idx]
+        attempts = b['ok'] + b['fail'] + max(0, b['fallback'] - b['fail'])
+        if attempts < min_samples:
+            continue
+        quality = b['ok'] / attempts
+        keep_mini = quality >= min_quality
+        if keep_mini and b['mini_cost'][1] and b['big_cost'][1]:
+            mini_cost = b['mini_cost'][0] / b['mini_cost'][1]
+            big_cost = b['big_cost'][0] / b['big_cost'][1]
+            keep_mini = mini_cost + (1 - quality) * big_cost <= big_cost
+        verdicts.append((bin_idx, keep_mini))
+    
+    if not verdicts:
+        return None
+    for bin_idx, keep_mini in verdicts:
+        if not keep_mini:
+            # Desde el primer bin que no cumple, todo va a GPT-5
+            return round((bin_idx - 1) / bins, 4)
+    # Todos los bins observados cumplen: mini absorbe hasta el mayor bin observado
+    return round(min(max(current, verdicts[-1][0] / bins), 1.0), 4)
 
 
 class GPT5Router:
     """Router inteligente con soporte para batch processing"""
     
-    def __init__(self):
+    def __init__(self, db_connector=None):
+        """
+        Args:
+            db_connector: GPT5DatabaseConnector opcional (cache de complejidad y
+                          métricas históricas para fit_thresholds)
+        """
+        self.db = db_connector
         self.analyzer = ComplexityAnalyzer()
         
         self.models = {
@@ -148,6 +214,25 @@ class GPT5Router:
             'simple': 0.35,  # <= 0.35 = GPT-5-mini
             'complex': 0.70  # >= 0.70 = GPT-5
         }
+        # Umbrales aprendidos por categoría (fit_thresholds); fallback a self.thresholds
+        self.category_thresholds: Dict[str, Dict[str, float]] = {}
+    
+    def _thresholds_for(self, category: str) -> Dict[str, float]:
+        return self.category_thresholds.get((category or '').lower(), self.thresholds)
+    
+    def _model_for(self, complexity: float, category: str = None) -> ModelType:
+        # Zona media: GPT-5-mini con validación adicional
+        if complexity >= self._thresholds_for(category)['complex']:
+            return ModelType.GPT5
+        return ModelType.GPT5_MINI
+    
+    def _reason(self, complexity: float, category: str = None) -> str:
+        thresholds = self._thresholds_for(category)
+        if complexity <= thresholds['simple']:
+            return f"Simple product (complexity={complexity:.2f})"
+        elif complexity >= thresholds['complex']:
+            return f"Complex product (complexity={complexity:.2f})"
+        return f"Medium complexity (complexity={complexity:.2f})"
     
     def route_single(self, product: Dict[str, Any]) -> Tuple[ModelType, float]:
         """
@@ -155,14 +240,55 @@ class GPT5Router:
         Returns: (modelo, complexity_score)
         """
         complexity = self.analyzer.calculate_complexity(product)
+        return self._model_for(complexity, product.get('category')), complexity
+    
+    def route_many(self, products: List[Dict[str, Any]],
+                   use_cache: bool = True, save: bool = False) -> List[Tuple[str, float, str]]:
+        """
+        Routing de un lote completo: complejidad cacheada en una query, el resto
+        en una pasada vectorizada, y asignación con los umbrales vigentes
+        
+        Args:
+            use_cache: Leer product_complexity_cache (requiere db_connector)
+            save: Persistir en bloque las complejidades recién calculadas
+        
+        Returns:
+            [(model_name, complexity_score, routing_reason)] alineado con products
+        """
+        complexities = np.full(len(products), np.nan)
+        
+        if use_cache and self.db is not None:
+            fingerprints = [p.get('fingerprint') or p.get('_fingerprint') for p in products]
+            cached = self.db.get_complexity_analyses([fp for fp in fingerprints if fp])
+            for i, fp in enumerate(fingerprints):
+                if fp in cached:
+                    complexities[i] = float(cached[fp]['complexity_score'])
+        
+        missing = np.flatnonzero(np.isnan(complexities))
+        if len(missing):
+            complexities[missing] = self.analyzer.calculate_complexity_batch(
+                [products[i] for i in missing]
+            )
+        
+        routed = []
+        for product, complexity in zip(products, complexities.tolist()):
+            category = product.get('category')
+            routed.append((self._model_for(complexity, category).value, complexity,
+                           self._reason(complexity, category)))
+        
+        if save and self.db is not None and len(missing):
+            self.db.save_complexity_analyses([
+                {
+                    'fingerprint': products[i].get('fingerprint') or products[i].get('_fingerprint'),
+                    'complexity_score': routed[i][1],
+                    'model_assigned': routed[i][0],
+                    'routing_reason': routed[i][2]
+                }
+                for i in missing
+                if products[i].get('fingerprint') or products[i].get('_fingerprint')
+            ])
         
-        if complexity <= self.thresholds['simple']:
-            return ModelType.GPT5_MINI, complexity
-        elif complexity >= self.thresholds['complex']:
-            return ModelType.GPT5, complexity
-        else:
-            # Zona media: GPT-5-mini con validaciÃ³n adicional
-            return ModelType.GPT5_MINI, complexity
+        return routed
     
     def route_batch(self, products: List[Dict[str, Any]]) -> Dict[ModelType, List[Dict[str, Any]]]:
         """
@@ -175,17 +301,15 @@ class GPT5Router:
             ModelType.GPT4O_MINI: []
         }
         
-        for product in products:
-            model, complexity = self.route_single(product)
-            
+        for product, (model, complexity, _) in zip(products, self.route_many(products)):
             # Enriquecer producto con metadata de routing
             product['_routing_metadata'] = {
-                'model': model.value,
+                'model': model,
                 'complexity_score': round(complexity, 3),
                 'batch_eligible': True
             }
             
-            batches[model].append(product)
+            batches[ModelType(model)].append(product)
         
         # Log de distribuciÃ³n
         total = len(products)
@@ -250,15 +374,51 @@ class GPT5Router:
         Returns: (model_name, complexity_score, routing_reason)
         """
         model_type, complexity = self.route_single(product)
+        return model_type.value, complexity, self._reason(complexity, product.get('category'))
+    
+    def fit_thresholds(self, stats: List[Dict[str, Any]] = None, days: int = 30,
+                       min_quality: float = 0.85, min_samples: int = 50) -> Dict[str, Any]:
+        """
+        Ajustar el umbral 'complex' (global y por categoría) desde processing_metrics
+        
+        Un bin de complejidad se queda en GPT-5-mini si su calidad observada
+        (éxitos sin escalar a fallback) alcanza min_quality y el costo esperado
+        (mini + escalamientos) no supera el de ir directo a GPT-5.
+        
+        Args:
+            stats: Filas agregadas (default: db.get_routing_stats(days))
+        
+        Returns:
+            {'global': umbrales, 'categories': {categoría: umbrales}}
+        """
+        if stats is None:
+            if self.db is None:
+                return {'global': dict(self.thresholds), 'categories': dict(self.category_thresholds)}
+            stats = self.db.get_routing_stats(days=days, bins=COMPLEXITY_BINS)
+        
+        by_category = defaultdict(list)
+        for row in stats:
+            by_category['*'].append(row)
+            if row.get('category'):
+                by_category[row['category'].lower()].append(row)
+        
+        fitted = fit_complexity_threshold(by_category.pop('*', []), self.thresholds['complex'],
+                                          min_quality, min_samples)
+        if fitted is not None:
+            self.thresholds['complex'] = max(fitted, self.thresholds['simple'])
         
-        if complexity <= self.thresholds['simple']:
-            reason = f"Simple product (complexity={complexity:.2f})"
-        elif complexity >= self.thresholds['complex']:
-            reason = f"Complex product (complexity={complexity:.2f})"
-        else:
-            reason = f"Medium complexity (complexity={complexity:.2f})"
+        for category, rows in by_category.items():
+            current = self._thresholds_for(category)['complex']
+            fitted = fit_complexity_threshold(rows, current, min_quality, min_samples)
+            if fitted is not None:
+                self.category_thresholds[category] = {
+                    'simple': self.thresholds['simple'],
+                    'complex': max(fitted, self.thresholds['simple'])
+                }
         
-        return model_type.value, complexity, reason
+        logger.info(f"🎯 Umbrales de routing ajustados: global={self.thresholds}, "
+                    f"categorías={len(self.category_thresholds)}")
+        return {'global': dict(self.thresholds), 'categories': dict(self.category_thresholds)}
     
     def _estimate_batch_cost(self, products: List[Dict[str, Any]], config: ModelConfig) -> float:
         """Estima costo de procesar un batch"""
@@ -5,18 +5,32 @@
 Control de rate limits, backpressure y resiliencia
 """
 
+import os
 import time
 import asyncio
-from typing import Dict, Any, Optional, Callable
+from typing import Dict, Any, Optional, Callable, List, Tuple
 from enum import Enum
 from dataclasses import dataclass
 from collections import deque
 from datetime import datetime, timedelta
 import logging
 import random
+import re
+
+try:
+    from .rate_backends import BucketSpec, backend_from_url
+except ImportError:
+    from gpt5.rate_backends import BucketSpec, backend_from_url
+
+try:
+    from ..telemetry import get_registry
+except ImportError:
+    from telemetry import get_registry
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_CONCURRENT_LIMIT = 10
+
 class CircuitState(Enum):
     """Estados del circuit breaker"""
     CLOSED = "closed"      # Normal, permitir requests
@@ -30,7 +44,7 @@ class RateLimitConfig:
     requests_per_minute: int
     requests_per_second: Optional[int] = None
     tokens_per_minute: Optional[int] = None
-    concurrent_limit: int = 10
+    concurrent_limit: int = DEFAULT_CONCURRENT_LIMIT
 
 class TokenBucket:
     """Implementación de Token Bucket para rate limiting"""
@@ -219,10 +233,29 @@ class CircuitBreaker:
             **self.stats
         }
 
+def _rate_limiter_metrics(limiter: "RateLimiter"):
+    """Stats y capacidad disponible del rate limiter para /metrics"""
+    stats = limiter.stats
+    return [
+        ("ratelimit_requests", "counter", "Requests al rate limiter por resultado",
+         [({"result": "accepted"}, stats['requests_accepted']),
+          ({"result": "throttled"}, stats['requests_throttled']),
+          ({"result": "rejected"}, stats['requests_rejected'])]),
+        ("ratelimit_backend_errors", "counter", "Errores del backend compartido (fallback a buckets locales)",
+         [({}, stats['backend_errors'])]),
+        ("ratelimit_tokens_available", "gauge", "Tokens disponibles en el bucket local por modelo",
+         [({"model": model}, bucket.tokens) for model, bucket in limiter.token_buckets.items()]),
+    ]
+
 class RateLimiter:
     """Sistema completo de rate limiting para múltiples modelos"""
     
-    def __init__(self):
+    def __init__(self, backend=None):
+        """
+        Args:
+            backend: Backend compartido entre procesos (rate_backends); None = buckets en memoria
+        """
+        self.backend = backend
         # Configuración por modelo
         self.configs = {
             'gpt-5-mini': RateLimitConfig(
@@ -279,8 +312,113 @@ class RateLimiter:
         self.stats = {
             'requests_accepted': 0,
             'requests_throttled': 0,
-            'requests_rejected': 0
+            'requests_rejected': 0,
+            'backend_errors': 0
         }
+        get_registry().register_collector(_rate_limiter_metrics, owner=self)
+    
+    def _buckets(self, model: str, estimated_tokens: int) -> List[Tuple[str, TokenBucket, int]]:
+        buckets = [('requests', self.request_buckets[model], 1)]
+        if model in self.token_buckets:
+            buckets.append(('tokens', self.token_buckets[model], estimated_tokens))
+        return buckets
+    
+    async def _try_acquire(self, model: str, estimated_tokens: int,
+                           consume: bool = True) -> Tuple[bool, float]:
+        """
+        Adquirir requests + tokens de forma atómica (todos o ninguno)
+        
+        Returns:
+            (concedido, segundos estimados hasta que alcance)
+        """
+        buckets = self._buckets(model, estimated_tokens)
+        if self.backend is not None:
+            # Capacidad/recarga viajan con cada llamada: el backend no guarda configuración
+            specs = [BucketSpec(f"{model}:{kind}", b.capacity, b.refill_rate, amount)
+                     for kind, b, amount in buckets]
+            try:
+                return await self.backend.acquire(specs, consume)
+            except Exception as e:
+                # Backend caído: degradar a buckets locales antes que frenar todo
+                self.stats['backend_errors'] += 1
+                logger.warning(f"⚠️ Rate limit backend error, using local buckets: {e}")
+        
+        # Sin awaits entre check y descuento: atómico dentro del event loop
+        wait = 0.0
+        for _, bucket, amount in buckets:
+            bucket._refill()
+            amount = min(amount, bucket.capacity)  # Un request mayor que el bucket nunca cabría
+            if bucket.tokens < amount:
+                wait = max(wait, (amount - bucket.tokens) / bucket.refill_rate)
+        if wait == 0 and consume:
+            for _, bucket, amount in buckets:
+                bucket.tokens -= min(amount, bucket.capacity)
+        return wait == 0, wait
+    
+    def _circuit_open(self, model: str) -> bool:
+        breaker = self.circuit_breakers[model]
+        if breaker.state != CircuitState.OPEN:
+            return False
+        if breaker._should_attempt_reset():
+            breaker.state = CircuitState.HALF_OPEN
+            logger.info(f"🔄 Circuit breaker for {model} entering HALF_OPEN state")
+            return False
+        return True
+    
+    async def _adjust(self, model: str, kind: str, bucket: TokenBucket, delta: float,
+                      ceiling: Optional[float] = None):
+        """Debitar `delta` (negativo = devolver) sin chequear; el nivel puede quedar negativo"""
+        if self.backend is not None:
+            try:
+                await self.backend.adjust(
+                    BucketSpec(f"{model}:{kind}", bucket.capacity, bucket.refill_rate, delta), ceiling
+                )
+                return
+            except Exception as e:
+                self.stats['backend_errors'] += 1
+                logger.warning(f"⚠️ Rate limit backend error, adjusting local buckets: {e}")
+        bucket._refill()
+        bucket.tokens -= delta
+        if ceiling is not None:
+            bucket.tokens = min(bucket.tokens, ceiling)
+        bucket.tokens = min(bucket.capacity, bucket.tokens)
+    
+    async def adjust_tokens(self, model: str, delta: float):
+        """Liquidar tokens reales vs pre-cargados (delta > 0 = se usaron más)"""
+        if model in self.token_buckets and delta:
+            await self._adjust(model, 'tokens', self.token_buckets[model], delta)
+    
+    async def pause(self, model: str, seconds: float):
+        """Vaciar el bucket de requests para que nadie (ningún proceso) envíe por `seconds`"""
+        if model not in self.request_buckets or seconds <= 0:
+            return
+        bucket = self.request_buckets[model]
+        # Con nivel 1 - rate·s, el próximo request cabe justo en `seconds`
+        await self._adjust(model, 'requests', bucket, 0, ceiling=1 - bucket.refill_rate * seconds)
+        logger.warning(f"⏸️ {model} en pausa {seconds:.1f}s (retry-after)")
+    
+    def resize(self, model: str, requests_per_minute: Optional[int] = None,
+               tokens_per_minute: Optional[int] = None):
+        """Redimensionar los buckets vivos (y la config) de un modelo"""
+        config = self.configs[model]
+        if requests_per_minute:
+            config.requests_per_minute = int(requests_per_minute)
+            self._resize_bucket(self.request_buckets[model], config.requests_per_minute)
+        if tokens_per_minute:
+            config.tokens_per_minute = int(tokens_per_minute)
+            bucket = self.token_buckets.get(model)
+            if bucket is None:
+                self.token_buckets[model] = TokenBucket(config.tokens_per_minute,
+                                                        config.tokens_per_minute / 60)
+            else:
+                self._resize_bucket(bucket, config.tokens_per_minute)
+    
+    @staticmethod
+    def _resize_bucket(bucket: TokenBucket, per_minute: int):
+        bucket._refill()
+        bucket.capacity = per_minute
+        bucket.refill_rate = per_minute / 60
+        bucket.tokens = min(bucket.tokens, bucket.capacity)
     
     async def acquire(self, model: str, estimated_tokens: int = 250) -> bool:
         """
@@ -298,40 +436,74 @@ class RateLimiter:
             return True
         
         # Verificar circuit breaker
-        if self.circuit_breakers[model].state == CircuitState.OPEN:
+        if self._circuit_open(model):
             self.stats['requests_rejected'] += 1
             return False
         
-        # Verificar rate limit de requests
-        request_bucket = self.request_buckets[model]
-        if not await request_bucket.acquire():
+        # Verificar rate limits de requests y tokens en una sola operación
+        acquired, _ = await self._try_acquire(model, estimated_tokens)
+        if not acquired:
             self.stats['requests_throttled'] += 1
             return False
         
-        # Verificar rate limit de tokens
-        if model in self.token_buckets:
-            token_bucket = self.token_buckets[model]
-            if not await token_bucket.acquire(estimated_tokens):
-                self.stats['requests_throttled'] += 1
-                return False
-        
         self.stats['requests_accepted'] += 1
         return True
     
+    async def wait_for_capacity(self, model: str, estimated_tokens: int = 250,
+                                max_wait: float = 60) -> bool:
+        """
+        Esperar (sin consumir) a que `acquire` pueda conceder el request
+
+        Útil para hacer pacing antes de despachar trabajo que luego llamará a
+        `acquire` por su cuenta. Retorna False si se agota max_wait.
+        """
+        if model not in self.configs:
+            return True
+        
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + max_wait
+        while True:
+            breaker = self.circuit_breakers[model]
+            if breaker.state == CircuitState.OPEN and not breaker._should_attempt_reset():
+                wait = 1.0
+            else:
+                ready, wait = await self._try_acquire(model, estimated_tokens, consume=False)
+                if ready:
+                    return True
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return False
+            await asyncio.sleep(min(wait, remaining, 1))
+    
     async def acquire_with_backoff(self, model: str, estimated_tokens: int = 250,
                                   max_retries: int = 3) -> bool:
-        """Adquirir con retry y exponential backoff"""
+        """
+        Adquirir esperando lo que indica el bucket (con jitter)
         
-        for attempt in range(max_retries):
+        La paciencia total equivale al backoff exponencial de max_retries intentos;
+        dormir lo justo en vez de 1-2-4s evita que los workers reintenten en ráfaga.
+        """
+        if model not in self.configs:
+            return await self.acquire(model, estimated_tokens)
+        
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (2 ** max_retries - 1) + max_retries * 0.5
+        attempt = 0
+        while True:
+            attempt += 1
             if await self.acquire(model, estimated_tokens):
                 return True
             
-            # Exponential backoff con jitter
-            wait_time = (2 ** attempt) + random.uniform(0, 1)
-            logger.info(f"⏳ Rate limited, waiting {wait_time:.1f}s (attempt {attempt + 1}/{max_retries})")
-            await asyncio.sleep(wait_time)
-        
-        return False
+            if self._circuit_open(model):
+                wait = 1.0
+            else:
+                _, wait = await self._try_acquire(model, estimated_tokens, consume=False)
+            remaining = deadline - loop.time()
+            if wait > remaining:
+                return False
+            wait_time = wait + random.uniform(0, min(wait, 1) * 0.2)
+            logger.debug(f"⏳ Rate limited, waiting {wait_time:.2f}s (attempt {attempt})")
+            await asyncio.sleep(min(wait_time, remaining))
     
     def report_success(self, model: str):
         """Reportar éxito al circuit breaker"""
@@ -366,6 +538,7 @@ class RateLimiter:
         
         # Estado global
         return {
+            'backend': type(self.backend).__name__ if self.backend else 'local',
             'stats': self.stats,
             'models': {
                 m: {
@@ -381,14 +554,97 @@ class RateLimiter:
         if model in self.circuit_breakers:
             self.circuit_breakers[model].reset()
 
+_DURATION_RE = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+
+
+def parse_duration(value) -> Optional[float]:
+    """Duración de headers de rate limit a segundos ('6m0s', '20ms', '1.5' -> s)"""
+    if value is None:
+        return None
+    text = str(value).strip()
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    parts = _DURATION_RE.findall(text)
+    if not parts:
+        return None
+    scale = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+    return sum(float(n) * scale[unit] for n, unit in parts)
+
+
+def parse_rate_limit_headers(headers) -> Dict[str, float]:
+    """
+    Extraer límites, remanentes, resets y retry-after de headers del proveedor
+    
+    Returns:
+        Dict con las claves presentes entre limit_requests, limit_tokens,
+        remaining_requests, remaining_tokens, reset_requests, reset_tokens, retry_after
+    """
+    if not headers:
+        return {}
+    lower = {str(k).lower(): v for k, v in dict(headers).items()}
+    out = {}
+    for kind in ('requests', 'tokens'):
+        for field in ('limit', 'remaining'):
+            value = lower.get(f'x-ratelimit-{field}-{kind}')
+            if value is not None:
+                try:
+                    out[f'{field}_{kind}'] = float(value)
+                except ValueError:
+                    pass
+        reset = parse_duration(lower.get(f'x-ratelimit-reset-{kind}'))
+        if reset is not None:
+            out[f'reset_{kind}'] = reset
+    if lower.get('retry-after-ms') is not None:
+        out['retry_after'] = parse_duration(lower['retry-after-ms']) / 1000
+    elif lower.get('retry-after') is not None:
+        retry_after = parse_duration(lower['retry-after'])
+        if retry_after is not None:
+            out['retry_after'] = retry_after
+    return out
+
+
 class AdaptiveThrottler:
-    """Throttler adaptativo que ajusta límites según performance"""
+    """
+    Control AIMD sobre los buckets vivos del RateLimiter
     
-    def __init__(self, rate_limiter: RateLimiter):
+    Sube los límites de forma aditiva mientras no haya 429 y los recorta de forma
+    multiplicativa ante un 429, acotado por el máximo del proveedor (aprendido de
+    los headers x-ratelimit-limit-*). Honra retry-after pausando el bucket.
+    """
+    
+    def __init__(self, rate_limiter: RateLimiter,
+                 increase_step: float = 0.05,
+                 decrease_factor: float = 0.7,
+                 adjustment_interval: float = 10,
+                 decrease_cooldown: float = 2.0,
+                 min_fraction: float = 0.1):
+        """
+        Args:
+            increase_step: Fracción del máximo que se suma por intervalo sin 429
+            decrease_factor: Multiplicador ante un 429
+            adjustment_interval: Segundos entre aumentos
+            decrease_cooldown: Un solo recorte por ráfaga de 429 dentro de este lapso
+            min_fraction: Piso como fracción del máximo
+        """
         self.rate_limiter = rate_limiter
         self.performance_window = deque(maxlen=100)  # Últimas 100 requests
-        self.adjustment_interval = 60  # Segundos entre ajustes
+        self.adjustment_interval = adjustment_interval  # Segundos entre ajustes
         self.last_adjustment = time.time()
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.decrease_cooldown = decrease_cooldown
+        self.min_fraction = min_fraction
+        
+        # Máximo del proveedor por modelo (config inicial hasta ver headers)
+        self.ceilings = {
+            model: {'rpm': config.requests_per_minute, 'tpm': config.tokens_per_minute}
+            for model, config in rate_limiter.configs.items()
+        }
+        self._last_decrease: Dict[str, float] = {}
+        self._limited_since_adjust: set = set()
+        self.stats = {'increases': 0, 'decreases': 0, 'pauses': 0}
     
     def record_latency(self, model: str, latency_ms: int, success: bool):
         """Registrar latencia de request"""
@@ -403,16 +659,72 @@ class AdaptiveThrottler:
         if time.time() - self.last_adjustment > self.adjustment_interval:
             self._adjust_limits()
     
-    def _adjust_limits(self):
-        """Ajustar límites basado en performance"""
-        if len(self.performance_window) < 10:
-            return
-        
-        # Calcular métricas
-        avg_latency = sum(r['latency_ms'] for r in self.performance_window) / len(self.performance_window)
-        success_rate = sum(1 for r in self.performance_window if r['success']) / len(self.performance_window)
+    async def observe(self, model: str, headers=None, rate_limited: bool = False):
+        """
+        Procesar la respuesta (o el error) de un request
         
-        # Ajustar según performance
+        Args:
+            headers: Headers HTTP del proveedor (si el cliente los expone)
+            rate_limited: True si el request terminó en 429
+        """
+        if model not in self.rate_limiter.configs:
+            return
+        info = parse_rate_limit_headers(headers)
+        ceiling = self.ceilings[model]
+        if info.get('limit_requests'):
+            ceiling['rpm'] = int(info['limit_requests'])
+        if info.get('limit_tokens'):
+            ceiling['tpm'] = int(info['limit_tokens'])
+        
+        pause = info.get('retry_after')
+        if pause is None:
+            # Presupuesto agotado en el proveedor: esperar a su reset aunque no haya 429 aún
+            for kind in ('requests', 'tokens'):
+                if info.get(f'remaining_{kind}') == 0 and info.get(f'reset_{kind}'):
+                    pause = max(pause or 0, info[f'reset_{kind}'])
+        
+        if rate_limited:
+            self._limited_since_adjust.add(model)
+            self._decrease(model)
+            if pause is None:
+                pause = 60 / max(1, self.rate_limiter.configs[model].requests_per_minute)
+        if pause:
+            self.stats['pauses'] += 1
+            await self.rate_limiter.pause(model, pause)
+    
+    def _decrease(self, model: str):
+        now = time.time()
+        if now - self._last_decrease.get(model, 0) < self.decrease_cooldown:
+            return
+        self._last_decrease[model] = now
+        config = self.rate_limiter.configs[model]
+        ceiling = self.ceilings[model]
+        rpm = max(int(config.requests_per_minute * self.decrease_factor),
+                  int(ceiling['rpm'] * self.min_fraction), 1)
+        tpm = None
+        if config.tokens_per_minute and ceiling['tpm']:
+            tpm = max(int(config.tokens_per_minute * self.decrease_factor),
+                      int(ceiling['tpm'] * self.min_fraction), 1)
+        logger.warning(f"📉 Reducing rate limit for {model}: {config.requests_per_minute} → {rpm} RPM")
+        self.rate_limiter.resize(model, rpm, tpm)
+        self.stats['decreases'] += 1
+    
+    def _increase(self, model: str):
+        config = self.rate_limiter.configs[model]
+        ceiling = self.ceilings[model]
+        rpm = min(ceiling['rpm'], config.requests_per_minute + max(1, int(ceiling['rpm'] * self.increase_step)))
+        tpm = None
+        if config.tokens_per_minute and ceiling['tpm']:
+            tpm = min(ceiling['tpm'],
+                      config.tokens_per_minute + max(1, int(ceiling['tpm'] * self.increase_step)))
+        if rpm == config.requests_per_minute and tpm in (None, config.tokens_per_minute):
+            return
+        logger.info(f"📈 Increasing rate limit for {model}: {config.requests_per_minute} → {rpm} RPM")
+        self.rate_limiter.resize(model, rpm, tpm)
+        self.stats['increases'] += 1
+    
+    def _adjust_limits(self):
+        """Paso aditivo: sube los modelos activos sin 429 desde el último ajuste"""
         for model in self.rate_limiter.configs.keys():
             model_requests = [r for r in self.performance_window if r['model'] == model]
             
@@ -421,32 +733,37 @@ class AdaptiveThrottler:
             
             model_success_rate = sum(1 for r in model_requests if r['success']) / len(model_requests)
             
-            # Si hay muchos errores, reducir límites
+            # Errores sostenidos (no solo 429): recortar
             if model_success_rate < 0.8:
-                old_limit = self.rate_limiter.configs[model].requests_per_minute
-                new_limit = int(old_limit * 0.8)
-                self.rate_limiter.configs[model].requests_per_minute = new_limit
-                logger.warning(f"📉 Reducing rate limit for {model}: {old_limit} → {new_limit} RPM")
-            
-            # Si todo va bien y latencia es baja, aumentar límites
-            elif model_success_rate > 0.95 and avg_latency < 1000:
-                old_limit = self.rate_limiter.configs[model].requests_per_minute
-                new_limit = int(old_limit * 1.1)
-                self.rate_limiter.configs[model].requests_per_minute = new_limit
-                logger.info(f"📈 Increasing rate limit for {model}: {old_limit} → {new_limit} RPM")
+                self._decrease(model)
+            elif model not in self._limited_since_adjust:
+                self._increase(model)
         
+        self._limited_since_adjust.clear()
         self.last_adjustment = time.time()
 
 # Singleton
 _rate_limiter = None
+_adaptive_throttler = None
 
 def get_rate_limiter() -> RateLimiter:
-    """Obtener instancia singleton del rate limiter"""
+    """
+    Obtener instancia singleton del rate limiter
+    
+    RATE_LIMIT_BACKEND (redis://... | sqlite:///...) comparte los buckets entre procesos
+    """
     global _rate_limiter
     if _rate_limiter is None:
-        _rate_limiter = RateLimiter()
+        _rate_limiter = RateLimiter(backend=backend_from_url(os.getenv('RATE_LIMIT_BACKEND')))
     return _rate_limiter
 
+def get_adaptive_throttler() -> AdaptiveThrottler:
+    """Obtener instancia singleton del throttler adaptativo (sobre el rate limiter singleton)"""
+    global _adaptive_throttler
+    if _adaptive_throttler is None:
+        _adaptive_throttler = AdaptiveThrottler(get_rate_limiter())
+    return _adaptive_throttler
+
 if __name__ == "__main__":
     import asyncio
     
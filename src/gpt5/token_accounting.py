@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧮 Contabilidad de tokens para el rate limiter
+Pre-carga en el bucket de tokens una estimación por tokenizer (prompt + salida
+esperada) y liquida contra el `usage` real que devuelve la API. Las respuestas y
+errores alimentan al AdaptiveThrottler (AIMD + retry-after).
+"""
+
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from .throttling import RateLimiter, AdaptiveThrottler, get_rate_limiter, get_adaptive_throttler
+except ImportError:
+    from gpt5.throttling import RateLimiter, AdaptiveThrottler, get_rate_limiter, get_adaptive_throttler
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+except ImportError:  # Opcional: sin tiktoken se usa la heurística corregida por el usage real
+    tiktoken = None
+
+MESSAGE_OVERHEAD_TOKENS = 4   # Tokens de formato por mensaje de chat
+REPLY_PRIMING_TOKENS = 3
+CHARS_PER_TOKEN = 4.0
+DEFAULT_COMPLETION_RATIO = 0.5  # Salida/entrada inicial hasta ver respuestas reales
+
+
+@dataclass
+class Reservation:
+    """Tokens pre-cargados para un request en vuelo"""
+    model: str
+    charged: int
+    prompt_estimate: int
+    started: float
+
+
+def _usage_value(usage: Any, key: str) -> int:
+    if usage is None:
+        return 0
+    value = usage.get(key) if isinstance(usage, dict) else getattr(usage, key, None)
+    return int(value or 0)
+
+
+def response_headers(obj: Any) -> Optional[Dict[str, str]]:
+    """Headers HTTP de una respuesta o excepción del cliente OpenAI (si los expone)"""
+    for candidate in (obj, getattr(obj, 'response', None), getattr(obj, 'http_response', None)):
+        headers = getattr(candidate, 'headers', None) if candidate is not None else None
+        if headers:
+            return dict(headers)
+    headers = getattr(obj, '_headers', None)
+    return dict(headers) if headers else None
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    status = getattr(error, 'status_code', None) or getattr(error, 'http_status', None)
+    text = str(error).lower()
+    return status == 429 or '429' in text or 'rate limit' in text
+
+
+class TokenAccountant:
+    """Reserva → request → liquidación contra el usage real"""
+
+    def __init__(self, rate_limiter: RateLimiter,
+                 throttler: Optional[AdaptiveThrottler] = None,
+                 alpha: float = 0.2):
+        """
+        Args:
+            rate_limiter: Limiter cuyos buckets se cargan y liquidan
+            throttler: Controlador AIMD a alimentar (None = sin adaptación)
+            alpha: Peso del último request en los promedios móviles
+        """
+        self.rate_limiter = rate_limiter
+        self.throttler = throttler
+        self.alpha = alpha
+        self._encoders: Dict[str, Any] = {}
+        # Por modelo: salida/entrada observada y corrección real/estimado del prompt
+        self.completion_ratio: Dict[str, float] = {}
+        self.prompt_correction: Dict[str, float] = {}
+        self.stats = {
+            'reserved': 0,
+            'settled': 0,
+            'tokens_charged': 0,
+            'tokens_actual': 0,
+            'refunded': 0,
+            'rate_limited': 0
+        }
+
+    def _encoder(self, model: str):
+        if tiktoken is None:
+            return None
+        if model not in self._encoders:
+            try:
+                self._encoders[model] = tiktoken.encoding_for_model(model)
+            except KeyError:
+                self._encoders[model] = tiktoken.get_encoding("o200k_base")
+        return self._encoders[model]
+
+    def count_prompt_tokens(self, model: str, messages: List[Dict[str, str]]) -> int:
+        """Tokens de entrada de una conversación de chat"""
+        encoder = self._encoder(model)
+        total = REPLY_PRIMING_TOKENS
+        for message in messages:
+            content = message.get('content') or ''
+            if encoder is not None:
+                total += len(encoder.encode(content))
+            else:
+                total += int(len(content) / CHARS_PER_TOKEN * self.prompt_correction.get(model, 1.0))
+            total += MESSAGE_OVERHEAD_TOKENS
+        return total
+
+    def estimate(self, model: str, messages: List[Dict[str, str]],
+                 max_completion_tokens: int) -> Tuple[int, int]:
+        """
+        Returns:
+            (tokens de prompt, tokens totales a pre-cargar)
+        """
+        prompt = self.count_prompt_tokens(model, messages)
+        completion = prompt * self.completion_ratio.get(model, DEFAULT_COMPLETION_RATIO)
+        return prompt, prompt + int(min(completion, max_completion_tokens))
+
+    async def reserve(self, model: str, messages: List[Dict[str, str]],
+                      max_completion_tokens: int, max_retries: int = 3) -> Optional[Reservation]:
+        """
+        Pre-cargar la estimación en el rate limiter (esperando capacidad)
+
+        Returns:
+            Reservation, o None si no hubo capacidad dentro del plazo
+        """
+        prompt, charged = self.estimate(model, messages, max_completion_tokens)
+        if not await self.rate_limiter.acquire(model, estimated_tokens=charged):
+            if not await self.rate_limiter.acquire_with_backoff(model, estimated_tokens=charged,
+                                                                max_retries=max_retries):
+                return None
+        self.stats['reserved'] += 1
+        self.stats['tokens_charged'] += charged
+        return Reservation(model, charged, prompt, time.perf_counter())
+
+    async def settle(self, reservation: Reservation, response: Any = None, usage: Any = None):
+        """Liquidar contra el usage real y alimentar al throttler"""
+        usage = usage if usage is not None else getattr(response, 'usage', None)
+        model = reservation.model
+        actual = _usage_value(usage, 'total_tokens')
+        if actual:
+            await self.rate_limiter.adjust_tokens(model, actual - reservation.charged)
+            self.stats['settled'] += 1
+            self.stats['tokens_actual'] += actual
+
+            prompt_tokens = _usage_value(usage, 'prompt_tokens')
+            completion_tokens = _usage_value(usage, 'completion_tokens')
+            if prompt_tokens:
+                self._ewma(self.completion_ratio, model, completion_tokens / prompt_tokens,
+                           DEFAULT_COMPLETION_RATIO)
+                if self._encoder(model) is None and reservation.prompt_estimate:
+                    # La heurística de caracteres se corrige con lo que cobra el proveedor
+                    correction = self.prompt_correction.get(model, 1.0)
+                    self._ewma(self.prompt_correction, model,
+                               correction * prompt_tokens / reservation.prompt_estimate, 1.0)
+
+        if self.throttler is not None:
+            await self.throttler.observe(model, headers=response_headers(response))
+            self.throttler.record_latency(model, self._latency_ms(reservation), True)
+
+    async def fail(self, reservation: Reservation, error: Exception):
+        """Registrar un request fallido: devuelve lo pre-cargado; un 429 recorta límites y honra retry-after"""
+        # Sin usage que liquidar: la pre-carga completa vuelve al bucket
+        await self.rate_limiter.adjust_tokens(reservation.model, -reservation.charged)
+        self.stats['refunded'] += 1
+        limited = is_rate_limit_error(error)
+        if limited:
+            self.stats['rate_limited'] += 1
+        if self.throttler is not None:
+            await self.throttler.observe(reservation.model, headers=response_headers(error),
+                                         rate_limited=limited)
+            self.throttler.record_latency(reservation.model, self._latency_ms(reservation), False)
+
+    def _ewma(self, store: Dict[str, float], model: str, value: float, default: float):
+        store[model] = (1 - self.alpha) * store.get(model, default) + self.alpha * value
+
+    @staticmethod
+    def _latency_ms(reservation: Reservation) -> int:
+        return int((time.perf_counter() - reservation.started) * 1000)
+
+    def get_stats(self) -> Dict[str, Any]:
+        charged, actual = self.stats['tokens_charged'], self.stats['tokens_actual']
+        return {
+            **self.stats,
+            'estimate_ratio': round(charged / actual, 3) if actual else None,
+            'completion_ratio': dict(self.completion_ratio)
+        }
+
+
+# Singleton
+_token_accountant = None
+
+
+def get_token_accountant() -> TokenAccountant:
+    """Obtener instancia singleton (rate limiter + throttler adaptativo compartidos)"""
+    global _token_accountant
+    if _token_accountant is None:
+        _token_accountant = TokenAccountant(get_rate_limiter(), get_adaptive_throttler())
+    return _token_accountant
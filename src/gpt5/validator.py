@@ -7,12 +7,29 @@ Validación de taxonomía, esquemas de atributos, marcas y quality gating
 
 import json
 import re
-from typing import Dict, Any, List, Tuple, Optional
+from typing import Dict, Any, List, Tuple, Optional, Sequence, Union
 from pathlib import Path
 import logging
 
+try:
+    from ..attribute_schema import get_attribute_schema
+except ImportError:
+    from attribute_schema import get_attribute_schema
+
 logger = logging.getLogger(__name__)
 
+
+def _value_key(value: Any):
+    """Clave de deduplicación: 1, 1.0 y True son iguales en un dict pero no al validar"""
+    return (value.__class__, value)
+
+
+_REQUIRED_FIELDS = ('brand', 'model', 'normalized_name', 'attributes', 'confidence')
+_REQUIRED_FIELDS_SET = frozenset(_REQUIRED_FIELDS)
+_EMPTY: Dict[str, Any] = {}
+_NUMERIC = (float, int, bool)
+
+
 class StrictValidator:
     """Validador estricto para productos normalizados"""
     
@@ -131,83 +148,10 @@ class StrictValidator:
             self.brand_index = {}
     
     def _load_attribute_schemas(self):
-        """Definir esquemas de atributos por categoría"""
-        self.attribute_schemas = {
-            "smartphones": {
-                "required": ["capacity", "color"],
-                "optional": ["screen_size", "network", "processor", "ram", "camera"],
-                "types": {
-                    "capacity": "string",  # 128GB, 256GB, etc
-                    "color": "string",
-                    "screen_size": "float",  # 6.7
-                    "network": "enum:4G,5G",
-                    "processor": "string",
-                    "ram": "string",  # 8GB
-                    "camera": "string"  # 48MP
-                },
-                "validators": {
-                    "capacity": lambda x: bool(re.match(r'^\d+[GT]B$', str(x).upper())),
-                    "screen_size": lambda x: 3.0 <= float(x) <= 10.0 if x else True,
-                    "network": lambda x: x in ["4G", "5G", "LTE"]
-                }
-            },
-            "notebooks": {
-                "required": ["ram", "storage"],
-                "optional": ["screen_size", "processor", "graphics", "os"],
-                "types": {
-                    "ram": "string",  # 16GB
-                    "storage": "string",  # 512GB SSD
-                    "screen_size": "float",
-                    "processor": "string",
-                    "graphics": "string",
-                    "os": "string"
-                },
-                "validators": {
-                    "ram": lambda x: bool(re.match(r'^\d+GB', str(x))),
-                    "storage": lambda x: bool(re.match(r'^\d+[GT]B', str(x))),
-                    "screen_size": lambda x: 10.0 <= float(x) <= 20.0 if x else True
-                }
-            },
-            "smart_tv": {
-                "required": ["screen_size"],
-                "optional": ["panel", "resolution", "smart_platform", "hdr"],
-                "types": {
-                    "screen_size": "float",
-                    "panel": "enum:OLED,QLED,LED,LCD,4K,8K",
-                    "resolution": "enum:HD,FHD,4K,8K",
-                    "smart_platform": "string",
-                    "hdr": "boolean"
-                },
-                "validators": {
-                    "screen_size": lambda x: 20.0 <= float(x) <= 100.0,
-                    "panel": lambda x: x in ["OLED", "QLED", "LED", "LCD", "4K", "8K"],
-                    "resolution": lambda x: x in ["HD", "FHD", "4K", "8K", "1080p", "720p"]
-                }
-            },
-            "perfumes": {
-                "required": ["volume_ml"],
-                "optional": ["concentration", "gender", "fragrance_family"],
-                "types": {
-                    "volume_ml": "integer",
-                    "concentration": "enum:EDP,EDT,Parfum,Cologne,EDC",
-                    "gender": "enum:Mujer,Hombre,Unisex",
-                    "fragrance_family": "string"
-                },
-                "validators": {
-                    "volume_ml": lambda x: 5 <= int(x) <= 500,
-                    "concentration": lambda x: x in ["EDP", "EDT", "Parfum", "Cologne", "EDC"],
-                    "gender": lambda x: x in ["Mujer", "Hombre", "Unisex", "Women", "Men"]
-                }
-            }
-        }
-        
-        # Schema por defecto
-        self.default_schema = {
-            "required": [],
-            "optional": ["size", "color", "material", "weight", "dimensions"],
-            "types": {},
-            "validators": {}
-        }
+        """Esquemas de atributos por categoría desde el esquema declarativo compartido"""
+        schema_file = self.config_path / "attribute_schema.json"
+        schema = get_attribute_schema(str(schema_file) if schema_file.exists() else None)
+        self.attribute_schemas, self.default_schema = schema.validator_schemas()
     
     def _init_quality_thresholds(self):
         """Definir umbrales de calidad por categoría"""
@@ -411,6 +355,38 @@ class StrictValidator:
         passes = len(issues) == 0
         return passes, quality_score, issues
     
+    def validate_normalized(self, normalized_data: Dict[str, Any],
+                            category_base: str = 'general') -> Tuple[bool, float, List[str]]:
+        """
+        Validación estricta de una respuesta LLM (taxonomía, atributos, calidad)
+        Limpia normalized_data in-place.
+        
+        Returns:
+            (passes_quality, quality_score, issues)
+        """
+        # 1. Validar taxonomía
+        if 'category_suggestion' in normalized_data:
+            valid_tax, final_cat, tax_msg = self.validate_taxonomy(
+                normalized_data['category_suggestion'], category_base
+            )
+            if not valid_tax:
+                logger.warning(f"⚠️ Taxonomía inválida: {tax_msg}")
+            normalized_data['category_suggestion'] = final_cat
+        
+        category = normalized_data.get('category_suggestion', category_base)
+        
+        # 2. Validar atributos
+        if 'attributes' in normalized_data:
+            valid_attrs, clean_attrs, attr_warnings = self.validate_attributes(
+                normalized_data['attributes'], category
+            )
+            if attr_warnings:
+                logger.debug(f"Advertencias de atributos: {attr_warnings}")
+            normalized_data['attributes'] = clean_attrs
+        
+        # 3. Validar calidad
+        return self.validate_quality(normalized_data, category)
+    
     def validate_complete(self, result: Dict[str, Any], category_base: str = None) -> Dict[str, Any]:
         """
         Validación completa de un resultado
@@ -482,6 +458,330 @@ class StrictValidator:
             'quality_score': quality_score,
             'needs_fallback': not passes_quality and quality_score < 0.6
         }
+    
+    # ============================================================================
+    # ⚡ VALIDACIÓN POR LOTES
+    # ============================================================================
+    
+    def validate_batch(self, results: Sequence[Dict[str, Any]],
+                       category_base: Union[str, Sequence[Optional[str]], None] = None) -> List[Dict[str, Any]]:
+        """
+        validate_complete sobre muchos resultados
+        
+        Solo compensa con muchos valores repetidos (~1.2-1.9x); con registros
+        mayormente distintos es más lento que iterar validate_complete, por eso
+        la ingesta y el camino empaquetado validan registro a registro.
+        
+        Mismo veredicto y mismas mutaciones in-place que llamar validate_complete
+        por registro, pero marcas y categorías se resuelven una vez por valor
+        distinto, los atributos una vez por combinación distinta (columnas de
+        valores únicos validadas con check_many: regex/rango NumPy/enum) y la
+        calidad una vez por (atributos, confidence). Registros con tipos
+        inesperados pasan por el camino escalar; si este falla el veredicto
+        queda inválido con el error en lugar de abortar el lote.
+        
+        Args:
+            results: Resultados normalizados (se limpian in-place)
+            category_base: Categoría base común o una por resultado
+        
+        Returns:
+            Un dict por resultado con la forma de validate_complete
+        """
+        n = len(results)
+        bases = list(category_base) if isinstance(category_base, (list, tuple)) else [category_base] * n
+        verdicts: List[Optional[Dict[str, Any]]] = [None] * n
+        # Estado por registro en listas planas: pocos objetos vivos entre pasadas
+        refs: List[Optional[int]] = [None] * n
+        notes: List[Optional[tuple]] = [None] * n
+        brand_memo: Dict[str, Tuple[str, Optional[str]]] = {}
+        taxonomy_memo: Dict[Tuple[str, str], Tuple[str, Optional[str]]] = {}
+        batch = _AttributeBatch(self)
+        
+        # 1. Estructura, marca y taxonomía (una resolución por valor distinto)
+        for i, result in enumerate(results):
+            if not self._batchable(result):
+                verdicts[i] = self._validate_complete_safe(result, bases[i])
+                continue
+            missing = None
+            if not result.keys() >= _REQUIRED_FIELDS_SET:
+                missing = []
+                for field in _REQUIRED_FIELDS:
+                    if field not in result:
+                        missing.append(f"Missing field: {field}")
+                        result[field] = "" if field != 'attributes' else {}
+            
+            raw_brand = result['brand'] or ''
+            brand = brand_memo.get(raw_brand)
+            if brand is None:
+                canonical, is_known = self.validate_brand(raw_brand)
+                unknown = not is_known and canonical != "DESCONOCIDA"
+                brand = brand_memo[raw_brand] = (canonical, f"Unknown brand: {canonical}" if unknown else None)
+            result['brand'] = brand[0]
+            
+            suggestion = result.get('category_suggestion') or ''
+            key = (suggestion, bases[i] or suggestion or 'general')
+            category = taxonomy_memo.get(key)
+            if category is None:
+                is_valid_cat, final_category, reason = self.validate_taxonomy(*key)
+                category = taxonomy_memo[key] = (final_category, None if is_valid_cat else reason)
+            result['category'] = category[0]
+            
+            refs[i] = batch.add(result['attributes'], category[0])
+            if missing or brand[1] or category[1]:
+                notes[i] = (missing, brand[1], category[1])
+        
+        # 2-3. Atributos por columna y calidad, luego el veredicto por registro
+        batch.resolve()
+        templates, quality = batch.templates, batch.quality
+        for i, ref in enumerate(refs):
+            if ref is None:
+                continue
+            result = results[i]
+            note = notes[i]
+            if note is None:
+                errors, warnings = [], []
+            else:
+                errors = note[0] or []
+                warnings = [w for w in note[1:] if w]
+            
+            template = templates[ref]
+            result['attributes'] = dict(template.cleaned)
+            if not template.is_valid:
+                warnings.extend(template.errors)
+            passes_quality, quality_score, quality_issues = quality(ref, result['confidence'])
+            if not passes_quality:
+                warnings.extend(quality_issues)
+            
+            # 4. Nombre normalizado
+            name = result.get('normalized_name')
+            if not name or len(name) < 5:
+                result['normalized_name'] = f"{result['brand']} {result.get('model', 'Producto')}"
+                warnings.append("Generated normalized_name")
+            
+            verdicts[i] = {
+                'valid': not errors and (passes_quality or len(warnings) <= 2),
+                'result': result,
+                'errors': errors,
+                'warnings': warnings,
+                'quality_score': quality_score,
+                'needs_fallback': not passes_quality and quality_score < 0.6
+            }
+        return verdicts
+    
+    def validate_normalized_batch(self, items: Sequence[Tuple[Dict[str, Any], Optional[str]]]
+                                  ) -> List[Tuple[bool, float, List[str]]]:
+        """
+        validate_normalized sobre muchas respuestas LLM: [(normalized_data, category_base)]
+        
+        Limpia cada normalized_data in-place igual que la versión escalar; las
+        categorías inválidas se reportan en un solo warning agregado.
+        """
+        out: List[Optional[Tuple[bool, float, List[str]]]] = [None] * len(items)
+        refs: List[Optional[int]] = [None] * len(items)
+        taxonomy_memo: Dict[Tuple[str, str], Tuple[bool, str, str]] = {}
+        invalid_taxonomy = 0
+        batch = _AttributeBatch(self)
+        
+        for i, (data, base) in enumerate(items):
+            if not self._batchable(data, complete=False):
+                try:
+                    out[i] = self.validate_normalized(data, base)
+                except Exception as e:
+                    out[i] = (False, 0.0, [f"Validation error: {e}"])
+                continue
+            if 'category_suggestion' in data:
+                key = (data['category_suggestion'] or '', base)
+                hit = taxonomy_memo.get(key)
+                if hit is None:
+                    hit = taxonomy_memo[key] = self.validate_taxonomy(*key)
+                invalid_taxonomy += not hit[0]
+                data['category_suggestion'] = hit[1]
+            # Sin 'attributes' no hay limpieza: la calidad se mide sobre {}
+            refs[i] = batch.add(data.get('attributes', _EMPTY), data.get('category_suggestion', base))
+        
+        if invalid_taxonomy:
+            logger.warning(f"⚠️ Taxonomía inválida en {invalid_taxonomy}/{len(items)} respuestas")
+        
+        batch.resolve()
+        for i, ref in enumerate(refs):
+            if ref is None:
+                continue
+            data = items[i][0]
+            if 'attributes' in data:
+                data['attributes'] = dict(batch.templates[ref].cleaned)
+            passes, score, issues = batch.quality(ref, data.get('confidence', 0.0))
+            out[i] = (passes, score, list(issues))
+        return out
+    
+    def _batchable(self, result: Any, complete: bool = True) -> bool:
+        """Tipos que el camino por lotes replica exactamente (el resto va al escalar)"""
+        if result.__class__ is not dict:
+            return False
+        get = result.get
+        if get('attributes', _EMPTY).__class__ is not dict:
+            return False
+        if get('confidence', 0.0).__class__ not in _NUMERIC:
+            return False
+        suggestion = get('category_suggestion')
+        if suggestion and suggestion.__class__ is not str:
+            return False
+        if complete:
+            # Sin confidence validate_complete la rellena con "" y validate_quality falla
+            brand, name = get('brand'), get('normalized_name')
+            return ('confidence' in result and (not brand or brand.__class__ is str)
+                    and (not name or name.__class__ is str))
+        return True
+    
+    def _validate_complete_safe(self, result: Any, category_base: Optional[str]) -> Dict[str, Any]:
+        try:
+            return self.validate_complete(result, category_base)
+        except Exception as e:
+            return {'valid': False, 'result': result, 'errors': [f"Validation error: {e}"],
+                    'warnings': [], 'quality_score': 0.0, 'needs_fallback': True}
+
+
+class _Template:
+    """Resultado de validate_attributes para una combinación distinta de atributos"""
+    
+    __slots__ = ("is_valid", "cleaned", "errors", "category", "present", "n_required")
+    
+    def __init__(self, is_valid: bool, cleaned: Dict[str, Any], errors: List[str],
+                 category: str, required: List[str]):
+        self.is_valid = is_valid
+        self.cleaned = cleaned
+        self.errors = errors
+        self.category = category
+        self.present = sum(1 for attr in required if attr in cleaned and cleaned[attr])
+        self.n_required = len(required)
+
+
+class _AttributeBatch:
+    """
+    validate_attributes + validate_quality de un lote, por combinación distinta
+    
+    add() registra los atributos de un registro y devuelve su índice en
+    `templates`; resolve() valida cada columna (atributo) de una vez sobre sus
+    valores únicos con check_many y arma una plantilla por combinación;
+    quality() memoiza el resultado por (plantilla, confidence). Las plantillas
+    son compartidas: quien las usa copia `cleaned`.
+    """
+    
+    def __init__(self, validator: 'StrictValidator'):
+        self.validator = validator
+        self.templates: List[Optional[_Template]] = []
+        self._entries: List[Tuple[str, Dict[str, Any]]] = []
+        self._ids: Dict[Any, int] = {}
+        self._quality: Dict[Any, Tuple[bool, float, List[str]]] = {}
+    
+    def add(self, attrs: Dict[str, Any], category: str) -> int:
+        # Las clases en la clave separan 1, 1.0 y True (iguales como claves de dict)
+        key = (category, tuple(attrs.items()), tuple(map(type, attrs.values())))
+        try:
+            ref = self._ids.get(key)
+        except TypeError:  # Valores no hasheables: camino escalar
+            self._entries.append((category, attrs))
+            self.templates.append(_Template(*self.validator.validate_attributes(attrs, category),
+                                            category, self._schema(category).get('required', [])))
+            return len(self.templates) - 1
+        if ref is None:
+            ref = self._ids[key] = len(self.templates)
+            self._entries.append((category, attrs))
+            self.templates.append(None)
+        return ref
+    
+    def _schema(self, category: str) -> Dict[str, Any]:
+        return self.validator.attribute_schemas.get(category, self.validator.default_schema)
+    
+    def resolve(self):
+        """Validar las combinaciones pendientes, una categoría y una columna a la vez"""
+        by_category: Dict[str, List[int]] = {}
+        for ref, template in enumerate(self.templates):
+            if template is None:
+                by_category.setdefault(self._entries[ref][0], []).append(ref)
+        for category, refs in by_category.items():
+            self._resolve_category(category, refs)
+    
+    def _resolve_category(self, category: str, refs: List[int]):
+        schema = self._schema(category)
+        required = schema.get('required', [])
+        all_allowed = set(required) | set(schema.get('optional', []))
+        validators = schema.get('validators', {})
+        types = schema.get('types', {})
+        
+        columns: Dict[str, Dict[Any, Any]] = {}
+        for ref in refs:
+            for attr, value in self._entries[ref][1].items():
+                if not all_allowed or attr in all_allowed:
+                    columns.setdefault(attr, {})[_value_key(value)] = value
+        
+        # Veredicto y valor normalizado por valor único de cada columna
+        normalize = self.validator._normalize_value
+        by_column: Dict[str, Dict[Any, Tuple[Optional[bool], Optional[str], Any]]] = {}
+        for attr, uniques in columns.items():
+            values = list(uniques.values())
+            rule = validators.get(attr)
+            if rule is None:
+                checks = [(True, None)] * len(values)
+            elif hasattr(rule, 'check_many'):
+                checks = rule.check_many(values)
+            else:
+                checks = []
+                for value in values:
+                    try:
+                        checks.append((bool(rule(value)), None))
+                    except Exception as e:
+                        checks.append((None, str(e)))
+            type_hint = types.get(attr)
+            by_column[attr] = {
+                vkey: (ok, err, normalize(value, type_hint) if ok else None)
+                for vkey, value, (ok, err) in zip(uniques, values, checks)
+            }
+        
+        # Plantillas (mismo orden de claves y errores que validate_attributes)
+        for ref in refs:
+            attrs = self._entries[ref][1]
+            cleaned = {}
+            errors = []
+            for req_attr in required:
+                if req_attr not in attrs or not attrs[req_attr]:
+                    errors.append(f"Missing required: {req_attr}")
+                else:
+                    cleaned[req_attr] = attrs[req_attr]
+            for attr, value in attrs.items():
+                if all_allowed and attr not in all_allowed:
+                    continue
+                ok, err, normalized = by_column[attr][_value_key(value)]
+                if ok:
+                    cleaned[attr] = normalized
+                elif ok is None:
+                    errors.append(f"Validation error {attr}: {err}")
+                else:
+                    errors.append(f"Invalid {attr}: {value}")
+            self.templates[ref] = _Template(len(errors) <= 1, cleaned, errors, category, required)
+    
+    def quality(self, ref: int, confidence) -> Tuple[bool, float, List[str]]:
+        """validate_quality sobre los atributos limpios; memoizado por (plantilla, confidence)"""
+        key = (ref, confidence.__class__, confidence)
+        hit = self._quality.get(key)
+        if hit is None:
+            hit = self._quality[key] = self._quality_of(self.templates[ref], confidence)
+        return hit
+    
+    def _quality_of(self, t: _Template, confidence) -> Tuple[bool, float, List[str]]:
+        thresholds = self.validator.quality_thresholds
+        thresholds = thresholds.get(t.category, thresholds['default'])
+        issues = []
+        if confidence < thresholds['min_confidence']:
+            issues.append(f"Low confidence: {confidence:.2f} < {thresholds['min_confidence']}")
+        if t.n_required:
+            coverage = t.present / t.n_required
+            if coverage < thresholds['min_coverage']:
+                issues.append(f"Low coverage: {coverage:.1%} < {thresholds['min_coverage']:.1%}")
+        else:
+            coverage = 1.0
+        if len(t.cleaned) < thresholds.get('min_attributes', 0):
+            issues.append(f"Too few attributes: {len(t.cleaned)} < {thresholds['min_attributes']}")
+        return len(issues) == 0, (confidence * 0.6) + (coverage * 0.4), issues
 
 # ============================================================================
 # Quality Gating Functions
@@ -0,0 +1,463 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🚦 Cola de procesamiento con prioridad (processing_queue)
+Consumo concurrente con FOR UPDATE SKIP LOCKED ordenado por prioridad y
+antigüedad, con leases y visibilidad para reintentos. Los items urgentes
+(alto valor, recién vistos) se normalizan en tiempo real; la cola larga se
+junta y se entrega al daemon de Batch API.
+
+    pending ─claim─▶ processing ─complete─▶ completed (batch_id = entregado a Batch API)
+       ▲                 │
+       └─ fail/lease ────┴──▶ failed (sin reintentos)
+
+Uso:
+    python -m gpt5.work_queue            # loop continuo
+    python -m gpt5.work_queue --once     # un tick (cron)
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from psycopg2 import extras
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_MIN = 1
+PRIORITY_MAX = 10
+URGENT_PRIORITY = 8  # Desde aquí se procesa en tiempo real
+
+_PRICE_KEYS = ("card_price", "normal_price", "price", "price_current", "original_price")
+
+
+def _default_price(product: Dict[str, Any]) -> Optional[float]:
+    for key in _PRICE_KEYS:
+        value = product.get(key)
+        if isinstance(value, (int, float)) and value > 0:
+            return float(value)
+    return None
+
+
+def _parse_time(value: Any) -> Optional[datetime]:
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value, tz=timezone.utc)
+    if isinstance(value, str) and value:
+        try:
+            parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+        return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+    return None
+
+
+# ============================================================================
+# 🎯 PRIORIDAD
+# ============================================================================
+
+@dataclass
+class PriorityPolicy:
+    """
+    Prioridad 1..10 a partir de señales del producto
+
+    base + banda de precio + frescura (nuevo / scrapeado hace poco) + peso del retailer
+    """
+    base: int = 4
+    price_bands: Sequence[Tuple[float, int]] = ((1_000_000, 3), (300_000, 2), (100_000, 1))
+    fresh_hours: float = 6
+    new_bonus: int = 2
+    stale_days: float = 30
+    retailer_weights: Dict[str, int] = field(default_factory=dict)
+    price_of: Callable[[Dict[str, Any]], Optional[float]] = _default_price
+
+    def score(self, product: Dict[str, Any], now: Optional[datetime] = None) -> int:
+        now = now or datetime.now(timezone.utc)
+        priority = self.base
+
+        price = self.price_of(product)
+        if price:
+            for threshold, points in self.price_bands:
+                if price >= threshold:
+                    priority += points
+                    break
+
+        # Frescura: un producto nuevo o recién scrapeado importa ahora
+        if product.get('is_new'):
+            priority += self.new_bonus
+        seen = _parse_time(product.get('scraped_at') or product.get('created_at'))
+        if seen is not None:
+            age_hours = (now - seen).total_seconds() / 3600
+            if age_hours <= self.fresh_hours:
+                priority += 1
+            elif age_hours >= self.stale_days * 24:
+                priority -= 1
+
+        retailer = str(product.get('retailer') or '').lower()
+        priority += self.retailer_weights.get(retailer, 0)
+        return max(PRIORITY_MIN, min(PRIORITY_MAX, priority))
+
+
+# ============================================================================
+# 💾 COLA
+# ============================================================================
+
+class ProcessingQueue:
+    """processing_queue en PostgreSQL con leases y visibilidad"""
+
+    def __init__(self, db, max_retries: int = 3, retry_delay: float = 60):
+        """
+        Args:
+            db: GPT5DatabaseConnector
+            max_retries: Reintentos antes de marcar failed
+            retry_delay: Base del backoff de visibilidad (segundos, x2 por reintento)
+        """
+        self.db = db
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+
+    def enqueue(self, items: List[Tuple[str, Dict[str, Any], Optional[str], int]]) -> int:
+        """
+        Encolar (fingerprint, producto, modelo, prioridad) en bloque
+
+        Un fingerprint ya vivo en la cola no se duplica: conserva la prioridad más alta.
+
+        Returns:
+            Filas insertadas o actualizadas
+        """
+        if not items:
+            return 0
+        rows = {}
+        for fingerprint, product, model, priority in items:
+            rows[fingerprint] = (fingerprint, json.dumps(product, default=str), model,
+                                 max(PRIORITY_MIN, min(PRIORITY_MAX, int(priority))))
+        with self.db.get_connection() as conn:
+            with conn.cursor() as cursor:
+                touched = extras.execute_values(cursor, """
+                    INSERT INTO processing_queue (fingerprint, product_data, assigned_model, priority)
+                    VALUES %s
+                    ON CONFLICT (fingerprint) WHERE status IN ('pending', 'processing')
+                    DO UPDATE SET priority = GREATEST(processing_queue.priority, EXCLUDED.priority),
+                                  assigned_model = COALESCE(EXCLUDED.assigned_model,
+                                                            processing_queue.assigned_model)
+                    RETURNING id
+                """, list(rows.values()), fetch=True)
+            conn.commit()
+        return len(touched)
+
+    def claim(self, worker_id: str, limit: int, lease_seconds: int = 300,
+              min_priority: int = PRIORITY_MIN, max_priority: int = PRIORITY_MAX) -> List[Dict]:
+        """Reclamar hasta `limit` items visibles por prioridad y antigüedad"""
+        with self.db.get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    UPDATE processing_queue
+                    SET status = 'processing',
+                        locked_by = %s,
+                        locked_until = CURRENT_TIMESTAMP + make_interval(secs => %s)
+                    WHERE id IN (
+                        SELECT id FROM processing_queue
+                        WHERE status = 'pending'
+                          AND priority BETWEEN %s AND %s
+                          AND COALESCE(visible_at, created_at) <= CURRENT_TIMESTAMP
+                        ORDER BY priority DESC, created_at
+                        LIMIT %s
+                        FOR UPDATE SKIP LOCKED
+                    )
+                    RETURNING id, fingerprint, product_data, assigned_model, priority,
+                              retry_count, created_at
+                """, (worker_id, lease_seconds, min_priority, max_priority, limit))
+                items = cursor.fetchall()
+            conn.commit()
+        # RETURNING no respeta el ORDER BY de la subconsulta
+        return sorted((dict(i) for i in items), key=lambda i: (-i['priority'], i['created_at']))
+
+    def backlog(self, max_priority: int = PRIORITY_MAX) -> Dict[str, Any]:
+        """Pendientes visibles hasta `max_priority` y edad del más antiguo (segundos)"""
+        with self.db.get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT COUNT(*) AS n,
+                           COALESCE(EXTRACT(EPOCH FROM CURRENT_TIMESTAMP - MIN(created_at)), 0) AS oldest
+                    FROM processing_queue
+                    WHERE status = 'pending' AND priority <= %s
+                      AND COALESCE(visible_at, created_at) <= CURRENT_TIMESTAMP
+                """, (max_priority,))
+                row = cursor.fetchone()
+        return {'pending': int(row['n']), 'oldest_seconds': float(row['oldest'])}
+
+    def extend(self, ids: List[int], worker_id: str, lease_seconds: int = 300) -> int:
+        """Renovar el lease de items aún en proceso (heartbeat)"""
+        return self._update_owned("""
+            UPDATE processing_queue
+            SET locked_until = CURRENT_TIMESTAMP + make_interval(secs => %s)
+            WHERE id = ANY(%s) AND locked_by = %s AND status = 'processing'
+        """, (lease_seconds, list(ids), worker_id))
+
+    def complete(self, ids: List[int], worker_id: str, batch_id: Optional[str] = None) -> int:
+        """Cerrar items (batch_id = entregados al daemon de Batch API)"""
+        return self._update_owned("""
+            UPDATE processing_queue
+            SET status = 'completed', processed_at = CURRENT_TIMESTAMP, batch_id = %s,
+                locked_by = NULL, locked_until = NULL
+            WHERE id = ANY(%s) AND locked_by = %s AND status = 'processing'
+        """, (batch_id, list(ids), worker_id))
+
+    def fail(self, ids: List[int], worker_id: str, error: str) -> int:
+        """Devolver items con backoff de visibilidad, o failed si agotaron reintentos"""
+        return self._update_owned("""
+            UPDATE processing_queue
+            SET status = CASE WHEN retry_count + 1 >= %s THEN 'failed' ELSE 'pending' END,
+                retry_count = retry_count + 1,
+                visible_at = CURRENT_TIMESTAMP
+                             + make_interval(secs => %s * power(2, retry_count)),
+                last_error = %s,
+                locked_by = NULL, locked_until = NULL
+            WHERE id = ANY(%s) AND locked_by = %s AND status = 'processing'
+        """, (self.max_retries, self.retry_delay, error[:1000], list(ids), worker_id))
+
+    def release_expired(self) -> int:
+        """Leases vencidos (worker muerto) vuelven a pending o a failed; cuenta como reintento"""
+        with self.db.get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    UPDATE processing_queue
+                    SET status = CASE WHEN retry_count + 1 >= %s THEN 'failed' ELSE 'pending' END,
+                        retry_count = retry_count + 1,
+                        visible_at = CURRENT_TIMESTAMP,
+                        last_error = 'lease expired (' || COALESCE(locked_by, '?') || ')',
+                        locked_by = NULL, locked_until = NULL
+                    WHERE id IN (
+                        SELECT id FROM processing_queue
+                        WHERE status = 'processing' AND locked_until < CURRENT_TIMESTAMP
+                        FOR UPDATE SKIP LOCKED
+                    )
+                """, (self.max_retries,))
+                released = cursor.rowcount
+            conn.commit()
+        if released:
+            logger.warning(f"♻️ {released} items con lease vencido devueltos a la cola")
+        return released
+
+    def _update_owned(self, query: str, params) -> int:
+        with self.db.get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(query, params)
+                updated = cursor.rowcount
+            conn.commit()
+        return updated
+
+
+# ============================================================================
+# ⚙️ CONSUMIDOR
+# ============================================================================
+
+class QueueConsumer:
+    """
+    Worker de la cola: urgentes en tiempo real, cola larga al daemon de Batch API
+
+    Varios consumidores pueden correr en paralelo (procesos u hosts): los claims
+    con SKIP LOCKED no se pisan y un worker muerto libera sus items al vencer el lease.
+    """
+
+    def __init__(self, queue: ProcessingQueue,
+                 realtime_fn: Callable[[Dict[str, Any], Optional[str]], Awaitable[Any]],
+                 batch_daemon=None,
+                 worker_id: str = None,
+                 urgent_priority: int = URGENT_PRIORITY,
+                 realtime_limit: int = 20,
+                 realtime_concurrency: int = 8,
+                 tail_batch_size: int = 1000,
+                 tail_min_size: int = 500,
+                 tail_max_wait: float = 900,
+                 lease_seconds: int = 300,
+                 idle_sleep: float = 2):
+        """
+        Args:
+            realtime_fn: async fn(producto, modelo) para items urgentes
+            batch_daemon: BatchLifecycleDaemon que recibe la cola larga (None = todo en tiempo real)
+            urgent_priority: Prioridad mínima para tiempo real
+            realtime_limit: Items urgentes reclamados por tick
+            realtime_concurrency: Items urgentes procesándose a la vez
+            tail_batch_size: Items de cola larga por job de batch
+            tail_min_size: Pendientes necesarios para armar un batch...
+            tail_max_wait: ...o segundos de espera del más antiguo
+            lease_seconds: Duración del lease (se renueva mientras se procesa)
+        """
+        self.queue = queue
+        self.realtime_fn = realtime_fn
+        self.batch_daemon = batch_daemon
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.urgent_priority = urgent_priority
+        self.realtime_limit = realtime_limit
+        self.realtime_concurrency = max(1, realtime_concurrency)
+        self.tail_batch_size = tail_batch_size
+        self.tail_min_size = tail_min_size
+        self.tail_max_wait = tail_max_wait
+        self.lease_seconds = lease_seconds
+        self.idle_sleep = idle_sleep
+
+        self.stats = {
+            'ticks': 0,
+            'realtime_done': 0,
+            'realtime_failed': 0,
+            'batched': 0,
+            'batch_jobs': 0,
+            'released': 0
+        }
+
+    async def run_once(self) -> int:
+        """Un tick: liberar leases vencidos, urgentes, y cola larga si está lista"""
+        self.stats['ticks'] += 1
+        self.stats['released'] += self.queue.release_expired()
+        handled = await self._realtime()
+        handled += self._tail()
+        return handled
+
+    async def run_forever(self, stop: Optional[asyncio.Event] = None):
+        """Loop hasta que `stop` se active"""
+        stop = stop or asyncio.Event()
+        logger.info(f"🚦 Queue consumer {self.worker_id} iniciado")
+        while not stop.is_set():
+            handled = await self.run_once()
+            if not handled:
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=self.idle_sleep)
+                except asyncio.TimeoutError:
+                    pass
+        logger.info(f"🛑 Queue consumer {self.worker_id} detenido: {self.stats}")
+
+    async def _realtime(self) -> int:
+        min_priority = self.urgent_priority if self.batch_daemon is not None else PRIORITY_MIN
+        items = self.queue.claim(self.worker_id, self.realtime_limit, self.lease_seconds,
+                                 min_priority=min_priority)
+        if not items:
+            return 0
+
+        semaphore = asyncio.Semaphore(self.realtime_concurrency)
+        heartbeat = asyncio.create_task(self._heartbeat([i['id'] for i in items]))
+
+        async def run(item):
+            async with semaphore:
+                try:
+                    await self.realtime_fn(item['product_data'], item.get('assigned_model'))
+                except Exception as e:
+                    logger.error(f"❌ Item {item['fingerprint'][:8]} falló: {e}")
+                    self.queue.fail([item['id']], self.worker_id, str(e))
+                    self.stats['realtime_failed'] += 1
+                    return
+                self.queue.complete([item['id']], self.worker_id)
+                self.stats['realtime_done'] += 1
+
+        try:
+            await asyncio.gather(*(run(i) for i in items))
+        finally:
+            heartbeat.cancel()
+        return len(items)
+
+    async def _heartbeat(self, ids: List[int]):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            self.queue.extend(ids, self.worker_id, self.lease_seconds)
+
+    def _tail(self) -> int:
+        if self.batch_daemon is None:
+            return 0
+        max_priority = self.urgent_priority - 1
+        backlog = self.queue.backlog(max_priority)
+        if backlog['pending'] < self.tail_min_size and (
+                not backlog['pending'] or backlog['oldest_seconds'] < self.tail_max_wait):
+            return 0
+
+        items = self.queue.claim(self.worker_id, self.tail_batch_size, self.lease_seconds,
+                                 max_priority=max_priority)
+        by_model: Dict[str, List[Dict]] = {}
+        for item in items:
+            by_model.setdefault(item.get('assigned_model') or 'gpt-5-mini', []).append(item)
+
+        for model, group in by_model.items():
+            products = [dict(i['product_data'], fingerprint=i['fingerprint']) for i in group]
+            ids = [i['id'] for i in group]
+            try:
+                batch_id = self.batch_daemon.submit(products, model)
+            except Exception as e:
+                logger.error(f"❌ No se pudo registrar batch de {len(group)} items: {e}")
+                self.queue.fail(ids, self.worker_id, str(e))
+                continue
+            # None = todos ya en vuelo en otro job: igual quedan resueltos para la cola
+            self.queue.complete(ids, self.worker_id, batch_id=batch_id)
+            self.stats['batched'] += len(group)
+            self.stats['batch_jobs'] += 1 if batch_id else 0
+            logger.info(f"📦 {len(group)} items de cola larga → batch {batch_id} ({model})")
+        return len(items)
+
+
+# ============================================================================
+# 🎯 MAIN
+# ============================================================================
+
+async def _main(args) -> int:
+    try:
+        from normalize_gpt5 import (get_gpt5_connector, get_l1_cache, normalize_with_gpt5,
+                                    ProcessingMode)
+        from gpt5.batch_daemon import BatchLifecycleDaemon, BatchJobStore
+        from gpt5.batch_processor_db import BatchProcessorDB
+    except ImportError:
+        from ..normalize_gpt5 import (get_gpt5_connector, get_l1_cache, normalize_with_gpt5,
+                                      ProcessingMode)
+        from .batch_daemon import BatchLifecycleDaemon, BatchJobStore
+        from .batch_processor_db import BatchProcessorDB
+
+    db = get_gpt5_connector()
+    daemon = BatchLifecycleDaemon(
+        processor=BatchProcessorDB(api_key=os.getenv("OPENAI_API_KEY", ""), db_connector=db,
+                                   l1_cache=get_l1_cache()),
+        store=BatchJobStore(db)
+    )
+
+    async def realtime(product, model):
+        # Sin force_model: así se respetan los caches y el routing vigente
+        return await normalize_with_gpt5(product, mode=ProcessingMode.SINGLE)
+
+    consumer = QueueConsumer(ProcessingQueue(db), realtime, batch_daemon=daemon,
+                             urgent_priority=args.urgent_priority,
+                             tail_max_wait=args.tail_max_wait)
+    try:
+        if args.once:
+            await consumer.run_once()
+        else:
+            await consumer.run_forever()
+    finally:
+        db.close()
+    return 0
+
+
+def main(argv=None) -> int:
+    import argparse
+    ap = argparse.ArgumentParser(prog="work-queue")
+    ap.add_argument("--once", action="store_true", help="Ejecutar un solo tick")
+    ap.add_argument("--urgent-priority", type=int, default=URGENT_PRIORITY)
+    ap.add_argument("--tail-max-wait", type=float, default=900)
+    args = ap.parse_args(argv)
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    try:
+        from ..telemetry import serve_from_env
+    except ImportError:
+        from telemetry import serve_from_env
+    serve_from_env()
+    try:
+        return asyncio.run(_main(args))
+    except KeyboardInterrupt:
+        return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -11,15 +11,27 @@ Conector extendido con todas las funcionalidades para GPT-5:
 
 import psycopg2
 from psycopg2 import pool, extras
+import atexit
 import json
 import logging
 import hashlib
+import os
+import threading
+import time
+import weakref
+from collections import deque
+from pathlib import Path
 from typing import Dict, List, Optional, Any, Tuple
 from contextlib import contextmanager
 from datetime import datetime, timedelta
 import numpy as np
 from enum import Enum
 
+try:
+    from .telemetry import get_registry
+except ImportError:
+    from telemetry import get_registry
+
 logger = logging.getLogger(__name__)
 
 class ModelType(Enum):
@@ -37,6 +49,181 @@ class BatchStatus(Enum):
     FAILED = "failed"
     CANCELLED = "cancelled"
 
+# ============================================================================
+# 📈 ESCRITURA DIFERIDA DE MÉTRICAS
+# ============================================================================
+
+METRIC_COLUMNS = (
+    "model", "request_type", "tokens_input", "tokens_output", "cost_usd",
+    "latency_ms", "cache_hit", "cache_type", "complexity_score", "batch_id",
+    "success", "error_type", "fingerprint", "retailer", "category", "created_at"
+)
+
+# Writers vivos (referencia débil: un conector descartado no queda retenido hasta el exit)
+_live_writers: "weakref.WeakSet[MetricsWriter]" = weakref.WeakSet()
+
+@atexit.register
+def _close_live_writers() -> None:
+    """Flush final de los writers que sigan vivos al terminar el proceso"""
+    for writer in list(_live_writers):
+        writer.close()
+
+def _metrics_writer_metrics(writer: "MetricsWriter"):
+    """Estado del buffer de processing_metrics para /metrics"""
+    stats = writer.stats
+    buffer = writer._buffer
+    try:
+        lag = (datetime.now() - buffer[0][-1]).total_seconds() if buffer else 0.0
+    except (IndexError, TypeError):
+        lag = 0.0
+    return [
+        ("db_metrics_rows", "counter", "Filas de processing_metrics por destino",
+         [({"result": "written"}, stats['written']),
+          ({"result": "spilled"}, stats['spilled']),
+          ({"result": "replayed"}, stats['replayed']),
+          ({"result": "dropped"}, stats['dropped'])]),
+        ("db_metrics_flush_errors", "counter", "Flushes de métricas fallidos",
+         [({}, stats['errors'])]),
+        ("db_metrics_buffer_rows", "gauge", "Filas pendientes de insertar",
+         [({}, len(buffer))]),
+        ("db_metrics_write_lag_seconds", "gauge", "Antigüedad de la fila pendiente más vieja",
+         [({}, lag)]),
+    ]
+
+class MetricsWriter:
+    """
+    Buffer de filas de processing_metrics con flush en segundo plano
+    
+    record() solo agrega la fila a un deque (sin I/O en el request); un hilo
+    la inserta con execute_values cada `flush_rows` filas o `flush_interval`
+    segundos. Si la BD no responde, las filas se vuelcan a JSONL en
+    `spill_dir` (o se descartan si es None) y se reinsertan en el siguiente
+    flush exitoso. Con la BD colgada el buffer se corta en `max_buffer` filas.
+    close() hace el flush final.
+    """
+    
+    def __init__(self, connector, flush_rows: int = 500, flush_interval: float = 2.0,
+                 max_buffer: int = 50000, spill_dir: Optional[str] = "out/metrics_spill",
+                 max_spill_files: int = 200):
+        self.connector = connector
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.spill_dir = Path(spill_dir) if spill_dir else None
+        self.max_spill_files = max_spill_files
+        self.stats = {'recorded': 0, 'written': 0, 'flushes': 0, 'errors': 0,
+                      'spilled': 0, 'replayed': 0, 'dropped': 0}
+        self._buffer: deque = deque()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._pid = None
+        _live_writers.add(self)
+        get_registry().register_collector(_metrics_writer_metrics, owner=self)
+    
+    def record(self, row: Tuple) -> None:
+        """Encolar una fila (orden de METRIC_COLUMNS); no bloquea"""
+        if self._pid != os.getpid():
+            self._start()
+        if len(self._buffer) >= self.max_buffer:
+            self.stats['dropped'] += 1
+            return
+        self._buffer.append(row)
+        self.stats['recorded'] += 1
+        if len(self._buffer) >= self.flush_rows:
+            self._wakeup.set()
+    
+    def _start(self) -> None:
+        """Arrancar el hilo de flush (también tras un fork: el hilo no se hereda)"""
+        self._pid = os.getpid()
+        self._buffer = deque()
+        self._flush_lock = threading.Lock()
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="metrics-writer", daemon=True)
+        self._thread.start()
+    
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+    
+    def flush(self) -> int:
+        """Insertar todo lo pendiente; ante error vuelca a disco. Retorna filas escritas"""
+        with self._flush_lock:
+            rows = []
+            while self._buffer:
+                rows.append(self._buffer.popleft())
+            if not rows:
+                return 0
+            try:
+                self._insert(rows)
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.error(f"Error registrando métricas ({len(rows)} filas): {e}")
+                self._spill(rows)
+                return 0
+            self.stats['written'] += len(rows)
+            self.stats['flushes'] += 1
+            self._replay_spill()
+            return len(rows)
+    
+    def _insert(self, rows: List[Tuple]) -> None:
+        query = f"INSERT INTO processing_metrics ({', '.join(METRIC_COLUMNS)}) VALUES %s"
+        with self.connector.get_connection() as conn:
+            try:
+                with conn.cursor() as cursor:
+                    extras.execute_values(cursor, query, rows, page_size=self.flush_rows)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+    
+    def _spill(self, rows: List[Tuple]) -> None:
+        """BD caída: filas a JSONL (o descartadas sin spill_dir o con el spill lleno)"""
+        if self.spill_dir is None:
+            self.stats['dropped'] += len(rows)
+            return
+        spilled = sum(1 for _ in self.spill_dir.glob("*.jsonl")) if self.spill_dir.exists() else 0
+        if spilled >= self.max_spill_files:
+            self.stats['dropped'] += len(rows)
+            logger.warning(f"⚠️ Spill de métricas lleno, {len(rows)} filas descartadas")
+            return
+        self.spill_dir.mkdir(parents=True, exist_ok=True)
+        path = self.spill_dir / f"metrics_{os.getpid()}_{time.time_ns()}.jsonl"
+        with open(path, 'w', encoding='utf-8') as f:
+            for row in rows:
+                f.write(json.dumps(row, default=str) + '\n')
+        self.stats['spilled'] += len(rows)
+    
+    def _replay_spill(self) -> None:
+        """Reinsertar archivos volcados durante una caída (tras un flush exitoso)"""
+        if self.spill_dir is None or not self.spill_dir.exists():
+            return
+        for path in sorted(self.spill_dir.glob("*.jsonl")):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    rows = [tuple(json.loads(line)) for line in f if line.strip()]
+                self._insert(rows)
+            except FileNotFoundError:
+                continue  # Otro proceso ya lo reinsertó
+            except Exception as e:
+                logger.error(f"Error reinsertando {path.name}: {e}")
+                return
+            path.unlink(missing_ok=True)
+            self.stats['replayed'] += len(rows)
+    
+    def close(self) -> None:
+        """Detener el hilo y hacer el flush final"""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        self._thread = None
+        self._pid = None
+        self.flush()
+
 class GPT5DatabaseConnector:
     """Conector completo para soporte GPT-5"""
     
@@ -49,6 +236,7 @@ class GPT5DatabaseConnector:
         self.pool_size = pool_size
         self.connection_pool = None
         self._init_pool()
+        self.metrics_writer = MetricsWriter(self)
     
     def _init_pool(self):
         """Inicializar pool de conexiones"""
@@ -171,8 +359,9 @@ class GPT5DatabaseConnector:
             raise
     
     def update_batch_status(self, batch_id: str, status: BatchStatus, 
-                           processed: int = None, error: str = None):
-        """Actualizar estado de batch"""
+                           processed: int = None, error: str = None,
+                           metadata: Dict = None):
+        """Actualizar estado de batch (metadata se mezcla con la existente)"""
         updates = ["status = %s"]
         params = [status.value]
         
@@ -190,6 +379,10 @@ class GPT5DatabaseConnector:
             updates.append("error_message = %s")
             params.append(error)
         
+        if metadata:
+            updates.append("metadata = COALESCE(metadata, '{}'::jsonb) || %s::jsonb")
+            params.append(json.dumps(metadata, default=str))
+        
         params.append(batch_id)
         
         query = f"""
@@ -322,32 +515,22 @@ class GPT5DatabaseConnector:
                              success: bool = True, error_type: str = None,
                              fingerprint: str = None, retailer: str = None,
                              category: str = None):
-        """Registrar métrica de procesamiento"""
-        query = """
-            INSERT INTO processing_metrics (
-                model, request_type, tokens_input, tokens_output, cost_usd,
-                latency_ms, cache_hit, cache_type, complexity_score, batch_id,
-                success, error_type, fingerprint, retailer, category
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """
-        
-        try:
-            with self.get_connection() as conn:
-                with conn.cursor() as cursor:
-                    cursor.execute(query, (
-                        model, request_type, tokens_input, tokens_output, cost_usd,
-                        latency_ms, cache_hit, cache_type, complexity_score, batch_id,
-                        success, error_type, fingerprint, retailer, category
-                    ))
-                    conn.commit()
-                    
-                    if not success:
-                        logger.warning(f"⚠️ Métrica de error registrada: {error_type}")
-        except Exception as e:
-            logger.error(f"Error registrando métrica: {e}")
+        """Registrar métrica de procesamiento (en buffer; se inserta en segundo plano)"""
+        self.metrics_writer.record((
+            model, request_type, tokens_input, tokens_output, cost_usd,
+            latency_ms, cache_hit, cache_type, complexity_score, batch_id,
+            success, error_type, fingerprint, retailer, category, datetime.now()
+        ))
+        if not success:
+            logger.warning(f"⚠️ Métrica de error registrada: {error_type}")
+    
+    def flush_metrics(self) -> int:
+        """Forzar la inserción de las métricas en buffer"""
+        return self.metrics_writer.flush()
     
     def get_cost_summary(self, days: int = 7) -> Dict:
         """Obtener resumen de costos"""
+        self.metrics_writer.flush()  # Incluir lo que sigue en el buffer
         query = """
             SELECT 
                 model,
@@ -447,6 +630,87 @@ class GPT5DatabaseConnector:
             logger.error(f"Error obteniendo complejidad: {e}")
             return None
     
+    def get_complexity_analyses(self, fingerprints: List[str]) -> Dict[str, Dict]:
+        """Complejidad cacheada de muchos productos en una sola query"""
+        if not fingerprints:
+            return {}
+        query = """
+            SELECT fingerprint, complexity_score, model_assigned, routing_reason
+            FROM product_complexity_cache
+            WHERE fingerprint = ANY(%s)
+        """
+        
+        try:
+            with self.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(query, (list(set(fingerprints)),))
+                    return {row['fingerprint']: row for row in cursor.fetchall()}
+        except Exception as e:
+            logger.error(f"Error obteniendo complejidades: {e}")
+            return {}
+    
+    def save_complexity_analyses(self, analyses: List[Dict]) -> int:
+        """Guardar análisis de complejidad en bloque (execute_values)"""
+        rows = {
+            a['fingerprint']: (
+                a['fingerprint'], round(a['complexity_score'], 2),
+                a['model_assigned'], a.get('routing_reason')
+            )
+            for a in analyses
+        }
+        if not rows:
+            return 0
+        query = """
+            INSERT INTO product_complexity_cache (
+                fingerprint, complexity_score, model_assigned, routing_reason
+            ) VALUES %s
+            ON CONFLICT (fingerprint) DO UPDATE SET
+                complexity_score = EXCLUDED.complexity_score,
+                model_assigned = EXCLUDED.model_assigned,
+                routing_reason = EXCLUDED.routing_reason,
+                updated_at = CURRENT_TIMESTAMP
+        """
+        
+        try:
+            with self.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    extras.execute_values(cursor, query, list(rows.values()))
+                    conn.commit()
+                    return len(rows)
+        except Exception as e:
+            logger.error(f"Error guardando complejidades: {e}")
+            return 0
+    
+    def get_routing_stats(self, days: int = 30, bins: int = 20) -> List[Dict]:
+        """
+        Métricas agregadas por categoría, bin de complejidad, modelo y resultado
+        (insumo de GPT5Router.fit_thresholds)
+        """
+        self.metrics_writer.flush()  # Incluir lo que sigue en el buffer
+        query = """
+            SELECT COALESCE(category, '') AS category,
+                   LEAST(width_bucket(complexity_score, 0, 1, %s), %s) AS bin,
+                   model, request_type, success,
+                   COUNT(*) AS n,
+                   AVG(cost_usd) AS cost_usd,
+                   AVG(latency_ms) AS latency_ms
+            FROM processing_metrics
+            WHERE cache_hit = FALSE
+              AND complexity_score IS NOT NULL
+              AND request_type IN ('single', 'fallback')
+              AND created_at > CURRENT_TIMESTAMP - make_interval(days => %s)
+            GROUP BY 1, 2, 3, 4, 5
+        """
+        
+        try:
+            with self.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(query, (bins, bins, days))
+                    return [dict(r) for r in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"Error obteniendo métricas de routing: {e}")
+            return []
+    
     # ============================================================================
     # 🔧 UTILIDADES
     # ============================================================================
@@ -536,7 +800,8 @@ class GPT5DatabaseConnector:
             return {}
     
     def close(self):
-        """Cerrar pool de conexiones"""
+        """Cerrar pool de conexiones (tras el flush final de métricas)"""
+        self.metrics_writer.close()
         if self.connection_pool:
             self.connection_pool.closeall()
             logger.info("🔌 Pool de conexiones cerrado")
@@ -597,52 +862,63 @@ class GPT5AICache:
             logger.error(f"Error obteniendo AI cache: {e}")
             return None
     
+    _UPSERT = """
+        INSERT INTO ai_metadata_cache (
+            fingerprint, brand, model, refined_attributes,
+            normalized_name, confidence, category_suggestion,
+            model_used, tokens_used, processing_version, 
+            batch_id, quality_score, ttl_hours, ai_response
+        ) VALUES {values}
+        ON CONFLICT (fingerprint) DO UPDATE SET
+            brand = EXCLUDED.brand,
+            model = EXCLUDED.model,
+            refined_attributes = EXCLUDED.refined_attributes,
+            normalized_name = EXCLUDED.normalized_name,
+            confidence = EXCLUDED.confidence,
+            category_suggestion = EXCLUDED.category_suggestion,
+            model_used = COALESCE(EXCLUDED.model_used, ai_metadata_cache.model_used),
+            tokens_used = COALESCE(EXCLUDED.tokens_used, ai_metadata_cache.tokens_used),
+            processing_version = 'v2.0',
+            batch_id = COALESCE(EXCLUDED.batch_id, ai_metadata_cache.batch_id),
+            quality_score = COALESCE(EXCLUDED.quality_score, ai_metadata_cache.quality_score),
+            ttl_hours = EXCLUDED.ttl_hours,
+            ai_response = EXCLUDED.ai_response,
+            updated_at = CURRENT_TIMESTAMP
+    """
+    
+    @staticmethod
+    def _row(fingerprint: str, metadata: Dict, model_used: str = None,
+             tokens_used: int = None, quality_score: float = None,
+             batch_id: str = None, ttl_hours: int = 168) -> Tuple:
+        return (
+            fingerprint,
+            metadata.get('brand'),
+            metadata.get('model'),
+            json.dumps(metadata.get('refined_attributes', {})),
+            metadata.get('normalized_name'),
+            metadata.get('confidence', 0.0),
+            metadata.get('category_suggestion'),
+            model_used or metadata.get('model_used'),
+            tokens_used or metadata.get('tokens_used'),
+            'v2.0',  # Nueva versión GPT-5
+            batch_id,
+            quality_score or metadata.get('quality_score'),
+            ttl_hours,
+            json.dumps(metadata) if not metadata.get('ai_response') else json.dumps(metadata.get('ai_response'))
+        )
+    
     def set(self, fingerprint: str, metadata: Dict, model_used: str = None,
            tokens_used: int = None, quality_score: float = None,
            batch_id: str = None, ttl_hours: int = 168):
         """Guardar en cache IA con metadatos GPT-5"""
-        query = """
-            INSERT INTO ai_metadata_cache (
-                fingerprint, brand, model, refined_attributes,
-                normalized_name, confidence, category_suggestion,
-                model_used, tokens_used, processing_version, 
-                batch_id, quality_score, ttl_hours, ai_response
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            ON CONFLICT (fingerprint) DO UPDATE SET
-                brand = EXCLUDED.brand,
-                model = EXCLUDED.model,
-                refined_attributes = EXCLUDED.refined_attributes,
-                normalized_name = EXCLUDED.normalized_name,
-                confidence = EXCLUDED.confidence,
-                category_suggestion = EXCLUDED.category_suggestion,
-                model_used = COALESCE(EXCLUDED.model_used, ai_metadata_cache.model_used),
-                tokens_used = COALESCE(EXCLUDED.tokens_used, ai_metadata_cache.tokens_used),
-                processing_version = 'v2.0',
-                batch_id = COALESCE(EXCLUDED.batch_id, ai_metadata_cache.batch_id),
-                quality_score = COALESCE(EXCLUDED.quality_score, ai_metadata_cache.quality_score),
-                ttl_hours = EXCLUDED.ttl_hours,
-                ai_response = EXCLUDED.ai_response,
-                updated_at = CURRENT_TIMESTAMP
-        """
+        query = self._UPSERT.format(values="(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)")
         
         try:
             with self.connector.get_connection() as conn:
                 with conn.cursor() as cursor:
-                    cursor.execute(query, (
-                        fingerprint,
-                        metadata.get('brand'),
-                        metadata.get('model'),
-                        json.dumps(metadata.get('refined_attributes', {})),
-                        metadata.get('normalized_name'),
-                        metadata.get('confidence', 0.0),
-                        metadata.get('category_suggestion'),
-                        model_used or metadata.get('model_used'),
-                        tokens_used or metadata.get('tokens_used'),
-                        'v2.0',  # Nueva versión GPT-5
-                        batch_id,
-                        quality_score or metadata.get('quality_score'),
-                        ttl_hours,
-                        json.dumps(metadata) if not metadata.get('ai_response') else json.dumps(metadata.get('ai_response'))
+                    cursor.execute(query, self._row(
+                        fingerprint, metadata, model_used, tokens_used,
+                        quality_score, batch_id, ttl_hours
                     ))
                     conn.commit()
                     logger.debug(f"✅ Cache IA GPT-5 guardado: {fingerprint[:8]}...")
@@ -650,6 +926,43 @@ class GPT5AICache:
         except Exception as e:
             logger.error(f"Error guardando AI cache GPT-5: {e}")
             return False
+    
+    def set_many(self, entries: List[Dict], ttl_hours: int = 168, page_size: int = 1000) -> int:
+        """
+        Upsert masivo en una transacción (execute_values)
+        
+        Args:
+            entries: Dicts con fingerprint, metadata y opcionales model_used,
+                     tokens_used, quality_score, batch_id
+        
+        Returns:
+            Filas escritas. A diferencia de set(), propaga errores para que el
+            llamador no avance su checkpoint.
+        """
+        # ON CONFLICT no admite el mismo fingerprint dos veces en un statement: gana el último
+        rows = {
+            e['fingerprint']: self._row(
+                e['fingerprint'], e['metadata'], e.get('model_used'), e.get('tokens_used'),
+                e.get('quality_score'), e.get('batch_id'), ttl_hours
+            )
+            for e in entries if e.get('fingerprint')
+        }
+        if not rows:
+            return 0
+        
+        with self.connector.get_connection() as conn:
+            try:
+                with conn.cursor() as cursor:
+                    extras.execute_values(
+                        cursor, self._UPSERT.format(values="%s"), list(rows.values()),
+                        page_size=page_size
+                    )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        logger.debug(f"✅ Cache IA GPT-5: {len(rows)} filas (bulk)")
+        return len(rows)
 
 # ============================================================================
 # 🎯 MAIN - Testing
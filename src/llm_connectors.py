@@ -19,6 +19,7 @@ from .gpt5.router import GPT5Router, ModelType
 from .gpt5.batch.processor import BatchProcessor, BatchOrchestrator
 from .gpt5.cache.semantic_cache import SemanticCache
 from .gpt5.prompt_optimizer import PromptOptimizer
+from .gpt5.dedup import coalesce
 
 load_dotenv()
 logging.basicConfig(level=logging.INFO)
@@ -40,7 +41,9 @@ class GPT5Connector:
             'total_requests': 0,
             'cache_hits': 0,
             'batch_processed': 0,
-            'total_cost': 0.0
+            'total_cost': 0.0,
+            'dedup_calls_saved': 0,
+            'dedup_tokens_saved': 0
         }
         
         # Inicializar cache semántico si está habilitado
@@ -194,27 +197,34 @@ class GPT5Connector:
         if not self.enabled():
             return [{"error": "llm_disabled"} for _ in products]
         
+        # Dedup: un request por fingerprint / título normalizado, resultado repartido a todos
+        plan = coalesce(products)
+        self.stats['dedup_calls_saved'] += plan.calls_saved
+        self.stats['dedup_tokens_saved'] += plan.tokens_saved
+        unique = plan.unique
+        
         if not self.config.get('batch', {}).get('enabled', False):
             # Fallback a procesamiento individual
             results = []
-            for product in products:
+            for product in unique:
                 result = await self.extract_with_llm(
                     product.get('name', ''),
                     product.get('category', '')
                 )
                 results.append(result)
-            return results
+            return plan.fan_out(results)
         
         # Usar batch processor para máximo ahorro
         batch_size = batch_size or self.config['batch'].get('optimal_batch_size', 10000)
         
-        logger.info(f"📦 Starting batch processing for {len(products)} products")
+        logger.info(f"📦 Starting batch processing for {len(unique)} products ({len(products)} before dedup)")
         
         # Dividir productos por modelo usando router
-        batches = self.router.route_batch(products)
+        batches = self.router.route_batch(unique)
         optimized_batches = self.router.optimize_batches(batches, batch_size)
         
-        all_results = []
+        slot = {id(p): k for k, p in enumerate(unique)}
+        unique_results: List[Optional[Dict[str, Any]]] = [None] * len(unique)
         
         for batch_config in optimized_batches:
             model = batch_config['model']
@@ -230,16 +240,19 @@ class GPT5Connector:
                 prompts[0] if prompts else ""  # Template base
             )
             
-            all_results.extend(results)
+            for product, result in zip(batch_products, results):
+                unique_results[slot[id(product)]] = result
             self.stats['batch_processed'] += len(results)
         
+        all_results = plan.fan_out(unique_results)
         logger.info(f"✅ Batch processing completed: {len(all_results)} products")
         
         # Calcular y mostrar ahorros
-        savings = self.router.estimate_savings(products)
+        savings = self.router.estimate_savings(unique)
         logger.info(f"💰 Estimated savings: ${savings['savings_usd']:.2f} ({savings['savings_percent']}%)")
+        logger.info(f"🧬 Dedup: {plan.calls_saved} calls / ~{plan.tokens_saved} tokens saved")
         
-        return all_results
+        return [r if r is not None else {"error": "missing_result"} for r in all_results]
     
     async def process_initial_population(self, products: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
@@ -1,9 +1,15 @@
 from __future__ import annotations
 import json, os
 from collections import defaultdict
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, Tuple, Optional, Set
 from difflib import SequenceMatcher
 
+# Atributos discriminantes para el blocking (en orden de preferencia)
+BUCKET_ATTRS = ("capacity", "storage", "volume_ml")
+SCREEN_BAND_IN = 1.0
+WILDCARD = "*"
+HIST_BINS = [(1, 1), (2, 5), (6, 10), (11, 50), (51, 100), (101, 500), (501, None)]
+
 def load_normalized(path: str) -> List[Dict[str, Any]]:
     rows = []
     with open(path, "r", encoding="utf-8") as fh:
@@ -27,38 +33,170 @@ def key_for_compare(prod: Dict[str, Any]) -> str:
 def sim(a: str, b: str) -> float:
     return SequenceMatcher(a=a, b=b).ratio()
 
-def do_match(rows: List[Dict[str, Any]], threshold: float = 0.86, max_cands: int = 50) -> List[Dict[str, Any]]:
-    # Blocking: category+brand
+def attribute_bucket(prod: Dict[str, Any]) -> str:
+    """Clave de atributo para sub-bloquear dentro de (categoría, marca).
+    Productos sin atributo discriminante van al bucket comodín y se comparan con todos."""
+    attrs = prod.get("attributes") or {}
+    for k in BUCKET_ATTRS:
+        v = attrs.get(k)
+        if v not in (None, ""):
+            return f"{k}={str(v).lower().replace(' ', '')}"
+    size = attrs.get("screen_size_in")
+    if size not in (None, ""):
+        try:
+            return f"screen={int(round(float(size) / SCREEN_BAND_IN))}"
+        except (TypeError, ValueError):
+            pass
+    return WILDCARD
+
+def block_histogram(sizes: List[int]) -> Dict[str, int]:
+    hist = {}
+    for lo, hi in HIST_BINS:
+        label = f"{lo}" if lo == hi else (f"{lo}-{hi}" if hi else f"{lo}+")
+        hist[label] = sum(1 for s in sizes if s >= lo and (hi is None or s <= hi))
+    return hist
+
+def _capped_by_retailer(idx: List[int], rows: List[Dict[str, Any]], max_cands: int) -> Dict[str, List[int]]:
+    """Primeros max_cands productos de cada retailer del bloque (mismo corte que el matching original)"""
+    by_retailer: Dict[str, List[int]] = defaultdict(list)
+    for i in idx:
+        members = by_retailer[rows[i]["retailer"]]
+        if len(members) < max_cands:
+            members.append(i)
+    return by_retailer
+
+def _cross_count(by_retailer: Dict[str, List[int]]) -> int:
+    sizes = [len(v) for v in by_retailer.values()]
+    total = sum(sizes)
+    return (total * total - sum(n * n for n in sizes)) // 2
+
+def _attribute_pairs(by_retailer: Dict[str, List[int]], buckets: List[str]) -> List[Tuple[int, int]]:
+    """Pares cross-retailer del bloque con el mismo bucket de atributo (o alguno comodín)"""
+    retailers = list(by_retailer)
+    grouped = []
+    for r in retailers:
+        g: Dict[str, List[int]] = defaultdict(list)
+        for i in by_retailer[r]:
+            g[buckets[i]].append(i)
+        grouped.append(g)
+    out = []
+    for a in range(len(retailers)):
+        for b in range(a+1, len(retailers)):
+            gb, wild_b = grouped[b], grouped[b].get(WILDCARD, [])
+            for i in by_retailer[retailers[a]]:
+                if buckets[i] == WILDCARD:
+                    partners = by_retailer[retailers[b]]
+                else:
+                    partners = gb.get(buckets[i], []) + wild_b
+                out.extend((i, j) for j in partners)
+    return out
+
+def candidate_pairs(rows: List[Dict[str, Any]], keys: List[str], max_cands: int = 50,
+                    window: int = 5, stats: Optional[Dict[str, Any]] = None) -> Set[Tuple[int, int]]:
+    """Blocking multi-pasada dentro del presupuesto del matching original.
+    Universo: por bloque (categoría, marca), los primeros max_cands de cada retailer.
+    1) Dentro del bloque solo se comparan productos del mismo bucket de atributo
+       (o con alguno comodín): subconjunto de las comparaciones originales.
+    2) Sorted-neighbourhood por categoría sobre key_for_compare, solo entre bloques
+       distintos (variantes de marca/typos), hasta agotar lo que la pasada 1 ahorró.
+    Nunca hay más comparaciones que en el blocking (categoría, marca) original."""
     blocks = defaultdict(list)
-    for p in rows:
-        key = (p.get("category",""), p.get("brand","").lower())
-        blocks[key].append(p)
+    blk = [(p.get("category",""), p.get("brand","").lower()) for p in rows]
+    for i, b in enumerate(blk):
+        blocks[b].append(i)
+    buckets = [attribute_bucket(p) for p in rows]
+
+    cands: Set[Tuple[int, int]] = set()
+    capped: Set[int] = set()
+    base_sizes, bucket_sizes = [], []
+    baseline = 0
+    for idx in blocks.values():
+        by_retailer = _capped_by_retailer(idx, rows, max_cands)
+        base_sizes.append(len(idx))
+        baseline += _cross_count(by_retailer)
+        sizes: Dict[str, int] = defaultdict(int)
+        for members in by_retailer.values():
+            capped.update(members)
+            for i in members:
+                sizes[buckets[i]] += 1
+        wild = sizes.pop(WILDCARD, 0)
+        bucket_sizes.extend([n + wild for n in sizes.values()] or [wild])
+        for i, j in _attribute_pairs(by_retailer, buckets):
+            cands.add((min(i, j), max(i, j)))
+    attr_pairs = len(cands)
+
+    # Sorted-neighbourhood: rescata variantes de marca/typos entre bloques vecinos
+    budget = baseline - attr_pairs
+    if window > 0 and budget > 0:
+        by_cat = defaultdict(list)
+        for i in sorted(capped):
+            by_cat[blk[i][0]].append(i)
+        for idx in by_cat.values():
+            idx.sort(key=lambda i: keys[i])
+            for pos, i in enumerate(idx):
+                for j in idx[pos+1:pos+1+window]:
+                    if blk[i] != blk[j] and rows[i]["retailer"] != rows[j]["retailer"]:
+                        pair = (min(i, j), max(i, j))
+                        if pair not in cands:
+                            cands.add(pair)
+                            budget -= 1
+                            if not budget:
+                                break
+                if not budget:
+                    break
+            if not budget:
+                break
+
+    if stats is not None:
+        stats.update({
+            "baseline_comparisons": baseline,
+            "candidate_pairs": len(cands),
+            "attribute_pass_pairs": attr_pairs,
+            "neighbourhood_pass_pairs": len(cands) - attr_pairs,
+            "reduction_x": round(baseline / len(cands), 2) if cands else None,
+            "blocks_baseline": block_histogram(base_sizes),
+            "blocks_attribute": block_histogram(bucket_sizes),
+            "max_block_baseline": max(base_sizes, default=0),
+            "max_block_attribute": max(bucket_sizes, default=0),
+        })
+    return cands
+
+def do_match(rows: List[Dict[str, Any]], threshold: float = 0.86, max_cands: int = 50,
+             window: int = 5, stats: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    keys = [key_for_compare(p) for p in rows]
+    cands = candidate_pairs(rows, keys, max_cands=max_cands, window=window, stats=stats)
+
+    # Orden de retailers por primera aparición en el bloque (categoría, marca):
+    # el "left" es siempre el retailer anterior, igual que el matching original
+    order: Dict[str, int] = {}
+    block_order: Dict[Tuple[str, str], Dict[str, int]] = defaultdict(dict)
+    blk = [(p.get("category",""), p.get("brand","").lower()) for p in rows]
+    for p, b in zip(rows, blk):
+        order.setdefault(p["retailer"], len(order))
+        block_order[b].setdefault(p["retailer"], len(block_order[b]))
+
+    best: Dict[Tuple[int, str], Tuple[Optional[int], float]] = {}
+    for i, j in cands:
+        rank = block_order[blk[i]] if blk[i] == blk[j] else order
+        if rank[rows[i]["retailer"]] > rank[rows[j]["retailer"]]:
+            i, j = j, i
+        s = sim(keys[i], keys[j])
+        slot = (i, rows[j]["retailer"])
+        cur = best.get(slot, (None, 0.0))
+        if s > cur[1] or (s == cur[1] and cur[0] is not None and j < cur[0]):
+            best[slot] = (j, s)
 
     pairs = []
-    for key, items in blocks.items():
-        # split by retailer
-        by_retailer = defaultdict(list)
-        for p in items:
-            by_retailer[p["retailer"]].append(p)
-        retailers = list(by_retailer.keys())
-        for i in range(len(retailers)):
-            for j in range(i+1, len(retailers)):
-                a_list = by_retailer[retailers[i]][:max_cands]
-                b_list = by_retailer[retailers[j]][:max_cands]
-                # compare
-                for a in a_list:
-                    akey = key_for_compare(a)
-                    best = (None, 0.0)
-                    for b in b_list:
-                        bkey = key_for_compare(b)
-                        s = sim(akey, bkey)
-                        if s > best[1]:
-                            best = (b, s)
-                    if best[0] and best[1] >= threshold:
-                        pairs.append({
-                            "left": a,
-                            "right": best[0],
-                            "similarity": round(best[1], 4),
-                            "block": {"category": key[0], "brand": key[1]}
-                        })
+    for (i, _), (j, s) in sorted(best.items(), key=lambda kv: (kv[0][0], order[kv[0][1]])):
+        if j is not None and s >= threshold:
+            a = rows[i]
+            pairs.append({
+                "left": a,
+                "right": rows[j],
+                "similarity": round(s, 4),
+                "block": {"category": a.get("category",""), "brand": a.get("brand","").lower()}
+            })
+    if stats is not None:
+        stats["comparisons"] = len(cands)
+        stats["pairs"] = len(pairs)
     return pairs
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🔗 Match Store inter-retail
+Persiste la salida del matcher en PostgreSQL (match_clusters / match_cluster_members)
+para que la comparación de precios sea un lookup indexado por fingerprint
+en vez de recalcular matches.jsonl o hacer joins ad-hoc.
+"""
+
+import hashlib
+import logging
+from typing import Dict, List, Any, Iterable, Tuple
+
+from psycopg2 import extras
+
+try:
+    from .fingerprint import product_fingerprint
+except ImportError:
+    from fingerprint import product_fingerprint
+
+logger = logging.getLogger(__name__)
+
+MemberKey = Tuple[str, str]  # (fingerprint, retailer)
+
+MATCH_VERSION = "v1.0"
+
+# Todas las ofertas del cluster al que pertenece un fingerprint (idx fingerprint + idx cluster)
+OFFERS_QUERY = """
+    SELECT o.cluster_id, o.fingerprint, o.retailer, o.product_id, o.name,
+           o.price_current, o.price_original, o.currency, o.url, o.similarity
+    FROM match_cluster_members m
+    JOIN match_cluster_members o ON o.cluster_id = m.cluster_id
+    WHERE m.fingerprint = %s
+    ORDER BY o.price_current ASC NULLS LAST, o.retailer
+"""
+
+# Comparación por fingerprint servida desde el match store (columnas de
+# mv_comparacion_precios). Las ofertas van en un arreglo y no en un objeto
+# por retailer: un retailer puede tener varias ofertas en el mismo cluster.
+PRICE_COMPARISON_QUERY = """
+    SELECT m.fingerprint,
+           c.cluster_id,
+           MIN(o.name) AS name,
+           c.brand,
+           c.category,
+           json_agg(
+               json_build_object(
+                   'retailer', o.retailer,
+                   'product_id', o.product_id,
+                   'fingerprint', o.fingerprint,
+                   'precio_actual', o.price_current,
+                   'precio_original', o.price_original,
+                   'url', o.url
+               )
+               ORDER BY o.price_current ASC NULLS LAST, o.retailer
+           ) AS ofertas,
+           MIN(o.price_current) AS precio_minimo,
+           MAX(COALESCE(o.price_original, o.price_current)) AS precio_maximo
+    FROM match_cluster_members m
+    JOIN match_clusters c ON c.cluster_id = m.cluster_id
+    JOIN match_cluster_members o ON o.cluster_id = m.cluster_id
+    WHERE m.fingerprint = ANY(%s)
+    GROUP BY m.fingerprint, c.cluster_id, c.brand, c.category
+"""
+
+
+def _member_key(row: Dict[str, Any]) -> MemberKey:
+    fp = row.get("fingerprint") or product_fingerprint(row)
+    return fp, row.get("retailer", "Unknown")
+
+
+def _cluster_id(keys: Iterable[MemberKey]) -> str:
+    """ID estable: deriva del miembro menor, no cambia si el cluster crece"""
+    anchor = min(keys)
+    return hashlib.sha1("|".join(anchor).encode("utf-8")).hexdigest()
+
+
+def build_clusters(pairs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Agrupa pares de do_match en clusters (union-find).
+    Miembros con el mismo fingerprint quedan siempre en el mismo cluster.
+    """
+    parent: Dict[MemberKey, MemberKey] = {}
+    rows: Dict[MemberKey, Dict[str, Any]] = {}
+    best_sim: Dict[MemberKey, float] = {}
+    by_fingerprint: Dict[str, MemberKey] = {}
+
+    def find(k: MemberKey) -> MemberKey:
+        while parent[k] != k:
+            parent[k] = parent[parent[k]]
+            k = parent[k]
+        return k
+
+    def union(a: MemberKey, b: MemberKey):
+        ra, rb = find(a), find(b)
+        if ra != rb:
+            parent[max(ra, rb)] = min(ra, rb)
+
+    def add(row: Dict[str, Any], similarity: float) -> MemberKey:
+        k = _member_key(row)
+        if k not in parent:
+            parent[k] = k
+            rows[k] = row
+        best_sim[k] = max(best_sim.get(k, 0.0), similarity)
+        # Mismo fingerprint en distintos retailers = mismo producto
+        if k[0] in by_fingerprint:
+            union(k, by_fingerprint[k[0]])
+        else:
+            by_fingerprint[k[0]] = k
+        return k
+
+    for pair in pairs:
+        sim = float(pair.get("similarity", 0.0))
+        a = add(pair["left"], sim)
+        b = add(pair["right"], sim)
+        union(a, b)
+
+    groups: Dict[MemberKey, List[MemberKey]] = {}
+    for k in parent:
+        groups.setdefault(find(k), []).append(k)
+
+    clusters = []
+    for keys in groups.values():
+        keys.sort()
+        head = rows[keys[0]]
+        members = []
+        for k in keys:
+            r = rows[k]
+            members.append({
+                "fingerprint": k[0],
+                "retailer": k[1],
+                "product_id": r.get("product_id"),
+                "name": r.get("name"),
+                "price_current": r.get("price_current"),
+                "price_original": r.get("price_original"),
+                "currency": r.get("currency", "CLP"),
+                "url": r.get("url"),
+                "similarity": round(best_sim[k], 4),
+            })
+        clusters.append({
+            "cluster_id": _cluster_id(keys),
+            "category": head.get("category"),
+            "brand": (head.get("brand") or "").lower(),
+            "member_count": len(members),
+            "retailer_count": len({m["retailer"] for m in members}),
+            "avg_similarity": round(sum(m["similarity"] for m in members) / len(members), 4),
+            "members": members,
+        })
+    return clusters
+
+
+class MatchStore:
+    """Persistencia y consulta de clusters de matching en PostgreSQL"""
+
+    def __init__(self, connector, page_size: int = 1000):
+        self.connector = connector
+        self.page_size = page_size
+
+    def upsert_clusters(self, clusters: List[Dict[str, Any]]) -> Dict[str, int]:
+        """Upsert masivo (execute_values) de clusters y miembros en una transacción"""
+        if not clusters:
+            return {"clusters": 0, "members": 0}
+
+        cluster_rows = [
+            (c["cluster_id"], c["category"], c["brand"], c["member_count"],
+             c["retailer_count"], c["avg_similarity"], MATCH_VERSION)
+            for c in clusters
+        ]
+        member_rows = [
+            (c["cluster_id"], m["fingerprint"], m["retailer"], m["product_id"], m["name"],
+             m["price_current"], m["price_original"], m["currency"], m["url"], m["similarity"])
+            for c in clusters for m in c["members"]
+        ]
+
+        with self.connector.get_connection() as conn:
+            try:
+                with conn.cursor() as cursor:
+                    extras.execute_values(cursor, """
+                        INSERT INTO match_clusters (
+                            cluster_id, category, brand, member_count,
+                            retailer_count, avg_similarity, match_version
+                        ) VALUES %s
+                        ON CONFLICT (cluster_id) DO UPDATE SET
+                            category = EXCLUDED.category,
+                            brand = EXCLUDED.brand,
+                            member_count = EXCLUDED.member_count,
+                            retailer_count = EXCLUDED.retailer_count,
+                            avg_similarity = EXCLUDED.avg_similarity,
+                            match_version = EXCLUDED.match_version
+                    """, cluster_rows, page_size=self.page_size)
+
+                    extras.execute_values(cursor, """
+                        INSERT INTO match_cluster_members (
+                            cluster_id, fingerprint, retailer, product_id, name,
+                            price_current, price_original, currency, url, similarity
+                        ) VALUES %s
+                        ON CONFLICT (fingerprint, retailer) DO UPDATE SET
+                            cluster_id = EXCLUDED.cluster_id,
+                            product_id = EXCLUDED.product_id,
+                            name = EXCLUDED.name,
+                            price_current = EXCLUDED.price_current,
+                            price_original = EXCLUDED.price_original,
+                            currency = EXCLUDED.currency,
+                            url = EXCLUDED.url,
+                            similarity = EXCLUDED.similarity,
+                            updated_at = CURRENT_TIMESTAMP
+                    """, member_rows, page_size=self.page_size)
+
+                    # Miembros que cambiaron de cluster pueden dejar clusters vacíos
+                    cursor.execute("""
+                        DELETE FROM match_clusters c
+                        WHERE NOT EXISTS (
+                            SELECT 1 FROM match_cluster_members m
+                            WHERE m.cluster_id = c.cluster_id
+                        )
+                    """)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+        logger.info(f"🔗 Match store: {len(cluster_rows)} clusters, {len(member_rows)} miembros")
+        return {"clusters": len(cluster_rows), "members": len(member_rows)}
+
+    def upsert_matches(self, pairs: List[Dict[str, Any]]) -> Dict[str, int]:
+        """Agrupa la salida de do_match y la persiste"""
+        return self.upsert_clusters(build_clusters(pairs))
+
+    def get_offers(self, fingerprint: str) -> List[Dict[str, Any]]:
+        """Todas las ofertas cross-retailer de un fingerprint (un solo lookup indexado)"""
+        with self.connector.get_connection() as conn:
+            with conn.cursor(cursor_factory=extras.RealDictCursor) as cursor:
+                cursor.execute(OFFERS_QUERY, (fingerprint,))
+                return [dict(r) for r in cursor.fetchall()]
+
+    def get_price_comparison(self, fingerprints: List[str]) -> List[Dict[str, Any]]:
+        """Comparación de precios por fingerprint: todas las ofertas del cluster, de menor a mayor precio"""
+        if not fingerprints:
+            return []
+        with self.connector.get_connection() as conn:
+            with conn.cursor(cursor_factory=extras.RealDictCursor) as cursor:
+                cursor.execute(PRICE_COMPARISON_QUERY, (list(fingerprints),))
+                return [dict(r) for r in cursor.fetchall()]
+
+
+def get_match_store() -> MatchStore:
+    """Factory para obtener el match store con la configuración de .env"""
+    try:
+        from .config_manager import get_config
+        from .simple_db_connector import SimplePostgreSQLConnector
+    except ImportError:
+        from config_manager import get_config
+        from simple_db_connector import SimplePostgreSQLConnector
+
+    cfg = get_config().database
+    connector = SimplePostgreSQLConnector(
+        host=cfg.host,
+        port=cfg.port,
+        database=cfg.database,
+        user=cfg.user,
+        password=cfg.password,
+        pool_size=cfg.pool_size
+    )
+    return MatchStore(connector)
@@ -2,6 +2,16 @@ from __future__ import annotations
 import json, time, os
 from typing import Dict, Any
 
+try:
+    from .telemetry import get_registry
+except ImportError:
+    from telemetry import get_registry
+
+_registry = get_registry()
+_events = _registry.counter("pipeline_events", "Eventos del pipeline por tipo", ("event",))
+_stage_seconds = _registry.counter("pipeline_stage_seconds", "Tiempo acumulado por etapa", ("stage",))
+_stage_items = _registry.counter("pipeline_stage_items", "Ítems procesados por etapa", ("stage",))
+
 class Metrics:
     def __init__(self):
         self.t0 = time.time()
@@ -14,13 +24,17 @@ class Metrics:
     def end(self, name: str, inc: int = 0):
         st = self.data["stages"].get(name, {})
         if "_t0" in st:
-            st["t"] += time.time() - st["_t0"]
+            elapsed = time.time() - st["_t0"]
+            st["t"] += elapsed
             st["count"] += inc
+            _stage_seconds.labels(name).inc(elapsed)
+            _stage_items.labels(name).inc(inc)
             del st["_t0"]
         self.data["stages"][name] = st
 
     def inc(self, key: str, by: int = 1):
         self.data["counters"][key] = self.data["counters"].get(key, 0) + by
+        _events.labels(key).inc(by)
 
     def dump(self, outdir: str):
         os.makedirs(outdir, exist_ok=True)
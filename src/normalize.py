@@ -1,26 +1,28 @@
 from __future__ import annotations
-import re, hashlib, os
+import re, os
 from typing import Dict, Any, Tuple, Optional
 try:
     # Imports relativos (cuando se ejecuta como módulo)
-    from .utils import parse_price, slugify
+    from .utils import parse_price, pick_price, slugify
     from .enrich import guess_brand, extract_attributes, clean_model
-    from .fingerprint import product_fingerprint
+    from .fingerprint import FingerprintKey
     from .cache import JsonCache
     from .googlecloudsqlconnector import CloudSQLConnector, DatabaseCache
     from .simple_db_connector import SimplePostgreSQLConnector, SimpleDatabaseCache
     from .llm_connectors import extract_with_llm, enrich_product_data, enabled as llm_enabled
     from .config_manager import get_config
+    from .stage_profiler import stage
 except ImportError:
     # Imports absolutos (cuando se ejecuta directamente)
-    from utils import parse_price, slugify
+    from utils import parse_price, pick_price, slugify
     from enrich import guess_brand, extract_attributes, clean_model
-    from fingerprint import product_fingerprint
+    from fingerprint import FingerprintKey
     from cache import JsonCache
     from googlecloudsqlconnector import CloudSQLConnector, DatabaseCache
     from simple_db_connector import SimplePostgreSQLConnector, SimpleDatabaseCache
     from llm_connectors import extract_with_llm, enrich_product_data, enabled as llm_enabled
     from config_manager import get_config
+    from stage_profiler import stage
 
 # Configuración de base de datos global
 _db_connector = None
@@ -41,59 +43,41 @@ def get_db_connector():
         )
     return _db_connector
 
-PRICE_KEYS_PREF = [
-    # prefer order for "current"
-    ("card_price", "card_price_text"),
-    ("normal_price", "normal_price_text"),
-    ("ripley_price", "ripley_price_text"),
-]
-
-def pick_price(item: Dict[str, Any]) -> Tuple[Optional[int], Optional[int]]:
-    # current
-    current = None
-    for numk, textk in PRICE_KEYS_PREF:
-        if numk in item:
-            current = parse_price(item.get(numk))
-        if current is None and textk in item:
-            current = parse_price(item.get(textk))
-        if current is not None:
-            break
-    # original
-    original = None
-    for k in ("original_price","original_price_text","normal_price","normal_price_text"):
-        val = parse_price(item.get(k))
-        if val:
-            original = val
-            break
-    return current, original
-
-def normalize_one(raw: Dict[str, Any], metadata: Dict[str, Any], retailer: str, category_id: str) -> Dict[str, Any]:
+def build_base_product(raw: Dict[str, Any], category_id: str) -> Tuple[Dict[str, Any], Optional[str]]:
+    """Producto base (sin IA) del que sale el fingerprint, y el modelo limpio (puede ser None)"""
     name = raw.get("name") or raw.get("title") or ""
-    url = raw.get("product_link") or raw.get("url") or None
     brand = raw.get("brand") or guess_brand(name) or "DESCONOCIDA"
-
-    # 1️⃣ EXTRACCIÓN BÁSICA (rápida, siempre)
-    price_curr, price_orig = pick_price(raw)
-    if price_curr is None:
-        # fallback: try any text with $
-        for k,v in raw.items():
-            if "price" in k and isinstance(v, str):
-                p = parse_price(v)
-                if p: price_curr = p; break
-
-    attrs = extract_attributes(name, category_id)
-    model = clean_model(name, brand)
-
-    # 2️⃣ CREAR PRODUCTO BASE para fingerprint
+    with stage("extract_attributes"):
+        attrs = extract_attributes(name, category_id)
+    with stage("clean_model"):
+        model = clean_model(name, brand)
     base_product = {
         "brand": brand,
         "category": category_id,
         "model": model or name,
         "attributes": attrs
     }
+    return base_product, model
+
+def normalize_one(raw: Dict[str, Any], metadata: Dict[str, Any], retailer: str, category_id: str) -> Dict[str, Any]:
+    name = raw.get("name") or raw.get("title") or ""
+    url = raw.get("product_link") or raw.get("url") or None
+
+    # 1️⃣ EXTRACCIÓN BÁSICA (rápida, siempre)
+    # Precios volátiles (nunca cacheados): una sola evaluación por producto
+    with stage("pick_price"):
+        price_curr, price_orig = pick_price(raw)
+        if price_curr is None and price_orig:
+            price_curr = price_orig  # Fallback si no hay precio de tarjeta
+
+    # 2️⃣ CREAR PRODUCTO BASE para fingerprint
+    base_product, model = build_base_product(raw, category_id)
+    brand, attrs = base_product["brand"], base_product["attributes"]
     
-    # 3️⃣ FINGERPRINT para cache IA indefinido 🎯
-    fingerprint = product_fingerprint(base_product)
+    # 3️⃣ FINGERPRINT para cache IA indefinido 🎯 (product_id sale del mismo buffer en 6️⃣)
+    with stage("fingerprint"):
+        fp_key = FingerprintKey(base_product)
+        fingerprint = fp_key.fingerprint
     
     # 4️⃣ CACHE IA INDEFINIDO EN BD - Solo metadatos, NO precios
     ai_data = {}
@@ -105,12 +89,14 @@ def normalize_one(raw: Dict[str, Any], metadata: Dict[str, Any], retailer: str,
             ai_cache = SimpleDatabaseCache(db_connector)
             
             # Buscar en cache por fingerprint
-            ai_data = ai_cache.get(fingerprint) or {}
+            with stage("ai_cache_lookup"):
+                ai_data = ai_cache.get(fingerprint) or {}
             
             if not ai_data:
                 # Primera vez: Llamar a OpenAI (costoso)
                 print(f"AI Enriqueciendo: {name[:50]}...")
-                ai_data = extract_with_llm(name, category_id)
+                with stage("llm_extract"):
+                    ai_data = extract_with_llm(name, category_id)
                 
                 if ai_data and "error" not in ai_data:
                     # Cache IA guardado indefinidamente en BD
@@ -151,19 +137,14 @@ def normalize_one(raw: Dict[str, Any], metadata: Dict[str, Any], retailer: str,
     # Combinar datos base + IA
     enriched = enrich_product_data(base_normalized, ai_data)
     
-    # 6️⃣ AGREGAR DATOS VOLÁTILES (precios, URL) - NUNCA cacheados
-    price_curr, price_orig = pick_price(raw)
-    if price_curr is None and price_orig:
-        price_curr = price_orig  # Fallback si no hay precio de tarjeta
-    
+    # 6️⃣ AGREGAR DATOS VOLÁTILES (precios de 1️⃣, URL) - NUNCA cacheados
     # product_id fingerprint (incluye retailer para uniqueness)
     sig_parts = [retailer, enriched.get("brand", ""), enriched.get("model", ""), category_id]
     final_attrs = enriched.get("attributes", {})
     for k in ("capacity","volume_ml","screen_size_in","panel","ram","storage","color"):
         if k in final_attrs:
             sig_parts.append(f"{k}={final_attrs[k]}")
-    sig = "|".join(str(x) for x in sig_parts)
-    product_id = hashlib.sha1(sig.encode("utf-8")).hexdigest()
+    product_id = fp_key.product_id(sig_parts)
 
     # 7️⃣ PRODUCTO FINAL optimizado para BD
     final_product = {
@@ -7,7 +7,6 @@ Normalización inteligente con routing, batch processing y cache semántico
 
 from __future__ import annotations
 import re
-import hashlib
 import os
 import json
 import logging
@@ -20,9 +19,9 @@ from enum import Enum
 
 # Imports del sistema actual
 try:
-    from .utils import parse_price, slugify
+    from .utils import parse_price, pick_price, slugify
     from .enrich import guess_brand, extract_attributes, clean_model
-    from .fingerprint import product_fingerprint
+    from .fingerprint import product_fingerprint, fingerprint_batch, hash_id
     from .cache import JsonCache
     from .gpt5_db_connector import GPT5DatabaseConnector, GPT5AICache, ModelType
     from .gpt5.router import GPT5Router, ComplexityAnalyzer
@@ -31,11 +30,17 @@ try:
     from .gpt5.validator import StrictValidator, QualityGate
     from .gpt5.cache_l1 import L1RedisCache, CacheManager
     from .gpt5.throttling import RateLimiter, CircuitBreaker, get_rate_limiter
+    from .gpt5.token_accounting import get_token_accountant
+    from .gpt5.executor import pace_llm_call
+    from .gpt5.work_queue import ProcessingQueue, PriorityPolicy
+    from .gpt5.dedup import coalesce
+    from .gpt5.prompt_optimizer import PromptOptimizer, PACKED_MAX_COMPLETION_TOKENS
     from .llm_connectors import enabled as llm_enabled
+    from .telemetry import serve_from_env
 except ImportError:
-    from utils import parse_price, slugify
+    from utils import parse_price, pick_price, slugify
     from enrich import guess_brand, extract_attributes, clean_model
-    from fingerprint import product_fingerprint
+    from fingerprint import product_fingerprint, fingerprint_batch, hash_id
     from cache import JsonCache
     from gpt5_db_connector import GPT5DatabaseConnector, GPT5AICache, ModelType
     from gpt5.router import GPT5Router, ComplexityAnalyzer
@@ -44,7 +49,13 @@ except ImportError:
     from gpt5.validator import StrictValidator, QualityGate
     from gpt5.cache_l1 import L1RedisCache, CacheManager
     from gpt5.throttling import RateLimiter, CircuitBreaker, get_rate_limiter
+    from gpt5.token_accounting import get_token_accountant
+    from gpt5.executor import pace_llm_call
+    from gpt5.work_queue import ProcessingQueue, PriorityPolicy
+    from gpt5.dedup import coalesce
+    from gpt5.prompt_optimizer import PromptOptimizer, PACKED_MAX_COMPLETION_TOKENS
     from llm_connectors import enabled as llm_enabled
+    from telemetry import serve_from_env
 
 logger = logging.getLogger(__name__)
 
@@ -67,6 +78,7 @@ _validator = None
 _l1_cache = None
 _rate_limiter = None
 _cache_manager = None
+_dedup_stats = {'input': 0, 'unique': 0, 'calls_saved': 0, 'tokens_saved': 0}
 
 def get_gpt5_connector() -> GPT5DatabaseConnector:
     """Obtener conector GPT-5 (singleton)"""
@@ -139,35 +151,15 @@ def get_cache_manager() -> CacheManager:
         )
     return _cache_manager
 
+def get_dedup_stats() -> Dict[str, int]:
+    """Llamadas/tokens ahorrados por dedup acumulados en el proceso"""
+    return dict(_dedup_stats)
+
 # ============================================================================
-# 🎯 EXTRACCIÓN DE PRECIOS (reutilizado del sistema actual)
+# 🎯 EXTRACCIÓN DE PRECIOS (pick_price compartido de utils, memoizado)
 # ============================================================================
 
-PRICE_KEYS_PREF = [
-    ("card_price", "card_price_text"),
-    ("normal_price", "normal_price_text"),
-    ("ripley_price", "ripley_price_text"),
-]
-
-def pick_price(item: Dict[str, Any]) -> Tuple[Optional[int], Optional[int]]:
-    """Extraer precios del producto (compatible con sistema actual)"""
-    current = None
-    for numk, textk in PRICE_KEYS_PREF:
-        if numk in item:
-            current = parse_price(item.get(numk))
-        if current is None and textk in item:
-            current = parse_price(item.get(textk))
-        if current is not None:
-            break
-    
-    original = None
-    for k in ("original_price", "original_price_text", "normal_price", "normal_price_text"):
-        val = parse_price(item.get(k))
-        if val:
-            original = val
-            break
-    
-    return current, original
+_priority_policy = PriorityPolicy(price_of=lambda item: pick_price(item)[0])
 
 # ============================================================================
 # 🚀 NORMALIZACIÓN CON GPT-5
@@ -280,8 +272,14 @@ async def normalize_with_gpt5(product: Dict[str, Any],
         model = force_model
         complexity = 0.5
         routing_reason = "Modelo forzado por usuario"
+    elif product.get('_routing'):
+        # Ya ruteado en bloque (GPT5Router.route_many)
+        model = product['_routing']['model']
+        complexity = product['_routing']['complexity']
+        routing_reason = product['_routing']['reason']
     else:
         model, complexity, routing_reason = router.route_single_extended(product)
+    product['_complexity'] = complexity
     
     # Guardar análisis de complejidad
     db.save_complexity_analysis(
@@ -337,21 +335,21 @@ async def _process_single_with_fallback(product: Dict, model: str,
     
     db = get_gpt5_connector()
     router = get_router()
+    prompt_manager = get_prompt_manager()
+    validator = get_validator()
+    l1_cache = get_l1_cache()
+    rate_limiter = get_rate_limiter()
+    accountant = get_token_accountant()
     ai_cache = GPT5AICache(db)
     
     # Obtener cadena de fallback
     fallback_chain = router.get_fallback_chain(ModelType(model))
     
     for attempt, current_model in enumerate(fallback_chain):
+        reservation = None
         try:
             logger.info(f"🔄 Intento {attempt + 1}: {current_model.value}")
             
-            # Verificar rate limit y circuit breaker
-            if not await rate_limiter.acquire(current_model.value, estimated_tokens=250):
-                logger.warning(f"⏳ Rate limited para {current_model.value}, esperando...")
-                if not await rate_limiter.acquire_with_backoff(current_model.value):
-                    raise Exception(f"Rate limit exceeded for {current_model.value}")
-            
             # Obtener prompt optimizado
             prompt_mode = PromptMode.STANDARD if attempt == 0 else PromptMode.FALLBACK
             prompt = prompt_manager.get_prompt(
@@ -369,6 +367,17 @@ async def _process_single_with_fallback(product: Dict, model: str,
                 "Eres un experto en normalización de productos retail. Responde en JSON."
             )
             
+            messages = [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt}
+            ]
+            
+            # Verificar rate limit y circuit breaker (pre-carga tokens estimados)
+            await pace_llm_call(current_model.value)
+            reservation = await accountant.reserve(current_model.value, messages, max_completion_tokens=500)
+            if reservation is None:
+                raise Exception(f"Rate limit exceeded for {current_model.value}")
+            
             # Llamar a OpenAI con circuit breaker
             import openai
             circuit_breaker = rate_limiter.circuit_breakers.get(current_model.value)
@@ -376,10 +385,7 @@ async def _process_single_with_fallback(product: Dict, model: str,
             async def make_openai_call():
                 return await openai.ChatCompletion.acreate(
                     model=current_model.value,
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": prompt}
-                    ],
+                    messages=messages,
                     temperature=0.1,
                     max_completion_tokens=500,
                     response_format={"type": "json_object"}
@@ -391,35 +397,17 @@ async def _process_single_with_fallback(product: Dict, model: str,
             else:
                 response = await make_openai_call()
             
+            # Liquidar la pre-carga contra el usage real
+            await accountant.settle(reservation, response)
+            reservation = None
+            
             # Parsear respuesta
             content = response.choices[0].message.content
             normalized_data = json.loads(content)
             
             # VALIDACIÓN ESTRICTA
-            # 1. Validar taxonomía
-            if 'category_suggestion' in normalized_data:
-                valid_tax, final_cat, tax_msg = validator.validate_taxonomy(
-                    normalized_data['category_suggestion'],
-                    product.get('category', 'general')
-                )
-                if not valid_tax:
-                    logger.warning(f"⚠️ Taxonomía inválida: {tax_msg}")
-                normalized_data['category_suggestion'] = final_cat
-            
-            # 2. Validar atributos
-            if 'attributes' in normalized_data:
-                valid_attrs, clean_attrs, attr_warnings = validator.validate_attributes(
-                    normalized_data['attributes'],
-                    normalized_data.get('category_suggestion', product.get('category', 'general'))
-                )
-                if attr_warnings:
-                    logger.debug(f"Advertencias de atributos: {attr_warnings}")
-                normalized_data['attributes'] = clean_attrs
-            
-            # 3. Validar calidad
-            valid_quality, quality_score, quality_issues = validator.validate_quality(
-                normalized_data,
-                normalized_data.get('category_suggestion', product.get('category', 'general'))
+            valid_quality, quality_score, quality_issues = _validate_normalized(
+                validator, normalized_data, product
             )
             
             if not valid_quality:
@@ -432,15 +420,7 @@ async def _process_single_with_fallback(product: Dict, model: str,
             
             # Calcular métricas
             tokens_used = response.usage.total_tokens
-            cost = db.get_model_config(current_model.value)
-            
-            if cost:
-                cost_usd = (
-                    (response.usage.prompt_tokens / 1000) * cost['cost_per_1k_input'] +
-                    (response.usage.completion_tokens / 1000) * cost['cost_per_1k_output']
-                )
-            else:
-                cost_usd = tokens_used * 0.0003 / 1000  # Estimado
+            cost_usd = _usage_cost(db, current_model.value, response.usage)
             
             # Guardar en múltiples niveles de cache
             # L1 Cache (Redis)
@@ -497,6 +477,8 @@ async def _process_single_with_fallback(product: Dict, model: str,
             
             # Reportar fallo al rate limiter
             rate_limiter.report_failure(current_model.value, e)
+            if reservation is not None:
+                await accountant.fail(reservation, e)
             
             # Log error
             db.log_processing_metric(
@@ -525,34 +507,31 @@ async def _process_single_with_fallback(product: Dict, model: str,
                     'error': 'fallback_basic'
                 }
 
+def _usage_cost(db: GPT5DatabaseConnector, model: str, usage: Any) -> float:
+    """Costo USD del usage de una respuesta según la config de precios del modelo"""
+    cost = db.get_model_config(model)
+    if cost:
+        return (
+            (usage.prompt_tokens / 1000) * float(cost['cost_per_1k_input']) +
+            (usage.completion_tokens / 1000) * float(cost['cost_per_1k_output'])
+        )
+    return usage.total_tokens * 0.0003 / 1000  # Estimado
+
+def _validate_normalized(validator: StrictValidator, normalized_data: Dict,
+                         product: Dict) -> Tuple[bool, float, List[str]]:
+    """Validación estricta (taxonomía, atributos, calidad); limpia normalized_data in-place"""
+    return validator.validate_normalized(normalized_data, product.get('category', 'general'))
+
 async def _queue_for_batch(product: Dict, model: str, fingerprint: str) -> Dict:
-    """Agregar producto a cola de batch processing con idempotencia"""
+    """Agregar producto a processing_queue con prioridad por señales (idempotente por fingerprint)"""
     
     db = get_gpt5_connector()
     
-    # Generar custom_id único para idempotencia
-    custom_id = f"{fingerprint}_{int(datetime.now().timestamp())}"
-    
-    # Guardar en cola con ON CONFLICT para idempotencia
-    with db.get_connection() as conn:
-        with conn.cursor() as cursor:
-            cursor.execute("""
-                INSERT INTO processing_queue 
-                (fingerprint, product_data, assigned_model, status, priority, custom_id)
-                VALUES (%s, %s, %s, 'pending', %s, %s)
-                ON CONFLICT (fingerprint) DO UPDATE
-                SET assigned_model = EXCLUDED.assigned_model,
-                    updated_at = CURRENT_TIMESTAMP
-            """, (
-                fingerprint,
-                json.dumps(product),
-                model,
-                5,  # Prioridad media
-                custom_id
-            ))
-            conn.commit()
-    
-    logger.info(f"📦 Producto agregado a cola batch: {fingerprint[:8]}...")
+    # Prioridad: precio, frescura y retailer (urgentes se procesan en minutos, el resto va a batch)
+    priority = _priority_policy.score(product)
+    ProcessingQueue(db).enqueue([(fingerprint, product, model, priority)])
+    
+    logger.info(f"📦 Producto agregado a cola batch: {fingerprint[:8]}... (prioridad {priority})")
     
     # Retornar producto con marca de pendiente
     return _build_final_product(
@@ -579,9 +558,7 @@ def _build_final_product(raw: Dict, ai_data: Dict, fingerprint: str) -> Dict:
     
     # Construir producto final
     return {
-        "product_id": hashlib.sha1(
-            f"{raw.get('retailer', '')}|{fingerprint}".encode()
-        ).hexdigest(),
+        "product_id": hash_id([raw.get('retailer', ''), fingerprint]),
         "fingerprint": fingerprint,
         "retailer": raw.get("retailer", "unknown"),
         "name": ai_data.get("normalized_name") or raw.get("name", ""),
@@ -610,13 +587,15 @@ def _build_final_product(raw: Dict, ai_data: Dict, fingerprint: str) -> Dict:
 # ============================================================================
 
 async def process_batch_gpt5(products: List[Dict], 
-                            max_batch_size: int = 50000) -> List[Dict]:
+                            max_batch_size: int = 50000,
+                            packed: bool = False) -> List[Dict]:
     """
     Procesar lote de productos con batch API (50% descuento)
     
     Args:
         products: Lista de productos a procesar
         max_batch_size: Tamaño máximo por batch
+        packed: K productos por línea del batch (prompts empaquetados)
     
     Returns:
         Lista de productos normalizados
@@ -637,21 +616,32 @@ async def process_batch_gpt5(products: List[Dict],
     cached_results = []
     ai_cache = GPT5AICache(db)
     
-    for product in products:
-        # Generar fingerprint
-        base = {
-            "brand": product.get("brand") or guess_brand(product.get("name", "")),
-            "category": product.get("category", "general"),
-            "model": clean_model(product.get("name", ""), product.get("brand", "")),
-            "attributes": extract_attributes(product.get("name", ""), product.get("category", ""))
-        }
-        fingerprint = product_fingerprint(base)
+    # Generar fingerprints del lote (productos base repetidos se hashean una vez)
+    bases = [{
+        "brand": product.get("brand") or guess_brand(product.get("name", "")),
+        "category": product.get("category", "general"),
+        "model": clean_model(product.get("name", ""), product.get("brand", "")),
+        "attributes": extract_attributes(product.get("name", ""), product.get("category", ""))
+    } for product in products]
+    for product, fingerprint in zip(products, fingerprint_batch(bases)):
         product['_fingerprint'] = fingerprint
+    
+    # Dedup: un solo request por fingerprint / título normalizado
+    plan = coalesce(products)
+    for key in _dedup_stats:
+        _dedup_stats[key] += plan.stats()[key]
+    members_of = {}
+    for k, product in enumerate(plan.unique):
+        members_of[id(product)] = [products[i] for i in plan.members(k)]
+    
+    for product in plan.unique:
+        fingerprint = product['_fingerprint']
         
         # Verificar cache
         cached = ai_cache.get(fingerprint)
         if cached:
-            cached_results.append(_build_final_product(product, cached, fingerprint))
+            for member in members_of[id(product)]:
+                cached_results.append(_build_final_product(member, cached, member['_fingerprint']))
         else:
             to_process.append(product)
     
@@ -660,19 +650,14 @@ async def process_batch_gpt5(products: List[Dict],
     if not to_process:
         return cached_results
     
-    # 2️⃣ ROUTING: Clasificar por complejidad
-    for product in to_process:
-        model, complexity, reason = router.route_single_extended(product)
-        product['_model'] = model
-        product['_complexity'] = complexity
-        
-        # Guardar análisis
-        db.save_complexity_analysis(
-            fingerprint=product['_fingerprint'],
-            complexity_score=complexity,
-            model_assigned=model,
-            routing_reason=reason
-        )
+    # 2️⃣ ROUTING: Clasificar por complejidad (una pasada; persiste solo lo nuevo)
+    routed = router.route_many(to_process, save=True)
+    for product, (model, complexity, reason) in zip(to_process, routed):
+        product['_routing'] = {
+            'model': model,
+            'complexity': complexity,
+            'reason': reason
+        }
     
     # 3️⃣ CREAR BATCHES: Optimizados por modelo
     batches = orchestrator.create_optimized_batches(to_process, max_batch_size)
@@ -694,24 +679,23 @@ async def process_batch_gpt5(products: List[Dict],
             results = await processor.process_products_batch(
                 products=batch_products,
                 model=model,
-                prompt_template="Normalize: {name}"
+                prompt_template="Normalize: {name}",
+                packed=packed
             )
             
-            # Convertir resultados a productos finales
+            # Convertir resultados a productos finales (fan-out a duplicados)
+            by_fingerprint = {p.get('_fingerprint'): p for p in batch_products}
             for result in results:
                 # Buscar producto original por fingerprint
-                original = next(
-                    (p for p in batch_products if p.get('_fingerprint') == result.get('fingerprint')),
-                    None
-                )
+                original = by_fingerprint.get(result.get('fingerprint'))
                 
                 if original and result.get('normalized'):
-                    final_product = _build_final_product(
-                        original,
-                        result['normalized'],
-                        result['fingerprint']
-                    )
-                    all_results.append(final_product)
+                    for member in members_of[id(original)]:
+                        all_results.append(_build_final_product(
+                            member,
+                            result['normalized'],
+                            member['_fingerprint']
+                        ))
             
         except Exception as e:
             logger.error(f"❌ Error procesando batch {batch_id}: {e}")
@@ -719,26 +703,198 @@ async def process_batch_gpt5(products: List[Dict],
             # Procesar individualmente como fallback
             for product in batch_products:
                 try:
-                    normalized = await normalize_with_gpt5(
-                        product,
-                        mode=ProcessingMode.SINGLE
-                    )
-                    all_results.append(normalized)
+                    for member in members_of[id(product)]:
+                        normalized = await normalize_with_gpt5(
+                            member,
+                            mode=ProcessingMode.SINGLE
+                        )
+                        all_results.append(normalized)
                 except Exception as e2:
                     logger.error(f"Error procesando producto individual: {e2}")
     
     # 5️⃣ ESTADÍSTICAS FINALES
     stats = db.get_cost_summary(days=1)
+    dedup = plan.stats()
     logger.info(f"""
     ✅ Batch processing completado:
     - Productos procesados: {len(all_results)}
-    - Cache hits: {len(cached_results)} ({len(cached_results)/len(products)*100:.1f}%)
+    - Cache hits: {len(cached_results)} ({len(cached_results)/max(len(products), 1)*100:.1f}%)
     - Nuevos procesados: {len(all_results) - len(cached_results)}
+    - Dedup: {dedup['calls_saved']} llamadas / ~{dedup['tokens_saved']} tokens ahorrados
     - Costo estimado: ${stats.get('total_cost', 0):.4f}
     """)
     
     return all_results
 
+# ============================================================================
+# 📦 PROMPTS EMPAQUETADOS (K productos por chat completion)
+# ============================================================================
+
+def _single_fingerprint(product: Dict[str, Any]) -> str:
+    """Fingerprint igual al de normalize_with_gpt5 (mismas claves de cache)"""
+    name = product.get("name") or product.get("title") or ""
+    brand = product.get("brand") or guess_brand(name) or "DESCONOCIDA"
+    category = product.get("category", "general")
+    return product_fingerprint({
+        "brand": brand,
+        "category": category,
+        "model": clean_model(name, brand) or name,
+        "attributes": extract_attributes(name, category)
+    })
+
+async def process_packed_gpt5(products: List[Dict], executor=None,
+                              max_rounds: int = 2) -> List[Dict]:
+    """
+    Normalizar productos empaquetando K por request (salida JSON indexada)
+    
+    El system prompt y la plantilla se envían una vez por pack; K se elige según
+    estimate_tokens y max_completion_tokens del modelo. Los items faltantes o
+    inválidos de una respuesta se reintentan solos; los que agotan max_rounds
+    pasan por _process_single_with_fallback.
+    
+    Args:
+        products: Productos crudos (con '_routing' si ya fueron ruteados)
+        executor: ConcurrentExecutor opcional para enviar packs en paralelo
+        max_rounds: Reintentos de items afectados
+    
+    Returns:
+        Productos finales alineados con `products`
+    """
+    import openai
+    
+    db = get_gpt5_connector()
+    router = get_router()
+    prompt_manager = get_prompt_manager()
+    validator = get_validator()
+    l1_cache = get_l1_cache()
+    rate_limiter = get_rate_limiter()
+    accountant = get_token_accountant()
+    ai_cache = GPT5AICache(db)
+    optimizer = PromptOptimizer()
+    
+    results: List[Optional[Dict]] = [None] * len(products)
+    fingerprints = [_single_fingerprint(p) for p in products]
+    by_model: Dict[str, List[int]] = {}
+    
+    # 1️⃣ Cache L1 / exacto
+    for idx, product in enumerate(products):
+        cached = l1_cache.get(fingerprints[idx]) or ai_cache.get(fingerprints[idx])
+        if cached:
+            results[idx] = _build_final_product(product, cached, fingerprints[idx])
+            continue
+        model = (product.get('_routing') or {}).get('model') or router.route_single_extended(product)[0]
+        by_model.setdefault(model, []).append(idx)
+    
+    # 2️⃣ Packs adaptativos por modelo
+    packs = []
+    for model, idxs in by_model.items():
+        for pack in optimizer.pack_products([products[i] for i in idxs], model):
+            packs.append({'model': model, 'items': [idxs[k] for k in pack]})
+    
+    if packs:
+        n_items = sum(len(p['items']) for p in packs)
+        logger.info(f"📦 {n_items} productos en {len(packs)} requests empaquetados")
+    
+    async def run_pack(pack: Dict) -> List[int]:
+        model = pack['model']
+        pending = pack['items']
+        for round_ in range(max_rounds + 1):
+            if not pending:
+                break
+            batch = [products[i] for i in pending]
+            messages = [
+                {"role": "system", "content": prompt_manager.get_packed_system_prompt(model)},
+                {"role": "user", "content": prompt_manager.get_packed_prompt(batch)}
+            ]
+            max_completion = PACKED_MAX_COMPLETION_TOKENS.get(model, 4000)
+            reservation = await accountant.reserve(model, messages, max_completion)
+            if reservation is None:
+                return pending
+            
+            async def make_openai_call():
+                return await openai.ChatCompletion.acreate(
+                    model=model,
+                    messages=messages,
+                    temperature=0.1,
+                    max_completion_tokens=max_completion,
+                    response_format={"type": "json_object"}
+                )
+            
+            try:
+                # Mismo circuit breaker por modelo que el camino individual
+                circuit_breaker = rate_limiter.circuit_breakers.get(model)
+                if circuit_breaker:
+                    response = await circuit_breaker.call_async(make_openai_call)
+                else:
+                    response = await make_openai_call()
+                content = response.choices[0].message.content
+                rate_limiter.report_success(model)
+                await accountant.settle(reservation, response)
+            except Exception as e:
+                logger.error(f"❌ Pack {model} ({len(batch)} items) falló: {e}")
+                rate_limiter.report_failure(model, e)
+                await accountant.fail(reservation, e)
+                continue
+            
+            parsed, retry_pos = prompt_manager.parse_packed_response(content, len(batch))
+            for pos, normalized_data in parsed.items():
+                idx = pending[pos]
+                try:
+                    valid, quality_score, issues = _validate_normalized(validator, normalized_data, products[idx])
+                except Exception as e:
+                    logger.warning(f"⚠️ Item {pos} del pack no validó: {e}")
+                    valid = False
+                if not valid:
+                    retry_pos.append(pos)
+                    continue
+                normalized_data['confidence'] = quality_score
+                normalized_data['model_used'] = model
+                l1_cache.set(
+                    fingerprint=fingerprints[idx],
+                    data=normalized_data,
+                    category=normalized_data.get('category_suggestion', products[idx].get('category'))
+                )
+                ai_cache.set(
+                    fingerprint=fingerprints[idx],
+                    metadata=normalized_data,
+                    model_used=model,
+                    tokens_used=response.usage.total_tokens // len(batch),
+                    quality_score=quality_score
+                )
+                results[idx] = _build_final_product(products[idx], normalized_data, fingerprints[idx])
+            
+            db.log_processing_metric(
+                model=model,
+                request_type='packed',
+                tokens_input=response.usage.prompt_tokens,
+                tokens_output=response.usage.completion_tokens,
+                cost_usd=_usage_cost(db, model, response.usage),
+                success=not retry_pos
+            )
+            pending = [pending[pos] for pos in sorted(retry_pos)]
+            if pending:
+                logger.info(f"🔁 {len(pending)}/{len(batch)} items del pack a reintentar")
+        return pending
+    
+    if executor is not None:
+        leftovers = await executor.map(run_pack, packs, model_of=lambda p: p['model'])
+    else:
+        leftovers = [await run_pack(pack) for pack in packs]
+    
+    # 3️⃣ Items que agotaron reintentos: camino individual con fallback
+    for pack, left in zip(packs, leftovers):
+        if isinstance(left, Exception):
+            left = pack['items']
+        for idx in left:
+            normalized_data = await _process_single_with_fallback(
+                product=products[idx],
+                model=pack['model'],
+                fingerprint=fingerprints[idx]
+            )
+            results[idx] = _build_final_product(products[idx], normalized_data, fingerprints[idx])
+    
+    return results
+
 # ============================================================================
 # 🔄 COMPATIBILIDAD CON SISTEMA ACTUAL
 # ============================================================================
@@ -787,6 +943,7 @@ async def main():
         level=logging.INFO,
         format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
     )
+    serve_from_env()
     
     print("""
     ╔══════════════════════════════════════════════════════════╗
@@ -6,7 +6,6 @@ Pipeline canónico: categorización (BD→JSON), normalización y persistencia s
 """
 
 from __future__ import annotations
-import hashlib
 import os
 from typing import Dict, Any, Tuple, Optional, List
 
@@ -14,18 +13,20 @@ from typing import Dict, Any, Tuple, Optional, List
 try:
     from .utils import parse_price
     from .enrich import guess_brand, extract_attributes, clean_model
-    from .fingerprint import product_fingerprint
+    from .fingerprint import FingerprintKey
     from .cache import JsonCache
     from .categorize import load_taxonomy, categorize_enhanced, get_brand_aliases
     from .unified_connector import get_unified_connector
     from .llm_connectors import extract_with_llm, enrich_product_data, enabled as llm_enabled
+    from .stage_profiler import stage, get_profiler
 except ImportError:
     from utils import parse_price
     from enrich import guess_brand, extract_attributes, clean_model
-    from fingerprint import product_fingerprint
+    from fingerprint import FingerprintKey
     from cache import JsonCache
     from categorize import load_taxonomy, categorize_enhanced, get_brand_aliases
     from unified_connector import get_unified_connector
+    from stage_profiler import stage, get_profiler
     try:
         from llm_connectors_optimized import extract_with_llm, enrich_product_data, enabled as llm_enabled
     except ImportError:
@@ -91,48 +92,94 @@ def pick_price(item: Dict[str, Any]) -> Tuple[Optional[int], Optional[int]]:
     return current, original
 
 
-def normalize_one_integrated(raw: Dict[str, Any], metadata: Dict[str, Any], retailer: str) -> Dict[str, Any]:
-    """Normalización integrada completa con BD y cache IA opcional"""
-
+def canonical_brand(brand: str, brand_aliases: Dict[str, List[str]]) -> str:
+    """Marca canónica según los aliases de la BD (sin cambio si no hay alias)"""
+    brand_upper = brand.upper()
+    for canonical, aliases in brand_aliases.items():
+        if brand_upper in [alias.upper() for alias in aliases]:
+            return canonical
+    return brand
+
+
+def integrated_base(raw: Dict[str, Any], metadata: Dict[str, Any],
+                    taxonomy: Optional[Dict[str, Any]] = None,
+                    brand_aliases: Optional[Dict[str, List[str]]] = None) -> Dict[str, Any]:
+    """
+    Pasos deterministas de normalize_one_integrated (sin IA ni BD de productos):
+    categorización, precio, marca con aliases, atributos, modelo y producto base
+    del fingerprint. fingerprint-map usa este mismo camino para el mapeo v1 -> v2.
+    """
     name = raw.get("name") or raw.get("title") or ""
-    url = raw.get("product_link") or raw.get("url") or None
-
-    print(f">> Normalizando: {str(name)[:50]}...")
 
     # 1) Categorización híbrida
-    taxonomy = get_taxonomy_cached()
-    categorization = categorize_enhanced(name, metadata, taxonomy)
+    with stage("categorize"):
+        categorization = categorize_enhanced(name, metadata, taxonomy or get_taxonomy_cached())
     category_id = categorization["category_id"]
-    category_confidence = categorization["confidence"]
-    print(f"   Categoría: {category_id} (conf: {category_confidence:.2f}, fuente: {categorization.get('source')})")
 
     # 2) Precios y marca
-    price_curr, price_orig = pick_price(raw)
-    if price_curr is None:
-        # Fallback: buscar cualquier key con texto de precio
-        for k, v in raw.items():
-            if "price" in k and isinstance(v, str):
-                p = _parse_price(v)
-                if p:
-                    price_curr = p
-                    break
-
-    brand_aliases = get_brand_aliases()
-    brand = raw.get("brand") or guess_brand(name) or "DESCONOCIDA"
-    # Normalizar marca con aliases
-    brand_upper = brand.upper()
-    for canonical, aliases in brand_aliases.items():
-        if brand_upper in [alias.upper() for alias in aliases]:
-            brand = canonical
-            break
+    with stage("pick_price"):
+        price_curr, price_orig = pick_price(raw)
+        if price_curr is None:
+            # Fallback: buscar cualquier key con texto de precio
+            for k, v in raw.items():
+                if "price" in k and isinstance(v, str):
+                    p = _parse_price(v)
+                    if p:
+                        price_curr = p
+                        break
+
+    with stage("brand"):
+        if brand_aliases is None:
+            brand_aliases = get_brand_aliases()
+        brand = canonical_brand(raw.get("brand") or guess_brand(name) or "DESCONOCIDA", brand_aliases)
 
     # 3) Atributos por categoría y modelo
-    attrs = extract_attributes(name, category_id)
-    model = clean_model(name, brand)
+    with stage("extract_attributes"):
+        attrs = extract_attributes(name, category_id)
+    with stage("clean_model"):
+        model = clean_model(name, brand)
+
+    return {
+        "name": name,
+        "categorization": categorization,
+        "category_id": category_id,
+        "price_current": price_curr,
+        "price_original": price_orig,
+        "brand": brand,
+        "model": model,
+        "attributes": attrs,
+        "base_product": {"brand": brand, "category": category_id, "model": model or name, "attributes": attrs},
+    }
+
+
+def product_id_parts(base: Dict[str, Any], retailer: str, ai_data: Optional[Dict[str, Any]] = None) -> List[Any]:
+    """Partes del product_id: marca/modelo (refinados por IA si hay) + categoría, precio y retailer"""
+    ai_data = ai_data or {}
+    return [ai_data.get('brand', base["brand"]), ai_data.get('model', base["model"]),
+            base["category_id"], base["price_current"], retailer]
+
+
+def normalize_one_integrated(raw: Dict[str, Any], metadata: Dict[str, Any], retailer: str) -> Dict[str, Any]:
+    """Normalización integrada completa con BD y cache IA opcional"""
+
+    url = raw.get("product_link") or raw.get("url") or None
+
+    print(f">> Normalizando: {str(raw.get('name') or raw.get('title') or '')[:50]}...")
+
+    # 1-3) Categoría, precio, marca, atributos y modelo
+    base = integrated_base(raw, metadata)
+    name = base["name"]
+    categorization = base["categorization"]
+    category_id = base["category_id"]
+    category_confidence = categorization["confidence"]
+    print(f"   Categoría: {category_id} (conf: {category_confidence:.2f}, fuente: {categorization.get('source')})")
+    price_curr, price_orig = base["price_current"], base["price_original"]
+    brand, model, attrs = base["brand"], base["model"], base["attributes"]
 
     # 4) Producto base y fingerprint
-    base_product = {"brand": brand, "category": category_id, "model": model or name, "attributes": attrs}
-    fingerprint = product_fingerprint(base_product)
+    with stage("fingerprint"):
+        fp_key = FingerprintKey(base["base_product"])
+        fingerprint = fp_key.fingerprint
 
     # 5) Cache/IA opcional
     ai_data: Dict[str, Any] = {}
@@ -142,7 +189,8 @@ def normalize_one_integrated(raw: Dict[str, Any], metadata: Dict[str, Any], reta
     if llm_enabled():
         try:
             db = get_db_connector()
-            ai_cached = db.get_ai_cache(fingerprint)
+            with stage("ai_cache_lookup"):
+                ai_cached = db.get_ai_cache(fingerprint)
             if ai_cached:
                 print(f"   IA: Cache hit (conf: {ai_cached.get('confidence', 0):.2f})")
                 ai_data = ai_cached
@@ -150,9 +198,11 @@ def normalize_one_integrated(raw: Dict[str, Any], metadata: Dict[str, Any], reta
                 ai_confidence = ai_cached.get('confidence', 0.0)
             else:
                 print("   IA: Enriqueciendo por primera vez...")
-                ai_data = extract_with_llm(name, category_id)
+                with stage("llm_extract"):
+                    ai_data = extract_with_llm(name, category_id)
                 if ai_data and "error" not in ai_data:
-                    db.set_ai_cache(fingerprint, ai_data)
+                    with stage("ai_cache_store"):
+                        db.set_ai_cache(fingerprint, ai_data)
                     ai_enhanced = True
                     ai_confidence = ai_data.get('confidence', 0.0)
                 else:
@@ -183,7 +233,7 @@ def normalize_one_integrated(raw: Dict[str, Any], metadata: Dict[str, Any], reta
             final_attributes[k] = v
 
     # 7) product_id y producto final
-    product_id = hashlib.sha1(f"{final_brand}|{final_model}|{category_id}|{price_curr}|{retailer}".encode()).hexdigest()
+    product_id = fp_key.product_id(product_id_parts(base, retailer, ai_data))
     normalized_product = {
         "product_id": product_id,
         "fingerprint": fingerprint,
@@ -214,7 +264,8 @@ def normalize_one_integrated(raw: Dict[str, Any], metadata: Dict[str, Any], reta
     # 8) Persistencia en BD
     try:
         db_connector = get_db_connector()
-        success = db_connector.save_normalized_product(normalized_product)
+        with stage("db_save"):
+            success = db_connector.save_normalized_product(normalized_product)
         if success:
             print("   BD: Producto guardado exitosamente")
         else:
@@ -264,6 +315,7 @@ def normalize_batch_integrated(items: list, retailer: str = None) -> list:
 
     results: List[Dict[str, Any]] = []
     errors = 0
+    profiler = get_profiler()
 
     for i, item_data in enumerate(items, 1):
         try:
@@ -271,7 +323,8 @@ def normalize_batch_integrated(items: list, retailer: str = None) -> list:
             metadata = item_data.get("metadata", {})
             item_retailer = retailer or item_data.get("_retailer", item_data.get("retailer", "Unknown"))
 
-            normalized = normalize_one_integrated(raw, metadata, item_retailer)
+            with profiler.sample(), stage("normalize_one"):
+                normalized = normalize_one_integrated(raw, metadata, item_retailer)
             results.append(normalized)
 
             print(f"   [{i}/{len(items)}] OK {normalized['name'][:40]}...")
@@ -4,6 +4,11 @@ from typing import List
 from .orchestrator import run_pipeline
 from .utils import setup_logging
 
+try:
+    from ..telemetry import serve_from_env
+except ImportError:
+    from telemetry import serve_from_env
+
 def main():
     parser = argparse.ArgumentParser(description="Retail Normalizer Pipeline")
     parser.add_argument("--input", required=False, default="/mnt/data", help="Carpeta con JSONs de scraping")
@@ -14,6 +19,7 @@ def main():
     parser.add_argument("--stage", choices=["all","normalize","match"], default="all", help="Etapa a ejecutar")
     parser.add_argument("--normalized", help="Ruta a normalized_products.jsonl para etapa match")
     args = parser.parse_args()
+    serve_from_env()
 
     patterns = [p.strip() for p in args.patterns.split(",") if p.strip()]
     os.makedirs(args.outdir, exist_ok=True)
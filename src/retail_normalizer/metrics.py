@@ -2,6 +2,18 @@ from __future__ import annotations
 import time, json, os
 from typing import Dict, Any
 
+try:
+    from ..telemetry import get_registry
+except ImportError:
+    from telemetry import get_registry
+
+_registry = get_registry()
+_events = _registry.counter("pipeline_events", "Eventos del pipeline por tipo", ("event",))
+_category = _registry.counter("pipeline_category_products", "Productos por categoría", ("category",))
+_llm_tokens = _registry.counter("llm_tokens", "Tokens LLM por modo y dirección", ("model", "direction"))
+_llm_cost = _registry.counter("llm_cost_usd", "Costo acumulado en USD por modelo", ("model",))
+_stage_seconds = _registry.counter("pipeline_stage_seconds", "Tiempo acumulado por etapa", ("stage",))
+
 class Metrics:
     def __init__(self):
         self.t0 = time.time()
@@ -22,14 +34,19 @@ class Metrics:
 
     def inc(self, key: str, n: int=1):
         self.counts[key] = self.counts.get(key,0) + n
+        _events.labels(key).inc(n)
 
     def inc_cat(self, cat: str):
         self.counts["by_category"][cat] = self.counts["by_category"].get(cat,0)+1
+        _category.labels(cat).inc()
 
     def add_llm(self, tokens_in: int, tokens_out: int, cost: float, mode: str):
         self.counts["llm_tokens_in"] += tokens_in
         self.counts["llm_tokens_out"] += tokens_out
         self.counts["llm_cost_usd"] += cost
+        _llm_tokens.labels(mode, "input").inc(tokens_in)
+        _llm_tokens.labels(mode, "output").inc(tokens_out)
+        _llm_cost.labels(mode).inc(cost)
         if mode=="mini":
             self.counts["llm_mini_calls"] += 1
         elif mode=="full":
@@ -37,6 +54,7 @@ class Metrics:
 
     def record_timing(self, name: str, ms: float):
         self.timings[name] = self.timings.get(name,0) + ms
+        _stage_seconds.labels(name).inc(ms / 1000)
 
     def report(self, out_path: str):
         total_s = time.time()-self.t0
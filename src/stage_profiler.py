@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+⏱️ Timers por etapa y perfilado del camino caliente de normalización
+
+Las etapas se marcan con `with stage("categorize"):` o `@timed("db_save")`.
+Con el profiler deshabilitado (default) `stage()` devuelve un context manager
+nulo compartido: el costo es una llamada y un chequeo de flag. Habilitado
+(--profile), cada etapa registra su duración en un histograma log-lineal y
+opcionalmente se corre cProfile (o pyinstrument) sobre una muestra de
+productos, con salida .pstats y pilas colapsadas para flamegraph.pl/speedscope.
+"""
+
+import cProfile
+import json
+import logging
+import os
+import pstats
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+try:
+    from .gpt5.monitoring.metrics_collector import LatencyHistogram
+except ImportError:
+    from gpt5.monitoring.metrics_collector import LatencyHistogram
+
+try:
+    from pyinstrument import Profiler as _Pyinstrument
+except ImportError:  # Opcional: sin pyinstrument se usa cProfile
+    _Pyinstrument = None
+
+logger = logging.getLogger(__name__)
+
+# Los histogramas trabajan en microsegundos (el bucket mínimo es 1 unidad)
+_US = 1_000_000
+_MAX_US = 3_600 * _US
+
+
+class _NullStage:
+    """Context manager sin efecto (profiler deshabilitado)"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    __slots__ = ("hist", "t0")
+
+    def __init__(self, hist: LatencyHistogram):
+        self.hist = hist
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.hist.record((time.perf_counter() - self.t0) * _US)
+        return False
+
+
+class StageProfiler:
+    """
+    Duración por etapa + muestreo de perfiles por producto
+
+    Las etapas anidadas se miden de forma inclusiva (cada una con su reloj).
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self.sample_every = 0
+        self.sample_limit = 0
+        self.backend = "cprofile"
+        self._seen = 0
+        self.sampled = 0
+        self._cprofile: Optional[cProfile.Profile] = None
+        self._pyinstrument = None
+
+    def enable(self, sample_every: int = 0, sample_limit: int = 50, backend: str = "cprofile"):
+        """
+        Habilitar timers; con sample_every=N se perfila 1 de cada N productos
+
+        Args:
+            sample_every: Frecuencia de muestreo de perfiles (0 = sin perfiles)
+            sample_limit: Máximo de productos perfilados
+            backend: "cprofile" o "pyinstrument" (si está instalado)
+        """
+        if backend == "pyinstrument" and _Pyinstrument is None:
+            logger.warning("⚠️ pyinstrument no instalado, se usa cProfile")
+            backend = "cprofile"
+        self.enabled = True
+        self.sample_every = max(0, sample_every)
+        self.sample_limit = sample_limit
+        self.backend = backend
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        """Descartar lo medido (el estado enabled se mantiene)"""
+        self.histograms = {}
+        self._seen = 0
+        self.sampled = 0
+        self._cprofile = None
+        self._pyinstrument = None
+
+    def stage(self, name: str):
+        """Context manager que mide la etapa `name`"""
+        if not self.enabled:
+            return _NULL_STAGE
+        hist = self.histograms.get(name)
+        if hist is None:
+            hist = self.histograms[name] = LatencyHistogram(max_value=_MAX_US)
+        return _Stage(hist)
+
+    def timed(self, name: Optional[str] = None) -> Callable:
+        """Decorador: mide cada llamada como la etapa `name` (default: nombre de la función)"""
+        def decorator(func):
+            label = name or func.__name__
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with self.stage(label):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    @contextmanager
+    def sample(self) -> Iterator[bool]:
+        """Perfilar el bloque si le toca muestra (un producto); entrega si se perfiló"""
+        if not self.enabled or not self.sample_every:
+            yield False
+            return
+        self._seen += 1
+        if (self._seen - 1) % self.sample_every or self.sampled >= self.sample_limit:
+            yield False
+            return
+        self.sampled += 1
+        if self.backend == "pyinstrument":
+            if self._pyinstrument is None:
+                self._pyinstrument = _Pyinstrument()
+            self._pyinstrument.start()
+            try:
+                yield True
+            finally:
+                self._pyinstrument.stop()
+        else:
+            if self._cprofile is None:
+                self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+            try:
+                yield True
+            finally:
+                self._cprofile.disable()
+
+    # ========================================================================
+    # 📊 REPORTES
+    # ========================================================================
+
+    def stage_summary(self) -> Dict[str, Dict[str, float]]:
+        """count/total/media/percentiles por etapa en ms, ordenado por tiempo total"""
+        summary = {}
+        for name, hist in self.histograms.items():
+            p = hist.percentiles((50, 95, 99))
+            summary[name] = {
+                'count': hist.count,
+                'total_ms': round(hist.total / 1000, 3),
+                'mean_ms': round(hist.mean / 1000, 4),
+                'p50_ms': round(p[50] / 1000, 4),
+                'p95_ms': round(p[95] / 1000, 4),
+                'p99_ms': round(p[99] / 1000, 4),
+                'max_ms': round(hist.max / 1000, 4),
+            }
+        return dict(sorted(summary.items(), key=lambda kv: -kv[1]['total_ms']))
+
+    def write_report(self, outdir: str) -> Dict[str, str]:
+        """
+        Escribir stages.json (+ perfiles si hubo muestras); retorna rutas escritas
+
+        stages.json trae el resumen y el histograma de cada etapa (µs, buckets
+        dispersos de LatencyHistogram). Con cProfile se escribe profile.pstats y
+        stacks.collapsed; con pyinstrument, pyinstrument.html.
+        """
+        os.makedirs(outdir, exist_ok=True)
+        paths = {}
+        stages_path = os.path.join(outdir, "stages.json")
+        with open(stages_path, "w", encoding="utf-8") as fh:
+            json.dump({
+                'unit': 'us',
+                'summary': self.stage_summary(),
+                'histograms': {name: hist.to_dict() for name, hist in self.histograms.items()},
+                'sampled_products': self.sampled,
+            }, fh, ensure_ascii=False, indent=2)
+        paths['stages'] = stages_path
+
+        if self._cprofile is not None:
+            stats = pstats.Stats(self._cprofile)
+            paths['pstats'] = os.path.join(outdir, "profile.pstats")
+            stats.dump_stats(paths['pstats'])
+            paths['collapsed'] = os.path.join(outdir, "stacks.collapsed")
+            with open(paths['collapsed'], "w", encoding="utf-8") as fh:
+                for stack, micros in collapse_pstats(stats):
+                    fh.write(f"{stack} {micros}\n")
+        if self._pyinstrument is not None:
+            paths['pyinstrument'] = os.path.join(outdir, "pyinstrument.html")
+            with open(paths['pyinstrument'], "w", encoding="utf-8") as fh:
+                fh.write(self._pyinstrument.output_html())
+        return paths
+
+    def format_summary(self, top: int = 15) -> str:
+        """Tabla de texto con las etapas más costosas"""
+        lines = [f"{'etapa':<24}{'n':>8}{'total ms':>12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"]
+        for name, s in list(self.stage_summary().items())[:top]:
+            lines.append(f"{name:<24}{s['count']:>8}{s['total_ms']:>12.1f}"
+                         f"{s['p50_ms']:>10.3f}{s['p95_ms']:>10.3f}{s['p99_ms']:>10.3f}")
+        return "\n".join(lines)
+
+
+# ============================================================================
+# 🔥 PILAS COLAPSADAS (formato flamegraph.pl / speedscope)
+# ============================================================================
+
+def _frame_label(func: Tuple[str, int, str]) -> str:
+    filename, line, name = func
+    if filename == "~":  # Builtins: ('~', 0, "<built-in method ...>")
+        return name
+    return f"{os.path.basename(filename)}:{name}:{line}"
+
+
+def collapse_pstats(stats: pstats.Stats, min_us: int = 1, max_depth: int = 64) -> List[Tuple[str, int]]:
+    """
+    Pilas `a;b;c micros` reconstruidas desde el grafo caller→callee de cProfile
+
+    cProfile solo guarda aristas, no pilas completas: el tiempo de cada función
+    se reparte entre sus llamadores en proporción al tiempo acumulado de cada
+    arista. Es la misma aproximación de flameprof; las recursiones se cortan.
+    """
+    entries = stats.stats
+    children: Dict[Any, List[Tuple[Any, float]]] = {}
+    for func, (_, _, _, _, callers) in entries.items():
+        for caller, edge in callers.items():
+            children.setdefault(caller, []).append((func, edge[3]))
+    roots = [func for func, (_, _, _, _, callers) in entries.items()
+             if not any(caller in entries for caller in callers)]
+
+    folded: Dict[str, float] = {}
+
+    def walk(func, path: Tuple[str, ...], on_path: frozenset, weight: float):
+        _, _, tt, ct, _ = entries[func]
+        if ct <= 0:
+            return
+        scale = min(1.0, weight / ct)
+        path = path + (_frame_label(func),)
+        self_time = tt * scale
+        if self_time > 0:
+            key = ";".join(path)
+            folded[key] = folded.get(key, 0.0) + self_time
+        if len(path) >= max_depth:
+            return
+        on_path = on_path | {func}
+        for child, edge_ct in children.get(func, ()):
+            if child not in on_path and edge_ct * scale * _US >= min_us:
+                walk(child, path, on_path, edge_ct * scale)
+
+    for root in roots:
+        walk(root, (), frozenset(), entries[root][3])
+
+    rows = [(stack, int(round(seconds * _US))) for stack, seconds in folded.items()]
+    return sorted((r for r in rows if r[1] >= min_us), key=lambda r: -r[1])
+
+
+# ============================================================================
+# Profiler global del proceso
+# ============================================================================
+
+_profiler = StageProfiler()
+
+
+def get_profiler() -> StageProfiler:
+    """Profiler global (deshabilitado hasta enable())"""
+    return _profiler
+
+
+def stage(name: str):
+    """Medir una etapa con el profiler global: `with stage("fingerprint"): ...`"""
+    return _profiler.stage(name) if _profiler.enabled else _NULL_STAGE
+
+
+def timed(name: Optional[str] = None) -> Callable:
+    """Decorador sobre el profiler global"""
+    return _profiler.timed(name)
+
+
+# ============================================================================
+# 🖥️ INTEGRACIÓN CLI (--profile)
+# ============================================================================
+
+def add_profile_arguments(parser) -> None:
+    """Agregar --profile y opciones de muestreo a un (sub)parser argparse"""
+    parser.add_argument("--profile", action="store_true",
+                        help="Medir etapas y escribir histogramas en <out>/profile/")
+    parser.add_argument("--profile-sample", dest="profile_sample", type=int, default=0,
+                        help="Perfilar 1 de cada N productos (0 = solo timers)")
+    parser.add_argument("--profile-limit", dest="profile_limit", type=int, default=50,
+                        help="Máximo de productos perfilados")
+    parser.add_argument("--profiler", choices=["cprofile", "pyinstrument"], default="cprofile",
+                        help="Backend para los productos muestreados")
+
+
+def enable_from_args(args) -> bool:
+    """Habilitar el profiler global según los flags; retorna si quedó activo"""
+    if not getattr(args, "profile", False):
+        return False
+    _profiler.reset()
+    _profiler.enable(args.profile_sample, args.profile_limit, args.profiler)
+    return True
+
+
+def write_profile(outdir: str) -> Dict[str, str]:
+    """Escribir el reporte del profiler global en <outdir>/profile e imprimir el resumen"""
+    paths = _profiler.write_report(os.path.join(outdir, "profile"))
+    print(_profiler.format_summary())
+    for kind, path in paths.items():
+        print(f"[OK] Profile {kind}: {path}")
+    return paths
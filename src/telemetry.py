@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+📡 Registro unificado de métricas (formato de exposición Prometheus/OpenMetrics)
+
+Contadores, gauges e histogramas en memoria con costo de O(1) por evento, más
+collectors que leen los `stats` de cada componente (cache L1, rate limiter,
+cache semántico, escritor de métricas a BD) solo cuando se consulta /metrics.
+El endpoint HTTP es opcional: se levanta con METRICS_PORT o start_http_server().
+"""
+
+import logging
+import math
+import os
+import threading
+import weakref
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Segundos: de cache hits (ms) a requests LLM lentos
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# Lo que produce un collector: (nombre, tipo, ayuda, [(labels, valor), ...])
+Sample = Tuple[Dict[str, str], float]
+Family = Tuple[str, str, str, List[Sample]]
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if value != value:
+        return "NaN"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, Any]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+class _Metric:
+    """Familia de métricas con hijos por combinación de labels"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self._new_child()
+            self._children[()] = self._default
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values, **kwargs):
+        """Hijo para los valores de labels (posicionales o por nombre)"""
+        if kwargs:
+            values = tuple(kwargs[name] for name in self.labelnames)
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name}: se esperaban labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        raise NotImplementedError
+
+
+class _Value:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        self.value = float(value)
+
+
+class Counter(_Metric):
+    """Contador monótono"""
+
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0):
+        self._default.inc(amount)
+
+    def _samples(self):
+        return [(self.name + "_total", dict(zip(self.labelnames, key)), child.value)
+                for key, child in list(self._children.items())]
+
+
+class Gauge(_Metric):
+    """Valor instantáneo (set/inc/dec)"""
+
+    kind = "gauge"
+
+    def _new_child(self):
+        return _Value()
+
+    def set(self, value: float):
+        self._default.set(value)
+
+    def inc(self, amount: float = 1.0):
+        self._default.inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self._default.dec(amount)
+
+    def _samples(self):
+        return [(self.name, dict(zip(self.labelnames, key)), child.value)
+                for key, child in list(self._children.items())]
+
+
+class _HistogramValue:
+    __slots__ = ("bounds", "counts", "sum", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        i = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+
+class Histogram(_Metric):
+    """Histograma con buckets fijos (cumulativos al exponer)"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.bounds = tuple(sorted(float(b) for b in buckets if b != math.inf))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramValue(self.bounds)
+
+    def observe(self, value: float):
+        self._default.observe(value)
+
+    def _samples(self):
+        samples = []
+        for key, child in list(self._children.items()):
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.bounds + (math.inf,), child.counts):
+                cumulative += count
+                samples.append((self.name + "_bucket", {**labels, "le": _format_value(bound)}, cumulative))
+            samples.append((self.name + "_sum", labels, child.sum))
+            samples.append((self.name + "_count", labels, cumulative))
+        return samples
+
+
+class MetricsRegistry:
+    """Registro de métricas + collectors evaluados al exponer"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Tuple[Callable, Optional[weakref.ref]]] = []
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, documentation: str, labelnames: Sequence[str], **kwargs):
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(name)
+                if metric is None:
+                    metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+        if not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+            raise ValueError(f"Métrica {name} ya registrada con otro tipo o labels")
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def register_collector(self, collect: Callable[..., Iterable[Family]], owner: Any = None):
+        """
+        Registrar un collector evaluado en cada scrape
+
+        Con `owner` se guarda una referencia débil y se llama collect(owner);
+        cuando el objeto se libera el collector se descarta solo.
+        """
+        ref = weakref.ref(owner) if owner is not None else None
+        with self._lock:
+            self._collectors.append((collect, ref))
+
+    def collect(self) -> List[Tuple[str, str, str, List[Tuple[str, Dict[str, str], float]]]]:
+        """
+        Familias listas para exponer: (nombre, tipo, ayuda, [(muestra, labels, valor)])
+
+        Las filas de collectors con el mismo nombre y labels se suman (p.ej. dos
+        instancias de cache L1 en el mismo proceso). Un collector que falla se omite.
+        """
+        families: Dict[str, Tuple[str, str, str, Dict[Tuple, list]]] = {}
+        for metric in list(self._metrics.values()):
+            rows = {(n, tuple(labels.items())): [n, labels, v] for n, labels, v in metric._samples()}
+            families[metric.name] = (metric.name, metric.kind, metric.documentation, rows)
+        dead = []
+        for entry in list(self._collectors):
+            collect, ref = entry
+            owner = ref() if ref is not None else None
+            if ref is not None and owner is None:
+                dead.append(entry)
+                continue
+            try:
+                produced = list(collect(owner) if ref is not None else collect())
+            except Exception as e:
+                logger.debug(f"Collector de métricas falló: {e}")
+                continue
+            for name, kind, documentation, samples in produced:
+                family = families.setdefault(name, (name, kind, documentation, {}))
+                sample_name = name + "_total" if kind == "counter" else name
+                for labels, value in samples:
+                    key = (sample_name, tuple(labels.items()))
+                    row = family[3].get(key)
+                    if row is None:
+                        family[3][key] = [sample_name, labels, value]
+                    else:
+                        row[2] += value
+        if dead:
+            with self._lock:
+                self._collectors[:] = [c for c in self._collectors if c not in dead]
+        return [(name, kind, doc, [tuple(r) for r in rows.values()])
+                for name, kind, doc, rows in families.values()]
+
+    def render(self) -> str:
+        """Texto en formato de exposición Prometheus 0.0.4"""
+        lines = []
+        for name, kind, documentation, samples in self.collect():
+            if kind == "counter":
+                name += "_total"
+            lines.append(f"# HELP {name} {_escape(documentation)}")
+            lines.append(f"# TYPE {name} {kind}")
+            for sample_name, labels, value in samples:
+                lines.append(f"{sample_name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# ============================================================================
+# Registro global y endpoint HTTP
+# ============================================================================
+
+_registry = MetricsRegistry()
+_server: Optional[ThreadingHTTPServer] = None
+
+
+def get_registry() -> MetricsRegistry:
+    """Registro global del proceso"""
+    return _registry
+
+
+def start_http_server(port: int, addr: str = "0.0.0.0",
+                      registry: Optional[MetricsRegistry] = None) -> ThreadingHTTPServer:
+    """Servir GET /metrics en un hilo daemon; retorna el servidor (server_address tiene el puerto real)"""
+    registry = registry or _registry
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((addr, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    logger.info(f"📡 Métricas en http://{addr}:{server.server_address[1]}/metrics")
+    return server
+
+
+def serve_from_env() -> Optional[ThreadingHTTPServer]:
+    """Levantar /metrics si METRICS_PORT está definido (una sola vez por proceso)"""
+    global _server
+    port = os.getenv("METRICS_PORT")
+    if _server is None and port:
+        try:
+            _server = start_http_server(int(port), os.getenv("METRICS_ADDR", "0.0.0.0"))
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ No se pudo levantar /metrics en puerto {port}: {e}")
+    return _server
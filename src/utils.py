@@ -1,41 +1,111 @@
 from __future__ import annotations
 import re
-from typing import Optional
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
 _CLP_RX = re.compile(r"[^\d,\.]")
 
+# Los textos de precio se repiten muchísimo entre productos ("$129.990"): se
+# memoiza el resultado por texto crudo. La memo se vacía al llegar al límite
+# para acotar memoria en corridas largas.
+_PRICE_MEMO: Dict[str, Optional[int]] = {}
+_PRICE_MEMO_LIMIT = 50_000
+_MISSING = object()
+
+PRICE_KEYS_PREF = [
+    # prefer order for "current"
+    ("card_price", "card_price_text"),
+    ("normal_price", "normal_price_text"),
+    ("ripley_price", "ripley_price_text"),
+]
+ORIGINAL_PRICE_KEYS = ("original_price", "original_price_text", "normal_price", "normal_price_text")
+
+def _parse_price_text(value: str) -> Optional[int]:
+    s = value.strip()
+    if not s:
+        return None
+    s = _CLP_RX.sub("", s)
+    if not s:
+        return None
+    # Caso típico: 1.299.990 o 1299990
+    # Eliminamos separadores y mantenemos dígitos
+    s = s.replace(".", "").replace(",", "")
+    try:
+        price = int(s)
+    except Exception:
+        return None
+    if price < 1 or price > 100_000_000:
+        return None
+    return price
+
+def _parse_price_str(value: str) -> Optional[int]:
+    price = _PRICE_MEMO.get(value, _MISSING)
+    if price is _MISSING:
+        if len(_PRICE_MEMO) >= _PRICE_MEMO_LIMIT:
+            _PRICE_MEMO.clear()
+        price = _PRICE_MEMO[value] = _parse_price_text(value)
+    return price
+
 def parse_price(value) -> Optional[int]:
     """Parsea precios chilenos con miles '.' y decimales ',' o enteros.
     Retorna CLP como entero o None.
     Valida que el precio esté en rango razonable para retail chileno.
+    Los textos se memoizan; los campos ya numéricos no pasan por la regex.
     """
+    cls = type(value)
+    if cls is str:
+        return _parse_price_str(value)
+    if cls is int:
+        # Camino rápido: card_price/normal_price ya vienen como entero
+        return value if 1 <= value <= 100_000_000 else None
     if value is None:
         return None
     if isinstance(value, (int, float)):
         price = int(round(float(value)))
     elif isinstance(value, str):
-        s = value.strip()
-        if not s:
-            return None
-        s = _CLP_RX.sub("", s)
-        if not s:
-            return None
-        # Caso típico: 1.299.990 o 1299990
-        # Eliminamos separadores y mantenemos dígitos
-        s = s.replace(".", "").replace(",", "")
-        try:
-            price = int(s)
-        except Exception:
-            return None
+        return _parse_price_str(str(value))
     else:
         return None
-    
+
     # Validar rango de precios razonables (1 CLP a 100 millones CLP)
     if price < 1 or price > 100_000_000:
         return None
-    
+
     return price
 
+def parse_prices(values: Iterable[Any]) -> List[Optional[int]]:
+    """parse_price vectorizado para ingesta por lotes: cada texto distinto se
+    parsea una sola vez y el resultado queda en la memo compartida."""
+    memo = _PRICE_MEMO
+    out: List[Optional[int]] = []
+    append = out.append
+    for value in values:
+        if type(value) is str:
+            price = memo.get(value, _MISSING)
+            append(_parse_price_str(value) if price is _MISSING else price)
+        else:
+            append(parse_price(value))
+    return out
+
+def pick_price(item: Dict[str, Any]) -> Tuple[Optional[int], Optional[int]]:
+    """(precio actual, precio original) desde las llaves conocidas del scraper"""
+    # current
+    current = None
+    for numk, textk in PRICE_KEYS_PREF:
+        if numk in item:
+            current = parse_price(item.get(numk))
+        if current is None and textk in item:
+            current = parse_price(item.get(textk))
+        if current is not None:
+            break
+    # original
+    original = None
+    for k in ORIGINAL_PRICE_KEYS:
+        val = parse_price(item.get(k))
+        if val:
+            original = val
+            break
+    return current, original
+
 def slugify(text: str) -> str:
     t = text.lower().strip()
     t = re.sub(r"\s+", " ", t)
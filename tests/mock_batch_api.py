@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 Mock local de OpenAI Batch API (aiohttp)
+===========================================
+POST /v1/files, POST/GET /v1/batches, GET /v1/batches/{id}, GET /v1/files/{id}/content.
+Los batches completan tras `complete_after` polls; las respuestas se generan desde
+los prompts (simples y empaquetados) y se cuentan por producto para detectar dobles.
+"""
+
+import json
+import re
+from collections import Counter
+from typing import Dict, Optional, Set
+
+from aiohttp import web
+
+_SINGLE_RE = re.compile(r"^Normaliza: (.*) \[")
+_PACKED_LINE_RE = re.compile(r"^(\d+)\|([^|]*)\|")
+
+
+class MockBatchAPI:
+    """Estado en memoria del servidor mock"""
+
+    def __init__(self, complete_after: int = 1, fail_batches: int = 0,
+                 drop_once: Optional[Set[str]] = None, fail_requests: int = 0):
+        """
+        Args:
+            complete_after: Polls necesarios para que un batch complete
+            fail_batches: Cuántos batches terminan en 'failed' antes de completar
+            drop_once: Nombres omitidos en la primera respuesta (items faltantes)
+            fail_requests: Cuántos batches completan con todas sus requests
+                fallidas (output_file_id null, solo error_file_id)
+        """
+        self.complete_after = complete_after
+        self.fail_batches = fail_batches
+        self.drop_once = set(drop_once or ())
+        self.fail_requests = fail_requests
+        self.files: Dict[str, str] = {}
+        self.batches: Dict[str, Dict] = {}
+        self.processed: Counter = Counter()
+        self.polls = 0
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/v1/files", self.post_file)
+        app.router.add_get("/v1/files/{file_id}/content", self.get_file_content)
+        app.router.add_post("/v1/batches", self.post_batch)
+        app.router.add_get("/v1/batches", self.list_batches)
+        app.router.add_get("/v1/batches/{batch_id}", self.get_batch)
+        return app
+
+    # ------------------------------------------------------------ handlers
+
+    async def post_file(self, request: web.Request) -> web.Response:
+        form = await request.post()
+        file_id = f"file-{len(self.files) + 1}"
+        self.files[file_id] = form["file"].file.read().decode("utf-8")
+        return web.json_response({"id": file_id, "purpose": form.get("purpose")})
+
+    async def get_file_content(self, request: web.Request) -> web.Response:
+        content = self.files.get(request.match_info["file_id"])
+        if content is None:
+            return web.json_response({"error": "not found"}, status=404)
+        return web.Response(text=content)
+
+    async def post_batch(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        if body.get("input_file_id") not in self.files:
+            return web.json_response({"error": "input file not found"}, status=400)
+        batch_id = f"batch-{len(self.batches) + 1}"
+        self.batches[batch_id] = {
+            "id": batch_id,
+            "status": "validating",
+            "input_file_id": body["input_file_id"],
+            "metadata": body.get("metadata") or {},
+            "output_file_id": None,
+            "error_file_id": None,
+            "_polls": 0,
+        }
+        return web.json_response(self._public(self.batches[batch_id]))
+
+    async def list_batches(self, request: web.Request) -> web.Response:
+        data = [self._public(b) for b in reversed(list(self.batches.values()))]
+        return web.json_response({"data": data, "has_more": False})
+
+    async def get_batch(self, request: web.Request) -> web.Response:
+        batch = self.batches.get(request.match_info["batch_id"])
+        if batch is None:
+            return web.json_response({"error": "not found"}, status=404)
+        self.polls += 1
+        batch["_polls"] += 1
+        if batch["status"] not in ("completed", "failed") and batch["_polls"] >= self.complete_after:
+            if self.fail_batches:
+                self.fail_batches -= 1
+                batch["status"] = "failed"
+            elif self.fail_requests:
+                self.fail_requests -= 1
+                batch["error_file_id"] = self._fail_all(batch["input_file_id"])
+                batch["status"] = "completed"
+            else:
+                batch["output_file_id"] = self._run(batch["input_file_id"])
+                batch["status"] = "completed"
+        elif batch["status"] == "validating":
+            batch["status"] = "in_progress"
+        return web.json_response(self._public(batch))
+
+    # ------------------------------------------------------------- helpers
+
+    def _public(self, batch: Dict) -> Dict:
+        return {k: v for k, v in batch.items() if not k.startswith("_")}
+
+    def _fail_all(self, input_file_id: str) -> str:
+        """Todas las requests del batch con error: solo archivo de errores"""
+        out = []
+        for line in self.files[input_file_id].splitlines():
+            req = json.loads(line)
+            error = {"message": "model overloaded", "type": "server_error"}
+            out.append(json.dumps({"custom_id": req["custom_id"],
+                                   "response": {"status_code": 500, "body": {"error": error}}}))
+        file_id = f"file-{len(self.files) + 1}"
+        self.files[file_id] = "\n".join(out) + "\n"
+        return file_id
+
+    def _run(self, input_file_id: str) -> str:
+        """Ejecutar el batch: una línea de salida por request de entrada"""
+        out = []
+        for line in self.files[input_file_id].splitlines():
+            req = json.loads(line)
+            content = req["body"]["messages"][-1]["content"]
+            body = {"model": req["body"]["model"],
+                    "usage": {"prompt_tokens": 50, "completion_tokens": 20, "total_tokens": 70}}
+            single = _SINGLE_RE.match(content)
+            if single:
+                name = single.group(1)
+                self.processed[name] += 1
+                message = {"brand": "MOCK", "model": name}
+            else:
+                items = []
+                for m in (_PACKED_LINE_RE.match(l) for l in content.splitlines()[1:]):
+                    if not m:
+                        continue
+                    name = m.group(2)
+                    if name in self.drop_once:
+                        self.drop_once.discard(name)
+                        continue
+                    self.processed[name] += 1
+                    items.append({"i": int(m.group(1)), "brand": "MOCK", "model": name})
+                message = {"items": items}
+            body["choices"] = [{"message": {"content": json.dumps(message)}}]
+            out.append(json.dumps({"custom_id": req["custom_id"],
+                                   "response": {"status_code": 200, "body": body}}))
+        file_id = f"file-{len(self.files) + 1}"
+        self.files[file_id] = "\n".join(out) + "\n"
+        return file_id
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 Tests para el esquema declarativo de atributos
+=================================================
+Valida que extracción (enrich.extract_attributes), validación (StrictValidator)
+y la tabla attributes_schema salgan del mismo configs/attribute_schema.json
+"""
+
+import json
+import os
+
+import pytest
+
+import src.attribute_schema as attribute_schema
+from src.attribute_schema import AttributeSchema, SchemaError, get_attribute_schema
+from src.enrich import extract_attributes
+from src.gpt5.validator import StrictValidator
+
+TABLETS = {
+    "categories": {
+        "tablets": {
+            "attributes": [
+                {"name": "storage", "type": "string", "required": True,
+                 "extract": {"size": ["GB", "TB"]}, "validate": {"pattern": "^\\d+ ?[GT]B$"}},
+                {"name": "screen_size", "type": "float",
+                 "extract": {"regex": "(\\d{1,2}(?:\\.\\d)?)\\s*\"", "cast": "float", "output": "screen_size_in"},
+                 "validate": {"range": [7, 14]}},
+                {"name": "connectivity", "type": "enum:WiFi,LTE",
+                 "extract": {"keywords": {"lte": "LTE", "wifi": "WiFi"}},
+                 "validate": {"enum": ["WiFi", "LTE"]}},
+            ]
+        }
+    }
+}
+
+GOLDEN_PATH = os.path.join(os.path.dirname(__file__), "fixtures", "extract_attributes_golden.json")
+with open(GOLDEN_PATH, encoding="utf-8") as f:
+    GOLDEN = json.load(f)
+
+
+class TestExtraction:
+    """🔎 extract_attributes desde el plan compilado"""
+
+    @pytest.mark.parametrize("name, category, expected", [
+        ("Samsung Galaxy A55 5G 256GB Azul 6.6\"", "smartphones",
+         {"capacity": "256 GB", "color": "azul", "network": "5G"}),
+        ("iPhone 15 Pro 1TB Titanio Negro", "smartphones", {"capacity": "1 TB", "color": "negro"}),
+        ("Notebook Lenovo IdeaPad 15.6\" 16GB RAM 512GB SSD", "notebooks",
+         {"screen_size_in": 15.6, "ram": "16 GB", "storage": "512 GB"}),
+        ("Notebook HP 14\" 8GB 1TB", "notebooks", {"screen_size_in": 14.0, "ram": "8 GB", "storage": "1 TB"}),
+        ("Smart TV LG 55 pulgadas OLED 4K", "smart_tv", {"screen_size_in": 55.0, "panel": "4K"}),
+        ("Perfume Good Girl EDP 80 ml Mujer", "perfumes",
+         {"volume_ml": 80, "concentration": "EDP", "gender": "Mujer"}),
+        ("Silla Gamer 128GB", "muebles", {}),
+    ])
+    def test_golden_names(self, name, category, expected):
+        """✅ Mismos atributos (y en el mismo orden) que las reglas por categoría originales"""
+        attrs = extract_attributes(name, category)
+        assert attrs == expected
+        assert list(attrs) == list(expected)
+
+    @pytest.mark.parametrize("case", GOLDEN, ids=lambda c: f"{c['category']}:{c['name'][:40]}")
+    def test_golden_corpus(self, case):
+        """✅ Corpus dorado: salida (y orden de claves) idéntica a las reglas por separado"""
+        attrs = extract_attributes(case["name"], case["category"])
+        assert attrs == case["attributes"]
+        assert list(attrs) == list(case["attributes"])
+
+    @pytest.mark.parametrize("name, category, expected", [
+        ("Galaxy A15 128  GB\tnegro", "smartphones", {"capacity": "128 GB", "color": "negro"}),  # \s* entre palabras
+        ("GB 128 Azul", "smartphones", {"color": "azul"}),                                      # unidad sin número
+        ("Notebook 8gb 256gb 1tb", "notebooks", {"ram": "8 GB", "storage": "256 GB"}),
+        ("Notebook 8gb 1tb", "notebooks", {"ram": "8 GB", "storage": "1 TB"}),                  # GB antes que TB
+        ('TV 1234" 4K', "smart_tv", {"screen_size_in": 234.0, "panel": "4K"}),
+        ("Perfume 12345ml xEDP EDT", "perfumes", {"volume_ml": 2345, "concentration": "EDT"}),
+        ("Perfume İEDP", "perfumes", {}),                                                       # \b sobre el original
+    ])
+    def test_token_edge_cases(self, name, category, expected):
+        """✅ Bordes de la pasada por palabras equivalentes a las regex sobre el texto completo"""
+        assert extract_attributes(name, category) == expected
+
+    def test_words_analyzed_once(self, monkeypatch):
+        """✅ Cada palabra distinta se analiza una vez; la memo queda acotada"""
+        plan = AttributeSchema.load().category("smartphones")
+        calls = []
+        analyze = plan._analyze
+        monkeypatch.setattr(plan, "_analyze", lambda word: calls.append(word) or analyze(word))
+        for _ in range(3):
+            assert plan.extract("Samsung Galaxy A55 256 GB Azul") == {"capacity": "256 GB", "color": "azul"}
+        assert sorted(calls) == sorted(["samsung", "galaxy", "a55", "256", "gb", "azul"])
+
+        monkeypatch.setattr(attribute_schema, "_MEMO_LIMIT", 4)
+        for i in range(60, 80):
+            assert plan.extract(f"Modelo{i} {i}0GB Negro") == {"capacity": f"{i}0 GB", "color": "negro"}
+        assert len(plan._memo) <= 4
+
+    def test_compiled_once(self):
+        """✅ El esquema por defecto se compila una sola vez por proceso"""
+        assert get_attribute_schema() is get_attribute_schema()
+
+
+class TestSharedPlan:
+    """🧩 Extracción, validación y BD desde el mismo esquema"""
+
+    def test_validator_uses_schema(self):
+        """✅ StrictValidator toma required/optional/types/reglas del esquema"""
+        validator = StrictValidator()
+        schema = validator.attribute_schemas["smartphones"]
+        assert schema["required"] == ["capacity", "color"]
+        assert schema["types"]["network"] == "enum:4G,5G"
+        assert schema["validators"]["capacity"]("256gb") is True
+        assert schema["validators"]["screen_size"]("") is True
+        assert validator.attribute_schemas["perfumes"]["validators"]["volume_ml"]("1000") is False
+        assert validator.default_schema["optional"] == ["size", "color", "material", "weight", "dimensions"]
+
+    def test_new_category_without_code(self, tmp_path):
+        """✅ Una categoría nueva en el JSON extrae y valida sin tocar código"""
+        (tmp_path / "attribute_schema.json").write_text(json.dumps(TABLETS), encoding="utf-8")
+        schema = AttributeSchema.load(str(tmp_path / "attribute_schema.json"))
+        attrs = schema.extract('iPad Air 11" 256GB WiFi', "tablets")
+        assert attrs == {"storage": "256 GB", "screen_size_in": 11.0, "connectivity": "WiFi"}
+
+        validator = StrictValidator(config_path=str(tmp_path))
+        valid, cleaned, errors = validator.validate_attributes(
+            {"storage": "256 GB", "screen_size": "11", "connectivity": "5G"}, "tablets")
+        assert valid and cleaned == {"storage": "256 GB", "screen_size": 11.0}
+        assert errors == ["Invalid connectivity: 5G"]
+
+    def test_db_rows(self):
+        """✅ Filas de attributes_schema con tipo de BD, requerido y reglas"""
+        rows = {(r[0], r[1]): r for r in get_attribute_schema().db_rows()}
+        _, _, attr_type, required, _, order, rules = rows[("perfumes", "volume_ml")]
+        assert (attr_type, required, order) == ("number", True, 0)
+        assert json.loads(rules) == {"range": [5, 500], "cast": "int"}
+        assert rows[("smart_tv", "panel")][2] == "string"
+
+    @pytest.mark.parametrize("attribute", [
+        {"name": "x", "extract": {"xpath": "//x"}},
+        {"name": "x", "validate": {"between": [1, 2]}},
+        {"name": "x", "extract": {"regex": "(\\d+", "cast": "int"}},
+    ])
+    def test_invalid_schema_fails_at_compile(self, attribute):
+        """✅ Specs desconocidas o regex rotas fallan al compilar, no por producto"""
+        with pytest.raises(SchemaError):
+            AttributeSchema({"categories": {"c": {"attributes": [attribute]}}})
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
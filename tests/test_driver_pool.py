@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 Tests para el pool de WebDrivers de los scrapers continuos
+=============================================================
+Valida que el pool reutilice el navegador entre búsquedas, lo recicle al
+llegar a max_pages, reemplace drivers que no pasan el health check y cierre
+todo al terminar (con drivers falsos, sin selenium)
+"""
+
+import threading
+
+import pytest
+
+from Scrappers.driver_pool import DriverPool, driver_is_alive
+
+
+class FakeDriver:
+    """Driver mínimo: responde execute_script mientras esté vivo"""
+
+    def __init__(self, n):
+        self.n = n
+        self.alive = True
+        self.quit_calls = 0
+
+    def execute_script(self, script):
+        if not self.alive:
+            raise RuntimeError("chrome not reachable")
+        return 1
+
+    def quit(self):
+        self.quit_calls += 1
+        self.alive = False
+
+
+@pytest.fixture
+def factory():
+    started = []
+
+    def make():
+        driver = FakeDriver(len(started))
+        started.append(driver)
+        return driver
+
+    make.started = started
+    return make
+
+
+def scrape_pages(pool, pages):
+    used = []
+    for _ in range(pages):
+        with pool.page() as driver:
+            used.append(driver.n)
+    return used
+
+
+class TestReuse:
+    """♻️ Reutilización y reciclaje"""
+
+    def test_shared_across_searches(self, factory):
+        """✅ 3 búsquedas x 5 páginas con un solo Chrome"""
+        with DriverPool(factory, max_pages=40) as pool:
+            for _ in range(3):
+                assert scrape_pages(pool, 5) == [0] * 5
+            assert pool.get_stats()["pages"] == 15
+        assert len(factory.started) == 1
+        assert factory.started[0].quit_calls == 1
+
+    def test_recycle_after_max_pages(self, factory):
+        """✅ Un driver nuevo cada max_pages páginas, el anterior se cierra"""
+        with DriverPool(factory, max_pages=4) as pool:
+            assert scrape_pages(pool, 10) == [0] * 4 + [1] * 4 + [2] * 2
+            assert pool.get_stats()["recycled"] == 2
+        assert [d.quit_calls for d in factory.started] == [1, 1, 1]
+
+    def test_invalid_config(self, factory):
+        """✅ size y max_pages deben ser positivos"""
+        with pytest.raises(ValueError):
+            DriverPool(factory, size=0)
+        with pytest.raises(ValueError):
+            DriverPool(factory, max_pages=0)
+
+
+class TestHealth:
+    """🩺 Health check"""
+
+    def test_failed_page_triggers_check(self, factory):
+        """✅ Si la página falla y el navegador murió, se reemplaza antes de reusarlo"""
+        pool = DriverPool(factory)
+        with pytest.raises(RuntimeError):
+            with pool.page() as driver:
+                driver.alive = False
+                driver.execute_script("window.scrollTo(0, 1)")
+        assert scrape_pages(pool, 2) == [1, 1]
+        assert pool.get_stats()["unhealthy"] == 1
+        pool.close()
+
+    def test_failed_page_healthy_driver_kept(self, factory):
+        """✅ Un error de página con el navegador sano no descarta el driver"""
+        pool = DriverPool(factory)
+        with pytest.raises(ValueError):
+            with pool.page():
+                raise ValueError("selector no encontrado")
+        assert scrape_pages(pool, 1) == [0]
+        assert pool.get_stats()["unhealthy"] == 0
+        pool.close()
+
+    def test_idle_driver_checked(self, factory):
+        """✅ Un driver ocioso más de idle_check_s se revisa antes de entregarse"""
+        checks = []
+        pool = DriverPool(factory, idle_check_s=0.0, health_check=lambda d: checks.append(d.n) or driver_is_alive(d))
+        scrape_pages(pool, 1)
+        factory.started[0].alive = False
+        assert scrape_pages(pool, 1) == [1]
+        assert checks == [0]
+        pool.close()
+
+
+class TestConcurrency:
+    """🧵 Varios slots"""
+
+    def test_size_bounds_drivers(self, factory):
+        """✅ Con size=2 y 4 hilos nunca hay más de 2 navegadores vivos"""
+        pool = DriverPool(factory, size=2, max_pages=100)
+        barrier = threading.Barrier(2)
+        peak = []
+
+        def worker():
+            for _ in range(5):
+                with pool.page():
+                    peak.append(pool.get_stats()["alive"])
+                    try:
+                        barrier.wait(timeout=0.05)
+                    except threading.BrokenBarrierError:
+                        pass
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        pool.close()
+        assert len(factory.started) <= 2 and max(peak) <= 2
+        assert pool.get_stats()["pages"] == 20
+
+    def test_acquire_timeout_and_closed(self, factory):
+        """✅ Sin slots libres acquire respeta el timeout; cerrado ya no entrega drivers"""
+        pool = DriverPool(factory, size=1)
+        slot = pool.acquire()
+        with pytest.raises(TimeoutError):
+            pool.acquire(timeout=0.01)
+        pool.close()
+        pool.release(slot)
+        assert slot.driver.quit_calls == 1
+        with pytest.raises(RuntimeError):
+            pool.acquire()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 Tests para fingerprint / product_id versionados
+==================================================
+Valida que v1 reproduzca exactamente los ids SHA-1 históricos, que v2 derive
+ambos ids del mismo buffer canónico y que lotes y mapeo de migración den lo
+mismo que el camino escalar
+"""
+
+import hashlib
+
+import pytest
+
+import src.fingerprint as fingerprint
+from src.fingerprint import (FingerprintKey, fingerprint_batch, hash_id, id_version, migration_rows,
+                             product_fingerprint, product_ids, product_ids_batch, set_default_version)
+
+PRODUCTS = [
+    {"brand": "Samsung", "category": "smartphones", "model": "Galaxy A55 5G",
+     "attributes": {"capacity": "256 GB", "color": "azul", "screen_size_in": 6.6}},
+    {"brand": "LG", "category": "smart_tv", "model": None, "name": "LG OLED55 4K",
+     "attributes": {"screen_size_in": 55.0, "panel": "OLED"}},
+    {"brand": "Dior", "category": "perfumes", "model": "Sauvage Édition", "attributes": {"volume_ml": 100}},
+    {"brand": "Lenovo", "category": "notebooks", "attributes": {}},
+]
+
+
+def legacy_fingerprint(prod):
+    """product_fingerprint antes del buffer canónico compartido"""
+    base = "|".join([
+        prod.get("brand", ""),
+        prod.get("category", ""),
+        (prod.get("model") or prod.get("name", "")),
+        str(prod.get("attributes", {}).get("capacity", "")),
+        str(prod.get("attributes", {}).get("volume_ml", "")),
+        str(prod.get("attributes", {}).get("screen_size_in", "")),
+    ])
+    return hashlib.sha1(base.encode("utf-8")).hexdigest()
+
+
+@pytest.fixture(autouse=True)
+def default_v1(monkeypatch):
+    monkeypatch.delenv("FINGERPRINT_VERSION", raising=False)
+    set_default_version(None)
+    yield
+    set_default_version(None)
+
+
+class TestVersions:
+    """🔑 v1 histórico y v2 BLAKE2b"""
+
+    @pytest.mark.parametrize("prod", PRODUCTS)
+    def test_v1_matches_legacy(self, prod):
+        """✅ v1 (por defecto) reproduce el fingerprint y product_id SHA-1 de siempre"""
+        parts = ["Falabella", prod["brand"], prod.get("model"), prod["category"], 129990]
+        assert product_fingerprint(prod) == legacy_fingerprint(prod)
+        assert product_ids(prod, parts) == (
+            legacy_fingerprint(prod), hashlib.sha1("|".join(str(x) for x in parts).encode("utf-8")).hexdigest())
+        assert hash_id(["Ripley", "abc"]) == hashlib.sha1(b"Ripley|abc").hexdigest()
+
+    def test_v2_shape(self):
+        """✅ v2: 128 bits con prefijo, product_id distinto por partes del listing"""
+        prod = PRODUCTS[0]
+        fp = product_fingerprint(prod, "v2")
+        canonical = "Samsung|smartphones|Galaxy A55 5G|256 GB||6.6".encode("utf-8")
+        assert fp == "v2:" + hashlib.blake2b(canonical, digest_size=16).hexdigest()
+        assert len(fp) == 35 and id_version(fp) == "v2"
+        assert id_version(legacy_fingerprint(prod)) == "v1"
+
+        key = FingerprintKey(prod, "v2")
+        assert key.fingerprint == fp
+        pid = key.product_id(["Falabella", "Samsung"])
+        assert pid == "v2:" + hashlib.blake2b(canonical + b"\x1eFalabella|Samsung", digest_size=16).hexdigest()
+        assert key.product_id(["Paris", "Samsung"]) != pid
+        assert key.product_id(["Falabella", "Samsung"]) == pid  # el estado del fingerprint no se consume
+
+    def test_default_from_env(self, monkeypatch):
+        """✅ FINGERPRINT_VERSION elige la versión; valores desconocidos fallan"""
+        monkeypatch.setenv("FINGERPRINT_VERSION", "V2")
+        set_default_version(None)
+        assert product_fingerprint(PRODUCTS[0]).startswith("v2:")
+        with pytest.raises(ValueError):
+            product_fingerprint(PRODUCTS[0], "v9")
+        with pytest.raises(ValueError):
+            set_default_version("sha256")
+
+
+class TestBatch:
+    """📦 Lotes"""
+
+    @pytest.mark.parametrize("version", ["v1", "v2"])
+    def test_batch_matches_scalar(self, version):
+        """✅ fingerprint_batch / product_ids_batch == camino escalar, con productos repetidos"""
+        prods = PRODUCTS * 3
+        parts = [["Falabella", i] for i in range(len(prods))]
+        assert fingerprint_batch(prods, version) == [product_fingerprint(p, version) for p in prods]
+        assert product_ids_batch(prods, parts, version) == [product_ids(p, s, version)
+                                                             for p, s in zip(prods, parts)]
+        assert fingerprint_batch([], version) == []
+        with pytest.raises(ValueError):
+            product_ids_batch(prods, parts[:-1], version)
+
+    def test_batch_hashes_repeats_once(self, monkeypatch):
+        """✅ Un producto base repetido en el lote se hashea una vez"""
+        calls = []
+        sha1 = fingerprint._sha1
+        monkeypatch.setattr(fingerprint, "_sha1", lambda buf: calls.append(buf) or sha1(buf))
+        assert fingerprint_batch(PRODUCTS * 5, "v1") == [legacy_fingerprint(p) for p in PRODUCTS * 5]
+        assert len(calls) == len(PRODUCTS)
+
+
+class TestMigration:
+    """🔁 Mapeo v1 -> v2"""
+
+    def test_migration_rows(self):
+        """✅ Una fila por fingerprint v1 distinto, con su equivalente v2"""
+        rows = migration_rows(PRODUCTS + PRODUCTS[:2])
+        assert rows == [{"old_fingerprint": legacy_fingerprint(p), "new_fingerprint": product_fingerprint(p, "v2")}
+                        for p in PRODUCTS]
+
+    def test_migration_rows_with_product_ids(self):
+        """✅ Con partes de listing agrega product_id v1/v2 (una fila por product_id v1)"""
+        parts = [["Falabella", p["brand"]] for p in PRODUCTS] + [["Paris", "Samsung"]]
+        rows = migration_rows(PRODUCTS + PRODUCTS[:1], parts)
+        assert len(rows) == 5
+        assert rows[4]["old_fingerprint"] == rows[0]["old_fingerprint"]
+        assert rows[4]["old_product_id"] == hashlib.sha1(b"Paris|Samsung").hexdigest()
+        assert rows[4]["new_product_id"] == FingerprintKey(PRODUCTS[0], "v2").product_id(["Paris", "Samsung"])
+
+    def test_mapping_matches_integrated_path(self, monkeypatch):
+        """✅ El mapeo de fingerprint-map reproduce los ids que normalize_one_integrated guarda en v1 y v2"""
+        import src.categorize as categorize
+        import src.normalize_integrated as ni
+
+        saved = []
+        monkeypatch.setattr(categorize, "get_category_attributes_schema", lambda cat: {})
+        monkeypatch.setattr(ni, "get_taxonomy_cached", lambda: categorize.load_taxonomy("configs/taxonomy_v1.json"))
+        monkeypatch.setattr(ni, "get_brand_aliases", lambda: {"Samsung": ["SAMSUNG", "Samsung Electronics"]})
+        monkeypatch.setattr(ni, "llm_enabled", lambda: False)
+        monkeypatch.setattr(ni, "get_db_connector", lambda: type("DB", (), {
+            "save_normalized_product": staticmethod(lambda prod: saved.append(prod) or True)})())
+
+        raw = {"name": "Smartphone SAMSUNG Galaxy A55 5G 256GB", "brand": "samsung electronics",
+               "normal_price_text": "$ 399.990"}
+        meta = {"search_term": "smartphone"}
+        base = ni.integrated_base(raw, meta)
+        row, = migration_rows([base["base_product"]], [ni.product_id_parts(base, "falabella")])
+        assert base["brand"] == "Samsung"
+
+        for version, suffix in (("v1", "old"), ("v2", "new")):
+            set_default_version(version)
+            ni.normalize_one_integrated(raw, meta, "falabella")
+            assert saved[-1]["fingerprint"] == row[f"{suffix}_fingerprint"]
+            assert saved[-1]["product_id"] == row[f"{suffix}_product_id"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
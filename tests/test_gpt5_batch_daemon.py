@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 Tests para el daemon de lifecycle de Batch API
+=================================================
+Ciclo completo contra un mock local de Batch API, reanudación tras crash en
+cada etapa y garantía de que ningún producto se pierde ni se procesa dos veces
+"""
+
+import asyncio
+import copy
+import time
+from collections import Counter
+from unittest.mock import MagicMock
+
+import pytest
+from aiohttp.test_utils import TestServer
+
+from src.gpt5.batch_daemon import BatchLifecycleDaemon, BatchStage, LeaseLost, TERMINAL_STAGES
+from src.gpt5.batch_processor_db import BatchProcessorDB, _fingerprint
+from tests.mock_batch_api import MockBatchAPI
+
+
+class Crash(BaseException):
+    """Muerte abrupta del proceso (no la captura el manejo de errores del daemon)"""
+
+
+class InMemoryBatchJobStore:
+    """Doble de BatchJobStore con la misma semántica (leases, pendientes únicos)"""
+
+    def __init__(self):
+        self.jobs = {}
+        self.items = {}  # (batch_id, fingerprint) -> item
+
+    def _pending_fps(self):
+        return {fp for (_, fp), i in self.items.items() if i['status'] == 'pending'}
+
+    def create_job(self, batch_id, model, products, packed=False, retry_count=0):
+        pending = self._pending_fps()
+        fresh = {}
+        for p in products:
+            fp = _fingerprint(p)
+            if fp not in pending and fp not in fresh:
+                fresh[fp] = p
+        if not fresh:
+            return 0
+        self.jobs[batch_id] = {
+            'batch_id': batch_id, 'model': model, 'status': 'pending',
+            'stage': BatchStage.CREATED.value, 'packed': packed,
+            'total_products': len(fresh), 'retry_count': retry_count, 'max_retries': 3,
+            'poll_attempts': 0, 'next_poll_at': 0, 'locked_by': None, 'locked_until': 0,
+            'openai_file_id': None, 'openai_batch_id': None, 'output_file_id': None,
+            'output_file_path': None, 'file_path': None, 'error_message': None,
+        }
+        for fp, p in fresh.items():
+            self.items[(batch_id, fp)] = {'fingerprint': fp, 'custom_id': '', 'item_index': 0,
+                                          'product_data': copy.deepcopy(p), 'status': 'pending'}
+        return len(fresh)
+
+    def claim_due(self, worker_id, limit, lease_seconds):
+        now = time.time()
+        claimed = []
+        for job in self.jobs.values():
+            if len(claimed) >= limit:
+                break
+            if job['stage'] not in TERMINAL_STAGES and job['next_poll_at'] <= now \
+                    and job['locked_until'] < now:
+                job['locked_by'], job['locked_until'] = worker_id, now + lease_seconds
+                claimed.append(dict(job))
+        return claimed
+
+    def _owned(self, batch_id, worker_id):
+        job = self.jobs[batch_id]
+        if job['locked_by'] != worker_id:
+            raise LeaseLost(batch_id)
+        return job
+
+    def advance(self, batch_id, worker_id, stage, **fields):
+        job = self._owned(batch_id, worker_id)
+        job.update(fields, stage=stage.value)
+
+    def schedule_poll(self, batch_id, worker_id, delay_seconds, poll_attempts, error=None):
+        job = self._owned(batch_id, worker_id)
+        job.update(next_poll_at=time.time() + delay_seconds, poll_attempts=poll_attempts,
+                   locked_by=None, locked_until=0)
+
+    def pending_items(self, batch_id):
+        return [dict(i) for (b, _), i in sorted(self.items.items())
+                if b == batch_id and i['status'] == 'pending']
+
+    def set_custom_ids(self, batch_id, item_map):
+        for custom_id, fps in item_map.items():
+            for idx, fp in enumerate(fps):
+                self.items[(batch_id, fp)].update(custom_id=custom_id, item_index=idx)
+
+    def item_map(self, batch_id):
+        out = {}
+        for i in sorted(self.pending_items(batch_id), key=lambda r: (r['custom_id'], r['item_index'])):
+            out.setdefault(i['custom_id'], []).append(i['fingerprint'])
+        return out
+
+    def finish_job(self, batch_id, worker_id, done, requeue_batch_id=None):
+        job = self._owned(batch_id, worker_id)
+        done = set(done)
+        leftovers = []
+        for (b, fp), i in self.items.items():
+            if b == batch_id and i['status'] == 'pending':
+                if fp in done:
+                    i['status'] = 'done'
+                else:
+                    i['status'] = 'requeued' if requeue_batch_id else 'failed'
+                    leftovers.append(i['product_data'])
+        if leftovers and requeue_batch_id:
+            self.create_job(requeue_batch_id, job['model'], leftovers, job['packed'],
+                            job['retry_count'] + 1)
+        n_done = sum(1 for (b, _), i in self.items.items() if b == batch_id and i['status'] == 'done')
+        job.update(stage=BatchStage.INGESTED.value, status='completed', locked_by=None, locked_until=0)
+        return {'done': n_done, 'leftover': len(leftovers)}
+
+    def fail_job(self, batch_id, worker_id, error):
+        job = self._owned(batch_id, worker_id)
+        job.update(stage=BatchStage.FAILED.value, status='failed', error_message=error)
+        for (b, _), i in self.items.items():
+            if b == batch_id and i['status'] == 'pending':
+                i['status'] = 'failed'
+
+    def expire_leases(self):
+        for job in self.jobs.values():
+            job['locked_until'] = 0
+
+
+def _products(n, prefix="Notebook Lenovo IdeaPad"):
+    return [{"name": f"{prefix} {i}", "category": "notebooks", "price": 500000 + i,
+             "fingerprint": f"fp{i:04d}"} for i in range(n)]
+
+
+class Harness:
+    """Mock server + processor + store compartidos entre "procesos" del daemon"""
+
+    def __init__(self, tmp_path, monkeypatch, **mock_kwargs):
+        self.api = MockBatchAPI(**mock_kwargs)
+        self.store = InMemoryBatchJobStore()
+        self.cached = Counter()
+        self.streamed = []
+        self.tmp_path = tmp_path
+        cache = MagicMock()
+        cache.set_many.side_effect = lambda entries, **kw: self.cached.update(
+            e['fingerprint'] for e in entries)
+        monkeypatch.setattr("src.gpt5.batch_processor_db.GPT5AICache", lambda db: cache)
+
+    def daemon(self, base_url, worker_id):
+        db = MagicMock()
+        db.get_model_config.return_value = None
+        proc = BatchProcessorDB(api_key="test", db_connector=db)
+        proc.base_url = base_url
+        proc.batch_dir = self.tmp_path
+        return BatchLifecycleDaemon(proc, self.store, worker_id=worker_id,
+                                    poll_interval=0, max_poll_interval=0,
+                                    on_results=lambda b, res: self.streamed.extend(res))
+
+    async def drain(self, daemon, max_ticks=50):
+        for _ in range(max_ticks):
+            if all(j['stage'] in TERMINAL_STAGES for j in self.store.jobs.values()):
+                return
+            await daemon.run_once()
+        raise AssertionError("El daemon no terminó los jobs")
+
+    def assert_exactly_once(self, products):
+        fps = [p['fingerprint'] for p in products]
+        names = [p['name'] for p in products]
+        assert all(self.api.processed[n] == 1 for n in names), self.api.processed
+        assert set(self.cached) == set(fps)
+        done = Counter(fp for (_, fp), i in self.store.items.items() if i['status'] == 'done')
+        assert done == Counter(fps)
+
+
+def _run(harness, scenario):
+    async def main():
+        server = TestServer(harness.api.app())
+        await server.start_server()
+        try:
+            await scenario(str(server.make_url("/v1")))
+        finally:
+            await server.close()
+    asyncio.run(main())
+
+
+class TestBatchLifecycle:
+    """🔄 Máquina de estados completa contra el mock"""
+
+    @pytest.mark.parametrize("packed", [False, True])
+    def test_full_lifecycle(self, tmp_path, monkeypatch, packed):
+        """✅ created → … → ingested; resultados llegan a caches y al callback"""
+        h = Harness(tmp_path, monkeypatch, complete_after=3)
+        products = _products(6)
+
+        async def scenario(url):
+            d = h.daemon(url, "w1")
+            batch_id = d.submit(products, "gpt-5-mini", packed=packed)
+            await h.drain(d)
+            assert h.store.jobs[batch_id]['stage'] == BatchStage.INGESTED.value
+            assert d.stats['polls'] >= 3
+
+        _run(h, scenario)
+        h.assert_exactly_once(products)
+        assert len(h.streamed) == 6
+        assert len(h.api.batches) == 1
+
+    def test_missing_items_requeued(self, tmp_path, monkeypatch):
+        """✅ Items faltantes de un pack se reencolan en un job nuevo, sin duplicar"""
+        products = _products(5)
+        h = Harness(tmp_path, monkeypatch, drop_once={products[2]['name']})
+
+        async def scenario(url):
+            d = h.daemon(url, "w1")
+            d.submit(products, "gpt-5-mini", packed=True)
+            await h.drain(d)
+            assert d.stats['items_requeued'] == 1
+
+        _run(h, scenario)
+        assert len(h.store.jobs) == 2
+        h.assert_exactly_once(products)
+
+    def test_remote_failure_retried(self, tmp_path, monkeypatch):
+        """✅ Batch remoto fallido vuelve a created y se reenvía"""
+        h = Harness(tmp_path, monkeypatch, fail_batches=1)
+        products = _products(3)
+
+        async def scenario(url):
+            d = h.daemon(url, "w1")
+            batch_id = d.submit(products, "gpt-5-mini")
+            await h.drain(d)
+            assert h.store.jobs[batch_id]['retry_count'] == 1
+
+        _run(h, scenario)
+        assert len(h.api.batches) == 2
+        h.assert_exactly_once(products)
+
+    def test_all_requests_failed_requeued(self, tmp_path, monkeypatch):
+        """✅ Batch completado sin output_file_id (todas las requests fallaron): se reencola y cierra"""
+        h = Harness(tmp_path, monkeypatch, fail_requests=1)
+        products = _products(4)
+
+        async def scenario(url):
+            d = h.daemon(url, "w1")
+            batch_id = d.submit(products, "gpt-5-mini")
+            await h.drain(d)
+            assert h.store.jobs[batch_id]['stage'] == BatchStage.INGESTED.value
+            assert d.stats['items_requeued'] == 4
+            assert d.stats['errors'] == 0
+
+        _run(h, scenario)
+        assert len(h.store.jobs) == 2
+        assert (tmp_path / f"{next(iter(h.store.jobs))}_errors.jsonl").exists()
+        h.assert_exactly_once(products)
+
+    def test_all_requests_failed_no_retries_left(self, tmp_path, monkeypatch):
+        """✅ Sin reintentos restantes los items quedan failed y el job no vuelve a backoff"""
+        h = Harness(tmp_path, monkeypatch, fail_requests=5)
+        products = _products(2)
+
+        async def scenario(url):
+            d = h.daemon(url, "w1")
+            d.submit(products, "gpt-5-mini")
+            for job in h.store.jobs.values():
+                job['retry_count'] = job['max_retries'] = 3
+            await h.drain(d)
+            assert d.stats['jobs_failed'] == 1
+
+        _run(h, scenario)
+        assert len(h.store.jobs) == 1
+        assert {i['status'] for i in h.store.items.values()} == {'failed'}
+
+    def test_in_flight_products_not_resubmitted(self, tmp_path, monkeypatch):
+        """✅ Productos ya pendientes en otro job no se registran de nuevo"""
+        h = Harness(tmp_path, monkeypatch)
+        d = h.daemon("http://unused/v1", "w1")
+        assert d.submit(_products(3), "gpt-5-mini")
+        assert d.submit(_products(3), "gpt-5-mini") is None
+        assert len(h.store.jobs) == 1
+
+
+class TestCrashRecovery:
+    """💥 Reanudación tras crash en cada etapa"""
+
+    @pytest.mark.parametrize("method,stage", [
+        ("advance", BatchStage.UPLOADED),      # subido pero no persistido
+        ("advance", BatchStage.SUBMITTED),     # batch remoto creado pero no persistido
+        ("advance", BatchStage.DOWNLOADED),    # descargado pero no persistido
+        ("finish_job", None),                  # caches escritos, items sin cerrar
+    ])
+    def test_resume_after_crash(self, tmp_path, monkeypatch, method, stage):
+        """✅ Un worker nuevo retoma el job: un solo batch remoto, cada producto una vez"""
+        h = Harness(tmp_path, monkeypatch, complete_after=1)
+        products = _products(4)
+        original = getattr(h.store, method)
+
+        def crashing(batch_id, worker_id, *args, **kwargs):
+            if worker_id == "w1" and (stage is None or args[0] == stage):
+                raise Crash()
+            return original(batch_id, worker_id, *args, **kwargs)
+
+        monkeypatch.setattr(h.store, method, crashing)
+
+        async def scenario(url):
+            d1 = h.daemon(url, "w1")
+            d1.submit(products, "gpt-5-mini", packed=True)
+            with pytest.raises(Crash):
+                await h.drain(d1)
+
+            h.store.expire_leases()
+            await h.drain(h.daemon(url, "w2"))
+
+        _run(h, scenario)
+        assert len(h.api.batches) == 1
+        assert all(j['stage'] == BatchStage.INGESTED.value for j in h.store.jobs.values())
+        h.assert_exactly_once(products)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
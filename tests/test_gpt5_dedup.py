@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 Tests para el coalescing de requests LLM
+===========================================
+Valida la agrupación por fingerprint / título y el fan-out de resultados
+"""
+
+import asyncio
+import pytest
+from unittest.mock import MagicMock
+
+from src.gpt5.dedup import coalesce, normalize_title, TOKENS_PER_REQUEST
+
+
+def _p(name, retailer, fp=None, category="smartphones"):
+    p = {"name": name, "retailer": retailer, "category": category}
+    if fp:
+        p["_fingerprint"] = fp
+    return p
+
+
+class TestNormalizeTitle:
+    """🔤 Títulos canónicos"""
+
+    def test_case_accents_units_and_noise(self):
+        """✅ Mayúsculas, tildes, espacio en unidades y ruido de marketing no importan"""
+        a = normalize_title("SAMSUNG Galaxy A55 256 GB Negro Liberado")
+        b = normalize_title("Samsung galaxy a55 256GB negro")
+        assert a == b
+        assert normalize_title("Cámara Oferta Envío Gratis") == "camara"
+
+    def test_condition_tokens_kept(self):
+        """✅ Nuevo/original distinguen productos: no se tratan como ruido"""
+        assert normalize_title("Cargador Apple 20W Original") != normalize_title("Cargador Apple 20W")
+        assert normalize_title("iPhone 13 128GB Nuevo") != normalize_title("iPhone 13 128GB")
+        assert normalize_title("Cámara Nueva") == "camara nueva"
+
+
+class TestCoalesce:
+    """🧬 Agrupación y fan-out"""
+
+    def test_fingerprint_and_title_groups(self):
+        """✅ Mismo fingerprint o mismo título normalizado -> un solo request"""
+        products = [
+            _p("Galaxy A55 256GB", "Falabella", fp="f1"),
+            _p("GALAXY A55 256 GB Oferta", "Ripley"),           # título
+            _p("Samsung A55 (256)", "Paris", fp="f1"),          # fingerprint
+            _p("iPhone 15 128GB", "Paris", fp="f2"),
+            _p("Galaxy A55 256GB", "Paris", category="perfumes"),  # otra categoría
+        ]
+        plan = coalesce(products)
+
+        assert len(plan.unique) == 3
+        assert plan.groups[0] == [0, 1, 2]
+        assert plan.calls_saved == 2
+        assert plan.tokens_saved == 2 * TOKENS_PER_REQUEST
+        assert plan.stats()["by_reason"] == {"fingerprint": 1, "title": 1}
+
+    def test_fan_out_preserves_order(self):
+        """✅ Cada original recibe el resultado de su representante, en orden"""
+        products = [_p("A 1", "X"), _p("B", "X"), _p("a 1", "Y")]
+        plan = coalesce(products)
+        out = plan.fan_out([{"r": "A"}, {"r": "B"}])
+
+        assert [o["r"] for o in out] == ["A", "B", "A"]
+        out[2]["r"] = "mutado"
+        assert out[0]["r"] == "A"
+
+    def test_titles_disabled(self):
+        """✅ use_titles=False solo colapsa fingerprints"""
+        products = [_p("A", "X"), _p("a", "Y")]
+        assert coalesce(products, use_titles=False).calls_saved == 0
+
+
+
+class TestProcessBatch:
+    """📦 process_batch_gpt5 sin nada que enviar"""
+
+    @pytest.fixture
+    def ng(self, monkeypatch):
+        import src.normalize_gpt5 as ng
+        self.orchestrator = MagicMock()
+        self.orchestrator.create_optimized_batches.return_value = []
+        self.db, self.router = MagicMock(), MagicMock()
+        self.db.get_cost_summary.return_value = {"total_cost": 0.0}
+        for name, value in (("get_gpt5_connector", self.db), ("get_router", self.router),
+                            ("get_batch_processor", MagicMock())):
+            monkeypatch.setattr(ng, name, lambda value=value: value)
+        monkeypatch.setattr(ng, "BatchOrchestrator", MagicMock(return_value=self.orchestrator))
+        self.ai_cache = MagicMock()
+        monkeypatch.setattr(ng, "GPT5AICache", MagicMock(return_value=self.ai_cache))
+        return ng
+
+    def test_empty_input(self, ng):
+        """✅ Lista vacía devuelve [] sin dividir por cero"""
+        assert asyncio.run(ng.process_batch_gpt5([])) == []
+        self.orchestrator.create_optimized_batches.assert_not_called()
+
+    def test_all_cached_returns_early(self, ng):
+        """✅ Todo en cache: se devuelve sin crear batches"""
+        self.ai_cache.get.return_value = {"brand": "SAMSUNG", "model": "Galaxy A55"}
+        products = [_p("Samsung Galaxy A55 256GB", "falabella"), _p("Samsung Galaxy A55 256GB", "ripley")]
+        results = asyncio.run(ng.process_batch_gpt5(products))
+        assert len(results) == 2
+        self.orchestrator.create_optimized_batches.assert_not_called()
+
+    def test_routes_once_and_passes_routing(self, ng):
+        """✅ Un solo route_many para el lote; los batches reciben '_routing' ya calculado"""
+        self.ai_cache.get.return_value = None
+        self.router.route_many.side_effect = lambda ps, save=False: [("gpt-5-mini", 0.2, "simple")] * len(ps)
+        products = [_p("Samsung Galaxy A55 256GB", "falabella"), _p("Samsung Galaxy S24 512GB", "ripley")]
+        asyncio.run(ng.process_batch_gpt5(products))
+        self.router.route_many.assert_called_once()
+        self.router.route_single_extended.assert_not_called()
+        self.db.save_complexity_analysis.assert_not_called()
+        sent = self.orchestrator.create_optimized_batches.call_args.args[0]
+        assert [p["_routing"]["model"] for p in sent] == ["gpt-5-mini", "gpt-5-mini"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 Tests para el ejecutor concurrente GPT-5
+===========================================
+Valida paralelismo acotado por modelo, orden de salida y cancelación
+"""
+
+import asyncio
+import pytest
+
+from src.gpt5.executor import ConcurrentExecutor, pace_llm_call
+from src.gpt5.throttling import RateLimiter
+
+
+class TestConcurrentExecutor:
+    """⚙️ Cola de trabajo con límite en vuelo por modelo"""
+
+    def test_order_preserved_and_errors_in_place(self):
+        """✅ La salida respeta el orden de entrada; los errores quedan en su posición"""
+        async def fn(x):
+            await asyncio.sleep(0.01 * (5 - x))
+            if x == 3:
+                raise ValueError("boom")
+            return x * 10
+
+        ex = ConcurrentExecutor(max_workers=5)
+        res = asyncio.run(ex.map(fn, [0, 1, 2, 3, 4]))
+
+        assert res[:3] == [0, 10, 20] and res[4] == 40
+        assert isinstance(res[3], ValueError)
+        assert ex.stats['completed'] == 4 and ex.stats['failed'] == 1
+
+    def test_in_flight_limit_per_model(self):
+        """✅ Cada modelo respeta su límite en vuelo"""
+        running = {'a': 0, 'b': 0}
+        peak = {'a': 0, 'b': 0}
+
+        async def fn(item):
+            running[item] += 1
+            peak[item] = max(peak[item], running[item])
+            await asyncio.sleep(0.01)
+            running[item] -= 1
+            return item
+
+        ex = ConcurrentExecutor(max_workers=16, max_in_flight={'a': 2, 'b': 3})
+        asyncio.run(ex.map(fn, ['a', 'b'] * 10, model_of=lambda m: m))
+
+        assert peak == {'a': 2, 'b': 3}
+
+    def test_concurrency_beats_sequential(self):
+        """✅ N requests de latencia L tardan ~L·N/límite, no L·N"""
+        async def fn(_):
+            await asyncio.sleep(0.05)
+
+        async def run():
+            ex = ConcurrentExecutor(rate_limiter=RateLimiter(), max_workers=20)
+            loop = asyncio.get_running_loop()
+            t0 = loop.time()
+            await ex.map(fn, list(range(20)), model_of=lambda _: 'gpt-5-mini')
+            return loop.time() - t0
+
+        # gpt-5-mini: concurrent_limit=10 -> 2 rondas de 50ms
+        assert asyncio.run(run()) < 0.5
+
+    def test_cancel_cleans_up_workers(self):
+        """✅ Cancelar el map cancela los workers y cuenta lo pendiente"""
+        async def fn(_):
+            await asyncio.sleep(10)
+
+        async def run():
+            ex = ConcurrentExecutor(max_workers=2)
+            task = asyncio.create_task(ex.map(fn, list(range(6))))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            return ex
+
+        ex = asyncio.run(run())
+        assert not ex._workers
+        assert ex.stats['cancelled'] == 6
+
+    def test_concurrent_maps_are_independent(self):
+        """✅ Dos map a la vez en el mismo executor: cada uno con sus workers y su progreso"""
+        async def fn(x):
+            await asyncio.sleep(0.01)
+            return x
+
+        async def run():
+            ex = ConcurrentExecutor(max_workers=3)
+            seen = {'a': [], 'b': []}
+            a, b = await asyncio.gather(
+                ex.map(fn, list(range(6)), progress=lambda d, t: seen['a'].append((d, t))),
+                ex.map(fn, list(range(10, 14)), progress=lambda d, t: seen['b'].append((d, t))),
+            )
+            return ex, a, b, seen
+
+        ex, a, b, seen = asyncio.run(run())
+        assert a == list(range(6)) and b == list(range(10, 14))
+        assert seen['a'][-1] == (6, 6) and seen['b'][-1] == (4, 4)
+        assert not ex._workers and ex.stats['cancelled'] == 0
+
+    def test_only_llm_calls_are_paced(self):
+        """✅ Con pace_items=False los cache hits no esperan al bucket de RPM"""
+        limiter = RateLimiter()
+        limiter.request_buckets['gpt-5'].tokens = 0
+        limiter.request_buckets['gpt-5'].refill_rate = 1e-6
+        calls = []
+
+        async def fn(item):
+            if item == 'miss':
+                await pace_llm_call('gpt-5')
+                calls.append(item)
+            return item
+
+        async def run():
+            ex = ConcurrentExecutor(rate_limiter=limiter, max_workers=4, max_wait=0.2)
+            loop = asyncio.get_running_loop()
+            t0 = loop.time()
+            await ex.map(fn, ['hit'] * 8, model_of=lambda _: 'gpt-5', pace_items=False)
+            hits = loop.time() - t0
+            await ex.map(fn, ['miss'], model_of=lambda _: 'gpt-5', pace_items=False)
+            return hits, loop.time() - t0 - hits
+
+        hits, miss = asyncio.run(run())
+        assert hits < 0.1 and miss >= 0.2
+        assert calls == ['miss']
+
+
+class TestWaitForCapacity:
+    """🚦 Pacing sin consumir tokens"""
+
+    def test_waits_without_consuming(self):
+        """✅ wait_for_capacity no consume el bucket de requests"""
+        limiter = RateLimiter()
+        before = limiter.request_buckets['gpt-5'].tokens
+        assert asyncio.run(limiter.wait_for_capacity('gpt-5', max_wait=0))
+        assert limiter.request_buckets['gpt-5'].tokens >= before
+
+    def test_times_out_when_empty(self):
+        """✅ Sin capacidad y sin espera retorna False"""
+        limiter = RateLimiter()
+        limiter.request_buckets['gpt-5'].tokens = 0
+        limiter.request_buckets['gpt-5'].refill_rate = 1e-6
+        assert asyncio.run(limiter.wait_for_capacity('gpt-5', max_wait=0)) is False
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
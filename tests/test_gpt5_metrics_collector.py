@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 Tests para el colector de métricas con memoria constante
+===========================================================
+Valida la precisión de los percentiles del histograma, que la memoria no
+crezca con el número de requests, la retención de contadores por hora y la
+persistencia compacta
+"""
+
+import random
+from datetime import datetime
+
+import pytest
+
+from src.gpt5.monitoring.metrics_collector import LatencyHistogram, MetricsCollector, TimeBuckets
+
+HOUR = 3600
+
+
+def _exact(values, q):
+    ordered = sorted(values)
+    return ordered[max(0, -(-len(ordered) * q // 100) - 1)]
+
+
+class TestLatencyHistogram:
+    """📐 Percentiles sin guardar muestras"""
+
+    def test_percentiles_within_precision(self):
+        """✅ p50/p95/p99 con error relativo ≤ 1% frente al cálculo exacto"""
+        rng = random.Random(7)
+        values = [rng.lognormvariate(7, 0.6) for _ in range(50_000)]
+        hist = LatencyHistogram(precision=0.01)
+        for v in values:
+            hist.record(v)
+
+        p = hist.percentiles((50, 95, 99))
+        for q in (50, 95, 99):
+            assert p[q] == pytest.approx(_exact(values, q), rel=0.0101)
+        assert hist.mean == pytest.approx(sum(values) / len(values))
+
+    def test_bucket_count_bounded(self):
+        """✅ La cantidad de buckets depende del rango, no de los registros"""
+        hist = LatencyHistogram(precision=0.01)
+        for i in range(200_000):
+            hist.record(1 + (i * 7919) % 3_600_000)
+        assert hist.count == 200_000
+        assert len(hist.counts) <= hist._max_index + 1 < 800
+
+    def test_merge_and_roundtrip(self):
+        """✅ Forma persistida compacta y fusionable"""
+        a, b = LatencyHistogram(), LatencyHistogram()
+        for v in range(1, 1001):
+            (a if v % 2 else b).record(v)
+        a.merge(b)
+        restored = LatencyHistogram.from_dict(a.to_dict())
+        assert restored.count == 1000
+        assert restored.percentiles() == a.percentiles()
+        assert restored.percentile(50) == pytest.approx(500, rel=0.01)
+
+
+class TestTimeBuckets:
+    """🕐 Contadores por hora con retención fija"""
+
+    def test_retention_evicts_oldest(self):
+        """✅ Solo quedan los últimos `retention` buckets"""
+        buckets = TimeBuckets('hour', retention=24)
+        start = datetime(2026, 10, 1, 0, 30).timestamp()
+        for h in range(72):
+            buckets.add(start + h * HOUR, cost=1.0, requests=2)
+
+        assert len(buckets.buckets) == 24
+        assert next(iter(buckets.buckets)) == "2026-10-03_00"
+        assert buckets.get("2026-10-03_23", "requests") == 2
+
+    def test_same_bucket_reuses_key(self):
+        """✅ Dentro de la misma hora se acumula sin recalcular la clave"""
+        buckets = TimeBuckets('day', retention=7)
+        ts = datetime(2026, 10, 19, 8).timestamp()
+        for i in range(10):
+            buckets.add(ts + i * 60, cost=0.5)
+        assert buckets.series('cost') == {"2026-10-19": 5.0}
+
+
+class TestMetricsCollectorMemory:
+    """📊 Colector sobre ring buffers y agregados"""
+
+    def test_memory_constant(self, tmp_path):
+        """✅ Muchos requests no hacen crecer los buffers"""
+        collector = MetricsCollector(persist_path=str(tmp_path), ring_size=500)
+        for i in range(20_000):
+            collector.track_request("gpt-5-mini", latency_ms=500 + i % 1000, tokens=200,
+                                    cost=0.0001, cache_hit=i % 4 == 0, success=i % 50 != 0)
+
+        assert len(collector.metrics['requests']) == 500
+        stats = collector.get_current_stats()
+        assert stats['total_requests'] == 20_000
+        assert stats['latency_ms']['p50'] == pytest.approx(1000, rel=0.02)
+        assert stats['model_distribution']['gpt-5-mini']['success_rate'] == pytest.approx(0.98)
+
+        trends = collector.get_performance_trends(hours=1)
+        assert sum(t['requests'] for t in trends.values()) == 20_000
+        assert sum(t['errors'] for t in trends.values()) == 400
+
+    def test_persistence_compact(self, tmp_path):
+        """✅ El archivo guarda histogramas y costos, no todas las muestras"""
+        collector = MetricsCollector(persist_path=str(tmp_path), ring_size=100)
+        for i in range(5000):
+            collector.track_request("gpt-5", latency_ms=800 + i, tokens=300, cost=0.002)
+        collector.save_metrics()
+
+        files = list(tmp_path.glob("metrics_*.json"))
+        assert len(files) == 1 and files[0].stat().st_size < 100_000
+
+        restored = MetricsCollector(persist_path=str(tmp_path))
+        assert restored.metrics['costs']['total'] == pytest.approx(10.0)
+        assert restored.get_latency_percentiles("gpt-5") == collector.get_latency_percentiles("gpt-5")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
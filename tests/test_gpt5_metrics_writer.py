@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 Tests para la escritura diferida de processing_metrics
+=========================================================
+Valida que registrar una métrica no toque la BD, el flush por filas/tiempo
+con un solo INSERT multi-fila, el volcado a disco ante caída y el flush final
+"""
+
+import gc
+import time
+import weakref
+import pytest
+from unittest.mock import MagicMock
+
+from src.gpt5_db_connector import GPT5DatabaseConnector, MetricsWriter, METRIC_COLUMNS
+
+
+def _row(i, success=True):
+    return ("gpt-5-mini", "single", 100 + i, 50, 0.0001, 900, False, None, 0.3, None,
+            success, None if success else "timeout", f"fp{i}", "ripley", "smartphones", "2026-10-19 12:00:00")
+
+
+@pytest.fixture
+def inserts(monkeypatch):
+    """Captura cada execute_values (una lista de filas por INSERT)"""
+    calls = []
+
+    def execute_values(cursor, sql, rows, page_size=100):
+        if calls and calls[-1] == "fail":
+            calls.pop()
+            raise ConnectionError("server closed the connection unexpectedly")
+        calls.append((sql, list(rows)))
+
+    monkeypatch.setattr("src.gpt5_db_connector.extras.execute_values", execute_values)
+    return calls
+
+
+class TestMetricsWriter:
+    """📈 Buffer + flush en segundo plano"""
+
+    def test_record_does_no_io(self, inserts, tmp_path):
+        """✅ record() solo encola; el flush hace un único INSERT multi-fila"""
+        connector = MagicMock()
+        writer = MetricsWriter(connector, flush_rows=1000, flush_interval=60, spill_dir=str(tmp_path))
+        for i in range(250):
+            writer.record(_row(i))
+        assert not connector.get_connection.called and not inserts
+
+        assert writer.flush() == 250
+        sql, rows = inserts[0]
+        assert len(inserts) == 1 and len(rows) == 250
+        assert f"({', '.join(METRIC_COLUMNS)}) VALUES %s" in sql
+        writer.close()
+
+    def test_background_flush_every_n_rows(self, inserts, tmp_path):
+        """✅ Al juntar flush_rows filas el hilo inserta sin esperar el intervalo"""
+        writer = MetricsWriter(MagicMock(), flush_rows=20, flush_interval=60, spill_dir=str(tmp_path))
+        for i in range(20):
+            writer.record(_row(i))
+        deadline = time.monotonic() + 2
+        while writer.stats['written'] < 20 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert writer.stats['written'] == 20
+        writer.close()
+
+    def test_background_flush_every_interval(self, inserts, tmp_path):
+        """✅ Pocas filas igual se insertan al vencer flush_interval"""
+        writer = MetricsWriter(MagicMock(), flush_rows=1000, flush_interval=0.05, spill_dir=str(tmp_path))
+        writer.record(_row(0))
+        deadline = time.monotonic() + 2
+        while writer.stats['written'] < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert writer.stats['written'] == 1
+        writer.close()
+
+    def test_outage_spills_and_replays(self, inserts, tmp_path):
+        """✅ Con la BD caída las filas van a disco y se reinsertan al volver"""
+        writer = MetricsWriter(MagicMock(), flush_rows=1000, flush_interval=60, spill_dir=str(tmp_path))
+        for i in range(3):
+            writer.record(_row(i, success=i != 1))
+        inserts.append("fail")
+        assert writer.flush() == 0
+        assert writer.stats['spilled'] == 3 and len(list(tmp_path.glob("*.jsonl"))) == 1
+
+        writer.record(_row(9))
+        assert writer.flush() == 1
+        assert [len(rows) for _, rows in inserts] == [1, 3]
+        assert inserts[1][1][1][11] == "timeout"
+        assert writer.stats['replayed'] == 3 and not list(tmp_path.glob("*.jsonl"))
+        writer.close()
+
+    def test_drop_without_spill_dir_and_bounded_buffer(self, inserts):
+        """✅ Sin spill_dir se descarta; el buffer no crece más allá de max_buffer"""
+        writer = MetricsWriter(MagicMock(), flush_rows=1000, flush_interval=60, max_buffer=5, spill_dir=None)
+        for i in range(8):
+            writer.record(_row(i))
+        inserts.append("fail")
+        writer.flush()
+        assert writer.stats['dropped'] == 8
+        writer.close()
+
+    def test_close_flushes(self, inserts, tmp_path):
+        """✅ close() inserta lo pendiente antes de terminar"""
+        writer = MetricsWriter(MagicMock(), flush_rows=1000, flush_interval=60, spill_dir=str(tmp_path))
+        writer.record(_row(0))
+        writer.close()
+        assert writer.stats['written'] == 1
+
+    def test_discarded_writer_is_not_retained(self, tmp_path):
+        """✅ El hook de salida no retiene writers descartados"""
+        ref = weakref.ref(MetricsWriter(MagicMock(), spill_dir=str(tmp_path)))
+        gc.collect()
+        assert ref() is None
+
+
+class TestConnectorMetrics:
+    """🔌 log_processing_metric fuera del camino crítico"""
+
+    def test_log_processing_metric_is_buffered(self, inserts, tmp_path):
+        """✅ Registrar no abre conexión; close() del conector hace el flush final"""
+        connector = GPT5DatabaseConnector.__new__(GPT5DatabaseConnector)
+        connector.connection_pool = MagicMock()
+        connector.metrics_writer = MetricsWriter(connector, flush_interval=60, spill_dir=str(tmp_path))
+
+        for i in range(100):
+            connector.log_processing_metric("gpt-5-mini", "single", 120, 40, 0.00002,
+                                            latency_ms=850, fingerprint=f"fp{i}")
+        assert not connector.connection_pool.getconn.called
+
+        connector.close()
+        assert [len(rows) for _, rows in inserts] == [100]
+        assert inserts[0][1][0][12] == "fp0"
+
+    @pytest.mark.parametrize("read", ["get_cost_summary", "get_routing_stats"])
+    def test_reads_flush_pending_metrics(self, inserts, tmp_path, read):
+        """✅ Los resúmenes leen processing_metrics después de insertar lo que estaba en buffer"""
+        connector = GPT5DatabaseConnector.__new__(GPT5DatabaseConnector)
+        connector.get_connection = MagicMock()
+        cursor = connector.get_connection.return_value.__enter__.return_value.cursor.return_value.__enter__.return_value
+        seen = []
+        cursor.execute.side_effect = lambda *a: seen.append(len(inserts))
+        cursor.fetchall.return_value = []
+        connector.metrics_writer = MetricsWriter(connector, flush_interval=60, spill_dir=str(tmp_path))
+        connector.log_processing_metric("gpt-5-mini", "single", 120, 40, 0.00002, fingerprint="fp0")
+
+        getattr(connector, read)()
+        assert seen == [1]
+        connector.metrics_writer.close()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 Tests para prompts empaquetados GPT-5
+========================================
+Valida el tamaño adaptativo de pack, el parseo indexado tolerante y el
+fan-out de resultados de batches empaquetados
+"""
+
+import json
+import asyncio
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+from src.gpt5.prompts import PromptManager
+from src.gpt5.prompt_optimizer import PromptOptimizer, PACKED_MAX_ITEMS
+
+
+def _products(n, name="Samsung Galaxy A55 256GB Negro"):
+    return [{"name": f"{name} {i}", "category": "smartphones", "price": 1000 + i,
+             "_fingerprint": f"fp{i}"} for i in range(n)]
+
+
+class TestPackSize:
+    """📐 K adaptativo según estimate_tokens y max_completion_tokens"""
+
+    def test_budget_limits_pack_size(self):
+        """✅ Menos max_completion_tokens -> packs más chicos"""
+        opt = PromptOptimizer()
+        products = _products(40)
+        small = opt.pack_products(products, "gpt-5-mini", max_completion_tokens=500)
+        large = opt.pack_products(products, "gpt-5-mini", max_completion_tokens=8000)
+
+        assert max(len(p) for p in small) < max(len(p) for p in large)
+        assert max(len(p) for p in large) <= PACKED_MAX_ITEMS
+        assert sorted(i for p in small for i in p) == list(range(40))
+
+    def test_oversized_item_gets_own_pack(self):
+        """✅ Un item mayor al presupuesto va solo, nunca se pierde"""
+        opt = PromptOptimizer()
+        packs = opt.pack_products(_products(3, name="x " * 300), "gpt-5-mini", max_completion_tokens=100)
+        assert packs == [[0], [1], [2]]
+
+
+class TestPackedPrompt:
+    """🧾 Prompt y parseo de salida indexada"""
+
+    def setup_method(self):
+        self.pm = PromptManager()
+
+    def test_prompt_one_line_per_product(self):
+        """✅ Cabecera única + una línea indexada por producto"""
+        prompt = self.pm.get_packed_prompt(_products(3))
+        lines = prompt.split("\n")
+        assert len(lines) == 4
+        assert lines[1].startswith("0|Samsung Galaxy A55") and lines[3].startswith("2|")
+        assert "Eres un experto" not in prompt
+
+    def test_parse_full_response(self):
+        """✅ Respuesta completa -> sin faltantes"""
+        items = [{"i": i, "brand": "SAMSUNG", "model": f"A55 {i}"} for i in range(3)]
+        parsed, missing = self.pm.parse_packed_response(json.dumps({"items": items}), 3)
+        assert sorted(parsed) == [0, 1, 2] and missing == []
+        assert "i" not in parsed[0]
+
+    def test_parse_truncated_and_invalid(self):
+        """✅ Truncada o con items inválidos -> solo esos se reintentan"""
+        content = ('{"items":[{"i":0,"brand":"SAMSUNG","model":"A55","attributes":{"capacity":"256GB"}},'
+                   '{"i":1,"brand":"","model":"A55"},{"i":2,"brand":"SAMS')
+        parsed, missing = self.pm.parse_packed_response(content, 3)
+        assert list(parsed) == [0]
+        assert parsed[0]["attributes"] == {"capacity": "256GB"}
+        assert missing == [1, 2]
+
+    def test_parse_garbage(self):
+        """✅ Basura -> todos faltantes"""
+        assert self.pm.parse_packed_response("lo siento", 2) == ({}, [0, 1])
+
+
+class TestPackedBatchFile:
+    """📦 Batch API con K productos por línea"""
+
+    def _processor(self, tmp_path):
+        from src.gpt5.batch_processor_db import BatchProcessorDB
+        db = MagicMock()
+        db.get_model_config.return_value = None
+        proc = BatchProcessorDB(api_key="test", db_connector=db)
+        proc.batch_dir = tmp_path
+        return proc
+
+    def test_packed_file_and_fan_out(self, tmp_path, monkeypatch):
+        """✅ Una línea por pack; resultados repartidos por fingerprint completo"""
+        proc = self._processor(tmp_path)
+        monkeypatch.setattr("src.gpt5.batch_processor_db.GPT5AICache", MagicMock())
+        products = _products(5)
+
+        path, batch_id = asyncio.run(proc.create_batch_file(
+            products, "gpt-5-mini", "", batch_id="b1", packed=True))
+        lines = [json.loads(l) for l in open(path, encoding="utf-8")]
+        assert len(lines) == 1
+        assert lines[0]["custom_id"] == "b1_p0"
+
+        items = [{"i": i, "brand": "SAMSUNG", "model": f"A55 {i}"} for i in range(5) if i != 3]
+        result_line = {"custom_id": "b1_p0", "response": {"status_code": 200, "body": {
+            "model": "gpt-5-mini", "usage": {"total_tokens": 500},
+            "choices": [{"message": {"content": json.dumps({"items": items})}}]}}}
+        results_path = tmp_path / "b1_results.jsonl"
+        results_path.write_text(json.dumps(result_line) + "\n", encoding="utf-8")
+
+        results = asyncio.run(proc.process_batch_results(str(results_path), "b1"))
+        assert sorted(r["fingerprint"] for r in results) == ["fp0", "fp1", "fp2", "fp4"]
+
+
+
+class TestPackedCost:
+    """💵 Costo, métricas y circuit breaker por pack"""
+
+    @pytest.fixture
+    def packed(self, monkeypatch):
+        """process_packed_gpt5 con BD/cache/validador simulados y un RateLimiter real"""
+        import openai
+        import src.normalize_gpt5 as ng
+        from src.gpt5.throttling import RateLimiter
+
+        db = MagicMock()
+        db.get_model_config.return_value = {"cost_per_1k_input": 0.25, "cost_per_1k_output": 2.0}
+        validator = MagicMock()
+        validator.validate_normalized.return_value = (True, 0.9, [])
+        l1_cache = MagicMock()
+        l1_cache.get.return_value = None
+        limiter = RateLimiter()
+        accountant = MagicMock(reserve=AsyncMock(return_value=object()), settle=AsyncMock(), fail=AsyncMock())
+        for name, value in (("get_gpt5_connector", db), ("get_validator", validator), ("get_l1_cache", l1_cache),
+                            ("get_rate_limiter", limiter), ("get_token_accountant", accountant),
+                            ("get_router", MagicMock()), ("get_prompt_manager", PromptManager())):
+            monkeypatch.setattr(ng, name, lambda value=value: value)
+        ai_cache = MagicMock()
+        ai_cache.return_value.get.return_value = None
+        monkeypatch.setattr(ng, "GPT5AICache", ai_cache)
+
+        items = [{"i": i, "brand": "SAMSUNG", "model": f"A55 {i}"} for i in range(3)]
+        response = SimpleNamespace(
+            usage=SimpleNamespace(prompt_tokens=1200, completion_tokens=300, total_tokens=1500),
+            choices=[SimpleNamespace(message=SimpleNamespace(content=json.dumps({"items": items})))])
+        acreate = AsyncMock(return_value=response)
+        monkeypatch.setattr(openai.ChatCompletion, "acreate", acreate, raising=False)
+        products = [dict(p, _routing={"model": "gpt-5-mini"}) for p in _products(3)]
+        return SimpleNamespace(ng=ng, db=db, limiter=limiter, acreate=acreate, products=products)
+
+    def test_pack_cost_from_usage_and_pricing(self, packed):
+        """✅ El costo del pack sale de su usage y los precios del modelo (no 0.0)"""
+        results = asyncio.run(packed.ng.process_packed_gpt5(packed.products))
+        assert len(results) == 3 and all(results)
+        kwargs = packed.db.log_processing_metric.call_args.kwargs
+        assert kwargs["cost_usd"] == pytest.approx(1.2 * 0.25 + 0.3 * 2.0)
+        assert kwargs["request_type"] == "packed"
+        packed.db.get_model_config.assert_called_with("gpt-5-mini")
+        assert packed.limiter.circuit_breakers["gpt-5-mini"].stats["total_calls"] == 1
+
+    def test_open_breaker_skips_pack_call(self, packed, monkeypatch):
+        """✅ Con el breaker del modelo abierto no se llama a OpenAI; los items van al camino individual"""
+        from src.gpt5.throttling import CircuitState
+        breaker = packed.limiter.circuit_breakers["gpt-5-mini"]
+        breaker.state = CircuitState.OPEN
+        monkeypatch.setattr(breaker, "_should_attempt_reset", lambda: False)
+        single = AsyncMock(return_value={"brand": "SAMSUNG", "model": "A55"})
+        monkeypatch.setattr(packed.ng, "_process_single_with_fallback", single)
+
+        results = asyncio.run(packed.ng.process_packed_gpt5(packed.products))
+        assert len(results) == 3 and all(results)
+        packed.acreate.assert_not_awaited()
+        assert single.await_count == 3
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 Tests para las plantillas de prompt compiladas
+=================================================
+Valida que el render compilado sea idéntico a los prompts anteriores, que el
+prefijo estático no cambie entre productos, que las líneas de Batch API
+coincidan con json.dumps y el tiempo de construcción para 50k productos
+"""
+
+import json
+import asyncio
+import time
+import pytest
+from unittest.mock import MagicMock
+
+from src.gpt5.prompts import PromptManager, PromptMode
+from src.gpt5.prompt_optimizer import PromptOptimizer, PromptStyle
+from src.gpt5.prompt_templates import ChatRequestTemplate, CompiledTemplate, count_tokens
+
+PRODUCT = {"name": "iPhone 15 Pro Max 256GB Negro Liberado", "category": "smartphones",
+           "price": 1299990, "retailer": "Falabella"}
+
+
+def _products(n):
+    return [{"name": f"Samsung Galaxy A55 {i}GB  Negro", "category": "smartphones",
+             "price": 100000 + i, "retailer": "Ripley", "_fingerprint": f"fp{i:08d}"} for i in range(n)]
+
+
+class TestCompiledRender:
+    """🧩 Render compilado == prompts f-string anteriores"""
+
+    def test_standard_prompt_matches_fstring(self):
+        """✅ Campos, separador de miles y llaves literales igual que antes"""
+        prompt = PromptManager().get_prompt("gpt-5-mini", "smartphones", PromptMode.STANDARD, PRODUCT)
+        assert prompt.startswith('Normaliza el siguiente smartphone:\n\nPRODUCTO: "iPhone 15 Pro Max 256GB Negro Liberado"\n'
+                                 'PRECIO: $1,299,990 CLP\nRETAILER: "Falabella"\n\nExtrae y estructura en JSON:\n{\n')
+        assert prompt.endswith('"category_suggestion": "smartphones"\n}')
+
+    def test_minimal_truncates_and_defaults(self):
+        """✅ {name:.80} trunca como [:80]; campos ausentes usan el default"""
+        pm = PromptManager()
+        product = {"name": "x" * 200}
+        assert pm.get_prompt("gpt-5-mini", "notebooks", PromptMode.MINIMAL, product) == \
+            f"N:{'x' * 80}|C:notebooks|$:0"
+        assert "SKU/ID: N/A" in pm.get_prompt("gpt-5", "smartphones", PromptMode.DETAILED, product)
+
+    def test_fallback_options_come_from_kwargs(self):
+        """✅ previous_attempt/error salen de kwargs (no del producto), con sus defaults"""
+        pm = PromptManager()
+        product = dict(PRODUCT, error="del producto")
+        prompt = pm.get_prompt("gpt-4o-mini", "zzz", PromptMode.FALLBACK, product)
+        assert "INTENTO ANTERIOR:\n{}\n\nERROR: JSON inválido o incompleto" in prompt
+        prompt = pm.get_prompt("gpt-4o", "all", PromptMode.FALLBACK, product,
+                               previous_attempt={"brand": "X"}, error=None)
+        assert "PROBLEMA DETECTADO:\nNone\n\nINTENTO PREVIO:\n{'brand': 'X'}" in prompt
+
+    def test_optimizer_cleans_values(self):
+        """✅ El optimizador limpia espacios, None y textos largos por campo"""
+        product = {"name": "  Cable   USB-C  ", "category": None, "price": 4990}
+        prompt = PromptOptimizer().optimize_prompt(product, "gpt-5-mini", PromptStyle.BATCH)
+        assert prompt == "P:Cable USB-C|C:|$:4990\nOut:{b,m,a:{c,cl,s},cf}"
+
+    def test_unknown_mode_falls_back_to_standard_default(self):
+        """✅ Sin plantilla para el modo se usa standard_default, resuelto una vez"""
+        pm = PromptManager()
+        template = pm.get_template("gpt-5", "smartphones", PromptMode.BATCH)
+        assert template is pm.get_template("gpt-5", "smartphones", PromptMode.BATCH)
+        assert template.render(PRODUCT).startswith('Normaliza producto:\n\nNOMBRE: "iPhone')
+
+
+class TestStaticPrefix:
+    """🔒 Prefijos estáticos byte-idénticos (prompt caching del proveedor)"""
+
+    def test_prefix_identical_across_products(self):
+        """✅ Todo prompt empieza con el mismo prefijo precomputado"""
+        template = PromptManager().get_template("gpt-5", "notebooks", PromptMode.DETAILED)
+        assert template.prefix == 'Análisis detallado de notebook:\n\nENTRADA: "'
+        prompts = [template.render(p) for p in _products(50)]
+        assert all(p.startswith(template.prefix) for p in prompts)
+
+    def test_static_tokens_cached(self):
+        """✅ La estimación suma tokens estáticos cacheados + campos del producto"""
+        template = CompiledTemplate("Producto: {name}\nPrecio: ${price:,} CLP\nJSON: {{brand}}")
+        assert template.static_text == "Producto: \nPrecio: $ CLP\nJSON: {brand}"
+        assert template.static_tokens == count_tokens(template.static_text)
+        estimate = template.estimate_tokens({"name": "Mouse Logitech", "price": 19990})
+        assert estimate == template.static_tokens + count_tokens("Mouse Logitech") + count_tokens("19,990")
+
+    def test_request_line_matches_json_dumps(self):
+        """✅ La línea precompilada es idéntica a json.dumps del request completo"""
+        line_template = ChatRequestTemplate("gpt-5-mini", 'Sistema "JSON" ñ', 200)
+        prompt = 'Normaliza: Perfume "Chanel" N°5\n[perfumes]'
+        request = {
+            "custom_id": "b1_0_fp", "method": "POST", "url": "/v1/chat/completions",
+            "body": {
+                "model": "gpt-5-mini",
+                "messages": [{"role": "system", "content": 'Sistema "JSON" ñ'},
+                             {"role": "user", "content": prompt}],
+                "temperature": 0.1,
+                "max_completion_tokens": 200,
+                "response_format": {"type": "json_object"}
+            }
+        }
+        assert line_template.render_line("b1_0_fp", prompt) == json.dumps(request, ensure_ascii=False)
+
+    def test_product_line_escapes_only_fields(self):
+        """✅ La línea con estáticos pre-escapados es idéntica a escapar el prompt completo"""
+        line_template = ChatRequestTemplate("gpt-4o", "Sistema", 500)
+        template = PromptManager().get_template("gpt-4o", "all", PromptMode.FALLBACK)
+        product = dict(PRODUCT, name='TV "OLED" 55\\ ñ\n')
+        kwargs = {"previous_attempt": {"brand": 'A"B'}, "error": "línea\tcon tab"}
+        assert line_template.render_product_line("c1", template, product, **kwargs) == \
+            line_template.render_line("c1", template.render(product, **kwargs))
+
+
+class TestBatchFileThroughput:
+    """⚡ Construcción de prompts para batches grandes"""
+
+    def test_50k_request_lines_under_a_second(self):
+        """✅ 50k líneas JSONL con prompt standard en menos de un segundo"""
+        template = PromptManager().get_template("gpt-5-mini", "smartphones", PromptMode.STANDARD)
+        line_template = ChatRequestTemplate("gpt-5-mini", "Sistema", 200)
+        products = _products(50_000)
+        start = time.perf_counter()
+        for i, product in enumerate(products):
+            line_template.render_product_line(f"b1_{i}", template, product)
+        assert time.perf_counter() - start < 1.0
+
+    def test_batch_file_lines(self, tmp_path):
+        """✅ El archivo batch usa la línea precompilada y consulta el modelo una sola vez"""
+        from src.gpt5.batch_processor_db import BatchProcessorDB, BATCH_SYSTEM_PROMPT
+        db = MagicMock()
+        db.get_model_config.return_value = None
+        proc = BatchProcessorDB(api_key="test", db_connector=db)
+        proc.batch_dir = tmp_path
+
+        products = _products(3)
+        path, _ = asyncio.run(proc.create_batch_file(products, "gpt-5", "", batch_id="b1"))
+        lines = [json.loads(l) for l in open(path, encoding="utf-8")]
+        assert [l["custom_id"] for l in lines] == ["b1_0_fp000000", "b1_1_fp000000", "b1_2_fp000000"]
+        assert lines[1]["body"]["messages"] == [
+            {"role": "system", "content": BATCH_SYSTEM_PROMPT},
+            {"role": "user", "content": "Producto: Samsung Galaxy A55 1GB  Negro\nCategoría: smartphones\n"
+                                        "Precio: $100,001 CLP\nRetailer: Ripley\n\nExtrae: marca, modelo, atributos clave"}]
+        assert lines[0]["body"]["max_completion_tokens"] == 400
+        assert db.get_model_config.call_count == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 Tests para el rate limiter compartido
+========================================
+Valida adquisición atómica multi-bucket (requests + tokens), el backend SQLite
+entre procesos y el backend Redis cuando hay un servidor disponible
+"""
+
+import asyncio
+import multiprocessing
+import os
+import time
+
+import pytest
+
+from src.gpt5.rate_backends import BucketSpec, SQLiteBucketBackend, RedisBucketBackend
+from src.gpt5.throttling import RateLimiter
+
+
+def _limiter(backend=None, rpm=None, tpm=None):
+    limiter = RateLimiter(backend=backend)
+    if rpm is not None:
+        bucket = limiter.request_buckets['gpt-5']
+        bucket.capacity = bucket.tokens = rpm
+        bucket.refill_rate = rpm / 60
+    if tpm is not None:
+        bucket = limiter.token_buckets['gpt-5']
+        bucket.capacity = bucket.tokens = tpm
+        bucket.refill_rate = tpm / 60
+    return limiter
+
+
+def _hammer(path, seconds, granted):
+    """Worker: adquiere sin pausa contra el backend compartido durante `seconds`"""
+    async def run():
+        limiter = RateLimiter(backend=SQLiteBucketBackend(path))
+        bucket = limiter.request_buckets['gpt-5']
+        bucket.capacity, bucket.refill_rate = 10, 20.0
+        n = 0
+        end = time.time() + seconds
+        while time.time() < end:
+            if await limiter.acquire('gpt-5', estimated_tokens=1):
+                n += 1
+            else:
+                await asyncio.sleep(0.005)
+        granted.put(n)
+    asyncio.run(run())
+
+
+class TestLocalAtomicAcquire:
+    """🪣 Buckets en memoria"""
+
+    def test_token_shortage_does_not_spend_request(self):
+        """✅ Si faltan tokens, el bucket de requests queda intacto"""
+        limiter = _limiter(rpm=5, tpm=100)
+        limiter.token_buckets['gpt-5'].tokens = 10
+        limiter.token_buckets['gpt-5'].refill_rate = 1e-6
+        before = limiter.request_buckets['gpt-5'].tokens
+
+        assert asyncio.run(limiter.acquire('gpt-5', estimated_tokens=50)) is False
+        assert limiter.request_buckets['gpt-5'].tokens >= before
+        assert limiter.stats['requests_throttled'] == 1
+
+    def test_oversized_request_clamped_to_capacity(self):
+        """✅ Un request más grande que el bucket entero igual puede pasar"""
+        limiter = _limiter(tpm=1000)
+        assert asyncio.run(limiter.acquire('gpt-5', estimated_tokens=5000))
+
+    def test_backoff_gives_up_when_wait_exceeds_patience(self):
+        """✅ Sin chance de capacidad dentro del plazo, no duerme en vano"""
+        limiter = _limiter()
+        limiter.request_buckets['gpt-5'].tokens = 0
+        limiter.request_buckets['gpt-5'].refill_rate = 1e-6
+
+        t0 = time.perf_counter()
+        assert asyncio.run(limiter.acquire_with_backoff('gpt-5', max_retries=3)) is False
+        assert time.perf_counter() - t0 < 0.5
+
+    def test_backend_error_falls_back_to_local(self):
+        """✅ Backend caído: se degrada a buckets locales y se cuenta el error"""
+        class Broken:
+            async def acquire(self, specs, consume=True):
+                raise ConnectionError("redis caído")
+
+        limiter = _limiter(backend=Broken())
+        assert asyncio.run(limiter.acquire('gpt-5'))
+        assert limiter.stats['backend_errors'] == 1
+
+
+class TestSQLiteBackend:
+    """🗄️ Buckets compartidos en un archivo SQLite"""
+
+    def test_multi_bucket_all_or_nothing(self, tmp_path):
+        """✅ requests + tokens se descuentan juntos o ninguno"""
+        backend = SQLiteBucketBackend(str(tmp_path / "rl.sqlite"))
+        req = BucketSpec("m:requests", capacity=5, refill_rate=1e-6, amount=1)
+
+        async def run():
+            assert (await backend.acquire([req, BucketSpec("m:tokens", 100, 1e-6, 80)]))[0]
+            ok, wait = await backend.acquire([req, BucketSpec("m:tokens", 100, 1e-6, 80)])
+            assert not ok and wait > 0
+            # El intento fallido no gastó el request: quedan 4
+            grants = [(await backend.acquire([req]))[0] for _ in range(5)]
+            assert grants == [True] * 4 + [False]
+
+        asyncio.run(run())
+
+    def test_peek_does_not_consume(self, tmp_path):
+        """✅ consume=False solo consulta"""
+        backend = SQLiteBucketBackend(str(tmp_path / "rl.sqlite"))
+        spec = BucketSpec("m:requests", capacity=1, refill_rate=1e-6, amount=1)
+
+        async def run():
+            assert (await backend.acquire([spec], consume=False))[0]
+            assert (await backend.acquire([spec]))[0]
+            assert not (await backend.acquire([spec], consume=False))[0]
+
+        asyncio.run(run())
+
+    def test_processes_share_budget(self, tmp_path):
+        """✅ Varios procesos juntos no superan capacidad + recarga·t"""
+        path = str(tmp_path / "rl.sqlite")
+        ctx = multiprocessing.get_context("fork")
+        granted = ctx.Queue()
+        seconds = 1.0
+        workers = [ctx.Process(target=_hammer, args=(path, seconds, granted)) for _ in range(3)]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join(timeout=30)
+        total = sum(granted.get(timeout=5) for _ in workers)
+
+        # Ventana real algo mayor que `seconds` (arranque escalonado de los procesos)
+        assert total <= 10 + 20.0 * (seconds + 0.5)
+        assert total >= 10 + 20.0 * seconds * 0.5
+
+
+@pytest.mark.skipif(not os.getenv("REDIS_URL"), reason="Requiere REDIS_URL con un servidor Redis")
+class TestRedisBackend:
+    """🔴 Script Lua atómico en Redis"""
+
+    def test_multi_bucket_all_or_nothing(self):
+        """✅ Misma semántica que SQLite usando el reloj del servidor"""
+        async def run():
+            backend = RedisBucketBackend(os.environ["REDIS_URL"], namespace=f"test:{os.getpid()}")
+            req = BucketSpec("m:requests", capacity=2, refill_rate=1e-6, amount=1)
+            try:
+                assert (await backend.acquire([req, BucketSpec("m:tokens", 100, 1e-6, 80)]))[0]
+                assert not (await backend.acquire([req, BucketSpec("m:tokens", 100, 1e-6, 80)]))[0]
+                assert (await backend.acquire([req]))[0]
+                assert not (await backend.acquire([req]))[0]
+            finally:
+                await backend.client.delete(*[f"{backend.namespace}:m:{k}" for k in ("requests", "tokens")])
+                await backend.close()
+
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
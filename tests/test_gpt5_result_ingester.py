@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 Tests para la ingesta streaming de resultados Batch API
+==========================================================
+Valida escritura masiva por chunk, validación, checkpoint/reanudación y
+equivalencia del pool de procesos con la ruta en proceso
+"""
+
+import json
+import pytest
+from unittest.mock import MagicMock
+
+from src.gpt5.result_ingester import BatchResultIngester
+
+
+def _write_results(path, n, bad=()):
+    item_map = {}
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(n):
+            custom_id = f"b1_{i}_fp{i:05d}"
+            item_map[custom_id] = [f"fp{i:05d}-full"]
+            content = "{not json" if i in bad else json.dumps({
+                "brand": "LENOVO", "model": f"IdeaPad {i}", "normalized_name": f"Lenovo IdeaPad {i}",
+                "category_suggestion": "notebooks", "attributes": {}, "confidence": 0.9
+            })
+            f.write(json.dumps({"custom_id": custom_id, "response": {"status_code": 200, "body": {
+                "model": "gpt-5-mini",
+                "usage": {"prompt_tokens": 40, "completion_tokens": 30, "total_tokens": 70},
+                "choices": [{"message": {"content": content}}]}}}) + "\n")
+    return item_map
+
+
+def _cache_recorder():
+    cache = MagicMock()
+    cache.written = []
+    cache.set_many.side_effect = lambda entries, **kw: cache.written.extend(
+        e["fingerprint"] for e in entries) or len(entries)
+    return cache
+
+
+class TestBatchResultIngester:
+    """📥 Ingesta por chunks con checkpoint"""
+
+    def test_bulk_writes_per_chunk(self, tmp_path):
+        """✅ Un upsert masivo por chunk en cache IA y L1, no uno por línea"""
+        path = tmp_path / "r.jsonl"
+        item_map = _write_results(path, 2500, bad={7})
+        cache, l1 = _cache_recorder(), MagicMock()
+
+        report = BatchResultIngester(cache, l1_cache=l1, chunk_size=1000, workers=1).ingest(
+            str(path), "b1", item_map)
+
+        assert cache.set_many.call_count == 3 and l1.set_many.call_count == 3
+        assert report.successful == 2499 and report.failed == 1
+        assert report.tokens_input == 40 * 2500
+        assert len(report.done) == 2499 and "fp00007-full" not in report.done
+        assert all(r["quality_score"] is not None for r in report.results)
+
+    def test_resume_from_checkpoint(self, tmp_path):
+        """✅ Tras un fallo reanuda desde el último chunk confirmado sin reescribirlo"""
+        path = tmp_path / "r.jsonl"
+        item_map = _write_results(path, 2500)
+        cache = _cache_recorder()
+        calls = {"n": 0}
+
+        def flaky(entries, **kw):
+            calls["n"] += 1
+            if calls["n"] == 2:
+                raise ConnectionError("db caída")
+            cache.written.extend(e["fingerprint"] for e in entries)
+
+        cache.set_many.side_effect = flaky
+        ingester = BatchResultIngester(cache, chunk_size=1000, workers=1)
+        with pytest.raises(ConnectionError):
+            ingester.ingest(str(path), "b1", item_map)
+        assert len(cache.written) == 1000
+
+        report = ingester.ingest(str(path), "b1", item_map)
+        assert report.resumed_from > 0
+        assert len(cache.written) == 2500 and len(set(cache.written)) == 2500
+        assert report.successful == 2500 and len(report.done) == 2500
+        assert len(report.results) == 1500
+
+    def test_truncated_checkpoint_reapplies_chunk(self, tmp_path):
+        """✅ Una línea de checkpoint truncada se descarta y su chunk se reaplica"""
+        path = tmp_path / "r.jsonl"
+        item_map = _write_results(path, 30)
+        ingester = BatchResultIngester(_cache_recorder(), chunk_size=10, workers=1)
+        ingester.ingest(str(path), "b1", item_map)
+
+        ckpt = tmp_path / "r.jsonl.ckpt"
+        lines = ckpt.read_text(encoding="utf-8").splitlines(keepends=True)
+        ckpt.write_text("".join(lines[:2]) + lines[2][:15], encoding="utf-8")
+
+        report = ingester.ingest(str(path), "b1", item_map)
+        assert report.chunks == 1 and len(report.done) == 30
+        assert len(ckpt.read_text(encoding="utf-8").splitlines()) == 3
+
+    def test_process_pool_matches_in_process(self, tmp_path):
+        """✅ El pool de procesos produce el mismo resultado que la ruta en proceso"""
+        path = tmp_path / "r.jsonl"
+        item_map = _write_results(path, 600, bad={3, 300})
+
+        serial = BatchResultIngester(_cache_recorder(), chunk_size=100, workers=1).ingest(
+            str(path), "b1", item_map)
+        (tmp_path / "r.jsonl.ckpt").unlink()
+        pooled = BatchResultIngester(_cache_recorder(), chunk_size=100, workers=2,
+                                     parallel_min_bytes=0).ingest(str(path), "b1", item_map)
+
+        assert pooled.done == serial.done
+        assert (pooled.successful, pooled.failed) == (serial.successful, serial.failed)
+        assert [r["fingerprint"] for r in pooled.results] == [r["fingerprint"] for r in serial.results]
+
+
+class TestAICacheSetMany:
+    """💾 Upsert masivo en ai_metadata_cache"""
+
+    def test_single_statement_last_wins(self, monkeypatch):
+        """✅ Un execute_values por llamada; fingerprints repetidos se colapsan"""
+        from src.gpt5_db_connector import GPT5AICache
+        captured = {}
+        monkeypatch.setattr("src.gpt5_db_connector.extras.execute_values",
+                            lambda cur, sql, rows, page_size: captured.update(sql=sql, rows=rows))
+        connector = MagicMock()
+        conn = connector.get_connection.return_value.__enter__.return_value
+
+        n = GPT5AICache(connector).set_many([
+            {"fingerprint": "a", "metadata": {"brand": "X"}},
+            {"fingerprint": "b", "metadata": {"brand": "Y"}},
+            {"fingerprint": "a", "metadata": {"brand": "Z"}},
+        ])
+
+        assert n == 2 and conn.commit.call_count == 1
+        assert "VALUES %s" in captured["sql"]
+        assert [r[1] for r in captured["rows"]] == ["Z", "Y"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 Tests para el router GPT-5
+=============================
+Valida complejidad vectorizada (idéntica a la fórmula original), carga masiva
+desde cache y ajuste de umbrales desde métricas históricas
+"""
+
+import re
+import pytest
+from unittest.mock import MagicMock
+
+from src.gpt5.router import GPT5Router, ComplexityAnalyzer, fit_complexity_threshold
+
+PRODUCTS = [
+    {"name": "iPhone 15 Pro Max 256GB Negro", "category": "smartphones", "price": 1200000},
+    {"name": "Perfume Chanel No 5 100ml", "category": "perfumes", "price": 150000},
+    {"name": "Notebook ASUS ROG Strix G16 RTX 4070 32GB RAM 1TB SSD DDR5 WiFi", "category": "notebooks",
+     "price": 2500000},
+    {"name": "Coca Cola 500ml", "category": "beverages", "price": 1500},
+    {"name": "Samsung Galaxy S24 Ultra 512GB 5G / LTE, 12 GB", "category": "smartphones", "price": 600000},
+    {"name": "Cable USB-C a HDMI DisplayPort", "category": "", "price": None},
+]
+
+
+def _legacy_complexity(analyzer, product):
+    """Fórmula previa (loop de substrings) como referencia"""
+    name = product.get('name', '').lower()
+    category = product.get('category', '').lower()
+    price = product.get('price') or 0
+    factors = [min(len(name) / 300, 1.0) * 0.15]
+    factors.append(min(sum(1 for t in analyzer.technical_terms if t in name) / 5, 1.0) * 0.25)
+    if category in analyzer.complex_categories:
+        factors.append(analyzer.complex_categories[category] * 0.3)
+    elif category in analyzer.simple_categories:
+        factors.append(analyzer.simple_categories[category] * 0.3)
+    else:
+        factors.append(0.4 * 0.3)
+    if price > 1000000:
+        factors.append(0.8 * 0.15)
+    elif price > 500000:
+        factors.append(0.6 * 0.15)
+    elif price > 100000:
+        factors.append(0.4 * 0.15)
+    else:
+        factors.append(0.2 * 0.15)
+    has_variants = bool(re.search(r'\d+GB|\d+TB|/|\||,\s*\d+', name))
+    factors.append(0.7 * 0.15 if has_variants else 0.2 * 0.15)
+    return sum(factors)
+
+
+def _stats(bins_quality, n=100, category="", big_cost=0.002, mini_cost=0.0003):
+    """Filas agregadas tipo get_routing_stats: {bin: calidad de mini}"""
+    rows = []
+    for b, q in bins_quality.items():
+        ok = int(n * q)
+        rows.append({"category": category, "bin": b, "model": "gpt-5-mini", "request_type": "single",
+                     "success": True, "n": ok, "cost_usd": mini_cost})
+        rows.append({"category": category, "bin": b, "model": "gpt-5", "request_type": "fallback",
+                     "success": True, "n": n - ok, "cost_usd": big_cost})
+    return rows
+
+
+class TestComplexityAnalyzer:
+    """📐 Complejidad vectorizada"""
+
+    def test_batch_matches_legacy_formula(self):
+        """✅ La pasada vectorizada reproduce exactamente la fórmula original"""
+        analyzer = ComplexityAnalyzer()
+        batch = analyzer.calculate_complexity_batch(PRODUCTS)
+        for product, score in zip(PRODUCTS, batch):
+            assert score == pytest.approx(_legacy_complexity(analyzer, product), abs=1e-12)
+            assert analyzer.calculate_complexity(product) == pytest.approx(score, abs=1e-12)
+
+    def test_overlapping_terms_counted(self):
+        """✅ Términos solapados ('64gb' contiene '4g' y 'gb') cuentan como en el loop"""
+        analyzer = ComplexityAnalyzer()
+        found = set(analyzer._technical_re.findall("ssd 64gb"))
+        assert found == {"ssd", "4g", "gb"}
+
+
+class TestRouteMany:
+    """📦 Routing en bloque"""
+
+    def test_bulk_cache_and_save(self):
+        """✅ Una query de cache y un guardado en bloque solo para lo calculado"""
+        db = MagicMock()
+        db.get_complexity_analyses.return_value = {"fp0": {"complexity_score": 0.9}}
+        router = GPT5Router(db)
+        products = [dict(p, fingerprint=f"fp{i}") for i, p in enumerate(PRODUCTS)]
+
+        routed = router.route_many(products, save=True)
+
+        assert db.get_complexity_analyses.call_count == 1
+        assert routed[0][:2] == ("gpt-5", 0.9)
+        saved = db.save_complexity_analyses.call_args[0][0]
+        assert sorted(a["fingerprint"] for a in saved) == [f"fp{i}" for i in range(1, len(PRODUCTS))]
+        assert [r[0] for r in routed[1:]] == [router.route_single(p)[0].value for p in products[1:]]
+
+
+class TestFitThresholds:
+    """🎯 Umbrales aprendidos de processing_metrics"""
+
+    def test_threshold_rises_when_mini_quality_holds(self):
+        """✅ Si mini mantiene calidad en bins altos, más tráfico va a mini"""
+        stats = _stats({b: 0.95 for b in range(5, 17)})
+        assert fit_complexity_threshold(stats, current=0.7) == 0.8
+
+    def test_threshold_drops_at_first_bad_bin(self):
+        """✅ Desde el primer bin con calidad insuficiente todo va a GPT-5"""
+        stats = _stats({**{b: 0.95 for b in range(5, 12)}, 12: 0.6, 13: 0.95})
+        assert fit_complexity_threshold(stats, current=0.7) == 0.55
+
+    def test_expensive_escalations_route_to_big(self):
+        """✅ Calidad suficiente pero escalamientos que encarecen -> GPT-5"""
+        stats = _stats({10: 0.86}, mini_cost=0.0019, big_cost=0.002)
+        assert fit_complexity_threshold(stats, current=0.7) == 0.45
+
+    def test_sparse_bins_ignored_and_per_category(self):
+        """✅ Bins sin muestras no cuentan; categorías con datos tienen umbral propio"""
+        router = GPT5Router()
+        stats = _stats({15: 0.2}, n=10) + _stats({b: 0.95 for b in range(10, 19)}, category="perfumes")
+        fitted = router.fit_thresholds(stats=stats)
+
+        assert fitted["categories"]["perfumes"]["complex"] == 0.9
+        assert router.thresholds["complex"] == 0.9
+        assert router._model_for(0.85, "Perfumes").value == "gpt-5-mini"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
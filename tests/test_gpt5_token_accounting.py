@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 Tests para la contabilidad de tokens y el throttler AIMD
+===========================================================
+Valida pre-carga + liquidación contra el usage real, redimensionado de los
+buckets vivos, retry-after y convergencia al máximo del proveedor
+"""
+
+import asyncio
+import pytest
+
+from src.gpt5.rate_backends import BucketSpec, SQLiteBucketBackend
+from src.gpt5.throttling import AdaptiveThrottler, RateLimiter, parse_rate_limit_headers
+from src.gpt5.token_accounting import TokenAccountant
+
+MESSAGES = [{"role": "system", "content": "Responde en JSON."},
+            {"role": "user", "content": "Normaliza: Notebook Lenovo IdeaPad 3 15ITL6 8GB 256GB SSD"}]
+
+
+class RateLimitError(Exception):
+    """Error 429 con headers, como los del cliente OpenAI"""
+
+    def __init__(self, headers):
+        super().__init__("Error code: 429 - rate limit reached")
+        self.status_code = 429
+        self.headers = headers
+
+
+class TestSettlement:
+    """🧮 Pre-carga y liquidación"""
+
+    def test_settle_debits_underestimate(self):
+        """✅ Si el usage real supera lo pre-cargado, la diferencia se descuenta"""
+        limiter = RateLimiter()
+        bucket = limiter.token_buckets['gpt-5']
+        bucket.refill_rate = 1e-9
+        accountant = TokenAccountant(limiter)
+
+        async def run():
+            reservation = await accountant.reserve('gpt-5', MESSAGES, max_completion_tokens=500)
+            after_reserve = bucket.tokens
+            await accountant.settle(reservation, usage={
+                'prompt_tokens': 40, 'completion_tokens': 400, 'total_tokens': reservation.charged + 300})
+            return after_reserve
+
+        after_reserve = asyncio.run(run())
+        assert bucket.tokens == pytest.approx(after_reserve - 300, abs=1e-3)
+        assert accountant.stats['settled'] == 1
+
+    def test_fail_refunds_reservation(self):
+        """✅ Un request fallido devuelve al bucket todo lo pre-cargado"""
+        limiter = RateLimiter()
+        bucket = limiter.token_buckets['gpt-5']
+        bucket.refill_rate = 1e-9
+        accountant = TokenAccountant(limiter)
+
+        async def run():
+            before = bucket.tokens
+            reservation = await accountant.reserve('gpt-5', MESSAGES, max_completion_tokens=500)
+            assert bucket.tokens == pytest.approx(before - reservation.charged, abs=1e-3)
+            await accountant.fail(reservation, RuntimeError("connection reset"))
+            return before
+
+        before = asyncio.run(run())
+        assert bucket.tokens == pytest.approx(before, abs=1e-3)
+        assert accountant.stats['refunded'] == 1
+        assert accountant.stats['rate_limited'] == 0
+
+    def test_completion_ratio_learned(self):
+        """✅ La salida esperada se aprende del usage y sube la pre-carga siguiente"""
+        accountant = TokenAccountant(RateLimiter(), alpha=0.5)
+        _, before = accountant.estimate('gpt-5-mini', MESSAGES, 500)
+
+        async def run():
+            for _ in range(5):
+                r = await accountant.reserve('gpt-5-mini', MESSAGES, 500)
+                await accountant.settle(r, usage={'prompt_tokens': 50, 'completion_tokens': 200,
+                                                  'total_tokens': 250})
+
+        asyncio.run(run())
+        _, after = accountant.estimate('gpt-5-mini', MESSAGES, 500)
+        assert accountant.completion_ratio['gpt-5-mini'] > 3
+        assert after > before
+
+    def test_sqlite_debt_shared(self, tmp_path):
+        """✅ El ajuste sin chequeo deja deuda visible para todos los procesos"""
+        backend = SQLiteBucketBackend(str(tmp_path / "rl.sqlite"))
+        spec = BucketSpec("m:tokens", capacity=100, refill_rate=1e-6, amount=150)
+
+        async def run():
+            assert await backend.adjust(spec) == pytest.approx(-50)
+            ok, wait = await backend.acquire([BucketSpec("m:tokens", 100, 1e-6, 1)])
+            assert not ok and wait > 0
+
+        asyncio.run(run())
+
+
+class TestAdaptiveThrottler:
+    """📈 AIMD sobre los buckets vivos"""
+
+    def test_rate_limit_shrinks_live_bucket_once_per_burst(self):
+        """✅ Un 429 recorta el bucket real (no solo la config), una vez por ráfaga"""
+        limiter = RateLimiter()
+        throttler = AdaptiveThrottler(limiter)
+        accountant = TokenAccountant(limiter, throttler)
+
+        async def run():
+            for _ in range(3):
+                r = await accountant.reserve('gpt-5', MESSAGES, 500)
+                await accountant.fail(r, RateLimitError({'retry-after-ms': '10'}))
+
+        asyncio.run(run())
+        assert limiter.request_buckets['gpt-5'].capacity == 70
+        assert limiter.request_buckets['gpt-5'].refill_rate == pytest.approx(70 / 60)
+        assert limiter.token_buckets['gpt-5'].capacity == 35000
+        assert throttler.stats['decreases'] == 1
+
+    def test_retry_after_blocks_requests(self):
+        """✅ retry-after vacía el bucket y la espera sugerida lo respeta"""
+        limiter = RateLimiter()
+        throttler = AdaptiveThrottler(limiter)
+
+        async def run():
+            await throttler.observe('gpt-5-mini', headers={'Retry-After': '3'}, rate_limited=True)
+            return await limiter._try_acquire('gpt-5-mini', 1, consume=False)
+
+        ok, wait = asyncio.run(run())
+        assert not ok and wait == pytest.approx(3, abs=0.05)
+
+    def test_converges_to_provider_limit(self):
+        """✅ Sube hasta el límite que informan los headers, recorta ante 429 y se recupera"""
+        limiter = RateLimiter()
+        throttler = AdaptiveThrottler(limiter, decrease_cooldown=0)
+        headers = {'x-ratelimit-limit-requests': '800', 'x-ratelimit-limit-tokens': '400000'}
+
+        def interval(rate_limited=False):
+            asyncio.run(throttler.observe('gpt-5-mini', headers=headers, rate_limited=rate_limited))
+            throttler.performance_window.append({'model': 'gpt-5-mini', 'success': True, 'latency_ms': 900})
+            throttler._adjust_limits()
+
+        for _ in range(40):
+            interval()
+        assert limiter.configs['gpt-5-mini'].requests_per_minute == 800
+        assert limiter.request_buckets['gpt-5-mini'].capacity == 800
+        assert limiter.token_buckets['gpt-5-mini'].capacity == 400000
+
+        interval(rate_limited=True)
+        assert limiter.request_buckets['gpt-5-mini'].capacity == 560
+        for _ in range(10):
+            interval()
+        assert limiter.request_buckets['gpt-5-mini'].capacity == 800
+
+    def test_header_parsing(self):
+        """✅ Duraciones tipo '6m0s' / '20ms' y limits numéricos"""
+        info = parse_rate_limit_headers({'x-ratelimit-reset-requests': '6m0s',
+                                         'x-ratelimit-reset-tokens': '20ms',
+                                         'x-ratelimit-remaining-tokens': '0'})
+        assert info == {'reset_requests': 360.0, 'reset_tokens': 0.02, 'remaining_tokens': 0.0}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 Tests para la validación por lotes de StrictValidator
+========================================================
+Valida que validate_batch / validate_normalized_batch den exactamente el mismo
+veredicto (y las mismas mutaciones) que las versiones escalares, y que el lote
+resuelva marcas, reglas y normalización una vez por valor distinto
+"""
+
+import copy
+import random
+
+import pytest
+
+from src.gpt5.validator import StrictValidator
+
+CATEGORIES = ["smartphones", "notebooks", "smart_tv", "perfumes", "general", ""]
+BRANDS = ["Samsung", "apple", "XIAOMI", "Lenovo", "Dior", "x", "", None, "Marca Rara"]
+
+ATTR_VALUES = {
+    "capacity": ["128GB", "256gb", "1TB", "grande", 128, ""],
+    "color": ["Negro", "Azul", ""],
+    "screen_size": ["6.1", 6.7, "", "enorme", 15.6, 55, "120", None],
+    "network": ["5G", "4G", "3G", "LTE"],
+    "ram": ["8GB", "16 GB", 8],
+    "storage": ["512GB", "1TB", "SSD"],
+    "processor": ["i7", "M2"],
+    "panel": ["OLED", "LED", "CRT"],
+    "resolution": ["4K", "8K", "720p"],
+    "volume_ml": [100, "50", "mucho", 1000, 2.5],
+    "concentration": ["EDP", "EDT", "Parfum"],
+    "gender": ["Hombre", "Unisex", "Niño"],
+    "weight": ["1.5kg", 1, True, 1.0],
+}
+
+
+def _result(rng: random.Random) -> dict:
+    result = {
+        "brand": rng.choice(BRANDS),
+        "model": rng.choice(["Galaxy A55", "MacBook Air", "X1", ""]),
+        "normalized_name": rng.choice(["Samsung Galaxy A55 256GB", "A55", "", None]),
+        "confidence": rng.choice([0.95, 0.8, 0.55, 0.3, 1, True]),
+        "category_suggestion": rng.choice(CATEGORIES),
+        "attributes": {k: rng.choice(v) for k, v in rng.sample(sorted(ATTR_VALUES.items()), rng.randint(0, 6))},
+    }
+    for field in rng.sample(["model", "normalized_name", "attributes"], rng.randint(0, 1)):
+        del result[field]
+    return result
+
+
+def _corpus(n: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    return [_result(rng) for _ in range(n)]
+
+
+@pytest.fixture(scope="module")
+def validator():
+    return StrictValidator()
+
+
+class TestEquivalence:
+    """⚖️ Mismo resultado que el camino escalar"""
+
+    def test_validate_batch_matches_complete(self, validator):
+        """✅ Veredicto, warnings en orden y mutaciones in-place idénticos a validate_complete"""
+        results = _corpus(3000)
+        bases = [random.Random(i).choice(CATEGORIES + [None]) for i in range(len(results))]
+        expected_results = copy.deepcopy(results)
+        expected = [validator.validate_complete(r, b) for r, b in zip(expected_results, bases)]
+
+        got = validator.validate_batch(results, bases)
+        assert got == expected
+        assert results == expected_results
+        assert all(g["result"] is r for g, r in zip(got, results))
+
+    def test_odd_types_fall_back(self, validator):
+        """✅ Tipos que el escalar rechaza quedan inválidos sin abortar el lote"""
+        results = [
+            {"brand": "Samsung", "model": "A55", "normalized_name": "Samsung A55",
+             "attributes": {"capacity": "128GB"}},                                  # sin confidence
+            {"brand": 123, "model": "A55", "normalized_name": "x", "attributes": {}, "confidence": 0.9},
+            {"brand": "Apple", "model": "X", "normalized_name": "Apple X", "confidence": 0.9,
+             "attributes": {"color": ["Negro", "Azul"], "size": {"cm": 15}}},       # no hasheables
+            {"brand": "Dior", "model": "Sauvage", "normalized_name": "Dior Sauvage",
+             "attributes": {"volume_ml": 100}, "confidence": 0.9, "category_suggestion": "perfumes"},
+        ]
+        got = validator.validate_batch(results, "general")
+
+        assert [g["valid"] for g in got] == [False, False, True, True]
+        assert got[0]["errors"][0].startswith("Validation error:")
+        assert got[1]["needs_fallback"] is True
+        assert got[2]["result"]["attributes"]["color"] == ["Negro", "Azul"]
+
+    def test_validate_normalized_batch_matches_scalar(self, validator):
+        """✅ validate_normalized_batch == validate_normalized por item"""
+        items = _corpus(2000, seed=11)
+        for i, data in enumerate(items):
+            if i % 5 == 0:
+                data.pop("category_suggestion")
+        bases = [data.get("category_suggestion", "general") for data in items]
+        expected_items = copy.deepcopy(items)
+        expected = [validator.validate_normalized(d, b) for d, b in zip(expected_items, bases)]
+
+        assert validator.validate_normalized_batch(list(zip(items, bases))) == expected
+        assert items == expected_items
+
+    def test_empty(self, validator):
+        """✅ Lotes vacíos"""
+        assert validator.validate_batch([]) == []
+        assert validator.validate_normalized_batch([]) == []
+
+
+def _fuzz_value(rng: random.Random):
+    """Valor de atributo arbitrario: tipos mezclados, unidades, espacios y casos borde"""
+    number = rng.choice([0, 1, 2.5, 6.1, 55, 128, 1000, -3, 1e9])
+    unit = rng.choice(["GB", "gb", " GB", "TB", "ml", " pulgadas", '"'])
+    return rng.choice([
+        number, str(number), f"{number}{unit}",
+        rng.choice(["", " ", "N/A", "negro", "OLED", "5G", "EDP", "Unisex", "ñandú", "4K"]),
+        None, True, False, rng.choice(list(ATTR_VALUES.values()))[0],
+    ])
+
+
+def _fuzz_result(rng: random.Random) -> dict:
+    keys = sorted(ATTR_VALUES) + ["desconocido", "Capacity", "screen size", "weight_kg"]
+    result = {
+        "brand": rng.choice(BRANDS + ["SAMSUNG ", "Äpple", "lenovo", 0]),
+        "model": rng.choice(["Galaxy A55", "", None, "X" * 120, 55]),
+        "normalized_name": rng.choice(["Samsung Galaxy A55 256GB", "A55", "", None, "a" * 300]),
+        "confidence": rng.choice([0.0, 0.49, 0.5, 0.7, 0.99, 1, 1.5, -0.1, True]),
+        "category_suggestion": rng.choice(CATEGORIES + ["Smartphones", "desconocida", None]),
+        "attributes": {k: _fuzz_value(rng) for k in rng.sample(keys, rng.randint(0, 8))},
+    }
+    # Sin confidence el escalar lanza (el lote lo marca inválido, ver test_odd_types_fall_back)
+    for field in rng.sample(sorted(set(result) - {"confidence"}), rng.randint(0, 2)):
+        del result[field]
+    return result
+
+
+class TestRandomizedEquivalence:
+    """🎲 Lote vs escalar sobre registros aleatorios (varias semillas)"""
+
+    @pytest.mark.parametrize("seed", range(20))
+    def test_batch_paths_match_per_record(self, validator, seed):
+        """✅ validate_batch y validate_normalized_batch == validate_complete / validate_normalized por registro"""
+        rng = random.Random(seed)
+        records = [_fuzz_result(rng) for _ in range(rng.randint(1, 300))]
+        # Registros repetidos (mismo contenido) para ejercitar la memoización del lote
+        records += [copy.deepcopy(rng.choice(records)) for _ in range(len(records) // 4)]
+        rng.shuffle(records)
+        bases = [rng.choice(CATEGORIES + [None, "Smartphones"]) for _ in records]
+
+        complete_in, complete_ref = copy.deepcopy(records), copy.deepcopy(records)
+        expected = [validator.validate_complete(r, b) for r, b in zip(complete_ref, bases)]
+        assert validator.validate_batch(complete_in, bases) == expected
+        assert complete_in == complete_ref
+
+        normalized_bases = [b or "general" for b in bases]
+        normalized_in, normalized_ref = copy.deepcopy(records), copy.deepcopy(records)
+        expected = [validator.validate_normalized(r, b) for r, b in zip(normalized_ref, normalized_bases)]
+        assert validator.validate_normalized_batch(list(zip(normalized_in, normalized_bases))) == expected
+        assert normalized_in == normalized_ref
+
+
+class TestDeduplication:
+    """♻️ Trabajo por valor distinto, no por registro"""
+
+    def test_lookups_once_per_distinct_value(self, validator, monkeypatch):
+        """✅ Marcas, reglas y normalización se evalúan una vez por valor distinto del lote"""
+        calls = {"brand": 0, "normalize": 0, "rule": 0}
+        original_brand, original_normalize = validator.validate_brand, validator._normalize_value
+        rule = validator.attribute_schemas["smartphones"]["validators"]["capacity"]
+        original_check = rule.check_many
+
+        def count(name, fn):
+            def wrapper(*args):
+                calls[name] += 1
+                return fn(*args)
+            return wrapper
+
+        monkeypatch.setattr(validator, "validate_brand", count("brand", original_brand))
+        monkeypatch.setattr(validator, "_normalize_value", count("normalize", original_normalize))
+        monkeypatch.setattr(type(rule), "check_many",
+                            lambda self, values: (calls.__setitem__("rule", calls["rule"] + len(values))
+                                                  or original_check(values)))
+
+        results = [{"brand": brand, "model": "A55", "normalized_name": "Galaxy A55", "confidence": 0.9,
+                    "category_suggestion": "smartphones",
+                    "attributes": {"capacity": capacity, "color": "Negro"}}
+                   for _ in range(500) for brand in ("Samsung", "Marca Rara") for capacity in ("128GB", "1tb")]
+        verdicts = validator.validate_batch(results)
+
+        assert len(verdicts) == 2000 and all(v["valid"] for v in verdicts)
+        assert calls == {"brand": 2, "normalize": 3, "rule": 2}
+        assert verdicts[1]["result"]["attributes"] is not verdicts[5]["result"]["attributes"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 Tests para la cola de procesamiento con prioridad
+====================================================
+Valida el cálculo de prioridad, el reparto urgente/cola larga del consumidor,
+reintentos con visibilidad, leases vencidos y la consulta de claim
+"""
+
+import asyncio
+import itertools
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.gpt5.work_queue import PriorityPolicy, ProcessingQueue, QueueConsumer
+
+NOW = datetime(2026, 10, 19, 12, 0, tzinfo=timezone.utc)
+
+
+class InMemoryQueue:
+    """Doble de ProcessingQueue con la misma semántica (prioridad, leases, visibilidad)"""
+
+    def __init__(self, max_retries=3):
+        self.rows = {}
+        self.max_retries = max_retries
+        self._ids = itertools.count(1)
+        self._clock = itertools.count()
+
+    def enqueue(self, items):
+        for fingerprint, product, model, priority in items:
+            live = next((r for r in self.rows.values() if r['fingerprint'] == fingerprint
+                         and r['status'] in ('pending', 'processing')), None)
+            if live:
+                live['priority'] = max(live['priority'], priority)
+                continue
+            row_id = next(self._ids)
+            self.rows[row_id] = {'id': row_id, 'fingerprint': fingerprint, 'product_data': product,
+                                 'assigned_model': model, 'priority': priority, 'status': 'pending',
+                                 'retry_count': 0, 'created_at': next(self._clock),
+                                 'locked_by': None, 'visible': True, 'batch_id': None}
+        return len(items)
+
+    def claim(self, worker_id, limit, lease_seconds=300, min_priority=1, max_priority=10):
+        ready = sorted((r for r in self.rows.values() if r['status'] == 'pending' and r['visible']
+                        and min_priority <= r['priority'] <= max_priority),
+                       key=lambda r: (-r['priority'], r['created_at']))[:limit]
+        for r in ready:
+            r.update(status='processing', locked_by=worker_id)
+        return [dict(r) for r in ready]
+
+    def backlog(self, max_priority=10):
+        pending = [r for r in self.rows.values() if r['status'] == 'pending'
+                   and r['visible'] and r['priority'] <= max_priority]
+        return {'pending': len(pending), 'oldest_seconds': 0.0}
+
+    def _owned(self, ids, worker_id):
+        return [self.rows[i] for i in ids
+                if self.rows[i]['locked_by'] == worker_id and self.rows[i]['status'] == 'processing']
+
+    def extend(self, ids, worker_id, lease_seconds=300):
+        return len(self._owned(ids, worker_id))
+
+    def complete(self, ids, worker_id, batch_id=None):
+        rows = self._owned(ids, worker_id)
+        for r in rows:
+            r.update(status='completed', batch_id=batch_id, locked_by=None)
+        return len(rows)
+
+    def fail(self, ids, worker_id, error):
+        rows = self._owned(ids, worker_id)
+        for r in rows:
+            r['retry_count'] += 1
+            r.update(status='failed' if r['retry_count'] >= self.max_retries else 'pending',
+                     visible=False, locked_by=None)
+        return len(rows)
+
+    def release_expired(self):
+        expired = [r for r in self.rows.values() if r['status'] == 'processing' and r.get('expired')]
+        for r in expired:
+            r['retry_count'] += 1
+            r.update(status='pending', locked_by=None, expired=False)
+        return len(expired)
+
+
+class FakeDaemon:
+    def __init__(self):
+        self.jobs = []
+
+    def submit(self, products, model, packed=False):
+        self.jobs.append((model, [p['fingerprint'] for p in products]))
+        return f"batch_{len(self.jobs)}"
+
+
+def _items(n, priority, prefix="fp"):
+    return [(f"{prefix}{i}", {"name": f"Producto {i}"}, "gpt-5-mini", priority) for i in range(n)]
+
+
+class TestPriorityPolicy:
+    """🎯 Señales → prioridad 1..10"""
+
+    def test_high_value_fresh_product_is_urgent(self):
+        """✅ Precio alto + recién scrapeado + nuevo llega a tiempo real"""
+        policy = PriorityPolicy()
+        product = {"card_price": 1_299_990, "is_new": True,
+                   "scraped_at": (NOW - timedelta(minutes=20)).isoformat()}
+        assert policy.score(product, now=NOW) == 10
+
+    def test_stale_cheap_product_is_tail(self):
+        """✅ Barato y visto hace meses queda en la cola larga"""
+        policy = PriorityPolicy(retailer_weights={"ripley": -1})
+        product = {"normal_price": 4990, "retailer": "Ripley",
+                   "scraped_at": (NOW - timedelta(days=90)).isoformat()}
+        assert policy.score(product, now=NOW) == 2
+
+    def test_custom_price_extractor(self):
+        """✅ price_of permite reutilizar el extractor de precios del pipeline"""
+        policy = PriorityPolicy(price_of=lambda p: 350_000)
+        assert policy.score({}, now=NOW) == 6
+
+
+class TestQueueConsumer:
+    """⚙️ Urgentes en tiempo real, cola larga a Batch API"""
+
+    def test_urgent_realtime_and_tail_batched(self):
+        """✅ Prioridad ≥ 8 se normaliza al tiro; el resto va a un job de batch"""
+        queue, daemon = InMemoryQueue(), FakeDaemon()
+        queue.enqueue(_items(3, 9, "hot") + _items(5, 3, "tail"))
+        seen = []
+
+        async def realtime(product, model):
+            seen.append(product['name'])
+
+        consumer = QueueConsumer(queue, realtime, batch_daemon=daemon, tail_min_size=5)
+        assert asyncio.run(consumer.run_once()) == 8
+
+        assert len(seen) == 3
+        assert daemon.jobs == [("gpt-5-mini", [f"tail{i}" for i in range(5)])]
+        assert all(r['status'] == 'completed' for r in queue.rows.values())
+        assert {r['batch_id'] for r in queue.rows.values() if r['fingerprint'].startswith('tail')} == {"batch_1"}
+
+    def test_small_tail_waits(self):
+        """✅ Una cola larga chica y reciente espera a juntar más"""
+        queue, daemon = InMemoryQueue(), FakeDaemon()
+        queue.enqueue(_items(3, 3))
+        consumer = QueueConsumer(queue, None, batch_daemon=daemon, tail_min_size=10, tail_max_wait=600)
+        assert asyncio.run(consumer.run_once()) == 0
+        assert not daemon.jobs
+
+    def test_failures_retry_then_fail(self):
+        """✅ Un item que falla vuelve con visibilidad diferida y agota reintentos"""
+        queue = InMemoryQueue(max_retries=2)
+        queue.enqueue(_items(1, 9))
+
+        async def boom(product, model):
+            raise RuntimeError("timeout")
+
+        consumer = QueueConsumer(queue, boom)
+        for _ in range(2):
+            asyncio.run(consumer.run_once())
+            for r in queue.rows.values():
+                r['visible'] = True  # Pasó el backoff
+        row = queue.rows[1]
+        assert row['status'] == 'failed' and row['retry_count'] == 2
+        assert consumer.stats['realtime_failed'] == 2
+
+    def test_expired_lease_reclaimed_by_other_worker(self):
+        """✅ Un worker muerto no retiene items: al vencer el lease otro los procesa"""
+        queue = InMemoryQueue()
+        queue.enqueue(_items(2, 9))
+        queue.claim("dead-worker", 10)
+        for r in queue.rows.values():
+            r['expired'] = True
+
+        done = []
+
+        async def realtime(product, model):
+            done.append(product['name'])
+
+        consumer = QueueConsumer(queue, realtime, worker_id="w2")
+        asyncio.run(consumer.run_once())
+        assert sorted(done) == ["Producto 0", "Producto 1"]
+        assert consumer.stats['released'] == 2
+
+
+class TestProcessingQueueSQL:
+    """💾 Consultas contra processing_queue"""
+
+    def test_claim_orders_by_priority_and_skips_locked(self):
+        """✅ Claim por prioridad/antigüedad con SKIP LOCKED y lease"""
+        db = MagicMock()
+        cursor = db.get_connection.return_value.__enter__.return_value.cursor.return_value.__enter__.return_value
+        cursor.fetchall.return_value = [
+            {"id": 1, "priority": 5, "created_at": 1},
+            {"id": 2, "priority": 9, "created_at": 2},
+        ]
+        items = ProcessingQueue(db).claim("w1", 10, lease_seconds=120, min_priority=8)
+
+        sql, params = cursor.execute.call_args[0]
+        assert "ORDER BY priority DESC, created_at" in sql and "FOR UPDATE SKIP LOCKED" in sql
+        assert params == ("w1", 120, 8, 10, 10)
+        assert [i["id"] for i in items] == [2, 1]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 Tests para Matching inter-retail
+===================================
+Valida el blocking multi-pasada de src/match.do_match
+"""
+
+import pytest
+from src.match import do_match, attribute_bucket, candidate_pairs, key_for_compare, WILDCARD
+
+
+def _p(retailer, brand, model, **attrs):
+    return {"retailer": retailer, "brand": brand, "category": "smartphones",
+            "model": model, "attributes": attrs}
+
+
+SAMPLE = [
+    _p("Falabella", "SAMSUNG", "Galaxy S24 256GB", capacity="256 GB"),
+    _p("Ripley", "SAMSUNG", "Galaxy S24 256GB", capacity="256 GB"),
+    _p("Paris", "SAMSUNG", "Galaxy S24 256 GB Negro"),  # sin capacidad -> comodín
+    _p("Falabella", "SAMSUNG", "Galaxy S24 512GB", capacity="512 GB"),
+    _p("Ripley", "SAMSUNG", "Galaxy S24 512GB", capacity="512 GB"),
+    _p("Falabella", "APPLE", "iPhone 15 128GB", capacity="128 GB"),
+    _p("Paris", "APPLE", "iPhone 15 128GB", capacity="128 GB"),
+]
+
+
+class TestBlocking:
+    """🧱 Claves de blocking por atributo"""
+
+    def test_attribute_bucket_keys(self):
+        """✅ Capacidad, volumen y banda de pantalla generan buckets"""
+        assert attribute_bucket(_p("X", "B", "m", capacity="256 GB")) == "capacity=256gb"
+        assert attribute_bucket({"attributes": {"volume_ml": 100}}) == "volume_ml=100"
+        assert attribute_bucket({"attributes": {"screen_size_in": 54.6}}) == "screen=55"
+        assert attribute_bucket({"attributes": {}}) == WILDCARD
+
+    def test_variants_not_compared(self):
+        """✅ 256GB y 512GB no son candidatos entre sí; el comodín sí"""
+        keys = [key_for_compare(p) for p in SAMPLE]
+        cands = candidate_pairs(SAMPLE, keys, window=0)
+        assert (0, 4) not in cands and (1, 3) not in cands
+        assert (0, 2) in cands and (2, 4) in cands
+
+    def test_stats_report_reduction(self):
+        """✅ Las estadísticas reportan histogramas y reducción vs baseline"""
+        stats = {}
+        do_match(SAMPLE, window=0, stats=stats)
+        assert stats["comparisons"] < stats["baseline_comparisons"]
+        assert stats["max_block_attribute"] < stats["max_block_baseline"]
+        assert sum(stats["blocks_baseline"].values()) == 2
+
+    def test_comparisons_within_baseline_budget(self):
+        """✅ Con datos generados nunca se hacen más comparaciones que el blocking original"""
+        from benchmarks.datasets import generate_dataset
+        from benchmarks.match_bench import to_rows
+        docs, _ = generate_dataset(1000)
+        stats = {}
+        do_match(to_rows(docs), stats=stats)
+        assert stats["neighbourhood_pass_pairs"] > 0
+        assert stats["comparisons"] <= stats["baseline_comparisons"]
+
+
+class TestMatching:
+    """🔗 Resultados del matching"""
+
+    def test_same_matches_as_full_block(self):
+        """✅ Sin pérdida de recall: los pares verdaderos se mantienen"""
+        pairs = do_match(SAMPLE)
+        found = {(p["left"]["model"], p["left"]["retailer"], p["right"]["retailer"]) for p in pairs}
+        assert ("Galaxy S24 256GB", "Falabella", "Ripley") in found
+        assert ("Galaxy S24 512GB", "Falabella", "Ripley") in found
+        assert ("iPhone 15 128GB", "Falabella", "Paris") in found
+
+    def test_pair_format(self):
+        """✅ Formato de salida compatible (left/right/similarity/block)"""
+        pair = do_match(SAMPLE)[0]
+        assert set(pair) == {"left", "right", "similarity", "block"}
+        assert pair["block"] == {"category": "smartphones", "brand": "samsung"}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 Tests para Match Store inter-retail
+======================================
+Valida agrupación de pares en clusters y las consultas del store (BD mockeada)
+"""
+
+import pytest
+from unittest.mock import MagicMock, patch
+from contextlib import contextmanager
+
+from src.match_store import build_clusters, MatchStore, OFFERS_QUERY, PRICE_COMPARISON_QUERY
+
+
+def _row(fp, retailer, price, name="Samsung Galaxy S24 256GB"):
+    return {
+        "fingerprint": fp, "retailer": retailer, "product_id": f"{retailer}-{fp}",
+        "name": name, "brand": "SAMSUNG", "category": "smartphones",
+        "price_current": price, "price_original": None, "url": f"https://{retailer}.cl/{fp}",
+    }
+
+
+def _connector(cursor):
+    conn = MagicMock()
+    conn.cursor.return_value.__enter__.return_value = cursor
+    connector = MagicMock()
+
+    @contextmanager
+    def get_connection():
+        yield conn
+
+    connector.get_connection = get_connection
+    return connector, conn
+
+
+class TestBuildClusters:
+    """🔗 Agrupación union-find de pares de do_match"""
+
+    def test_transitive_pairs_form_one_cluster(self):
+        """✅ A~B y B~C terminan en un único cluster"""
+        a, b, c = _row("fa", "Falabella", 100), _row("fb", "Ripley", 90), _row("fc", "Paris", 95)
+        pairs = [
+            {"left": a, "right": b, "similarity": 0.9},
+            {"left": b, "right": c, "similarity": 0.95},
+        ]
+        clusters = build_clusters(pairs)
+
+        assert len(clusters) == 1
+        assert clusters[0]["member_count"] == 3
+        assert clusters[0]["retailer_count"] == 3
+        sims = {m["retailer"]: m["similarity"] for m in clusters[0]["members"]}
+        assert sims["Ripley"] == 0.95  # mejor similitud del miembro
+
+    def test_same_fingerprint_joins_clusters(self):
+        """✅ Mismo fingerprint en pares distintos se une al mismo cluster"""
+        pairs = [
+            {"left": _row("fx", "Falabella", 100), "right": _row("fy", "Ripley", 90), "similarity": 0.9},
+            {"left": _row("fx", "Paris", 99), "right": _row("fz", "Ripley", 80), "similarity": 0.88},
+        ]
+        clusters = build_clusters(pairs)
+        assert len(clusters) == 1
+        assert clusters[0]["member_count"] == 4
+
+    def test_cluster_id_is_stable(self):
+        """✅ El cluster_id no depende del orden de los pares"""
+        a, b = _row("fa", "Falabella", 100), _row("fb", "Ripley", 90)
+        c1 = build_clusters([{"left": a, "right": b, "similarity": 0.9}])
+        c2 = build_clusters([{"left": b, "right": a, "similarity": 0.9}])
+        assert c1[0]["cluster_id"] == c2[0]["cluster_id"]
+
+
+class TestMatchStore:
+    """💾 Persistencia y lookup (cursor mockeado)"""
+
+    def test_upsert_matches_bulk(self):
+        """✅ Un execute_values por tabla, commit único"""
+        cursor = MagicMock()
+        connector, conn = _connector(cursor)
+        pairs = [{"left": _row("fa", "Falabella", 100), "right": _row("fb", "Ripley", 90), "similarity": 0.9}]
+
+        with patch("src.match_store.extras.execute_values") as ev:
+            res = MatchStore(connector).upsert_matches(pairs)
+
+        assert res == {"clusters": 1, "members": 2}
+        assert ev.call_count == 2
+        assert len(ev.call_args_list[1].args[2]) == 2
+        conn.commit.assert_called_once()
+
+    def test_get_offers_single_query(self):
+        """✅ get_offers hace un único lookup por fingerprint"""
+        cursor = MagicMock()
+        cursor.fetchall.return_value = [{"retailer": "Ripley", "price_current": 90}]
+        connector, _ = _connector(cursor)
+
+        offers = MatchStore(connector).get_offers("fa")
+
+        cursor.execute.assert_called_once_with(OFFERS_QUERY, ("fa",))
+        assert offers == [{"retailer": "Ripley", "price_current": 90}]
+
+    def test_price_comparison_keeps_same_retailer_offers(self):
+        """✅ Dos ofertas del mismo retailer en el cluster no se pisan: arreglo, no objeto por retailer"""
+        cursor = MagicMock()
+        offers = [{"retailer": "Ripley", "product_id": "p1", "precio_actual": 90},
+                  {"retailer": "Ripley", "product_id": "p2", "precio_actual": 95}]
+        cursor.fetchall.return_value = [{"fingerprint": "fa", "ofertas": offers}]
+        connector, _ = _connector(cursor)
+
+        rows = MatchStore(connector).get_price_comparison(["fa"])
+
+        cursor.execute.assert_called_once_with(PRICE_COMPARISON_QUERY, (["fa"],))
+        assert "json_object_agg" not in PRICE_COMPARISON_QUERY
+        assert rows[0]["ofertas"] == offers
+
+    def test_price_comparison_empty(self):
+        """✅ Sin fingerprints no consulta la BD"""
+        connector = MagicMock()
+        assert MatchStore(connector).get_price_comparison([]) == []
+        connector.get_connection.assert_not_called()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
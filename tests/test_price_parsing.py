@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 Tests para el parseo de precios memoizado
+============================================
+Valida que parse_price / parse_prices / pick_price den lo mismo que antes de
+la memo, que los campos numéricos no pasen por la memo y que esta quede acotada
+"""
+
+import pytest
+
+import src.utils as utils
+from src.utils import parse_price, parse_prices, pick_price
+
+
+@pytest.fixture(autouse=True)
+def fresh_memo():
+    utils._PRICE_MEMO.clear()
+    yield
+    utils._PRICE_MEMO.clear()
+
+
+class TestParsePrice:
+    """💲 parse_price"""
+
+    @pytest.mark.parametrize("value, expected", [
+        ("$129.990", 129990),
+        ("$ 1.299.990", 1299990),
+        ("  $99,990  ", 99990),
+        ("1299990", 1299990),
+        ("Precio: $19.990 c/u", 19990),
+        ("", None),
+        ("   ", None),
+        ("sin precio", None),
+        ("$0", None),
+        ("$150.000.000", None),
+        (129990, 129990),
+        (129990.6, 129991),
+        (0, None),
+        (-5, None),
+        (100_000_001, None),
+        (True, 1),
+        (None, None),
+        (["$1.990"], None),
+    ])
+    def test_values(self, value, expected):
+        """✅ Mismos resultados que el parser sin memo (textos, números y tipos raros)"""
+        assert parse_price(value) == expected
+        assert parse_price(value) == expected  # segunda vez desde la memo
+
+    def test_text_memoized(self, monkeypatch):
+        """✅ Cada texto distinto pasa una sola vez por la regex"""
+        calls = []
+        original = utils._parse_price_text
+        monkeypatch.setattr(utils, "_parse_price_text", lambda v: calls.append(v) or original(v))
+        for _ in range(100):
+            assert parse_price("$129.990") == 129990
+            assert parse_price("$") is None
+        assert calls == ["$129.990", "$"]
+
+    def test_numeric_fast_path(self):
+        """✅ Campos ya numéricos no ocupan la memo"""
+        assert parse_price(129990) == 129990
+        assert parse_price(99.9) == 100
+        assert utils._PRICE_MEMO == {}
+
+    def test_memo_bounded(self, monkeypatch):
+        """✅ La memo se vacía al llegar al límite"""
+        monkeypatch.setattr(utils, "_PRICE_MEMO_LIMIT", 10)
+        for i in range(1, 100):
+            assert parse_price(f"${i}.990") == i * 1000 + 990
+        assert len(utils._PRICE_MEMO) <= 10
+
+
+class TestBatch:
+    """📦 parse_prices y pick_price"""
+
+    def test_parse_prices_matches_scalar(self):
+        """✅ parse_prices == [parse_price(v) ...] con valores mezclados y repetidos"""
+        values = ["$129.990", 129990, None, "", "$129.990", 1.5, "abc", "$2.999.990", {"x": 1}] * 50
+        expected = [parse_price(v) for v in values]
+        utils._PRICE_MEMO.clear()
+        assert parse_prices(values) == expected
+        assert parse_prices(iter(values)) == expected
+        assert parse_prices([]) == []
+
+    @pytest.mark.parametrize("item, expected", [
+        ({"card_price_text": "$99.990", "card_price": 99990, "normal_price_text": "$129.990",
+          "normal_price": 129990, "original_price_text": "", "original_price": None}, (99990, 129990)),
+        ({"ripley_price_text": "$89.990", "card_price_text": "$89.990", "normal_price_text": "$109.990"},
+         (89990, 109990)),
+        ({"card_price": None, "card_price_text": "$", "normal_price_text": "$49.990"}, (49990, 49990)),
+        ({"ripley_price_text": "$9.990"}, (9990, None)),
+        ({"name": "Sin precios"}, (None, None)),
+    ])
+    def test_pick_price(self, item, expected):
+        """✅ Preferencia tarjeta > normal > ripley y original desde las llaves conocidas"""
+        assert pick_price(item) == expected
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
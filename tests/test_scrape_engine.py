@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 Tests para el motor de scraping concurrente
+==============================================
+Valida la cortesía por dominio, la espera por productos renderizados en vez
+de sleeps fijos, el orden de resultados con varios workers y el corte de
+páginas tras una vacía (con drivers falsos, sin selenium ni red)
+"""
+
+import threading
+import time
+
+import pytest
+
+from Scrappers.driver_pool import DriverPool
+from Scrappers.scrape_engine import (DEFAULT_MIN_INTERVAL_S, ConcurrentScraper, DomainLimiter, PageTask,
+                                     group_products, wait_for_products)
+
+
+class RenderingDriver:
+    """Driver falso: la página url tiene pages[url] productos, visibles tras render_s"""
+
+    def __init__(self, pages, render_s=0.0, load_s=0.0):
+        self.pages = pages
+        self.render_s = render_s
+        self.load_s = load_s
+        self.url = None
+        self.loaded_at = 0.0
+        self.scrolls = 0
+
+    def get(self, url):
+        time.sleep(self.load_s)
+        self.url = url
+        self.loaded_at = time.monotonic()
+
+    def _visible(self):
+        if time.monotonic() - self.loaded_at < self.render_s:
+            return 0
+        return self.pages.get(self.url, 0)
+
+    def find_elements(self, by, selector):
+        assert by == "css selector"
+        return [None] * self._visible()
+
+    @property
+    def page_source(self):
+        return f"{self.url}|{self._visible()}"
+
+    def execute_script(self, script, *args):
+        if script == "return 1":
+            return 1
+        self.scrolls += 1
+
+    def quit(self):
+        pass
+
+
+def parse_page(html, task):
+    url, count = html.rsplit("|", 1)
+    return [{"url": url, "i": i, "page_scraped": task.page_num} for i in range(int(count))]
+
+
+def no_gap(workers):
+    """Limiter sin separación entre cargas (servidor falso, sin cortesía que cuidar)"""
+    return DomainLimiter(max_concurrent=workers, min_interval_s=0.0)
+
+
+def make_tasks(searches=2, pages=4, host="https://www.falabella.com"):
+    return [PageTask(f"s{s}", p, f"{host}/search?Ntt=s{s}&page={p}") for s in range(searches) for p in range(1, pages + 1)]
+
+
+class TestDomainLimiter:
+    """🚦 Cortesía por dominio"""
+
+    def test_min_interval_between_starts(self):
+        """✅ Cargas al mismo host separadas por min_interval_s; otro host no espera"""
+        limiter = DomainLimiter(max_concurrent=4, min_interval_s=0.05)
+        starts = []
+        for _ in range(3):
+            with limiter.slot("https://www.paris.cl/search/?q=tv"):
+                starts.append(time.monotonic())
+        assert starts[1] - starts[0] >= 0.045 and starts[2] - starts[1] >= 0.045
+        t0 = time.monotonic()
+        with limiter.slot("https://www.falabella.com/falabella-cl/search?Ntt=tv"):
+            assert time.monotonic() - t0 < 0.04
+
+    def test_max_concurrent_per_domain(self):
+        """✅ Nunca más de max_concurrent cargas simultáneas al mismo host"""
+        limiter = DomainLimiter(max_concurrent=2, min_interval_s=0.0)
+        active, peak, lock = [0], [0], threading.Lock()
+
+        def worker():
+            with limiter.slot("https://simple.ripley.cl/tecno"):
+                with lock:
+                    active[0] += 1
+                    peak[0] = max(peak[0], active[0])
+                time.sleep(0.02)
+                with lock:
+                    active[0] -= 1
+
+        threads = [threading.Thread(target=worker) for _ in range(6)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert peak[0] == 2
+        with pytest.raises(ValueError):
+            DomainLimiter(max_concurrent=0)
+
+
+class TestWaitForProducts:
+    """⏳ Espera por página lista"""
+
+    def test_returns_when_rendered(self):
+        """✅ Devuelve apenas los productos aparecen y el conteo se estabiliza (con scroll)"""
+        driver = RenderingDriver({"u": 48}, render_s=0.05)
+        driver.get("u")
+        t0 = time.monotonic()
+        assert wait_for_products(driver, ".pod", timeout=5, poll_s=0.01) == 48
+        assert time.monotonic() - t0 < 1
+        assert driver.scrolls >= 1
+
+    def test_timeout_without_products(self):
+        """✅ Página vacía o bloqueada: 0 tras el timeout, sin colgarse"""
+        driver = RenderingDriver({})
+        driver.get("bloqueada")
+        t0 = time.monotonic()
+        assert wait_for_products(driver, ".pod", timeout=0.1, poll_s=0.01) == 0
+        assert 0.1 <= time.monotonic() - t0 < 1
+
+
+class TestConcurrentScraper:
+    """⚡ Motor concurrente"""
+
+    @pytest.mark.parametrize("workers", [1, 3])
+    def test_results_match_sequential(self, workers):
+        """✅ Mismos productos y orden que tasks con 1 o K workers; K drivers como máximo"""
+        tasks = make_tasks()
+        pages = {t.url: 10 + t.page_num for t in tasks}
+        started = []
+        pool = DriverPool(lambda: started.append(1) or RenderingDriver(pages, render_s=0.01, load_s=0.01),
+                          size=workers)
+        engine = ConcurrentScraper(pool, parse_page, ".pod", workers=workers, limiter=no_gap(workers), poll_s=0.005)
+        results = engine.run(tasks)
+        pool.close()
+        assert [r.task for r in results] == tasks
+        assert [len(r.products) for r in results] == [10 + t.page_num for t in tasks]
+        assert len(started) <= workers
+        grouped = group_products(results)
+        assert list(grouped) == ["s0", "s1"]
+        assert [p["page_scraped"] for p in grouped["s0"]] == sorted(p["page_scraped"] for p in grouped["s0"])
+
+    def test_parallel_faster(self):
+        """✅ Con 4 workers las páginas se cargan en paralelo"""
+        tasks = make_tasks(searches=2, pages=4)
+        pages = {t.url: 5 for t in tasks}
+
+        def run(workers):
+            pool = DriverPool(lambda: RenderingDriver(pages, load_s=0.05), size=workers)
+            t0 = time.monotonic()
+            ConcurrentScraper(pool, parse_page, ".pod", workers=workers, limiter=no_gap(workers),
+                              poll_s=0.005).run(tasks)
+            pool.close()
+            return time.monotonic() - t0
+
+        assert run(4) < run(1) / 2
+
+    def test_cut_after_empty_page(self):
+        """✅ Una página vacía desde cut_empty_from corta las siguientes de esa búsqueda"""
+        tasks = make_tasks(searches=2, pages=6)
+        pages = {t.url: 5 for t in tasks if not (t.key == "s0" and t.page_num >= 3)}
+        pool = DriverPool(lambda: RenderingDriver(pages), size=1)
+        engine = ConcurrentScraper(pool, parse_page, ".pod", workers=1, limiter=no_gap(1), wait_timeout=0.02,
+                                   poll_s=0.005, cut_empty_from=3)
+        results = engine.run(tasks)
+        pool.close()
+        skipped = [(r.task.key, r.task.page_num) for r in results if r.skipped]
+        assert skipped == [("s0", 4), ("s0", 5), ("s0", 6)]
+        assert sum(len(r.products) for r in results if r.task.key == "s1") == 30
+
+    def test_in_flight_pages_after_cut_dropped(self):
+        """✅ Con K workers, páginas tras el corte que ya se cargaron se descartan (como el loop secuencial)"""
+        tasks = make_tasks(searches=1, pages=6)
+        pages = {t.url: 5 for t in tasks if t.page_num != 3}
+        pool = DriverPool(lambda: RenderingDriver(pages), size=3)
+        # La página 3 (vacía) espera el timeout mientras 4 y 5 cargan en los otros slots
+        engine = ConcurrentScraper(pool, parse_page, ".pod", workers=3, limiter=no_gap(3), wait_timeout=0.1,
+                                   poll_s=0.005, cut_empty_from=3)
+        results = engine.run(tasks)
+        pool.close()
+        assert [r.task.page_num for r in results if r.skipped] == [4, 5, 6]
+        assert [p["page_scraped"] for p in group_products(results)["s0"]] == [1] * 5 + [2] * 5
+
+    def test_default_limiter_keeps_gap(self):
+        """✅ Sin limiter explícito las cargas al mismo host quedan separadas"""
+        engine = ConcurrentScraper(DriverPool(lambda: None), parse_page, ".pod", workers=4)
+        assert engine.limiter.min_interval_s == DEFAULT_MIN_INTERVAL_S > 0
+        assert engine.limiter.max_concurrent == 4
+
+    def test_errors_and_stop(self):
+        """✅ Un error de página queda en el resultado; con stop_event no se carga nada más"""
+        tasks = make_tasks(searches=1, pages=3)
+
+        def parse(html, task):
+            if task.page_num == 2:
+                raise ValueError("html inesperado")
+            return parse_page(html, task)
+
+        stop = threading.Event()
+        pool = DriverPool(lambda: RenderingDriver({t.url: 3 for t in tasks}), size=1)
+        engine = ConcurrentScraper(pool, parse, ".pod", workers=1, limiter=no_gap(1), poll_s=0.005,
+                                   stop_event=stop)
+        results = engine.run(tasks)
+        assert [len(r.products) for r in results] == [3, 0, 3]
+        assert results[1].error == "html inesperado"
+        stop.set()
+        assert all(r.skipped for r in engine.run(tasks))
+        pool.close()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
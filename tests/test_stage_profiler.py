@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 Tests para los timers por etapa y el perfilado por muestreo
+==============================================================
+Valida que deshabilitado no registre nada, los histogramas por etapa, el
+muestreo 1-de-N con límite, el reporte en disco y las pilas colapsadas
+"""
+
+import argparse
+import cProfile
+import json
+import pstats
+import time
+
+import pytest
+
+from src.stage_profiler import (
+    StageProfiler, collapse_pstats, add_profile_arguments, enable_from_args, get_profiler, stage
+)
+
+
+def _leaf():
+    return sum(i * i for i in range(2000))
+
+
+def _middle():
+    return _leaf() + _leaf()
+
+
+def _root():
+    return _middle()
+
+
+@pytest.fixture
+def profiler():
+    p = StageProfiler()
+    yield p
+    p.disable()
+
+
+class TestStageTimers:
+    """⏱️ Etapas con context manager y decorador"""
+
+    def test_disabled_records_nothing(self, profiler):
+        """✅ Deshabilitado: stage() es el mismo objeto nulo y no crea histogramas"""
+        assert profiler.stage("a") is profiler.stage("b")
+        with profiler.stage("categorize"):
+            pass
+        assert profiler.histograms == {}
+        with profiler.sample() as sampled:
+            assert sampled is False
+
+    def test_stage_histograms(self, profiler):
+        """✅ Cada etapa acumula conteo y percentiles en ms"""
+        profiler.enable()
+        for _ in range(20):
+            with profiler.stage("db_save"):
+                time.sleep(0.002)
+            with profiler.stage("fingerprint"):
+                pass
+
+        summary = profiler.stage_summary()
+        assert list(summary) == ["db_save", "fingerprint"]
+        assert summary["db_save"]["count"] == 20
+        assert summary["db_save"]["p50_ms"] >= 1.9
+        assert summary["fingerprint"]["p99_ms"] < summary["db_save"]["p50_ms"]
+
+    def test_timed_decorator(self, profiler):
+        """✅ @timed mide con el nombre de la función y respeta el flag en cada llamada"""
+        @profiler.timed()
+        def extract_attributes(name):
+            return {"name": name}
+
+        assert extract_attributes("x") == {"name": "x"}
+        assert profiler.histograms == {}
+        profiler.enable()
+        extract_attributes("y")
+        assert profiler.histograms["extract_attributes"].count == 1
+
+    def test_exception_still_recorded(self, profiler):
+        """✅ Una etapa que falla igual registra su duración"""
+        profiler.enable()
+        with pytest.raises(ValueError):
+            with profiler.stage("llm_extract"):
+                raise ValueError("timeout")
+        assert profiler.histograms["llm_extract"].count == 1
+
+
+class TestSampling:
+    """🔬 Perfiles sobre una muestra de productos"""
+
+    def test_one_in_n_with_limit(self, profiler):
+        """✅ Se perfila el producto 1, 1+N, ... hasta sample_limit"""
+        profiler.enable(sample_every=3, sample_limit=2)
+        flags = []
+        for _ in range(10):
+            with profiler.sample() as sampled:
+                flags.append(sampled)
+                _root()
+        assert flags == [True, False, False, True] + [False] * 6
+        assert profiler.sampled == 2
+
+    def test_report_files(self, profiler, tmp_path):
+        """✅ stages.json, .pstats y pilas colapsadas en el directorio de salida"""
+        profiler.enable(sample_every=1)
+        for _ in range(3):
+            with profiler.sample(), profiler.stage("normalize_one"):
+                _root()
+
+        paths = profiler.write_report(str(tmp_path))
+        data = json.loads((tmp_path / "stages.json").read_text(encoding="utf-8"))
+        assert data["unit"] == "us" and data["sampled_products"] == 3
+        assert data["histograms"]["normalize_one"]["count"] == 3
+        assert pstats.Stats(paths["pstats"]).total_calls > 0
+        lines = (tmp_path / "stacks.collapsed").read_text(encoding="utf-8").splitlines()
+        assert any(";test_stage_profiler.py:_leaf:" in line for line in lines)
+
+
+class TestCollapsedStacks:
+    """🔥 Reconstrucción de pilas desde cProfile"""
+
+    def test_stacks_follow_call_graph(self):
+        """✅ Las pilas respetan caller→callee y el total cuadra con el tiempo perfilado"""
+        prof = cProfile.Profile()
+        prof.enable()
+        _root()
+        prof.disable()
+        stats = pstats.Stats(prof)
+
+        rows = collapse_pstats(stats)
+        stacks = [stack.split(";") for stack, _ in rows]
+        names = [[frame.split(":")[1] if ":" in frame else frame for frame in s] for s in stacks]
+        leaf_paths = [n for n in names if "_leaf" in n]
+        assert leaf_paths and all(n[n.index("_leaf") - 1] == "_middle" for n in leaf_paths)
+        assert all(n[n.index("_middle") - 1] == "_root" for n in names if "_middle" in n)
+        assert all(micros > 0 for _, micros in rows)
+
+        total_us = sum(micros for _, micros in rows)
+        assert total_us == pytest.approx(stats.total_tt * 1e6, rel=0.05)
+
+
+class TestCliIntegration:
+    """🖥️ Flags --profile"""
+
+    def test_enable_from_args(self):
+        """✅ --profile habilita el profiler global; sin el flag queda apagado"""
+        parser = argparse.ArgumentParser()
+        add_profile_arguments(parser)
+        try:
+            assert enable_from_args(parser.parse_args([])) is False
+            assert not get_profiler().enabled
+
+            args = parser.parse_args(["--profile", "--profile-sample", "5"])
+            assert enable_from_args(args) is True
+            with stage("categorize"):
+                pass
+            assert get_profiler().sample_every == 5
+            assert get_profiler().histograms["categorize"].count == 1
+        finally:
+            get_profiler().disable()
+            get_profiler().reset()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
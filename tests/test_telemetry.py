@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 Tests para el registro de métricas y el endpoint /metrics
+============================================================
+Valida el formato de exposición Prometheus, los collectors que leen los
+`stats` de cada componente al exponer y el servidor HTTP opcional
+"""
+
+import gc
+import urllib.request
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.telemetry import MetricsRegistry, get_registry, start_http_server, CONTENT_TYPE
+from src.gpt5.cache_l1 import L1RedisCache
+from src.gpt5_db_connector import MetricsWriter, _metrics_writer_metrics
+
+
+def _lines(registry):
+    return registry.render().splitlines()
+
+
+class TestExposition:
+    """📡 Formato de texto Prometheus 0.0.4"""
+
+    def test_counter_and_gauge(self):
+        """✅ Contadores con sufijo _total, labels escapados y gauges tal cual"""
+        registry = MetricsRegistry()
+        requests = registry.counter("llm_requests", "Requests LLM", ("model", "status"))
+        requests.labels("gpt-5-mini", "success").inc()
+        requests.labels(model="gpt-5-mini", status="success").inc(2)
+        registry.gauge("queue_depth", "Pendientes").set(7)
+        registry.counter("events", 'Eventos "raros"', ("event",)).labels('a"b\\c').inc()
+
+        lines = _lines(registry)
+        assert "# TYPE llm_requests_total counter" in lines
+        assert 'llm_requests_total{model="gpt-5-mini",status="success"} 3' in lines
+        assert "queue_depth 7" in lines
+        assert 'events_total{event="a\\"b\\\\c"} 1' in lines
+
+    def test_histogram_buckets_cumulative(self):
+        """✅ Buckets cumulativos con +Inf, _sum y _count"""
+        registry = MetricsRegistry()
+        hist = registry.histogram("llm_request_duration_seconds", "Latencia", ("model",),
+                                  buckets=(0.5, 1.0))
+        for value in (0.2, 0.7, 0.9, 3.0):
+            hist.labels("gpt-5").observe(value)
+
+        lines = _lines(registry)
+        assert 'llm_request_duration_seconds_bucket{model="gpt-5",le="0.5"} 1' in lines
+        assert 'llm_request_duration_seconds_bucket{model="gpt-5",le="1"} 3' in lines
+        assert 'llm_request_duration_seconds_bucket{model="gpt-5",le="+Inf"} 4' in lines
+        assert 'llm_request_duration_seconds_count{model="gpt-5"} 4' in lines
+        assert 'llm_request_duration_seconds_sum{model="gpt-5"} 4.8' in lines
+
+    def test_conflicting_registration(self):
+        """✅ El mismo nombre devuelve la misma métrica; con otro tipo o labels es un error"""
+        registry = MetricsRegistry()
+        counter = registry.counter("x", "X", ("a",))
+        assert registry.counter("x", "X", ("a",)) is counter
+        with pytest.raises(ValueError):
+            registry.gauge("x", "X", ("a",))
+        with pytest.raises(ValueError):
+            registry.counter("x", "X", ("b",))
+
+
+class TestCollectors:
+    """🔌 Stats leídos al exponer, sin costo por evento"""
+
+    def test_collector_dropped_with_owner(self):
+        """✅ Un collector con owner se descarta cuando el objeto se libera"""
+        class Component:
+            stats = {"hits": 4}
+
+        registry = MetricsRegistry()
+        component = Component()
+        registry.register_collector(
+            lambda c: [("cache_requests", "counter", "Consultas", [({"tier": "x"}, c.stats["hits"])])],
+            owner=component)
+        assert 'cache_requests_total{tier="x"} 4' in _lines(registry)
+
+        del component
+        gc.collect()
+        assert "cache_requests_total" not in registry.render()
+        assert registry._collectors == []
+
+    def test_same_series_summed(self):
+        """✅ Dos instancias con la misma serie se suman; un collector roto se omite"""
+        registry = MetricsRegistry()
+        registry.register_collector(lambda: [("ratelimit_requests", "counter", "R", [({"result": "accepted"}, 2)])])
+        registry.register_collector(lambda: [("ratelimit_requests", "counter", "R", [({"result": "accepted"}, 3)])])
+        registry.register_collector(lambda: 1 / 0)
+        assert 'ratelimit_requests_total{result="accepted"} 5' in _lines(registry)
+
+    def test_l1_cache_stats(self):
+        """✅ Hits/misses del cache L1 aparecen en el registro global"""
+        cache = L1RedisCache(use_mock=True)
+        cache.stats.update(hits=10, misses=5, sets=3, errors=0)
+        families = {name: samples for name, _, _, samples in get_registry().collect()}
+        hits = [v for n, labels, v in families["cache_requests"]
+                if labels == {"tier": "l1", "result": "hit"}]
+        assert hits and hits[0] >= 10
+
+    def test_metrics_writer_lag(self, tmp_path):
+        """✅ El lag del escritor es la antigüedad de la fila pendiente más vieja"""
+        writer = MetricsWriter(MagicMock(), flush_interval=60, spill_dir=str(tmp_path))
+        writer._buffer.append(("gpt-5",) * 15 + (datetime.now() - timedelta(seconds=30),))
+        families = {name: samples for name, _, _, samples in _metrics_writer_metrics(writer)}
+        buffered, lag = families["db_metrics_buffer_rows"], families["db_metrics_write_lag_seconds"]
+        assert buffered == [({}, 1)]
+        assert 29 <= lag[0][1] < 60
+        writer._buffer.clear()
+        writer.close()
+
+
+class TestHttpServer:
+    """🌐 Endpoint /metrics"""
+
+    def test_serves_metrics(self):
+        """✅ GET /metrics devuelve el texto con el content-type de Prometheus"""
+        registry = MetricsRegistry()
+        registry.counter("pipeline_events", "Eventos", ("event",)).labels("normalized").inc(42)
+        server = start_http_server(0, "127.0.0.1", registry=registry)
+        try:
+            url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+            with urllib.request.urlopen(url, timeout=5) as response:
+                body = response.read().decode("utf-8")
+                assert response.headers["Content-Type"] == CONTENT_TYPE
+            assert 'pipeline_events_total{event="normalized"} 42' in body
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])